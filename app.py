@@ -25,14 +25,20 @@ except Exception:
 import os
 import re
 import base64
+import hashlib
 import json
 import textwrap
 from io import BytesIO
 from datetime import datetime, date
 import uuid
+import importlib.machinery
 
 import streamlit as st
 
+# Streamlit instala este script como ``__main__``: con un spec "__main__" los workers
+# de export (forkserver/spawn) no lo re-ejecutan al arrancar.
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+
 # Legacy safety default
 legacy_calc_value = 0.0
 
@@ -59,6 +65,8 @@ except Exception:
     build = None
     MediaInMemoryUpload = None
 
+from drive_index import DriveJornadaIndex
+
 GOOGLE_SCOPES = [
     "openid",
     "https://www.googleapis.com/auth/userinfo.email",
@@ -75,6 +83,9 @@ def _drive_service():
     gc = st.session_state.get("google_creds")
     if not gc:
         return None
+    return _drive_service_from_creds(gc)
+
+def _drive_service_from_creds(gc: dict):
     creds = Credentials(
         token=gc.get("token"),
         refresh_token=gc.get("refresh_token"),
@@ -95,9 +106,11 @@ def _ensure_drive_folder(drive, folder_name: str) -> str:
     folder = drive.files().create(body=meta, fields="id").execute()
     return folder["id"]
 
-def _drive_upsert_json(drive, folder_id: str, filename: str, payload: dict) -> str:
+def _drive_upsert_json(drive, folder_id: str, filename: str, payload: dict) -> dict:
+    """Crea o actualiza ``filename``; retorna el recurso de Drive (id, modifiedTime, md5Checksum…)."""
     content = json.dumps(payload, ensure_ascii=False, indent=2, default=_json_default).encode("utf-8")
     media = MediaInMemoryUpload(content, mimetype="application/json", resumable=False)
+    fields = "id,name,modifiedTime,md5Checksum,size"
 
     q = f"'{folder_id}' in parents and name='{filename}' and trashed=false"
     res = drive.files().list(q=q, fields="files(id,name)").execute()
@@ -105,12 +118,10 @@ def _drive_upsert_json(drive, folder_id: str, filename: str, payload: dict) -> s
 
     if existing:
         file_id = existing[0]["id"]
-        drive.files().update(fileId=file_id, media_body=media).execute()
-        return file_id
+        return drive.files().update(fileId=file_id, media_body=media, fields=fields).execute()
 
     meta = {"name": filename, "parents": [folder_id]}
-    created = drive.files().create(body=meta, media_body=media, fields="id").execute()
-    return created["id"]
+    return drive.files().create(body=meta, media_body=media, fields=fields).execute()
 
 def _drive_list_json(drive, folder_id: str, limit: int = 100):
     q = f"'{folder_id}' in parents and mimeType='application/json' and trashed=false"
@@ -126,6 +137,34 @@ def _drive_download_json(drive, file_id: str) -> dict:
     data = drive.files().get_media(fileId=file_id).execute()
     return json.loads(data.decode("utf-8"))
 
+# Índice de jornadas en Drive: listado con TTL, contenido por versión (md5) y resumen KPI.
+DRIVE_INDEX_TTL_S = float(os.environ.get("TNPI_DRIVE_INDEX_TTL_S", "300"))
+# > 0 activa un hilo que vuelve a listar cada N segundos (0 = solo TTL y botón).
+DRIVE_INDEX_REFRESH_S = float(os.environ.get("TNPI_DRIVE_INDEX_REFRESH_S", "0"))
+
+@st.cache_resource(show_spinner=False)
+def _shared_drive_index(user_tag: str, folder_name: str) -> DriveJornadaIndex:
+    """Un índice (y a lo sumo un hilo de refresco) por usuario y carpeta, compartido entre sus sesiones."""
+    script_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+    return DriveJornadaIndex(
+        folder_name,
+        summarize=_kpi_summary_from_payload,
+        cache_dir=os.path.join(script_dir, ".cache", "drive", user_tag),
+        ttl_s=DRIVE_INDEX_TTL_S,
+    )
+
+def _drive_index(drive, folder_name: str) -> DriveJornadaIndex:
+    """Índice de la carpeta de jornadas del usuario (compartido por sus sesiones, con caché en disco)."""
+    user = (st.session_state.get("auth_user") or {}).get("email") or "anon"
+    user_tag = hashlib.sha1(str(user).lower().encode("utf-8")).hexdigest()[:16]
+    idx = _shared_drive_index(user_tag, folder_name)
+    if DRIVE_INDEX_REFRESH_S > 0 and st.session_state.get("google_creds"):
+        # Si el hilo ya corre, solo toma las credenciales de esta sesión (las más recientes).
+        _gc = dict(st.session_state["google_creds"])
+        idx.start_auto_refresh(lambda: _drive_service_from_creds(_gc), DRIVE_INDEX_REFRESH_S)
+    idx.refresh(drive)
+    return idx
+
 
 
 def _calc_eff(prog: float, real: float) -> float:
@@ -152,6 +191,12 @@ def _safe_float(v, default=0.0) -> float:
 
 # --- FIX: asegurar RowID por registro (para edición en Detalle) ---
 def _ensure_rowid(df_in: pd.DataFrame) -> pd.DataFrame:
+    # Si ya hay RowID en todas las filas se devuelve el mismo objeto: así los
+    # índices/tablas derivadas de la sesión no se invalidan en cada rerun.
+    if "RowID" in df_in.columns:
+        rid = df_in["RowID"]
+        if not (rid.isna() | (rid.astype(str).str.strip() == "")).any():
+            return df_in
     df = df_in.copy()
     if "RowID" not in df.columns:
         df.insert(0, "RowID", "")
@@ -215,80 +260,24 @@ import streamlit.components.v1 as components
 # ------------------------------
 # CSV robust loader (para CSVs con separador desconocido)
 # ------------------------------
-def robust_read_csv(src, encodings=("utf-8-sig","utf-8","latin-1"), seps=(",", ";", "\t", "|")) -> pd.DataFrame:
-    """
-    Lee CSV desde ruta o stream (UploadedFile) intentando:
-      1) sep=None (Sniffer) con engine='python'
-      2) una lista de separadores comunes
-    También prueba encodings típicos (utf-8-sig/utf-8/latin-1).
-    """
-    # Obtener bytes si es stream (p.ej. st.file_uploader)
-    data_bytes = None
-    if hasattr(src, "getvalue"):
-        try:
-            data_bytes = src.getvalue()
-        except Exception:
-            data_bytes = None
-    if data_bytes is None and hasattr(src, "read") and not isinstance(src, (str, bytes, os.PathLike)):
-        try:
-            # Ojo: read() consume el stream; por eso guardamos bytes
-            data_bytes = src.read()
-        except Exception:
-            data_bytes = None
-
-    def _try_read(buf, enc, sep):
-        return pd.read_csv(buf, sep=sep, engine="python", encoding=enc)
-
-    # Caso path en disco
-    if isinstance(src, (str, os.PathLike)):
-        last_err = None
-        for enc in encodings:
-            try:
-                return pd.read_csv(src, sep=None, engine="python", encoding=enc)
-            except Exception as e:
-                last_err = e
-            for s in seps:
-                try:
-                    return pd.read_csv(src, sep=s, engine="python", encoding=enc)
-                except Exception as e:
-                    last_err = e
-        raise last_err if last_err else ValueError("No se pudo leer el CSV")
-
-    # Caso stream / bytes
-    if data_bytes is None:
-        raise ValueError("No se pudo leer el archivo (stream vacío).")
-
-    from io import BytesIO
-    last_err = None
-    for enc in encodings:
-        try:
-            return _try_read(BytesIO(data_bytes), enc, None)
-        except Exception as e:
-            last_err = e
-        for s in seps:
-            try:
-                return _try_read(BytesIO(data_bytes), enc, s)
-            except Exception as e:
-                last_err = e
-    raise last_err if last_err else ValueError("No se pudo leer el CSV")
-
+from csv_loader import dialect_label, robust_read_csv
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
 
-from pptx import Presentation
-from pptx.util import Inches, Pt
-
-from PIL import Image
+from figure_cache import FigureCache, frame_fingerprint
+from derived_tables import DerivedTables, conn_std_by, conn_totals, hours_by, tipo_totals
+from day_index import DayIndex
+from kpi_kernel import attach_standard, efficiency_pct, semaforo, standards_table
+from jornada_store import JornadaStore, convert_json, day_key, merge_drill_day, session_days, split_drill_day
+from presence_store import PresenceStore
+from chart_render import DEFAULT_PROFILE, RENDER_PROFILES, ChartRenderer, export_style
+from daily_export import DEFAULT_FORMATS as DEFAULT_DAY_FORMATS, FORMATS as DAY_EXPORT_FORMATS, DayExportJob, daily_charts, day_kpis, run_batch
+from export_docs import build_pdf_doc, build_pptx_doc
 
 # ------------------------------
 # PLOTLY EXPORT (kaleido)
 # ------------------------------
 PLOTLY_IMG_OK = True
 try:
-    import plotly.io as pio
     import plotly.graph_objects as go
     import importlib.util
     if importlib.util.find_spec("kaleido") is None:
@@ -763,7 +752,7 @@ def add_semaforo_column(df, eff_col="Eficiencia_pct"):
     _df = _decorate_turno_df(df)
     if _df is None:
         return _df
-    _df["Semáforo"] = _df[eff_col].apply(_semaforo_from_eff)
+    _df["Semáforo"] = semaforo(_df[eff_col])
     return _df
 
 st.set_page_config(page_title="Dashboard Operativo DrillSpot", layout="wide")
@@ -780,61 +769,25 @@ def _get_user_role(email: str) -> str:
     except Exception:
         return "user"
 
-def _active_users_path() -> str:
+# Presencia: latidos a SQLite (WAL) con throttle por usuario; TTL de 45 min.
+PRESENCE_HEARTBEAT_S = float(os.environ.get("TNPI_PRESENCE_HEARTBEAT_S", "60"))
+PRESENCE_TTL_S = 45 * 60
+
+def _active_users_db_path() -> str:
     base_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
-    return os.path.join(base_dir, "active_users.json")
+    return os.path.join(base_dir, "active_users.sqlite3")
 
-def _load_active_users() -> dict:
-    try:
-        p = _active_users_path()
-        if os.path.exists(p):
-            with open(p, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data if isinstance(data, dict) else {}
-    except Exception:
-        pass
-    return {}
+@st.cache_resource(show_spinner=False)
+def _presence_store() -> PresenceStore:
+    return PresenceStore(_active_users_db_path(), heartbeat_s=PRESENCE_HEARTBEAT_S, ttl_s=PRESENCE_TTL_S)
 
-def _save_active_users(data: dict) -> None:
+def _touch_active_user(user_meta: dict) -> None:
+    # Presencia es best-effort: un "database is locked" o un error de disco no debe cortar el rerun.
     try:
-        with open(_active_users_path(), "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        _presence_store().heartbeat(user_meta)
     except Exception:
         pass
 
-def _cleanup_active_users(data: dict, ttl_minutes: int = 30) -> dict:
-    if not isinstance(data, dict):
-        return {}
-    out = {}
-    now = datetime.now()
-    for k, v in data.items():
-        try:
-            last_seen = datetime.fromisoformat(str(v.get("last_seen", "")))
-        except Exception:
-            last_seen = None
-        if last_seen is None:
-            continue
-        if (now - last_seen).total_seconds() <= ttl_minutes * 60:
-            out[k] = v
-    return out
-
-def _touch_active_user(user_meta: dict) -> None:
-    if not isinstance(user_meta, dict):
-        return
-    key = (user_meta.get("email") or user_meta.get("username") or "").strip().lower()
-    if not key:
-        return
-    data = _load_active_users()
-    data = _cleanup_active_users(data, ttl_minutes=45)
-    data[key] = {
-        "name": user_meta.get("name") or user_meta.get("username") or key,
-        "email": user_meta.get("email") or key,
-        "photo_url": user_meta.get("photo_url") or "",
-        "role": user_meta.get("role") or "user",
-        "last_seen": datetime.now().isoformat(timespec="seconds"),
-    }
-    _save_active_users(data)
-
 def _render_user_badge(user_meta: dict) -> str:
     name = (user_meta.get("name") or user_meta.get("username") or "").strip()
     photo = (user_meta.get("photo_url") or "").strip()
@@ -1067,12 +1020,14 @@ with st.sidebar:
     st.radio("Modo visual", ["Diurno", "Nocturno"], key="ui_mode", horizontal=True)
 
 with st.sidebar.expander("🟢 Usuarios activos", expanded=False):
-    au = _cleanup_active_users(_load_active_users(), ttl_minutes=45)
-    if not au:
+    try:
+        users_sorted = _presence_store().active(limit=12)
+    except Exception:
+        users_sorted = []
+    if not users_sorted:
         st.caption("Sin usuarios activos detectados.")
     else:
-        users_sorted = sorted(au.values(), key=lambda x: str(x.get("last_seen", "")), reverse=True)
-        for u in users_sorted[:12]:
+        for u in users_sorted:
             name = str(u.get("name") or u.get("email") or "").strip()
             role = str(u.get("role") or "").strip()
             last_seen = str(u.get("last_seen", "")).replace("T", " ")
@@ -1361,7 +1316,7 @@ def _load_actividades_ce():
         ]
         for _p in _csv_candidates:
             if os.path.exists(_p):
-                _df = pd.read_csv(_p, encoding="latin-1")
+                _df = robust_read_csv(_p, encodings=("utf-8-sig", "latin-1"))
                 col = _df.columns[0]
                 vals = [str(x).strip() for x in _df[col].tolist() if str(x).strip() and str(x).strip().lower() != "nan"]
                 # quitar duplicados preservando orden
@@ -1457,6 +1412,8 @@ CONN_STDS = {
     ("Fondo a fondo con MPD", "30° - 60°"): {"Preconexión": 12, "Conexión": 7, "Postconexión": 8, "TOTAL": 27},
     ("Fondo a fondo con MPD", ">60°"): {"Preconexión": 25, "Conexión": 7, "Postconexión": 8, "TOTAL": 40},
 }
+# Misma información en tabla (Conn_Tipo, Angulo_Bucket, componentes...) para cruzar con merge.
+CONN_STDS_TABLE = standards_table(CONN_STDS)
 
 # BHA estándares -> (objetivo arma, objetivo desarma)
 BHA_TYPES = {
@@ -1559,7 +1516,7 @@ def load_tnpi_catalog(csv_path: str) -> pd.DataFrame:
         try:
             df = robust_read_csv(csv_path)
         except Exception:
-            df = pd.read_csv(csv_path, encoding="utf-8", errors="ignore")
+            df = pd.read_csv(csv_path, encoding="utf-8", encoding_errors="ignore")
 
         # Normaliza número de columnas
         if df.shape[1] >= 4:
@@ -1589,18 +1546,63 @@ def load_tnpi_catalog(csv_path: str) -> pd.DataFrame:
     # fallback mínimo
     return pd.DataFrame(columns=cols_4)
 
+def _daily_export_jobs(
+    df_base: pd.DataFrame,
+    days: list,
+    etapa: str = "",
+    formats: tuple = DEFAULT_DAY_FORMATS,
+    profile: str | None = None,
+    viajes_store: dict | None = None,
+) -> list[DayExportJob]:
+    """Un ``DayExportJob`` por día con registros (filas, conexiones, BHA y drill_day de esa fecha)."""
+    if df_base is None or df_base.empty or "Fecha" not in df_base.columns:
+        return []
+    fechas = _df_fecha_to_date(df_base["Fecha"])
+    df_conn_all = st.session_state.get("df_conn", pd.DataFrame())
+    df_bha_all = st.session_state.get("df_bha", pd.DataFrame())
+    conn_fechas = df_conn_all["Fecha"].astype(str) if "Fecha" in df_conn_all.columns else None
+    bha_fechas = df_bha_all["Fecha"].astype(str) if "Fecha" in df_bha_all.columns else None
+    _drill_base, drill_by_day = split_drill_day(st.session_state.get("drill_day", {}) or {})
+    jobs = []
+    for day in days:
+        df_day = df_base[fechas == day]
+        if etapa and "Etapa" in df_day.columns:
+            df_day = df_day[df_day["Etapa"].astype(str) == str(etapa)]
+        if df_day.empty:
+            continue
+        r0 = df_day.iloc[0]
+        meta_d = {
+            "equipo": str(r0.get("Equipo", st.session_state.get("equipo_val", "")) or ""),
+            "pozo": str(r0.get("Pozo", st.session_state.get("pozo_val", "")) or ""),
+            "etapa": str(r0.get("Etapa", "") or ""),
+            "fecha": day.isoformat(),
+        }
+        jobs.append(
+            DayExportJob(
+                day=day,
+                df_day=df_day.copy(),
+                df_conn_day=df_conn_all[conn_fechas == str(day)].copy() if conn_fechas is not None else pd.DataFrame(),
+                df_bha_day=df_bha_all[bha_fechas == str(day)].copy() if bha_fechas is not None else pd.DataFrame(),
+                por_etapa=drill_by_day.get(day.isoformat(), {}).get("por_etapa", {}),
+                meta=meta_d,
+                kpis=day_kpis(df_day),
+                etapa=meta_d["etapa"] if etapa else "",
+                modo_reporte=modo_reporte,
+                formats=tuple(formats),
+                profile=profile or EXPORT_RENDER_PROFILE,
+                colorway=list(EXPORT_COLORWAY),
+                conn_order=list(CONN_ORDER),
+                conn_color_map=dict(CONN_COLOR_MAP),
+                viajes_store=viajes_store,
+            )
+        )
+    return jobs
+
+
 def render_export_diario_calendario():
     # -----------------------------------------------------------------
     # EXPORT AUTOMÁTICO DIARIO (por calendario) - PDF / PPTX / CSV
     # -----------------------------------------------------------------
-    def _safe_float(v, default=0.0) -> float:
-        try:
-            if v is None:
-                return float(default)
-            return float(v)
-        except Exception:
-            return float(default)
-
     with st.expander("Export automático diario (calendario)", expanded=False):
         df_base = st.session_state.get("df", pd.DataFrame()).copy()
         days_all = _available_days(df_base)
@@ -1617,6 +1619,7 @@ def render_export_diario_calendario():
                 key="exp_scope_pick",
             )
             df_day = split_day(df_base, dia_exp, date_col="Fecha")
+            etapa_pick = ""
             if (not df_day.empty) and (scope_rep.startswith("Por etapa")):
                 etapas_dia = [e for e in df_day.get("Etapa", pd.Series(dtype=str)).fillna("").astype(str).unique().tolist() if e != ""]
                 etapa_default = st.session_state.get("etapa_val", "")
@@ -1639,22 +1642,9 @@ def render_export_diario_calendario():
                     "etapa": str(r0.get("Etapa", "") or ""),
                     "fecha": dia_exp.isoformat(),
                 }
+                kpis_d = day_kpis(df_day)
 
-                total = float(df_day.get("Horas_Reales", pd.Series(dtype=float)).fillna(0).sum())
-                tp = float(df_day[df_day.get("Tipo", "") == "TP"]["Horas_Reales"].sum()) if "Tipo" in df_day.columns else total
-                tnpi = float(df_day[df_day.get("Tipo", "") == "TNPI"]["Horas_Reales"].sum()) if "Tipo" in df_day.columns else 0.0
-                tnp = float(df_day[df_day.get("Tipo", "") == "TNP"]["Horas_Reales"].sum()) if "Tipo" in df_day.columns else 0.0
-                eff = clamp_0_100(safe_pct(tp, total)) if total > 0 else 0.0
-
-                kpis_d = {
-                    "TP (h)": f"{tp:.2f}",
-                    "TNPI (h)": f"{tnpi:.2f}",
-                    "TNP (h)": f"{tnp:.2f}",
-                    "Horas total (h)": f"{total:.2f}",
-                    "Eficiencia del día": f"{eff:.0f}%",
-                }
-
-                sig_day = f"{dia_exp.isoformat()}|{scope_rep}|{meta_d.get('etapa','')}|{len(df_day)}|{total:.2f}|{tp:.2f}|{tnpi:.2f}|{tnp:.2f}"
+                sig_day = f"{dia_exp.isoformat()}|{scope_rep}|{meta_d.get('etapa','')}|{len(df_day)}|" + "|".join(kpis_d.values())
                 if st.session_state.get("exp_day_sig") != sig_day:
                     st.session_state["exp_day_sig"] = sig_day
                     st.session_state.pop("exp_day_pdf", None)
@@ -1668,235 +1658,23 @@ def render_export_diario_calendario():
                             prog = st.progress(0)
                             prog_msg = st.empty()
                             prog_msg.caption("Iniciando...")
-                            charts_d = {}
-                            # Pie tiempos
-                            if "Tipo" in df_day.columns and "Horas_Reales" in df_day.columns:
-                                df_t = df_day.groupby("Tipo", as_index=False)["Horas_Reales"].sum()
-                                if not df_t.empty:
-                                    charts_d["TP vs TNPI vs TNP (Diario)"] = px.pie(
-                                        df_t,
-                                        names="Tipo",
-                                        values="Horas_Reales",
-                                        hole=0.55,
-                                        title=f"TP vs TNPI vs TNP - {dia_exp.isoformat()}",
-                                    )
-                            prog.progress(12)
-                            prog_msg.caption("Graficas de tiempos listas.")
-                            # Pie actividades
-                            if "Actividad" in df_day.columns and "Horas_Reales" in df_day.columns:
-                                df_a = df_day.groupby("Actividad", as_index=False)["Horas_Reales"].sum().sort_values("Horas_Reales", ascending=False).head(10)
-                                if not df_a.empty:
-                                    charts_d["Top actividades (Diario)"] = px.pie(
-                                        df_a,
-                                        names="Actividad",
-                                        values="Horas_Reales",
-                                        hole=0.35,
-                                        title=f"Top actividades - {dia_exp.isoformat()}",
-                                    )
-                            prog.progress(24)
-                            prog_msg.caption("Graficas de actividades listas.")
-                            # BHA (Arma/Desarma) - diario
-                            df_bha_all = st.session_state.get("df_bha", pd.DataFrame()).copy()
-                            if not df_bha_all.empty and "Fecha" in df_bha_all.columns:
-                                df_bha_all["Fecha"] = df_bha_all["Fecha"].astype(str)
-                                df_bha_d = df_bha_all[df_bha_all["Fecha"] == str(dia_exp)].copy()
-                                if scope_rep.startswith("Por etapa") and meta_d.get("etapa"):
-                                    if "Etapa" in df_bha_d.columns:
-                                        df_bha_d = df_bha_d[df_bha_d["Etapa"] == str(meta_d.get("etapa"))].copy()
-                                if not df_bha_d.empty:
-                                    df_long_bha = df_bha_d.melt(
-                                        id_vars=[c for c in ["BHA_Tipo", "Accion"] if c in df_bha_d.columns],
-                                        value_vars=[c for c in ["Estandar_h", "Real_h"] if c in df_bha_d.columns],
-                                        var_name="Serie",
-                                        value_name="Horas",
-                                    )
-                                    if not df_long_bha.empty:
-                                        fig_bha_d = px.bar(
-                                            df_long_bha,
-                                            x="BHA_Tipo" if "BHA_Tipo" in df_long_bha.columns else "Accion",
-                                            y="Horas",
-                                            color="Serie",
-                                            barmode="group",
-                                            title=f"BHA - {dia_exp.isoformat()}",
-                                            color_discrete_sequence=EXPORT_COLORWAY,
-                                        )
-                                        charts_d["BHA (Estándar vs Real)"] = fig_bha_d
-                            prog.progress(38)
-                            prog_msg.caption("Graficas BHA listas.")
-
-                            # ROP diario (Día vs Noche): por etapa o consolidado por pozo
-                            if modo_reporte == "Perforación":
-                                rop_prog_d = 0.0
-                                rop_rd = 0.0
-                                rop_rn = 0.0
-                                por_etapa = st.session_state.drill_day.get("por_etapa", {})
-                                if scope_rep.startswith("Por etapa") and meta_d.get("etapa"):
-                                    etapa_key = str(meta_d.get("etapa"))
-                                    etapa_data_rop_d = por_etapa.get(etapa_key, {})
-                                    _prog_map = etapa_data_rop_d.get("rop_prog_by_date", {}) or {}
-                                    _rd_map = etapa_data_rop_d.get("rop_real_dia_by_date", {}) or {}
-                                    _rn_map = etapa_data_rop_d.get("rop_real_noche_by_date", {}) or {}
-                                    _p_entry = _prog_map.get(str(dia_exp), {})
-                                    rop_prog_d = _safe_float(_p_entry.get("rop_prog") if isinstance(_p_entry, dict) else (_p_entry or 0.0))
-                                    rop_rd = _safe_float(_rd_map.get(str(dia_exp), 0.0) or 0.0)
-                                    rop_rn = _safe_float(_rn_map.get(str(dia_exp), 0.0) or 0.0)
-                                else:
-                                    # Consolidado por pozo: sumar por etapa si hay datos diarios
-                                    for _, etapa_data_rop_d in (por_etapa or {}).items():
-                                        _prog_map = etapa_data_rop_d.get("rop_prog_by_date", {}) or {}
-                                        _rd_map = etapa_data_rop_d.get("rop_real_dia_by_date", {}) or {}
-                                        _rn_map = etapa_data_rop_d.get("rop_real_noche_by_date", {}) or {}
-                                        _p_entry = _prog_map.get(str(dia_exp), {})
-                                        rop_prog_d += _safe_float(_p_entry.get("rop_prog") if isinstance(_p_entry, dict) else (_p_entry or 0.0))
-                                        rop_rd += _safe_float(_rd_map.get(str(dia_exp), 0.0) or 0.0)
-                                        rop_rn += _safe_float(_rn_map.get(str(dia_exp), 0.0) or 0.0)
-                                if (rop_prog_d + rop_rd + rop_rn) > 0:
-                                    df_rop_d = pd.DataFrame(
-                                        [
-                                            {"Turno": "Día ☀️", "Programado (m/h)": rop_prog_d, "Real (m/h)": rop_rd},
-                                            {"Turno": "Noche 🌙", "Programado (m/h)": rop_prog_d, "Real (m/h)": rop_rn},
-                                        ]
-                                    )
-                                    fig_rop_d = px.bar(
-                                        df_rop_d,
-                                        x="Turno",
-                                        y=["Programado (m/h)", "Real (m/h)"],
-                                        barmode="group",
-                                        text_auto=True,
-                                        title=f"ROP - {dia_exp.isoformat()}",
-                                        color_discrete_sequence=EXPORT_COLORWAY,
-                                    )
-                                    charts_d["ROP (Diario)"] = fig_rop_d
-                            prog.progress(52)
-                            prog_msg.caption("Graficas ROP listas.")
-
-                            # Metros perforados diarios (Real vs Programado): por etapa o consolidado
-                            if modo_reporte == "Perforación":
-                                mp_d = 0.0
-                                mr_d = 0.0
-                                mr_n = 0.0
-                                por_etapa = st.session_state.drill_day.get("por_etapa", {})
-                                if scope_rep.startswith("Por etapa") and meta_d.get("etapa"):
-                                    etapa_key = str(meta_d.get("etapa"))
-                                    etapa_data_m = por_etapa.get(etapa_key, {})
-                                    _mp_map = etapa_data_m.get("metros_prog_by_date", {}) or {}
-                                    _md_map = etapa_data_m.get("metros_real_dia_by_date", {}) or {}
-                                    _mn_map = etapa_data_m.get("metros_real_noche_by_date", {}) or {}
-                                    _mp_entry = _mp_map.get(str(dia_exp), {})
-                                    mp_d = _safe_float(_mp_entry.get("metros_prog") if isinstance(_mp_entry, dict) else (_mp_entry or 0.0))
-                                    mr_d = _safe_float(_md_map.get(str(dia_exp), 0.0) or 0.0)
-                                    mr_n = _safe_float(_mn_map.get(str(dia_exp), 0.0) or 0.0)
-                                else:
-                                    for _, etapa_data_m in (por_etapa or {}).items():
-                                        _mp_map = etapa_data_m.get("metros_prog_by_date", {}) or {}
-                                        _md_map = etapa_data_m.get("metros_real_dia_by_date", {}) or {}
-                                        _mn_map = etapa_data_m.get("metros_real_noche_by_date", {}) or {}
-                                        _mp_entry = _mp_map.get(str(dia_exp), {})
-                                        mp_d += _safe_float(_mp_entry.get("metros_prog") if isinstance(_mp_entry, dict) else (_mp_entry or 0.0))
-                                        mr_d += _safe_float(_md_map.get(str(dia_exp), 0.0) or 0.0)
-                                        mr_n += _safe_float(_mn_map.get(str(dia_exp), 0.0) or 0.0)
-                                mr_t = mr_d + mr_n
-                                if (mp_d + mr_d + mr_n) > 0:
-                                    df_m_d = pd.DataFrame(
-                                        [
-                                            {"Tipo": "Programado (total)", "Metros (m)": mp_d},
-                                            {"Tipo": "Real Día ☀️", "Metros (m)": mr_d},
-                                            {"Tipo": "Real Noche 🌙", "Metros (m)": mr_n},
-                                            {"Tipo": "Real Total", "Metros (m)": mr_t},
-                                        ]
-                                    )
-                                    fig_m_d = px.bar(
-                                        df_m_d,
-                                        x="Tipo",
-                                        y="Metros (m)",
-                                        text_auto=True,
-                                        title=f"Metros - {dia_exp.isoformat()}",
-                                        color="Tipo",
-                                        color_discrete_map={
-                                            "Programado (total)": "#6B7280",
-                                            "Real Día ☀️": "#F59E0B",
-                                            "Real Noche 🌙": "#1D4ED8",
-                                            "Real Total": "#22C55E",
-                                        },
-                                    )
-                                    charts_d["Metros perforados (Diario)"] = fig_m_d
-                            prog.progress(66)
-                            prog_msg.caption("Graficas de metros listas.")
-
-                            # Conexiones perforando (diario)
-                            df_conn_all = st.session_state.get("df_conn", pd.DataFrame()).copy()
-                            if not df_conn_all.empty and "Fecha" in df_conn_all.columns:
-                                df_conn_all["Fecha"] = df_conn_all["Fecha"].astype(str)
-                                df_conn_d = df_conn_all[df_conn_all["Fecha"] == str(dia_exp)].copy()
-                                if scope_rep.startswith("Por etapa") and meta_d.get("etapa") and "Etapa" in df_conn_d.columns:
-                                    df_conn_d = df_conn_d[df_conn_d["Etapa"] == str(meta_d.get("etapa"))].copy()
-                                if not df_conn_d.empty and {"Componente", "Minutos_Reales"}.issubset(df_conn_d.columns):
-                                    df_conn_sum = df_conn_d.groupby("Componente", as_index=False)["Minutos_Reales"].sum()
-                                    df_conn_sum["Componente"] = pd.Categorical(df_conn_sum["Componente"], categories=CONN_ORDER, ordered=True)
-                                    df_conn_sum = df_conn_sum.sort_values("Componente")
-                                    charts_d["Conexiones (Distribución)"] = px.pie(
-                                        df_conn_sum,
-                                        names="Componente",
-                                        values="Minutos_Reales",
-                                        hole=0.35,
-                                        title=f"Conexiones - {dia_exp.isoformat()}",
-                                        color="Componente",
-                                        color_discrete_map=CONN_COLOR_MAP,
-                                    )
-
-                                    df_stack = df_conn_d.copy()
-                                    df_stack["Conn_Label"] = df_stack["Profundidad_m"].fillna(df_stack["Conn_No"]).astype(float).astype(int).astype(str)
-                                    df_stack["Componente"] = pd.Categorical(df_stack["Componente"], categories=CONN_ORDER, ordered=True)
-                                    df_stack_g = df_stack.groupby(["Conn_Label", "Componente"], as_index=False)["Minutos_Reales"].sum().sort_values(["Conn_Label", "Componente"])
-                                    fig_conn_stack = px.bar(
-                                        df_stack_g,
-                                        x="Conn_Label",
-                                        y="Minutos_Reales",
-                                        color="Componente",
-                                        category_orders={"Componente": CONN_ORDER},
-                                        color_discrete_map=CONN_COLOR_MAP,
-                                        barmode="stack",
-                                        title=f"Conexiones perforando - {dia_exp.isoformat()}",
-                                        labels={"Conn_Label": "Profundidad (m)", "Minutos_Reales": "Tiempo (min)"},
-                                    )
-                                    charts_d["Conexiones perforando (Stack)"] = fig_conn_stack
-                            prog.progress(78)
-                            prog_msg.caption("Graficas de conexiones listas.")
-
-                            # Viajes (si existen datos por hora)
-                            viajes_store = st.session_state.get("viajes_hourly_store", {})
-                            if isinstance(viajes_store, dict) and len(viajes_store) > 0:
-                                for v_name, v_obj in viajes_store.items():
-                                    hourly_df = v_obj.get("hourly") if isinstance(v_obj, dict) else None
-                                    if isinstance(hourly_df, pd.DataFrame) and not hourly_df.empty:
-                                        df_plot = hourly_df.copy().sort_values("hour").reset_index(drop=True)
-                                        df_plot["hour_str"] = df_plot["hour"].astype(int)
-                                        fig_v = px.bar(
-                                            df_plot,
-                                            x="hour_str",
-                                            y="speed_mh",
-                                            labels={"hour_str": "Hora", "speed_mh": "m/h"},
-                                            title=f"Viaje – {v_name}",
-                                        )
-                                        fig_v.update_traces(marker_color=EXPORT_COLORWAY[0])
-                                        charts_d[f"Viaje – Velocidad ({v_name})"] = fig_v
-                                        fig_c = px.bar(
-                                            df_plot,
-                                            x="hour_str",
-                                            y="conn_min",
-                                            labels={"hour_str": "Hora", "conn_min": "min"},
-                                            title=f"Viaje – Conexiones ({v_name})",
-                                        )
-                                        fig_c.update_traces(marker_color=EXPORT_COLORWAY[1] if len(EXPORT_COLORWAY) > 1 else EXPORT_COLORWAY[0])
-                                        charts_d[f"Viaje – Conexiones ({v_name})"] = fig_c
-                            prog.progress(86)
-                            prog_msg.caption("Graficas de viajes listas.")
-
+                            job_d = _daily_export_jobs(
+                                df_base,
+                                [dia_exp],
+                                etapa=etapa_pick,
+                                viajes_store=st.session_state.get("viajes_hourly_store", {}),
+                            )[0]
+                            charts_d = daily_charts(job_d)
+                            prog.progress(40)
+                            prog_msg.caption("Gráficas listas.")
+                            render_charts_png(charts_d)
+                            prog.progress(80)
+                            prog_msg.caption("Imágenes de gráficas listas.")
                             st.session_state["exp_day_pdf"] = build_pdf(meta_d, kpis_d, charts=charts_d)
-                            prog.progress(93)
+                            prog.progress(90)
                             prog_msg.caption("PDF listo.")
                             st.session_state["exp_day_ppt"] = build_pptx(meta_d, kpis_d, charts=charts_d)
-                            prog.progress(98)
+                            prog.progress(97)
                             prog_msg.caption("PowerPoint listo.")
                             st.session_state["exp_day_csv"] = df_day.to_csv(index=False).encode("utf-8")
                             prog.progress(100)
@@ -1936,159 +1714,121 @@ def render_export_diario_calendario():
                 st.markdown("**Vista previa (tabla del día)**")
                 st.dataframe(df_day, use_container_width=True, height=260)
 
+            # ---- Rango de fechas → un ZIP con los exportables de cada día ----
+            st.markdown("---")
+            st.markdown("**Exportar rango de fechas (ZIP)**")
+            colb1, colb2 = st.columns(2)
+            with colb1:
+                rng_ini = st.date_input("Desde", value=days_all[0], min_value=days_all[0], max_value=days_all[-1], key="exp_batch_ini")
+            with colb2:
+                rng_fin = st.date_input("Hasta", value=days_all[-1], min_value=days_all[0], max_value=days_all[-1], key="exp_batch_fin")
+            if rng_ini > rng_fin:
+                rng_ini, rng_fin = rng_fin, rng_ini
+            days_rng = [d for d in days_all if rng_ini <= d <= rng_fin]
+            scope_batch = st.radio(
+                "Alcance del lote",
+                ["Por pozo (todas las etapas)", "Por etapa"],
+                index=0,
+                horizontal=True,
+                key="exp_batch_scope",
+            )
+            etapa_batch = ""
+            if scope_batch == "Por etapa" and "Etapa" in df_base.columns:
+                etapas_rng = sorted(
+                    e for e in df_base.loc[_df_fecha_to_date(df_base["Fecha"]).isin(days_rng), "Etapa"].fillna("").astype(str).unique().tolist() if e != ""
+                )
+                etapa_default = st.session_state.get("etapa_val", "")
+                etapa_batch = st.selectbox(
+                    "Etapa del lote",
+                    options=etapas_rng if etapas_rng else [""],
+                    index=etapas_rng.index(etapa_default) if etapa_default in etapas_rng else 0,
+                    key="exp_batch_etapa",
+                )
+            fmt_labels = {"pdf": "PDF", "pptx": "PowerPoint", "csv": "CSV", "xlsx": "Excel (resumen)"}
+            formats_batch = st.multiselect(
+                "Formatos por día",
+                options=list(DAY_EXPORT_FORMATS),
+                default=list(DEFAULT_DAY_FORMATS),
+                format_func=lambda f: fmt_labels.get(f, f),
+                key="exp_batch_formats",
+            )
+            st.caption(f"{len(days_rng)} día(s) con datos en el rango. Los días sin cambios desde el último lote se reutilizan.")
+
+            sig_batch = f"{rng_ini}|{rng_fin}|{etapa_batch}|{','.join(formats_batch)}"
+            if st.session_state.get("exp_batch_sig") != sig_batch:
+                st.session_state["exp_batch_sig"] = sig_batch
+                st.session_state.pop("exp_batch_zip", None)
+
+            if st.button("Generar ZIP del rango", use_container_width=True, key="exp_batch_run", disabled=not (days_rng and formats_batch)):
+                jobs = _daily_export_jobs(df_base, days_rng, etapa=etapa_batch, formats=tuple(formats_batch))
+                prog = st.progress(0)
+                prog_msg = st.empty()
+
+                def _on_day(done: int, total: int, day: str, state: str) -> None:
+                    prog.progress(int(done * 100 / max(total, 1)))
+                    prog_msg.caption(f"{done}/{total} · {day}: {state}")
+
+                res = run_batch(
+                    jobs,
+                    workers=EXPORT_RENDER_WORKERS,
+                    cache=st.session_state.setdefault("_batch_export_cache", {}),
+                    progress=_on_day,
+                )
+                st.session_state["exp_batch_zip"] = res.zip_bytes
+                prog_msg.caption(
+                    f"Listo: {len(res.generated)} día(s) generados, {len(res.reused)} reutilizados"
+                    + (f", {len(res.failed)} con error ({', '.join(res.failed)})" if res.failed else "")
+                    + "."
+                )
+
+            if st.session_state.get("exp_batch_zip") is not None:
+                pozo_b = str(st.session_state.get("pozo_val", "") or "")
+                st.download_button(
+                    "Descargar ZIP (rango)",
+                    data=st.session_state.get("exp_batch_zip"),
+                    file_name=f"Reportes_Diarios_{pozo_b}_{rng_ini.isoformat()}_{rng_fin.isoformat()}.zip",
+                    mime="application/zip",
+                    use_container_width=True,
+                    key="dl_zip_batch",
+                )
+
 
 def style_for_export(fig):
     if not PLOTLY_IMG_OK:
         return fig
-    f = go.Figure(fig.to_dict())
-    f.update_layout(
-        template="plotly_white",
-        paper_bgcolor="white",
-        plot_bgcolor="white",
-        font=dict(color="black", size=18),
-        margin=dict(l=40, r=40, t=70, b=40),
-        legend=dict(bgcolor="rgba(255,255,255,0.85)", borderwidth=0, font=dict(size=24)),
-        title=dict(x=0.02),
-        colorway=EXPORT_COLORWAY,
-        uniformtext=dict(minsize=16, mode="show"),
-    )
-    f.update_xaxes(tickfont=dict(size=24), title_font=dict(size=24), automargin=True)
-    f.update_yaxes(tickfont=dict(size=24), title_font=dict(size=24), automargin=True)
-    f.update_traces(
-        textfont=dict(size=24),
-        insidetextfont=dict(size=26),
-        outsidetextfont=dict(size=24),
-        selector=dict(type="pie"),
-    )
-    legend_items = {t.name for t in f.data if getattr(t, "name", None)}
-    if len(legend_items) >= 6:
-        f.update_layout(
-            legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5, font=dict(size=24)),
-            margin=dict(l=40, r=40, t=70, b=130),
-        )
-    return f
+    return export_style(fig, EXPORT_COLORWAY)
+
+# Render de gráficas para exportables: caché por contenido + pool de procesos con kaleido caliente.
+# Cada worker carga kaleido/Chromium (cientos de MB): por defecto 2 como mucho; TNPI_EXPORT_WORKERS lo sube.
+EXPORT_RENDER_WORKERS = max(1, int(os.environ.get("TNPI_EXPORT_WORKERS", str(min(2, os.cpu_count() or 1)))))
+EXPORT_RENDER_PROFILE = os.environ.get("TNPI_EXPORT_PROFILE", DEFAULT_PROFILE)
 
-def plotly_to_png_bytes(fig) -> bytes | None:
+@st.cache_resource(show_spinner=False)
+def _get_chart_renderer() -> ChartRenderer:
+    return ChartRenderer(style=style_for_export, workers=EXPORT_RENDER_WORKERS, default_profile=EXPORT_RENDER_PROFILE)
+
+def plotly_to_png_bytes(fig, profile: str | None = None) -> bytes | None:
     if not PLOTLY_IMG_OK:
         return None
     try:
-        fig_export = style_for_export(fig)
-        png = pio.to_image(fig_export, format="png", width=1800, height=1000, scale=2)
-        im = Image.open(BytesIO(png)).convert("RGBA")
-        bg = Image.new("RGBA", im.size, (255, 255, 255, 255))
-        bg.paste(im, (0, 0), im)
-        out = bg.convert("RGB")
-        b = BytesIO()
-        out.save(b, format="PNG", optimize=True)
-        return b.getvalue()
+        return _get_chart_renderer().render(fig, profile)
     except Exception:
         return None
 
-def build_pdf(meta: dict, kpis: dict, charts: dict) -> bytes:
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    def write_text(txt, y, size=12, bold=False):
-        c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
-        c.drawString(0.75 * inch, y, txt)
-        return y - 0.26 * inch
-
-    def write_chart(fig, y, title):
-        img_bytes = plotly_to_png_bytes(fig)
-        if img_bytes is None:
-            y = write_text(f"{title} (gráfica no disponible: instala kaleido)", y, size=10, bold=False)
-            return y
-        y = write_text(title, y, size=12, bold=True)
-        img_h = 3.1 * inch
-        img_w = width - 1.5 * inch
-        y_img = y - img_h
-
-        if y_img < 0.75 * inch:
-            c.showPage()
-            y = height - 0.75 * inch
-            y = write_text(title, y, bold=True)
-            y_img = y - img_h
-
-        img_reader = ImageReader(BytesIO(img_bytes))
-        c.drawImage(
-            img_reader,
-            0.75 * inch,
-            y_img,
-            width=img_w,
-            height=img_h,
-            preserveAspectRatio=True,
-            mask=None,
-        )
-        return y_img - 0.25 * inch
-
-    y = height - 0.75 * inch
-    y = write_text("Reporte DrillSpot / ROGII", y, size=18, bold=True)
-    y = write_text(f"Equipo: {meta.get('equipo','')}", y)
-    y = write_text(f"Pozo: {meta.get('pozo','')}", y)
-    y = write_text(f"Etapa: {meta.get('etapa','')}", y)
-    y = write_text(f"Fecha: {meta.get('fecha','')}", y)
-    y -= 0.1 * inch
-
-    y = write_text("KPIs", y, size=14, bold=True)
-    for k, v in kpis.items():
-        y = write_text(f"- {k}: {v}", y, size=11)
-        if y < 1.0 * inch:
-            c.showPage()
-            y = height - 0.75 * inch
-
-    if charts:
-        c.showPage()
-        y = height - 0.75 * inch
-        y = write_text("Gráficas", y, size=14, bold=True)
-        for name, fig in charts.items():
-            y = write_chart(fig, y, name)
-            if y < 1.0 * inch:
-                c.showPage()
-                y = height - 0.75 * inch
-
-    c.save()
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def build_pptx(meta: dict, kpis: dict, charts: dict) -> bytes:
-    prs = Presentation()
-    prs.slide_width = Inches(13.33)
-    prs.slide_height = Inches(7.5)
-
-    slide = prs.slides.add_slide(prs.slide_layouts[0])
-    slide.shapes.title.text = "Reporte DrillSpot / ROGII"
-    slide.placeholders[1].text = (
-        f"Equipo: {meta.get('equipo','')} | Pozo: {meta.get('pozo','')} | "
-        f"Etapa: {meta.get('etapa','')} | Fecha: {meta.get('fecha','')}"
-    )
+def render_charts_png(charts: dict, profile: str | None = None) -> dict:
+    """PNG de todas las gráficas de un exportable (en paralelo; reutiliza las ya renderizadas)."""
+    if not PLOTLY_IMG_OK or not charts:
+        return {name: None for name in (charts or {})}
+    try:
+        return _get_chart_renderer().render_many(charts, profile)
+    except Exception:
+        return {name: plotly_to_png_bytes(fig, profile) for name, fig in charts.items()}
 
-    slide = prs.slides.add_slide(prs.slide_layouts[5])
-    slide.shapes.title.text = "KPIs"
-    box = slide.shapes.add_textbox(Inches(0.8), Inches(1.4), Inches(11.7), Inches(5.2))
-    tf = box.text_frame
-    tf.clear()
-    tf.word_wrap = True
-    for i, (k, v) in enumerate(kpis.items()):
-        p = tf.add_paragraph() if i > 0 else tf.paragraphs[0]
-        p.text = f"{k}: {v}"
-        p.font.size = Pt(18)
-
-    for title, fig in (charts or {}).items():
-        slide = prs.slides.add_slide(prs.slide_layouts[5])
-        slide.shapes.title.text = title
-        img_bytes = plotly_to_png_bytes(fig)
-        if img_bytes is None:
-            slide.shapes.add_textbox(Inches(0.8), Inches(1.6), Inches(11.5), Inches(1.0)).text_frame.text = (
-                "No se pudo embebir imagen (instala kaleido)."
-            )
-        else:
-            slide.shapes.add_picture(BytesIO(img_bytes), Inches(0.8), Inches(1.4), width=Inches(11.6))
+def build_pdf(meta: dict, kpis: dict, charts: dict, profile: str | None = None) -> bytes:
+    return build_pdf_doc(meta, kpis, list(charts or {}), render_charts_png(charts, profile))
 
-    buf = BytesIO()
-    prs.save(buf)
-    buf.seek(0)
-    return buf.getvalue()
+def build_pptx(meta: dict, kpis: dict, charts: dict, profile: str | None = None) -> bytes:
+    return build_pptx_doc(meta, kpis, list(charts or {}), render_charts_png(charts, profile))
 
 # ------------------------------
 # Gauge principal
@@ -2665,6 +2405,32 @@ def _list_local_jornadas(limit: int = 60) -> list[tuple[str, str]]:
     except Exception:
         return []
 
+def _jornadas_store_root() -> str:
+    script_dir = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+    return os.environ.get("TNPI_JORNADAS_STORE_DIR") or os.path.join(script_dir, "jornadas")
+
+def _default_jornada_store_dir(equipo: str, pozo: str) -> str:
+    """Carpeta del almacén por día (``jornada_store``) de un equipo/pozo."""
+    safe = lambda s: re.sub(r"[^A-Za-z0-9_-]+", "_", str(s)).strip("_")
+    return os.path.join(_jornadas_store_root(), f"jornada_{safe(equipo)}_{safe(pozo)}")
+
+def _list_jornada_stores() -> list[tuple[str, str]]:
+    root = _jornadas_store_root()
+    try:
+        out = []
+        for f in sorted(os.listdir(root)):
+            full = os.path.join(root, f)
+            if JornadaStore.is_store(full):
+                try:
+                    days = JornadaStore(full).days()
+                except Exception:
+                    days = []
+                rango = f" · {days[0]} → {days[-1]} ({len(days)} días)" if days else ""
+                out.append((f"{f}{rango}", full))
+        return out
+    except Exception:
+        return []
+
 def _kpi_summary_from_payload(payload: dict) -> dict:
     """Calcula KPIs básicos desde un payload de jornada."""
     try:
@@ -2773,6 +2539,49 @@ def save_jornada_json(path_out: str) -> None:
     with open(path_out, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
+def _store_loaded_days(store_dir: str) -> set:
+    """Días de ``store_dir`` presentes en la sesión (cargados o guardados desde ella)."""
+    tracked = st.session_state.setdefault("jornada_store_days", {})
+    return tracked.setdefault(os.path.abspath(store_dir), set())
+
+
+def save_jornada_store(store_dir: str, fecha_sel=None) -> list[str]:
+    """
+    Guarda la jornada en el almacén por día. Con ``fecha_sel`` solo se escribe
+    el segmento de ese día; sin ella, todos los días cuyo contenido cambió.
+    Solo se borran del disco los días que la sesión tenía de ese almacén y ya
+    no tienen datos; los que no se cargaron se conservan.
+    Retorna los días escritos.
+    """
+    meta = {
+        "equipo": st.session_state.get("equipo_val", ""),
+        "pozo": st.session_state.get("pozo_val", ""),
+        "fecha": str(st.session_state.get("fecha_val", "")),
+        "equipo_tipo": st.session_state.get("equipo_tipo_val", ""),
+        "etapa_manual": bool(st.session_state.get("etapa_manual_chk", False)),
+        "etapa": st.session_state.get("etapa_sel", ""),
+        "etapa_manual_val": st.session_state.get("etapa_manual_val", ""),
+        "modo_reporte": st.session_state.get("modo_reporte", ""),
+        "show_charts": bool(st.session_state.get("show_charts", True)),
+    }
+    st.session_state.drill_day["meta"] = meta
+    store = JornadaStore(store_dir)
+    args = (st.session_state.df, st.session_state.df_conn, st.session_state.df_bha)
+    kwargs = dict(
+        drill_day=st.session_state.drill_day,
+        meta=meta,
+        custom_actividades=st.session_state.get("custom_actividades", []),
+    )
+    loaded = _store_loaded_days(store_dir)
+    if fecha_sel is not None:
+        written = [day_key(fecha_sel)] if store.save_day(fecha_sel, *args, **kwargs) else []
+        loaded.add(day_key(fecha_sel))
+        return written
+    written = store.save_all(*args, prune_days=set(loaded), **kwargs)
+    loaded.clear()
+    loaded.update(session_days(*args, drill_day=st.session_state.drill_day))
+    return written
+
 def _normalize_df_for_hash(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or df.empty:
         return pd.DataFrame()
@@ -2812,26 +2621,36 @@ def _merge_dict_no_overwrite(base: dict, incoming: dict) -> dict:
             base[k] = _merge_dict_no_overwrite(base.get(k, {}), v)
     return base
 
+def _day_index(df: pd.DataFrame) -> DayIndex:
+    """
+    Índice Fecha/Turno de ``df``. Para las tablas de sesión (df, df_conn,
+    df_bha) se guarda en ``st.session_state`` y se actualiza de forma
+    incremental con las altas/ediciones; otro frame se indexa al vuelo.
+    """
+    for name in ("df", "df_conn", "df_bha"):
+        if df is st.session_state.get(name):
+            store = st.session_state.setdefault("_day_index", {})
+            idx = store.get(name)
+            if idx is None:
+                store[name] = idx = DayIndex.build(df)
+            return idx.sync(df)
+    return DayIndex.build(df)
+
 def _filter_df_by_date(df: pd.DataFrame, fecha_sel) -> pd.DataFrame:
     if df is None or df.empty:
         return pd.DataFrame()
     if "Fecha" not in df.columns:
         return pd.DataFrame()
-    fecha_str = str(fecha_sel)
-    df_local = df.copy()
+    df_local = df.iloc[_day_index(df).rows(fecha_sel)].copy()
     df_local["Fecha"] = df_local["Fecha"].astype(str)
-    return df_local[df_local["Fecha"] == fecha_str].copy()
+    return df_local
 
 def _day_used_hours(df: pd.DataFrame, fecha_sel) -> float:
     """Suma horas reales registradas en un día (según columna Fecha)."""
     if df is None or df.empty or "Fecha" not in df.columns:
         return 0.0
     try:
-        fecha_str = str(fecha_sel)
-        df_local = df.copy()
-        df_local["Fecha"] = df_local["Fecha"].astype(str)
-        df_local = df_local[df_local["Fecha"] == fecha_str]
-        return float(pd.to_numeric(df_local.get("Horas_Reales", 0.0), errors="coerce").fillna(0.0).sum())
+        return _day_index(df).day_total(fecha_sel)
     except Exception:
         return 0.0
 
@@ -2850,28 +2669,7 @@ def _day_used_hours_by_turno(df: pd.DataFrame, fecha_sel, turno_nombre: str) ->
     if df is None or df.empty or "Fecha" not in df.columns or "Turno" not in df.columns:
         return 0.0
     try:
-        fecha_str = str(fecha_sel)
-        df_local = df.copy()
-        df_local["Fecha"] = df_local["Fecha"].astype(str)
-        df_local = df_local[df_local["Fecha"] == fecha_str]
-        turno_col = df_local.get("Turno", pd.Series(dtype=str)).fillna("").astype(str).str.lower()
-        is_diurno = (
-            turno_col.str.contains("diurno", na=False) | turno_col.str.contains("dia", na=False)
-            | turno_col.str.contains("día", na=False) | turno_col.str.contains("day", na=False)
-            | turno_col.str.contains("☀", na=False)
-        )
-        is_nocturno = (
-            turno_col.str.contains("nocturno", na=False) | turno_col.str.contains("noche", na=False)
-            | turno_col.str.contains("night", na=False) | turno_col.str.contains("🌙", na=False)
-        )
-        tn = str(turno_nombre or "").strip().lower()
-        if "diurno" in tn or "dia" in tn or "día" in tn:
-            mask = is_diurno
-        elif "nocturno" in tn or "noche" in tn:
-            mask = is_nocturno
-        else:
-            return 0.0
-        return float(pd.to_numeric(df_local.loc[mask, "Horas_Reales"], errors="coerce").fillna(0).sum())
+        return _day_index(df).turno_total(fecha_sel, turno_nombre)
     except Exception:
         return 0.0
 
@@ -3021,6 +2819,75 @@ def load_jornada_json(path_in: str) -> bool:
 
     return _apply_jornada_payload(payload)
 
+def load_jornada_store(store_dir: str, fecha_ini=None, fecha_fin=None) -> bool:
+    """
+    Carga del almacén por día solo los días en ``[fecha_ini, fecha_fin]``: esos
+    días se reemplazan en la sesión y el resto se conserva.
+    """
+    try:
+        store = JornadaStore(store_dir)
+        data = store.load(fecha_ini, fecha_fin)
+        days = set(data["days"])
+
+        def _replace_days(current: pd.DataFrame, loaded: pd.DataFrame) -> pd.DataFrame:
+            cols = current.columns if current is not None and len(current.columns) else loaded.columns
+            loaded = loaded.reindex(columns=cols)
+            if current is None or current.empty or "Fecha" not in current.columns:
+                return loaded.reset_index(drop=True)
+            keep = current[~current["Fecha"].map(day_key).isin(days)]
+            if loaded.empty:
+                return keep.reset_index(drop=True)
+            return pd.concat([keep, loaded], ignore_index=True)
+
+        st.session_state.df = _replace_days(st.session_state.df, data["df"])
+        st.session_state.df_conn = _replace_days(st.session_state.df_conn, data["df_conn"])
+        st.session_state.df_bha = _replace_days(st.session_state.df_bha, data["df_bha"])
+        _store_loaded_days(store_dir).update(days)
+        st.session_state.drill_day = merge_drill_day(st.session_state.get("drill_day") or {}, data["drill_day"])
+        if data["custom_actividades"]:
+            st.session_state.custom_actividades = data["custom_actividades"]
+        meta = data["meta"] or st.session_state.drill_day.get("meta") or {}
+        if meta:
+            _queue_sidebar_restore(meta)
+        return True
+    except Exception as e:
+        st.sidebar.error(f"No se pudo cargar el almacén de jornada: {e}")
+        return False
+
+def _queue_sidebar_restore(meta: dict) -> None:
+    # Restauración segura del sidebar: NO modificar keys de widgets después de instanciados.
+    # Guardamos valores para aplicarlos al inicio del script (antes de render del sidebar) y forzamos rerun.
+    pending = {
+        'equipo_val': meta.get('equipo', ''),
+        'pozo_val': meta.get('pozo', ''),
+    }
+
+    # fecha viene como string "YYYY-MM-DD" o "YYYY/MM/DD"
+    _fecha_raw = str(meta.get('fecha', ''))
+    _fecha = None
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            _fecha = datetime.strptime(_fecha_raw, fmt).date()
+            break
+        except Exception:
+            pass
+    if _fecha is not None:
+        pending['fecha_val'] = _fecha
+
+    pending['equipo_tipo_val'] = meta.get('equipo_tipo', '')
+    pending['etapa_manual_chk'] = bool(meta.get('etapa_manual', False))
+    pending['etapa_sel'] = meta.get('etapa', meta.get('etapa_manual_val', ''))
+    pending['etapa_manual_val'] = meta.get('etapa_manual_val', meta.get('etapa', ''))
+
+    if 'modo_reporte' in meta:
+        pending['modo_reporte'] = meta.get('modo_reporte', st.session_state.get('modo_reporte', ''))
+    if 'show_charts' in meta:
+        pending['show_charts'] = bool(meta.get('show_charts', True))
+
+    st.session_state['_pending_sidebar_restore'] = pending
+    # Mantener meta también dentro de drill_day
+    st.session_state.drill_day['meta'] = meta
+
 def _apply_jornada_payload(payload: dict) -> bool:
     try:
         meta = payload.get("meta") or {}
@@ -3075,39 +2942,8 @@ def _apply_jornada_payload(payload: dict) -> bool:
 
         # Actividades personalizadas
         st.session_state.custom_actividades = payload.get("custom_actividades", []) or []
-        # Restauración segura del sidebar: NO modificar keys de widgets después de instanciados.
-        # Guardamos valores para aplicarlos al inicio del script (antes de render del sidebar) y forzamos rerun.
         if meta:
-            pending = {
-                'equipo_val': meta.get('equipo', ''),
-                'pozo_val': meta.get('pozo', ''),
-            }
-
-            # fecha viene como string "YYYY-MM-DD" o "YYYY/MM/DD"
-            _fecha_raw = str(meta.get('fecha', ''))
-            _fecha = None
-            for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
-                try:
-                    _fecha = datetime.strptime(_fecha_raw, fmt).date()
-                    break
-                except Exception:
-                    pass
-            if _fecha is not None:
-                pending['fecha_val'] = _fecha
-
-            pending['equipo_tipo_val'] = meta.get('equipo_tipo', '')
-            pending['etapa_manual_chk'] = bool(meta.get('etapa_manual', False))
-            pending['etapa_sel'] = meta.get('etapa', meta.get('etapa_manual_val', ''))
-            pending['etapa_manual_val'] = meta.get('etapa_manual_val', meta.get('etapa', ''))
-
-            if 'modo_reporte' in meta:
-                pending['modo_reporte'] = meta.get('modo_reporte', st.session_state.get('modo_reporte', ''))
-            if 'show_charts' in meta:
-                pending['show_charts'] = bool(meta.get('show_charts', True))
-
-            st.session_state['_pending_sidebar_restore'] = pending
-            # Mantener meta también dentro de drill_day
-            st.session_state.drill_day['meta'] = meta
+            _queue_sidebar_restore(meta)
 
         return True
     except Exception as e:
@@ -3281,12 +3117,14 @@ def _render_jornada_avanzado(container) -> None:
 
     if use_drive:
         folder_name = st.secrets.get("drive", {}).get("jornadas_folder", "DrillSpot_Jornadas")
-        folder_id = _ensure_drive_folder(drive, folder_name)
+        _idx = _drive_index(drive, folder_name)
+        folder_id = _idx.ensure_folder(drive)
 
         # Guardar en Drive
         if c.button("💾 Guardar jornada en Drive", use_container_width=True):
             try:
-                _drive_upsert_json(drive, folder_id, _fname, _payload)
+                _file_meta = _drive_upsert_json(drive, folder_id, _fname, _payload)
+                _idx.note_upload(_file_meta, _payload)
                 c.success("Guardado en Drive ✅")
             except Exception as e:
                 c.error(f"No se pudo guardar en Drive: {e}")
@@ -3295,7 +3133,7 @@ def _render_jornada_avanzado(container) -> None:
 
         # Cargar desde Drive
         c.caption("Cargar desde Drive")
-        _files = _drive_list_json(drive, folder_id, limit=100)
+        _files = _idx.files()
         if not _files:
             c.info("No hay jornadas en Drive todavía.")
             up_jornada = None
@@ -3304,7 +3142,7 @@ def _render_jornada_avanzado(container) -> None:
             _pick = c.selectbox("Selecciona jornada", list(_options.keys()), key="drive_jornada_pick")
             if c.button("📥 Descargar selección a memoria", use_container_width=True):
                 try:
-                    payload = _drive_download_json(drive, _options[_pick])
+                    payload = _idx.payload(drive, _options[_pick], revalidate=True)
                     # Guardamos en memoria como si fuera un upload
                     st.session_state["_drive_payload_cache"] = payload
                     c.success("Lista para aplicar ✅ (pulsa 'Aplicar jornada')")
@@ -3358,20 +3196,37 @@ use_drive = drive is not None
 st.sidebar.markdown("**Selector rápido de jornadas**")
 if use_drive:
     folder_name = st.secrets.get("drive", {}).get("jornadas_folder", "DrillSpot_Jornadas")
-    folder_id = _ensure_drive_folder(drive, folder_name)
-    _files_quick = _drive_list_json(drive, folder_id, limit=50)
+    try:
+        _idx_quick = _drive_index(drive, folder_name)
+    except Exception as e:
+        _idx_quick = None
+        st.sidebar.error(f"No se pudo listar Drive: {e}")
+    if _idx_quick is not None and st.sidebar.button("🔄 Actualizar lista de Drive", use_container_width=True, key="drive_index_refresh_btn"):
+        try:
+            _idx_quick.refresh(drive, force=True)
+        except Exception as e:
+            st.sidebar.error(f"No se pudo listar Drive: {e}")
+    _files_quick = _idx_quick.files()[:50] if _idx_quick is not None else []
     if _files_quick:
         _options_quick = {f'{f["name"]} · {f.get("modifiedTime","")}': f["id"] for f in _files_quick}
         _pick_quick = st.sidebar.selectbox("Jornadas en Drive", list(_options_quick.keys()), key="drive_jornada_quick")
         try:
-            _payload_preview = _drive_download_json(drive, _options_quick[_pick_quick])
-            _kpi_prev = _kpi_summary_from_payload(_payload_preview)
+            # El resumen se calcula una vez por versión del archivo (md5) y queda en el índice.
+            _kpi_prev = _idx_quick.kpi(_options_quick[_pick_quick])
+            if _kpi_prev is None:
+                _idx_quick.payload(drive, _options_quick[_pick_quick])
+                _kpi_prev = _idx_quick.kpi(_options_quick[_pick_quick]) or {}
             _render_kpi_summary(_kpi_prev, title="Resumen KPI (vista previa)")
         except Exception:
             st.sidebar.caption("No se pudo generar vista previa.")
+        _ist = _idx_quick.stats()
+        st.sidebar.caption(
+            f"Índice Drive: {_ist['files']} archivos · {_ist['downloads']} descargas · "
+            f"{_ist['content_hits']} desde caché · lista de hace {int(_ist['age_s'] or 0)} s"
+        )
         if st.sidebar.button("Cargar jornada (Drive)", use_container_width=True, key="drive_jornada_quick_btn"):
             try:
-                payload = _drive_download_json(drive, _options_quick[_pick_quick])
+                payload = _idx_quick.payload(drive, _options_quick[_pick_quick], revalidate=True)
                 if _apply_jornada_payload(payload):
                     st.sidebar.success("Jornada cargada ✅")
                     st.rerun()
@@ -3401,6 +3256,47 @@ else:
     else:
         st.sidebar.caption("No hay jornadas locales guardadas.")
 
+    # Almacén por día: guardar escribe solo el segmento del día; cargar lee solo el rango.
+    st.sidebar.markdown("**Jornada por día (almacén)**")
+    _store_dir = _default_jornada_store_dir(equipo, pozo)
+    _cs1, _cs2 = st.sidebar.columns(2)
+    if _cs1.button("💾 Guardar día", use_container_width=True, key="store_save_day_btn"):
+        try:
+            _written = save_jornada_store(_store_dir, fecha)
+            st.sidebar.success(f"Día {fecha} guardado ✅" if _written else f"Día {fecha} sin cambios.")
+        except Exception as e:
+            st.sidebar.error(f"No se pudo guardar el día: {e}")
+    if _cs2.button("💾 Guardar todo", use_container_width=True, key="store_save_all_btn"):
+        try:
+            _written = save_jornada_store(_store_dir)
+            st.sidebar.success(f"{len(_written)} día(s) actualizados ✅")
+        except Exception as e:
+            st.sidebar.error(f"No se pudo guardar la jornada: {e}")
+
+    _stores = _list_jornada_stores()
+    if _stores:
+        _store_map = dict(_stores)
+        _pick_store = st.sidebar.selectbox("Almacenes", list(_store_map.keys()), key="store_jornada_pick")
+        try:
+            _store_days = [d for d in JornadaStore(_store_map[_pick_store]).days() if re.match(r"^\d{4}-\d{2}-\d{2}$", d)]
+        except Exception:
+            _store_days = []
+        if _store_days:
+            _d0 = datetime.strptime(_store_days[0], "%Y-%m-%d").date()
+            _d1 = datetime.strptime(_store_days[-1], "%Y-%m-%d").date()
+            _rango = st.sidebar.date_input("Rango a cargar", value=(_d0, _d1), min_value=_d0, max_value=_d1, key="store_jornada_range")
+            if st.sidebar.button("📥 Cargar rango", use_container_width=True, key="store_jornada_load_btn"):
+                _ini, _fin = (_rango[0], _rango[-1]) if isinstance(_rango, (list, tuple)) and _rango else (_d0, _d1)
+                if load_jornada_store(_store_map[_pick_store], _ini, _fin):
+                    st.sidebar.success("Jornada cargada ✅")
+                    st.rerun()
+    if _local_list and st.sidebar.button("Convertir JSON seleccionado a almacén", use_container_width=True, key="store_convert_btn"):
+        try:
+            _conv = convert_json(_map[_pick_local], os.path.join(_jornadas_store_root(), os.path.splitext(os.path.basename(_map[_pick_local]))[0]))
+            st.sidebar.success(f"Convertido: {len(_conv.days())} días ✅")
+        except Exception as e:
+            st.sidebar.error(f"No se pudo convertir: {e}")
+
 st.sidebar.markdown("**Subir y aplicar .json**")
 up_quick = st.sidebar.file_uploader(
     "Subir jornada (.json)",
@@ -3514,6 +3410,7 @@ with st.sidebar.container(border=True):
             st.sidebar.error(f"Error leyendo CSV TNPI: {e}")
 
         if df_tnpi_cat is not None and not df_tnpi_cat.empty:
+            st.sidebar.caption(f"CSV detectado: {dialect_label(df_tnpi_cat)}")
             det_col = None
             cat_col = None
             for c in df_tnpi_cat.columns:
@@ -3616,6 +3513,7 @@ if up_tnp is not None:
         st.sidebar.error(f"Error leyendo CSV TNP: {e}")
 
     if df_tnp_cat is not None and not df_tnp_cat.empty:
+        st.sidebar.caption(f"CSV detectado: {dialect_label(df_tnp_cat)}")
         det_col = None
         cat_col = None
         for c in df_tnp_cat.columns:
@@ -5190,6 +5088,94 @@ df = st.session_state.df.copy()
 df_conn = st.session_state.df_conn.copy()
 df_bha = st.session_state.df_bha.copy()
 
+# == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
+# TABLAS DERIVADAS (una vez por versión de df / df_conn / df_bha, compartidas entre pestañas)
+# == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
+def _bha_by_etapa(d: pd.DataFrame) -> pd.DataFrame:
+    if d.empty or "Etapa" not in d.columns:
+        return pd.DataFrame(columns=["Etapa", "Operaciones"])
+    return d.groupby("Etapa").size().rename("Operaciones").reset_index()
+
+
+def _conn_count_by(d: pd.DataFrame, key: str) -> pd.DataFrame:
+    if d.empty or key not in d.columns or "Conn_No" not in d.columns:
+        return pd.DataFrame(columns=[key, "Conexiones"])
+    return d.groupby(key)["Conn_No"].nunique().rename("Conexiones").reset_index()
+
+
+# Llaves de ``horas_por_causa``: los filtros de las pestañas (fecha, etapa, modo,
+# corrida, operación, tipo) y las columnas de categoría/detalle que agrupan.
+CAUSA_KEYS = [
+    "Fecha", "Etapa", "Modo_Reporte", "Corrida", "Operacion", "Tipo",
+    "Categoria", "Categoria_TNPI", "Detalle_TNPI", "Categoria_TNP", "Detalle_TNP",
+]
+
+
+def _horas_por_causa(d: pd.DataFrame) -> pd.DataFrame:
+    """Horas reales por combinación de ``CAUSA_KEYS`` presentes (NaN se conserva como llave)."""
+    keys = [k for k in CAUSA_KEYS if k in d.columns]
+    if d.empty or not keys:
+        return pd.DataFrame(columns=keys + ["Horas_Reales"])
+    base = d[keys].copy()
+    base["Horas_Reales"] = pd.to_numeric(d["Horas_Reales"], errors="coerce").fillna(0.0) if "Horas_Reales" in d.columns else 0.0
+    return base.groupby(keys, dropna=False, sort=False, as_index=False)["Horas_Reales"].sum()
+
+
+def _conn_componentes_by_etapa(d: pd.DataFrame) -> pd.DataFrame:
+    cols = ["Etapa", "Componente", "Minutos_Reales", "Minutos_Estandar"]
+    if d.empty or any(c not in d.columns for c in cols):
+        return pd.DataFrame(columns=["Etapa", "Componente", "real", "std"])
+    return d.groupby(["Etapa", "Componente"], as_index=False).agg(
+        real=("Minutos_Reales", "sum"),
+        std=("Minutos_Estandar", "sum"),
+    )
+
+
+def _conn_indicador_by_etapa(d: pd.DataFrame) -> pd.DataFrame:
+    cols = ["Etapa", "Conn_No", "Profundidad_m", "Minutos_Reales", "Minutos_TNPI"]
+    if d.empty or any(c not in d.columns for c in cols):
+        return pd.DataFrame(columns=["Etapa", "Conn_No", "Profundidad_m", "real_min", "tnpi_min", "tnp_min"])
+    return d.groupby(["Etapa", "Conn_No", "Profundidad_m"], as_index=False).agg(
+        real_min=("Minutos_Reales", "sum"),
+        tnpi_min=("Minutos_TNPI", "sum"),
+        tnp_min=("Minutos_TNP", "sum") if "Minutos_TNP" in d.columns else ("Minutos_TNPI", "sum"),
+    )
+
+
+def _get_derived() -> DerivedTables:
+    reg = st.session_state.get("_derived_tables")
+    if reg is None:
+        reg = DerivedTables()
+        reg.sync("df", st.session_state.df)
+        reg.sync("df_conn", st.session_state.df_conn)
+        reg.sync("df_bha", st.session_state.df_bha)
+        reg.define("tipo_totals", ("df",), tipo_totals)
+        reg.define("horas_por_etapa", ("df",), lambda d: hours_by(d, "Etapa"))
+        reg.define("horas_por_actividad", ("df",), lambda d: hours_by(d, "Actividad"))
+        reg.define("horas_por_causa", ("df",), _horas_por_causa)
+        reg.define("conn_por_conexion", ("df_conn",), lambda d: conn_std_by(d, [], CONN_STDS_TABLE))
+        reg.define("conn_por_etapa", ("df_conn",), lambda d: conn_std_by(d, ["Etapa"], CONN_STDS_TABLE))
+        reg.define("conn_totales", ("conn_por_conexion",), conn_totals)
+        reg.define("conn_count_por_seccion", ("df_conn",), lambda d: _conn_count_by(d, "Seccion"))
+        reg.define("conn_componentes_por_etapa", ("df_conn",), _conn_componentes_by_etapa)
+        reg.define("conn_indicador_por_etapa", ("df_conn",), _conn_indicador_by_etapa)
+        reg.define("bha_por_etapa", ("df_bha",), _bha_by_etapa)
+        st.session_state["_derived_tables"] = reg
+    return reg
+
+
+def _etapa_hours(etapa_sel) -> dict:
+    """Horas TP/TNPI/TNP/Real/Prog de una etapa desde ``horas_por_etapa``."""
+    t = _get_derived().get("horas_por_etapa")
+    row = t[t["Etapa"] == etapa_sel]
+    return {c: float(row[c].sum()) for c in ["TP", "TNPI", "TNP", "Real", "Prog"]}
+
+
+_derived = _get_derived()
+_derived.sync("df", st.session_state.df)
+_derived.sync("df_conn", st.session_state.df_conn)
+_derived.sync("df_bha", st.session_state.df_bha)
+
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
 # BHA: GRAFICA ESTÁNDAR VS REAL (cuando estás capturando Arma/Desarma)
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
@@ -5199,11 +5185,12 @@ df_bha = st.session_state.df_bha.copy()
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
 # KPIs base
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
-total_prog = float(df["Horas_Prog"].sum()) if not df.empty else 0.0
-total_real = float(df["Horas_Reales"].sum()) if not df.empty else 0.0
-tp_h = float(df[df["Tipo"] == "TP"]["Horas_Reales"].sum()) if not df.empty else 0.0
-tnpi_h = float(df[df["Tipo"] == "TNPI"]["Horas_Reales"].sum()) if not df.empty else 0.0
-tnp_h = float(df[df["Tipo"] == "TNP"]["Horas_Reales"].sum()) if not df.empty else 0.0
+_tot = _derived.get("tipo_totals")
+total_prog = _tot["Prog"]
+total_real = _tot["Real"]
+tp_h = _tot["TP"]
+tnpi_h = _tot["TNPI"]
+tnp_h = _tot["TNP"]
 eficiencia_dia = clamp_0_100(safe_pct(tp_h, total_real)) if total_real > 0 else 0.0
 
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
@@ -5239,16 +5226,11 @@ conn_tnpi_min = 0.0
 eff_conn = 0.0
 
 if modo_reporte == "Perforación" and not df_conn.empty:
-    conn_real_min = float(df_conn.groupby(["Conn_No"])["Minutos_Reales"].sum().sum())
-    per_conn2 = df_conn.groupby("Conn_No", as_index=False).first()[["Conn_No", "Conn_Tipo", "Angulo_Bucket"]]
-    per_conn2["Std_Total"] = per_conn2.apply(
-        lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-        axis=1
-    )
-    conn_std_min = float(per_conn2["Std_Total"].sum())
-
-    conn_tp_min = min(conn_real_min, conn_std_min) if conn_std_min > 0 else conn_real_min
-    conn_tnpi_min = max(0.0, conn_real_min - conn_std_min) if conn_std_min > 0 else 0.0
+    _ct = _derived.get("conn_totales")
+    conn_real_min = _ct["Real"]
+    conn_std_min = _ct["Std"]
+    conn_tp_min = _ct["TP"]
+    conn_tnpi_min = _ct["TNPI"]
     eff_conn = clamp_0_100(safe_pct(conn_tp_min, conn_real_min)) if conn_real_min > 0 else 0.0
 
 
@@ -5390,95 +5372,150 @@ def default_trip_direction_from_activity(activity_name: str) -> str:
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
 # CACHE: generar figuras (reduce lentitud)
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
-@st.cache_data(show_spinner=False)
-def _make_figs(df_json: str, df_conn_json: str, modo_reporte: str):
-    df_local = pd.read_json(df_json, orient="split") if df_json else pd.DataFrame()
-    dfc_local = pd.read_json(df_conn_json, orient="split") if df_conn_json else pd.DataFrame()
-
-    figs = {"tiempos": None, "act_pie": None, "act_bar": None, "conn_pie": None, "conn_stack": None}
-
-    # tiempos
-    if not df_local.empty and {"Tipo", "Horas_Reales"}.issubset(df_local.columns):
-        figs["tiempos"] = px.pie(df_local, names="Tipo", values="Horas_Reales", hole=0.55, title="TP vs TNPI vs TNP")
-
-    # actividades
-    if not df_local.empty and {"Actividad", "Horas_Reales"}.issubset(df_local.columns):
-        df_act = df_local.groupby("Actividad", as_index=False)["Horas_Reales"].sum().sort_values("Horas_Reales", ascending=False)
-        figs["act_pie"] = px.pie(df_act, names="Actividad", values="Horas_Reales", hole=0.35, title="Horas por actividad")
-
-        palette = px.colors.qualitative.Set3 + px.colors.qualitative.Pastel + px.colors.qualitative.Bold
-        act_names = df_act["Actividad"].tolist()
-        act_color_map = {a: palette[i % len(palette)] for i, a in enumerate(act_names)}
-
-        figs["act_bar"] = px.bar(
-            df_act, x="Actividad", y="Horas_Reales", color="Actividad",
-            title="Distribución de actividades (24 h)",
-            color_discrete_map=act_color_map,
-            text="Horas_Reales",
-        )
-        figs["act_bar"].update_layout(showlegend=False)
+FIG_CACHE_MAX_ENTRIES = int(os.getenv("TNPI_FIG_CACHE_MAX_ENTRIES", "64"))
 
-    # conexiones
-    if modo_reporte == "Perforación" and not dfc_local.empty and {"Componente", "Minutos_Reales"}.issubset(dfc_local.columns):
-        df_conn_sum = dfc_local.groupby("Componente", as_index=False)["Minutos_Reales"].sum()
-        df_conn_sum["Componente"] = pd.Categorical(df_conn_sum["Componente"], categories=CONN_ORDER, ordered=True)
-        df_conn_sum = df_conn_sum.sort_values("Componente")
-
-        figs["conn_pie"] = px.pie(
-            df_conn_sum, names="Componente", values="Minutos_Reales", hole=0.35,
-            title="Distribución de tiempo en conexión (min/% )",
-            color="Componente", color_discrete_map=CONN_COLOR_MAP
-        )
 
-        df_stack = dfc_local.copy()
-        df_stack["Conn_Label"] = df_stack["Profundidad_m"].fillna(df_stack["Conn_No"]).astype(float).astype(int).astype(str)
-        df_stack["Componente"] = pd.Categorical(df_stack["Componente"], categories=CONN_ORDER, ordered=True)
+@st.cache_resource(show_spinner=False)
+def _get_fig_cache() -> FigureCache:
+    # Compartida entre sesiones: la llave es el contenido, no el usuario.
+    return FigureCache(FIG_CACHE_MAX_ENTRIES)
 
-        df_stack_g = df_stack.groupby(["Conn_Label", "Componente"], as_index=False)["Minutos_Reales"].sum().sort_values(["Conn_Label", "Componente"])
 
-        per_conn = df_stack.groupby("Conn_Label", as_index=False).first()[["Conn_Label", "Conn_Tipo", "Angulo_Bucket"]]
-        per_conn["Std_Total"] = per_conn.apply(
-            lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-            axis=1,
-        )
-        std_line = float(per_conn["Std_Total"].mean()) if not per_conn.empty else 0.0
-
-        fig_conn_stack = px.bar(
-            df_stack_g,
-            x="Conn_Label",
-            y="Minutos_Reales",
-            color="Componente",
-            category_orders={"Componente": CONN_ORDER},
-            color_discrete_map=CONN_COLOR_MAP,
-            barmode="stack",
-            title="Conexiones perforando",
-            labels={"Conn_Label": "Profundidad (m)", "Minutos_Reales": "Tiempo (min)"},
-        )
+def _cached_fig(name: str, data: pd.DataFrame, builder, *params, fp: str | None = None):
+    """
+    Figura ``name`` para ``data`` (más ``params``) construida una sola vez por
+    contenido. ``fp`` evita recalcular la huella cuando ``data`` es una tabla
+    base ya registrada en las tablas derivadas.
+    """
+    key = (name, fp or frame_fingerprint(data), *params)
+    return _get_fig_cache().get_or_build(key, lambda: builder(data, *params))
 
-        if std_line > 0:
-            fig_conn_stack.add_hline(
-                y=std_line,
-                line_dash="dash",
-                line_color="#9C640C",
-                annotation_text=f"{std_line:.1f}",
-                annotation_position="top left",
-                annotation_font_color="#9C640C",
-            )
 
-        df_tot = df_stack.groupby("Conn_Label", as_index=False)["Minutos_Reales"].sum().rename(columns={"Minutos_Reales": "Real_Total"})
-        tot_map = dict(zip(df_tot["Conn_Label"].astype(str), df_tot["Real_Total"]))
-        for x in sorted(df_tot["Conn_Label"].astype(str).unique(), key=lambda v: float(v) if v.replace(".", "", 1).isdigit() else v):
-            y = float(tot_map.get(x, 0))
-            fig_conn_stack.add_annotation(x=x, y=y, text=f"<b>{y:.0f}</b>", showarrow=False, yshift=10)
+def _build_fig_tiempos(df_local: pd.DataFrame, title: str):
+    if df_local.empty or not {"Tipo", "Horas_Reales"}.issubset(df_local.columns):
+        return None
+    df_tiempos = df_local.groupby("Tipo")["Horas_Reales"].sum().reset_index()
+    if df_tiempos.empty:
+        return None
+    return px.pie(df_tiempos, names="Tipo", values="Horas_Reales", hole=0.55, title=title)
+
+
+def _act_hours(df_local: pd.DataFrame) -> pd.DataFrame:
+    return df_local.groupby("Actividad", as_index=False)["Horas_Reales"].sum().sort_values("Horas_Reales", ascending=False)
+
+
+def _build_fig_act_pie(df_local: pd.DataFrame, title: str, top_n: int = 0):
+    if df_local.empty or not {"Actividad", "Horas_Reales"}.issubset(df_local.columns):
+        return None
+    df_act = _act_hours(df_local)
+    if top_n:
+        df_act = df_act.head(top_n)
+    if df_act.empty:
+        return None
+    return px.pie(df_act, names="Actividad", values="Horas_Reales", hole=0.35, title=title)
+
+
+def _build_fig_act_bar(df_local: pd.DataFrame, title: str):
+    if df_local.empty or not {"Actividad", "Horas_Reales"}.issubset(df_local.columns):
+        return None
+    df_act = _act_hours(df_local)
+    palette = px.colors.qualitative.Set3 + px.colors.qualitative.Pastel + px.colors.qualitative.Bold
+    act_names = df_act["Actividad"].tolist()
+    act_color_map = {a: palette[i % len(palette)] for i, a in enumerate(act_names)}
+
+    fig = px.bar(
+        df_act, x="Actividad", y="Horas_Reales", color="Actividad",
+        title=title,
+        color_discrete_map=act_color_map,
+        text="Horas_Reales",
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def _build_fig_conn_pie(dfc_local: pd.DataFrame, title: str):
+    if dfc_local.empty or not {"Componente", "Minutos_Reales"}.issubset(dfc_local.columns):
+        return None
+    df_conn_sum = dfc_local.groupby("Componente", as_index=False)["Minutos_Reales"].sum()
+    df_conn_sum["Componente"] = pd.Categorical(df_conn_sum["Componente"], categories=CONN_ORDER, ordered=True)
+    df_conn_sum = df_conn_sum.sort_values("Componente")
+
+    return px.pie(
+        df_conn_sum, names="Componente", values="Minutos_Reales", hole=0.35,
+        title=title,
+        color="Componente", color_discrete_map=CONN_COLOR_MAP
+    )
+
 
-        fig_conn_stack.update_layout(legend_title_text="", xaxis_tickangle=0)
-        figs["conn_stack"] = fig_conn_stack
+def _build_fig_conn_stack(dfc_local: pd.DataFrame, title: str):
+    if dfc_local.empty or not {"Componente", "Minutos_Reales"}.issubset(dfc_local.columns):
+        return None
+    df_stack = dfc_local.copy()
+    df_stack["Conn_Label"] = df_stack["Profundidad_m"].fillna(df_stack["Conn_No"]).astype(float).astype(int).astype(str)
+    df_stack["Componente"] = pd.Categorical(df_stack["Componente"], categories=CONN_ORDER, ordered=True)
+
+    df_stack_g = df_stack.groupby(["Conn_Label", "Componente"], as_index=False)["Minutos_Reales"].sum().sort_values(["Conn_Label", "Componente"])
+
+    per_conn = df_stack.groupby("Conn_Label", as_index=False).first()[["Conn_Label", "Conn_Tipo", "Angulo_Bucket"]]
+    per_conn = attach_standard(per_conn, CONN_STDS_TABLE)
+    std_line = float(per_conn["Std_Total"].mean()) if not per_conn.empty else 0.0
+
+    fig_conn_stack = px.bar(
+        df_stack_g,
+        x="Conn_Label",
+        y="Minutos_Reales",
+        color="Componente",
+        category_orders={"Componente": CONN_ORDER},
+        color_discrete_map=CONN_COLOR_MAP,
+        barmode="stack",
+        title=title,
+        labels={"Conn_Label": "Profundidad (m)", "Minutos_Reales": "Tiempo (min)"},
+    )
 
+    if std_line > 0:
+        fig_conn_stack.add_hline(
+            y=std_line,
+            line_dash="dash",
+            line_color="#9C640C",
+            annotation_text=f"{std_line:.1f}",
+            annotation_position="top left",
+            annotation_font_color="#9C640C",
+        )
+
+    df_tot = df_stack.groupby("Conn_Label", as_index=False)["Minutos_Reales"].sum().rename(columns={"Minutos_Reales": "Real_Total"})
+    tot_map = dict(zip(df_tot["Conn_Label"].astype(str), df_tot["Real_Total"]))
+    for x in sorted(df_tot["Conn_Label"].astype(str).unique(), key=lambda v: float(v) if v.replace(".", "", 1).isdigit() else v):
+        y = float(tot_map.get(x, 0))
+        fig_conn_stack.add_annotation(x=x, y=y, text=f"<b>{y:.0f}</b>", showarrow=False, yshift=10)
+
+    fig_conn_stack.update_layout(legend_title_text="", xaxis_tickangle=0)
+    return fig_conn_stack
+
+
+def _make_figs(df_local: pd.DataFrame, dfc_local: pd.DataFrame, modo_reporte: str):
+    fp_df = _derived.fingerprint("df")
+    fp_conn = _derived.fingerprint("df_conn")
+    figs = {
+        "tiempos": _cached_fig("tiempos", df_local, _build_fig_tiempos, "TP vs TNPI vs TNP", fp=fp_df),
+        "act_pie": _cached_fig("act_pie", df_local, _build_fig_act_pie, "Horas por actividad", fp=fp_df),
+        "act_bar": _cached_fig("act_bar", df_local, _build_fig_act_bar, "Distribución de actividades (24 h)", fp=fp_df),
+        "conn_pie": None,
+        "conn_stack": None,
+    }
+    # conexiones
+    if modo_reporte == "Perforación":
+        figs["conn_pie"] = _cached_fig("conn_pie", dfc_local, _build_fig_conn_pie, "Distribución de tiempo en conexión (min/% )", fp=fp_conn)
+        figs["conn_stack"] = _cached_fig("conn_stack", dfc_local, _build_fig_conn_stack, "Conexiones perforando", fp=fp_conn)
     return figs
 
-df_json = df.to_json(orient="split") if not df.empty else ""
-df_conn_json = df_conn.to_json(orient="split") if not df_conn.empty else ""
-figs = _make_figs(df_json, df_conn_json, modo_reporte) if show_charts else {"tiempos": None, "act_pie": None, "act_bar": None, "conn_pie": None, "conn_stack": None}
+figs = _make_figs(df, df_conn, modo_reporte) if show_charts else {"tiempos": None, "act_pie": None, "act_bar": None, "conn_pie": None, "conn_stack": None}
+if show_charts:
+    _fc_stats = _get_fig_cache().stats()
+    st.sidebar.caption(
+        f"Caché de gráficas: {_fc_stats['entries']}/{_fc_stats['max_entries']} · "
+        f"aciertos {_fc_stats['hits']} · fallos {_fc_stats['misses']} · "
+        f"desalojos {_fc_stats['evictions']} ({_fc_stats['hit_rate']*100:.0f}%)"
+    )
 
 # == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == == =
 # NAV PRO: TABS
@@ -5590,13 +5627,7 @@ with tab_resumen:
     # --- MISSION CONTROL DASHBOARD ---
     st.markdown("### 🧭 Centro de Control de Misión")
 
-    # Calcular KPIs generales (todas las etapas)
-    total_prog = float(df["Horas_Prog"].sum()) if not df.empty else 0.0
-    total_real = float(df["Horas_Reales"].sum()) if not df.empty else 0.0
-    tp_h = float(df[df["Tipo"] == "TP"]["Horas_Reales"].sum()) if not df.empty else 0.0
-    tnpi_h = float(df[df["Tipo"] == "TNPI"]["Horas_Reales"].sum()) if not df.empty else 0.0
-    tnp_h = float(df[df["Tipo"] == "TNP"]["Horas_Reales"].sum()) if not df.empty else 0.0
-    eficiencia_dia = clamp_0_100(safe_pct(tp_h, total_real)) if total_real > 0 else 0.0
+    # KPIs generales (todas las etapas): ya calculados en "KPIs base" desde tipo_totals
 
     # Mostrar el dashboard NASA (vista general)
     dashboard_html = mission_control_dashboard(
@@ -5641,12 +5672,13 @@ with tab_resumen:
         df_resumen_filtrado = pd.DataFrame()
         df_conn_filtrado = pd.DataFrame()
 
-    # Recalcular KPIs con datos filtrados
-    total_prog_filtrado = float(df_resumen_filtrado["Horas_Prog"].sum()) if not df_resumen_filtrado.empty else 0.0
-    total_real_filtrado = float(df_resumen_filtrado["Horas_Reales"].sum()) if not df_resumen_filtrado.empty else 0.0
-    tp_h_filtrado = float(df_resumen_filtrado[df_resumen_filtrado["Tipo"] == "TP"]["Horas_Reales"].sum()) if not df_resumen_filtrado.empty else 0.0
-    tnpi_h_filtrado = float(df_resumen_filtrado[df_resumen_filtrado["Tipo"] == "TNPI"]["Horas_Reales"].sum()) if not df_resumen_filtrado.empty else 0.0
-    tnp_h_filtrado = float(df_resumen_filtrado[df_resumen_filtrado["Tipo"] == "TNP"]["Horas_Reales"].sum()) if not df_resumen_filtrado.empty else 0.0
+    # KPIs de la etapa filtrada (tabla derivada horas_por_etapa)
+    _h_etapa = _etapa_hours(etapa_resumen)
+    total_prog_filtrado = _h_etapa["Prog"]
+    total_real_filtrado = _h_etapa["Real"]
+    tp_h_filtrado = _h_etapa["TP"]
+    tnpi_h_filtrado = _h_etapa["TNPI"]
+    tnp_h_filtrado = _h_etapa["TNP"]
     eficiencia_dia_filtrado = clamp_0_100(safe_pct(tp_h_filtrado, total_real_filtrado)) if total_real_filtrado > 0 else 0.0
 
     # Recalcular KPIs de conexiones filtradas
@@ -5657,16 +5689,12 @@ with tab_resumen:
     eff_conn_filtrado = 0.0
 
     if not df_conn_filtrado.empty:
-        conn_real_min_filtrado = float(df_conn_filtrado.groupby(["Conn_No"])["Minutos_Reales"].sum().sum())
-        per_conn2_filtrado = df_conn_filtrado.groupby("Conn_No", as_index=False).first()[["Conn_No", "Conn_Tipo", "Angulo_Bucket"]]
-        per_conn2_filtrado["Std_Total"] = per_conn2_filtrado.apply(
-            lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-            axis=1
-        )
-        conn_std_min_filtrado = float(per_conn2_filtrado["Std_Total"].sum())
-
-        conn_tp_min_filtrado = min(conn_real_min_filtrado, conn_std_min_filtrado) if conn_std_min_filtrado > 0 else conn_real_min_filtrado
-        conn_tnpi_min_filtrado = max(0.0, conn_real_min_filtrado - conn_std_min_filtrado) if conn_std_min_filtrado > 0 else 0.0
+        _per_etapa = _derived.get("conn_por_etapa")
+        _ct_f = conn_totals(_per_etapa[_per_etapa["Etapa"] == etapa_resumen])
+        conn_real_min_filtrado = _ct_f["Real"]
+        conn_std_min_filtrado = _ct_f["Std"]
+        conn_tp_min_filtrado = _ct_f["TP"]
+        conn_tnpi_min_filtrado = _ct_f["TNPI"]
         eff_conn_filtrado = clamp_0_100(safe_pct(conn_tp_min_filtrado, conn_real_min_filtrado)) if conn_real_min_filtrado > 0 else 0.0
 
     # --- MISSION CONTROL PARA ETAPA ESPECÍFICA ---
@@ -5942,17 +5970,13 @@ with tab_resumen:
         # Generar figuras específicas para esta etapa
         if not df_resumen_filtrado.empty:
             # Tiempos (TP vs TNPI vs TNP)
-            df_tiempos = df_resumen_filtrado.groupby("Tipo")["Horas_Reales"].sum().reset_index()
-            if not df_tiempos.empty:
-                fig_tiempos = px.pie(df_tiempos, names="Tipo", values="Horas_Reales", 
-                                     hole=0.55, title=f"TP vs TNPI vs TNP - {etapa_resumen}")
+            fig_tiempos = _cached_fig("tiempos", df_resumen_filtrado, _build_fig_tiempos, f"TP vs TNPI vs TNP - {etapa_resumen}")
+            if fig_tiempos is not None:
                 st.plotly_chart(fig_tiempos, use_container_width=True, key="pie_tiempos_resumen")
             
             # Actividades
-            df_act = df_resumen_filtrado.groupby("Actividad", as_index=False)["Horas_Reales"].sum().sort_values("Horas_Reales", ascending=False)
-            if not df_act.empty:
-                fig_act_pie = px.pie(df_act.head(8), names="Actividad", values="Horas_Reales", 
-                                     hole=0.35, title=f"Top Actividades - {etapa_resumen}")
+            fig_act_pie = _cached_fig("act_pie", df_resumen_filtrado, _build_fig_act_pie, f"Top Actividades - {etapa_resumen}", 8)
+            if fig_act_pie is not None:
                 st.plotly_chart(fig_act_pie, use_container_width=True, key="pie_actividades_resumen")
 
     # -----------------------------------------------------------------
@@ -6325,10 +6349,7 @@ with tab_resumen:
                         .sort_values(["Conn_Label", "Componente"])
                     )
                     per_conn = df_stack.groupby("Conn_Label", as_index=False).first()[["Conn_Label", "Conn_Tipo", "Angulo_Bucket"]]
-                    per_conn["Std_Total"] = per_conn.apply(
-                        lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-                        axis=1,
-                    )
+                    per_conn = attach_standard(per_conn, CONN_STDS_TABLE)
                     std_line = float(per_conn["Std_Total"].mean()) if not per_conn.empty else 0.0
                     fig_conn_stack_d = px.bar(
                         df_stack_g,
@@ -6462,33 +6483,29 @@ with tab_act:
         key="vista_indicadores",
     )
 
-    # Base dataframe para indicadores
-    df_ind_base = st.session_state.get("df", pd.DataFrame()).copy()
+    # Base dataframe para indicadores (el acumulado sale de la tabla derivada)
+    df_ind_base = st.session_state.get("df", pd.DataFrame())
 
     # Filtrar por fecha seleccionada (puede incluir varias etapas)
     if vista_ind == "Día seleccionado":
         fecha_sel = st.session_state.get("fecha_val", None)
         if fecha_sel is not None and "Fecha" in df_ind_base.columns:
-            df_ind_base["_Fecha_dt"] = pd.to_datetime(df_ind_base["Fecha"], errors="coerce")
+            _fecha_dt = pd.to_datetime(df_ind_base["Fecha"], errors="coerce")
             try:
                 fecha_date = fecha_sel if hasattr(fecha_sel, "year") else pd.to_datetime(fecha_sel).date()
             except Exception:
                 fecha_date = pd.to_datetime(fecha_sel, errors="coerce").date()
-            df_ind_base = df_ind_base[df_ind_base["_Fecha_dt"].dt.date == fecha_date].copy()
-            df_ind_base.drop(columns=["_Fecha_dt"], inplace=True, errors="ignore")
+            df_ind_base = df_ind_base[_fecha_dt.dt.date == fecha_date]
 
     st.subheader("Indicador de desempeño por actividades")
     rows_act = []
     if not df_ind_base.empty:
-        g = df_ind_base.groupby(["Actividad", "Tipo"], as_index=False)["Horas_Reales"].sum()
-        piv = g.pivot_table(index="Actividad", columns="Tipo", values="Horas_Reales", aggfunc="sum", fill_value=0.0).reset_index()
-        for col in ["TP", "TNPI", "TNP"]:
-            if col not in piv.columns:
-                piv[col] = 0.0
+        if vista_ind == "Día seleccionado":
+            piv = hours_by(df_ind_base, "Actividad")
+        else:
+            piv = _derived.get("horas_por_actividad").copy()
         piv["Real"] = piv["TP"] + piv["TNPI"] + piv["TNP"]
-        def _safe_pct(n, d):
-            return (float(n) / float(d) * 100.0) if float(d) > 0 else 0.0
-        piv["Eficiencia"] = piv.apply(lambda r: max(0.0, min(100.0, _safe_pct(r["TP"], r["Real"]))), axis=1)
+        piv["Eficiencia"] = efficiency_pct(piv["TP"], piv["Real"])
         piv = piv.sort_values("Real", ascending=False)
         for _, r in piv.iterrows():
             rows_act.append({
@@ -6510,12 +6527,13 @@ with tab_act:
 with tab_top:
     st.subheader("Top 5 categorías – TNPI / TNP")
 
-    df_top = st.session_state.get("df", pd.DataFrame()).copy()
+    # Horas ya agregadas por fecha/etapa/modo/tipo/categoría (tabla derivada compartida):
+    # los filtros y el top se hacen sobre ese resumen, no sobre la bitácora completa.
+    _derived.sync("df", st.session_state.df)
+    df_top = _derived.get("horas_por_causa")
     if df_top.empty:
         st.info("Aún no hay datos para calcular el top de TNPI/TNP.")
     else:
-        df_top["Horas_Reales"] = pd.to_numeric(df_top.get("Horas_Reales", 0.0), errors="coerce").fillna(0.0)
-
         col_f1, col_f2, col_f3 = st.columns(3)
         with col_f1:
             days = _available_days(df_top)
@@ -6665,8 +6683,8 @@ with tab_top:
             else:
                 total_tnpi = float(top_tnpi["Horas_Reales"].sum())
                 top_tnpi = top_tnpi.copy()
-                top_tnpi["%"] = top_tnpi["Horas_Reales"].apply(lambda v: (float(v) / total_tnpi * 100.0) if total_tnpi > 0 else 0.0)
-                top_tnpi["Semáforo"] = top_tnpi["%"].apply(semaforo_dot)
+                top_tnpi["%"] = efficiency_pct(top_tnpi["Horas_Reales"], total_tnpi, clamp=False)
+                top_tnpi["Semáforo"] = semaforo(top_tnpi["%"])
                 fig_tnpi = px.bar(
                     top_tnpi.sort_values("Horas_Reales"),
                     x="Horas_Reales",
@@ -6684,8 +6702,8 @@ with tab_top:
             else:
                 total_tnp = float(top_tnp["Horas_Reales"].sum())
                 top_tnp = top_tnp.copy()
-                top_tnp["%"] = top_tnp["Horas_Reales"].apply(lambda v: (float(v) / total_tnp * 100.0) if total_tnp > 0 else 0.0)
-                top_tnp["Semáforo"] = top_tnp["%"].apply(semaforo_dot)
+                top_tnp["%"] = efficiency_pct(top_tnp["Horas_Reales"], total_tnp, clamp=False)
+                top_tnp["Semáforo"] = semaforo(top_tnp["%"])
                 fig_tnp = px.bar(
                     top_tnp.sort_values("Horas_Reales"),
                     x="Horas_Reales",
@@ -6733,23 +6751,20 @@ with tab_conn:
         # ------------------------------
         # Chips pro: exceso vs estándar (con sugerencias)
         # ------------------------------
+        # Agregados por etapa de ``df_conn`` (tablas derivadas): se filtran, no se recalculan.
+        _derived.sync("df_conn", st.session_state.df_conn)
         if not df_conn_view.empty:
             try:
-                per_conn = df_conn_view.groupby("Conn_No", as_index=False).first()[["Conn_No", "Conn_Tipo", "Angulo_Bucket"]]
-                per_conn["Std_Total"] = per_conn.apply(
-                    lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-                    axis=1,
-                )
+                per_conn = _derived.get("conn_por_etapa")
+                per_conn = per_conn[per_conn["Etapa"] == etapa_conn_view]
                 total_std_min = float(per_conn["Std_Total"].sum())
-                total_real_min = float(df_conn_view.groupby(["Conn_No"])["Minutos_Reales"].sum().sum())
+                total_real_min = float(pd.to_numeric(per_conn["Minutos_Reales"], errors="coerce").sum())
 
                 # Componente con mayor exceso
                 comp_over = None
-                if {"Componente", "Minutos_Reales", "Minutos_Estandar"}.issubset(df_conn_view.columns):
-                    comp_sum = df_conn_view.groupby("Componente", as_index=False).agg(
-                        real=("Minutos_Reales", "sum"),
-                        std=("Minutos_Estandar", "sum"),
-                    )
+                comp_sum = _derived.get("conn_componentes_por_etapa")
+                comp_sum = comp_sum[comp_sum["Etapa"] == etapa_conn_view].copy()
+                if not comp_sum.empty:
                     comp_sum["over"] = comp_sum["real"] - comp_sum["std"]
                     comp_sum = comp_sum.sort_values("over", ascending=False)
                     if not comp_sum.empty and float(comp_sum.iloc[0]["over"]) > 0:
@@ -6769,86 +6784,21 @@ with tab_conn:
                 st.info("Aún no hay datos de conexiones para la etapa seleccionada.")
             else:
                 # Pie por componentes
-                if {"Componente", "Minutos_Reales"}.issubset(df_conn_view.columns):
-                    df_conn_sum = df_conn_view.groupby("Componente", as_index=False)["Minutos_Reales"].sum()
-                    df_conn_sum["Componente"] = pd.Categorical(df_conn_sum["Componente"], categories=CONN_ORDER, ordered=True)
-                    df_conn_sum = df_conn_sum.sort_values("Componente")
-
-                    fig_conn_pie = px.pie(
-                        df_conn_sum,
-                        names="Componente",
-                        values="Minutos_Reales",
-                        hole=0.35,
-                        title=f"Distribución de tiempo en conexión - {etapa_conn_view}",
-                        color="Componente",
-                        color_discrete_map=CONN_COLOR_MAP,
-                    )
+                fig_conn_pie = _cached_fig("conn_pie", df_conn_view, _build_fig_conn_pie, f"Distribución de tiempo en conexión - {etapa_conn_view}")
+                if fig_conn_pie is not None:
                     st.plotly_chart(fig_conn_pie, use_container_width=True, key="pie_conexiones")
 
                 # Stacked por conexión/profundidad
-                df_stack = df_conn_view.copy()
-                df_stack["Conn_Label"] = df_stack["Profundidad_m"].fillna(df_stack["Conn_No"]).astype(float).astype(int).astype(str)
-                df_stack["Componente"] = pd.Categorical(df_stack["Componente"], categories=CONN_ORDER, ordered=True)
-                df_stack_g = (
-                    df_stack.groupby(["Conn_Label", "Componente"], as_index=False)["Minutos_Reales"]
-                    .sum()
-                    .sort_values(["Conn_Label", "Componente"])
-                )
-
-                per_conn = df_stack.groupby("Conn_Label", as_index=False).first()[["Conn_Label", "Conn_Tipo", "Angulo_Bucket"]]
-                per_conn["Std_Total"] = per_conn.apply(
-                    lambda r: float(CONN_STDS.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)),
-                    axis=1,
-                )
-                std_line = float(per_conn["Std_Total"].mean()) if not per_conn.empty else 0.0
-
-                fig_conn_stack = px.bar(
-                    df_stack_g,
-                    x="Conn_Label",
-                    y="Minutos_Reales",
-                    color="Componente",
-                    category_orders={"Componente": CONN_ORDER},
-                    color_discrete_map=CONN_COLOR_MAP,
-                    barmode="stack",
-                    title=f"Conexiones perforando - {etapa_conn_view}",
-                    labels={"Conn_Label": "Profundidad (m)", "Minutos_Reales": "Tiempo (min)"},
-                )
-
-                if std_line > 0:
-                    fig_conn_stack.add_hline(
-                        y=std_line,
-                        line_dash="dash",
-                        line_color="#9C640C",
-                        annotation_text=f"{std_line:.1f}",
-                        annotation_position="top left",
-                        annotation_font_color="#9C640C",
-                    )
-
-                df_tot = (
-                    df_stack.groupby("Conn_Label", as_index=False)["Minutos_Reales"]
-                    .sum()
-                    .rename(columns={"Minutos_Reales": "Real_Total"})
-                )
-                tot_map = dict(zip(df_tot["Conn_Label"].astype(str), df_tot["Real_Total"]))
-                for x in sorted(df_tot["Conn_Label"].astype(str).unique(), key=lambda v: float(v) if v.replace(".", "", 1).isdigit() else v):
-                    y = float(tot_map.get(x, 0))
-                    fig_conn_stack.add_annotation(x=x, y=y, text=f"<b>{y:.0f}</b>", showarrow=False, yshift=10)
-
-                fig_conn_stack.update_layout(legend_title_text="", xaxis_tickangle=0)
-                st.plotly_chart(fig_conn_stack, use_container_width=True, key="stack_conexiones")
+                fig_conn_stack = _cached_fig("conn_stack", df_conn_view, _build_fig_conn_stack, f"Conexiones perforando - {etapa_conn_view}")
+                if fig_conn_stack is not None:
+                    st.plotly_chart(fig_conn_stack, use_container_width=True, key="stack_conexiones")
 
         st.subheader("Indicador de desempeño por conexiones")
         rows_conn = []
         if not df_conn_view.empty:
-            per = df_conn_view.groupby(["Conn_No", "Profundidad_m"], as_index=False).agg(
-                real_min=("Minutos_Reales", "sum"),
-                tnpi_min=("Minutos_TNPI", "sum"),
-                tnp_min=("Minutos_TNP", "sum") if "Minutos_TNP" in df_conn_view.columns else ("Minutos_TNPI", "sum"),
-            )
-            per["eff"] = per.apply(
-                lambda r: clamp_0_100(safe_pct(r["real_min"] - r["tnpi_min"] - r.get("tnp_min", 0.0), r["real_min"])) if r["real_min"] > 0 else 0.0,
-                axis=1,
-            )
+            per = _derived.get("conn_indicador_por_etapa")
+            per = per[per["Etapa"] == etapa_conn_view].drop(columns=["Etapa"])
+            per["eff"] = efficiency_pct(per["real_min"] - per["tnpi_min"] - per["tnp_min"], per["real_min"])
             per = per.sort_values("Conn_No", ascending=True)
 
             for _, r in per.iterrows():
@@ -7853,11 +7803,11 @@ with tab_bha:
         df_bha_last = df_bha.tail(n_bha).copy()
 
         # Eficiencia y semáforo (igual que en otras vistas)
-        df_bha_last["Eficiencia_pct"] = df_bha_last.apply(
-            lambda r: (float(r.get("Estandar_h", 0.0)) / float(r.get("Real_h", 0.0)) * 100.0) if float(r.get("Real_h", 0.0) or 0.0) > 0 else 0.0,
-            axis=1
+        _no_h = pd.Series(0.0, index=df_bha_last.index)
+        df_bha_last["Eficiencia_pct"] = efficiency_pct(
+            df_bha_last.get("Estandar_h", _no_h), df_bha_last.get("Real_h", _no_h), clamp=False
         )
-        df_bha_last["Semáforo"] = df_bha_last["Eficiencia_pct"].apply(semaforo_dot)
+        df_bha_last["Semáforo"] = semaforo(df_bha_last["Eficiencia_pct"])
 
         def _bha_label(row):
             try:
@@ -8564,7 +8514,7 @@ with tab_detalle:
                     pass
                 # Limpia caches para que estadísticas/figuras se recalculen
                 try:
-                    _make_figs.clear()
+                    _get_fig_cache().clear()
                 except Exception:
                     pass
                 # Invalidar exportables para evitar desalineación con cambios
@@ -8714,13 +8664,11 @@ with tab_comp:
             etapa_b = st.selectbox("Etapa B", options=etapas_all, index=1 if len(etapas_all) > 1 else 0, key="cmp_etapa_b")
 
         def _kpis_etapa(etp: str) -> dict:
-            dfx = df[df["Etapa"] == etp].copy()
-            total = float(dfx.get("Horas_Reales", pd.Series(dtype=float)).fillna(0).sum()) if not dfx.empty else 0.0
-            tp = float(dfx[dfx.get("Tipo", "") == "TP"]["Horas_Reales"].sum()) if "Tipo" in dfx.columns else total
-            tnpi = float(dfx[dfx.get("Tipo", "") == "TNPI"]["Horas_Reales"].sum()) if "Tipo" in dfx.columns else 0.0
-            tnp = float(dfx[dfx.get("Tipo", "") == "TNP"]["Horas_Reales"].sum()) if "Tipo" in dfx.columns else 0.0
+            h = _etapa_hours(etp)
+            total = h["Real"]
+            tp = h["TP"] if "Tipo" in df.columns else total
             eff = clamp_0_100(safe_pct(tp, total)) if total > 0 else 0.0
-            return {"TP": tp, "TNPI": tnpi, "TNP": tnp, "Total": total, "Eficiencia": eff}
+            return {"TP": tp, "TNPI": h["TNPI"], "TNP": h["TNP"], "Total": total, "Eficiencia": eff}
 
         k_a = _kpis_etapa(etapa_a)
         k_b = _kpis_etapa(etapa_b)
@@ -8839,11 +8787,8 @@ with tab_comp:
                     piv[col] = 0.0
 
             piv["Total_h"] = piv["TP"] + piv["TNPI"] + piv["TNP"]
-            piv["Eficiencia_pct"] = piv.apply(
-                lambda r: clamp_0_100(safe_pct(r["TP"], r["Total_h"])) if r["Total_h"] > 0 else 0.0,
-                axis=1,
-            )
-            piv["Semáforo"] = piv["Eficiencia_pct"].apply(semaforo_dot)
+            piv["Eficiencia_pct"] = efficiency_pct(piv["TP"], piv["Total_h"])
+            piv["Semáforo"] = semaforo(piv["Eficiencia_pct"])
 
             # Conexiones por etapa
             conn_map = {}
@@ -9117,8 +9062,8 @@ with tab_ce:
                                 piv[c] = 0.0
                         piv["Total_h"] = piv["TP"] + piv["TNPI"] + piv["TNP"]
                         piv = piv.sort_values("_Hora")
-                        piv["Eficiencia_pct"] = piv.apply(lambda r: (r["TP"] / r["Total_h"] * 100.0) if r["Total_h"] > 0 else 0.0, axis=1)
-                        piv["Semáforo"] = piv["Eficiencia_pct"].apply(semaforo_dot)
+                        piv["Eficiencia_pct"] = efficiency_pct(piv["TP"], piv["Total_h"], clamp=False)
+                        piv["Semáforo"] = semaforo(piv["Eficiencia_pct"])
 
                         # Chips pro
                         best_row = piv.sort_values("Eficiencia_pct", ascending=False).iloc[0]
@@ -9163,8 +9108,8 @@ with tab_ce:
                         TNP_h=("Horas_Reales", lambda s: float(s[df_ce.loc[s.index, "Tipo"].astype(str) == "TNP"].sum()) if "Tipo" in df_ce.columns else 0.0),
                     ).sort_values("Fecha")
 
-                    df_d["Eficiencia_pct"] = df_d.apply(lambda r: (r["TP_h"]/r["Total_h"]*100.0) if r["Total_h"]>0 else 0.0, axis=1)
-                    df_d["Semáforo"] = df_d["Eficiencia_pct"].apply(semaforo_dot)
+                    df_d["Eficiencia_pct"] = efficiency_pct(df_d["TP_h"], df_d["Total_h"], clamp=False)
+                    df_d["Semáforo"] = semaforo(df_d["Eficiencia_pct"])
                     df_d["Fecha"] = pd.to_datetime(df_d["Fecha"], errors="coerce")
 
                     # Chips pro arriba de la tendencia
@@ -9215,13 +9160,13 @@ with tab_ce:
                         if c not in piv.columns:
                             piv[c]=0.0
                     piv["Total"] = piv[["TP","TNPI","TNP"]].sum(axis=1)
-                    piv["Eficiencia_%"] = piv.apply(lambda r: (r["TP"]/r["Total"]*100.0) if r["Total"]>0 else 0.0, axis=1)
-                    piv["Semáforo"] = piv["Eficiencia_%"].apply(semaforo_dot)
+                    piv["Eficiencia_%"] = efficiency_pct(piv["TP"], piv["Total"], clamp=False)
+                    piv["Semáforo"] = semaforo(piv["Eficiencia_%"])
                     piv = piv.sort_values("Total", ascending=False).reset_index()
                 else:
                     piv = df_ce.groupby("Actividad", as_index=False)["Horas_Reales"].sum().rename(columns={"Horas_Reales":"Total"})
                     piv["TP"]=piv["Total"]; piv["TNPI"]=0.0; piv["TNP"]=0.0; piv["Eficiencia_%"]=100.0
-                    piv["Semáforo"] = piv["Eficiencia_%"].apply(semaforo_dot)
+                    piv["Semáforo"] = semaforo(piv["Eficiencia_%"])
 
                 st.markdown("#### Resumen por actividad (CE)")
                 st.dataframe(piv, use_container_width=True, hide_index=True)
@@ -9261,6 +9206,8 @@ with tab_estadisticas:
             
             # Filtrar datos por etapa
             df_etapa = df[df["Etapa"] == etapa_seleccionada].copy()
+            _causas_all = _derived.get("horas_por_causa")
+            causas_etapa = _causas_all[_causas_all["Etapa"] == etapa_seleccionada] if "Etapa" in _causas_all.columns else _causas_all.iloc[0:0]
             df_conn_etapa = df_conn[df_conn["Seccion"] == etapa_seleccionada].copy()
             df_bha_etapa = df_bha[df_bha["Etapa"] == etapa_seleccionada].copy()
             
@@ -9269,20 +9216,21 @@ with tab_estadisticas:
             
             col1, col2, col3, col4 = st.columns(4)
             
+            _h_est = _etapa_hours(etapa_seleccionada)
             with col1:
-                tp_h_etapa = float(df_etapa[df_etapa["Tipo"] == "TP"]["Horas_Reales"].sum()) if not df_etapa.empty else 0.0
+                tp_h_etapa = _h_est["TP"]
                 st.metric("TP (h)", f"{tp_h_etapa:.1f}")
             
             with col2:
-                tnpi_h_etapa = float(df_etapa[df_etapa["Tipo"] == "TNPI"]["Horas_Reales"].sum()) if not df_etapa.empty else 0.0
+                tnpi_h_etapa = _h_est["TNPI"]
                 st.metric("TNPI (h)", f"{tnpi_h_etapa:.1f}")
             
             with col3:
-                tnp_h_etapa = float(df_etapa[df_etapa["Tipo"] == "TNP"]["Horas_Reales"].sum()) if not df_etapa.empty else 0.0
+                tnp_h_etapa = _h_est["TNP"]
                 st.metric("TNP (h)", f"{tnp_h_etapa:.1f}")
             
             with col4:
-                total_h_etapa = float(df_etapa["Horas_Reales"].sum()) if not df_etapa.empty else 0.0
+                total_h_etapa = _h_est["Real"]
                 eficiencia_etapa = clamp_0_100(safe_pct(tp_h_etapa, total_h_etapa)) if total_h_etapa > 0 else 0.0
                 sk, sl, sc = status_from_eff(eficiencia_etapa)
                 st.markdown(f"""
@@ -9389,11 +9337,8 @@ with tab_estadisticas:
                 # BHA
                 if not df_bha_etapa.empty:
                     df_bha_display = df_bha_etapa.copy()
-                    df_bha_display["Eficiencia_pct"] = df_bha_display.apply(
-                        lambda r: (r["Estandar_h"] / r["Real_h"] * 100) if r["Real_h"] > 0 else 0,
-                        axis=1
-                    )
-                    df_bha_display["Semáforo"] = df_bha_display["Eficiencia_pct"].apply(semaforo_dot)
+                    df_bha_display["Eficiencia_pct"] = efficiency_pct(df_bha_display["Estandar_h"], df_bha_display["Real_h"], clamp=False)
+                    df_bha_display["Semáforo"] = semaforo(df_bha_display["Eficiencia_pct"])
                     
                     # Gráfica de BHA
                     fig_bha_etapa = px.bar(df_bha_display, x="BHA_Tipo", y=["Estandar_h", "Real_h"],
@@ -9415,11 +9360,8 @@ with tab_estadisticas:
                         "Minutos_TNPI": "sum"
                     }).reset_index()
                     df_conn_summary["TP_min"] = df_conn_summary["Minutos_Reales"] - df_conn_summary["Minutos_TNPI"]
-                    df_conn_summary["Eficiencia_pct"] = df_conn_summary.apply(
-                        lambda r: (r["TP_min"] / r["Minutos_Reales"] * 100) if r["Minutos_Reales"] > 0 else 0,
-                        axis=1
-                    )
-                    df_conn_summary["Semáforo"] = df_conn_summary["Eficiencia_pct"].apply(semaforo_dot)
+                    df_conn_summary["Eficiencia_pct"] = efficiency_pct(df_conn_summary["TP_min"], df_conn_summary["Minutos_Reales"], clamp=False)
+                    df_conn_summary["Semáforo"] = semaforo(df_conn_summary["Eficiencia_pct"])
                     conexiones_count = len(df_conn_summary)
                     
                     # Gráfica de conexiones
@@ -9439,7 +9381,7 @@ with tab_estadisticas:
             
             if tnpi_h_etapa > 0:
                 # Top causas de TNPI
-                df_tnpi_causas = df_etapa[df_etapa["Tipo"] == "TNPI"].groupby(["Categoria_TNPI", "Detalle_TNPI", "Categoria_TNP", "Detalle_TNP"])["Horas_Reales"].sum().reset_index()
+                df_tnpi_causas = causas_etapa[causas_etapa["Tipo"] == "TNPI"].groupby(["Categoria_TNPI", "Detalle_TNPI", "Categoria_TNP", "Detalle_TNP"])["Horas_Reales"].sum().reset_index()
                 df_tnpi_causas = df_tnpi_causas.sort_values("Horas_Reales", ascending=False).head(10)
                 
                 col_causas1, col_causas2 = st.columns(2)
@@ -9460,7 +9402,7 @@ with tab_estadisticas:
                                    use_container_width=True, hide_index=True)
                 
                 # Distribución por categoría
-                df_tnpi_cat = df_etapa[df_etapa["Tipo"] == "TNPI"].groupby("Categoria_TNPI")["Horas_Reales"].sum().reset_index()
+                df_tnpi_cat = causas_etapa[causas_etapa["Tipo"] == "TNPI"].groupby("Categoria_TNPI")["Horas_Reales"].sum().reset_index()
                 if not df_tnpi_cat.empty:
                     fig_tnpi_cat = px.pie(df_tnpi_cat, names="Categoria_TNPI", values="Horas_Reales",
                                          title="TNPI por Categoría (%)", hole=0.3)
@@ -9472,7 +9414,7 @@ with tab_estadisticas:
             # ---- SECCIÓN 4B: ANÁLISIS TNP ----
             st.markdown("### 🔵 Análisis de TNP")
 
-            df_tnp_etapa = df_etapa[df_etapa["Tipo"] == "TNP"].copy()
+            df_tnp_etapa = causas_etapa[causas_etapa["Tipo"] == "TNP"].copy()
             if not df_tnp_etapa.empty:
                 # Normalizar nulos/guiones para evitar 'nan'
                 for col in ["Categoria_TNP", "Detalle_TNP"]:
@@ -9705,7 +9647,8 @@ with tab_corridas:
                         st.warning(f"No pude generar gráficas combinadas: {_e}")
 
                     st.markdown("### Distribución TNPI por categoría")
-                    d_tnpi = d[d["Tipo"] == "TNPI"].copy()
+                    _causas_all = _derived.get("horas_por_causa")
+                    d_tnpi = _causas_all[(_causas_all["Corrida"] == corrida_sel) & (_causas_all["Tipo"] == "TNPI")].copy()
                     for col, fb in [("Categoria_TNPI", "Sin categoría"), ("Detalle_TNPI", "Sin detalle")]:
                         if col not in d_tnpi.columns:
                             d_tnpi[col] = fb
@@ -9995,7 +9938,8 @@ with tab_drillspot:
     else:
         try:
             if up.name.lower().endswith(".csv"):
-                kpi_raw = pd.read_csv(up)
+                kpi_raw = robust_read_csv(up)
+                st.caption(f"CSV detectado: {dialect_label(kpi_raw)}")
             else:
                 # intenta hoja por defecto; si falla, lee la primera
                 xls = pd.ExcelFile(up)
@@ -10321,7 +10265,7 @@ with tab_drillspot:
     up_rig = st.file_uploader("Cargar CSV Rig Activities", type=["csv"], key="rig_activities_upload")
     if up_rig is not None:
         try:
-            rig_raw = pd.read_csv(up_rig)
+            rig_raw = robust_read_csv(up_rig)
             # Detectar columna de tiempo (primera columna o la que contenga 'time'/'date' o formato ISO)
             time_col = None
             for c in rig_raw.columns:
@@ -10600,6 +10544,14 @@ with tab_general:
         if operaciones_sel is not None:
             df_filtrado = df_filtrado[df_filtrado["Operacion"].isin(operaciones_sel)]
 
+        # Mismos filtros sobre las horas ya agregadas por causa (análisis TNPI/TNP).
+        causas_filtrado = _derived.get("horas_por_causa")
+        if fecha_seleccionada != "Todas las fechas":
+            causas_filtrado = causas_filtrado[causas_filtrado["Fecha"] == fecha_seleccionada]
+        causas_filtrado = causas_filtrado[causas_filtrado["Tipo"].isin(tipos_tiempo_sel)]
+        if operaciones_sel is not None:
+            causas_filtrado = causas_filtrado[causas_filtrado["Operacion"].isin(operaciones_sel)]
+
         # ---- KPIs GENERALES ----
         st.markdown("### 📈 KPIs Generales del Pozo")
         
@@ -10699,7 +10651,7 @@ with tab_general:
 
         with col_a1:
             st.markdown("#### 🔴 TNPI")
-            df_tnpi_rg = df_filtrado[df_filtrado["Tipo"] == "TNPI"].copy()
+            df_tnpi_rg = causas_filtrado[causas_filtrado["Tipo"] == "TNPI"].copy()
             if df_tnpi_rg.empty:
                 st.info("No hay registros TNPI para los filtros seleccionados.")
             else:
@@ -10716,7 +10668,7 @@ with tab_general:
 
         with col_a2:
             st.markdown("#### 🟡 TNP")
-            df_tnp_rg = df_filtrado[df_filtrado["Tipo"] == "TNP"].copy()
+            df_tnp_rg = causas_filtrado[causas_filtrado["Tipo"] == "TNP"].copy()
             if df_tnp_rg.empty:
                 st.info("No hay registros TNP para los filtros seleccionados.")
             else:
@@ -10737,28 +10689,28 @@ with tab_general:
         # Crear resumen por etapa
         if not df_filtrado.empty:
             resumen_etapas = []
+            # Sin filtros (fecha/operación; el tipo "Todos" ya son TP/TNPI/TNP) vale la tabla derivada.
+            if fecha_seleccionada == "Todas las fechas" and tipo_tiempo_sel == "Todos" and operaciones_sel is None:
+                _h_etapas = _derived.get("horas_por_etapa")
+            else:
+                _h_etapas = hours_by(df_filtrado, "Etapa")
+            _h_etapas = _h_etapas.set_index("Etapa")
+            _conn_count = _derived.get("conn_count_por_seccion").set_index("Seccion")["Conexiones"]
+            _bha_count = _derived.get("bha_por_etapa").set_index("Etapa")["Operaciones"]
             etapas_unicas = sorted(df_filtrado["Etapa"].unique())
             
             for etapa_actual in etapas_unicas:
-                df_etapa_actual = df_filtrado[df_filtrado["Etapa"] == etapa_actual]
-                
-                # Calcular KPIs para esta etapa
-                total_etapa = float(df_etapa_actual["Horas_Reales"].sum())
-                tp_etapa = float(df_etapa_actual[df_etapa_actual["Tipo"] == "TP"]["Horas_Reales"].sum())
-                tnpi_etapa = float(df_etapa_actual[df_etapa_actual["Tipo"] == "TNPI"]["Horas_Reales"].sum())
-                tnp_etapa = float(df_etapa_actual[df_etapa_actual["Tipo"] == "TNP"]["Horas_Reales"].sum())
+                # KPIs para esta etapa
+                total_etapa = float(_h_etapas.at[etapa_actual, "TP"] + _h_etapas.at[etapa_actual, "TNPI"] + _h_etapas.at[etapa_actual, "TNP"]) if etapa_actual in _h_etapas.index else 0.0
+                tp_etapa = float(_h_etapas.at[etapa_actual, "TP"]) if etapa_actual in _h_etapas.index else 0.0
+                tnpi_etapa = float(_h_etapas.at[etapa_actual, "TNPI"]) if etapa_actual in _h_etapas.index else 0.0
+                tnp_etapa = float(_h_etapas.at[etapa_actual, "TNP"]) if etapa_actual in _h_etapas.index else 0.0
                 
                 eficiencia_etapa = clamp_0_100(safe_pct(tp_etapa, total_etapa)) if total_etapa > 0 else 0.0
                 
-                # Contar conexiones para esta etapa
-                conexiones_etapa = 0
-                if not df_conn.empty and "Seccion" in df_conn.columns:
-                    conexiones_etapa = len(df_conn[df_conn["Seccion"] == etapa_actual]["Conn_No"].unique())
-                
-                # Contar BHA para esta etapa
-                bha_etapa = 0
-                if not df_bha.empty and "Etapa" in df_bha.columns:
-                    bha_etapa = len(df_bha[df_bha["Etapa"] == etapa_actual])
+                # Conexiones y operaciones BHA de esta etapa
+                conexiones_etapa = int(_conn_count.get(etapa_actual, 0))
+                bha_etapa = int(_bha_count.get(etapa_actual, 0))
                 
                 resumen_etapas.append({
                     "Etapa": etapa_actual,
@@ -10781,7 +10733,7 @@ with tab_general:
         
         if tnpi_horas > 0:
             # Top causas de TNPI en todas las etapas
-            df_tnpi_general = df_filtrado[df_filtrado["Tipo"] == "TNPI"].copy()
+            df_tnpi_general = causas_filtrado[causas_filtrado["Tipo"] == "TNPI"].copy()
             
             col_tnpi1, col_tnpi2 = st.columns(2)
             
@@ -10837,7 +10789,7 @@ with tab_general:
         st.markdown("### 🔍 Análisis de TNP - Todas las Etapas")
 
         if tnp_horas > 0:
-            df_tnp_general = df_filtrado[df_filtrado["Tipo"] == "TNP"].copy()
+            df_tnp_general = causas_filtrado[causas_filtrado["Tipo"] == "TNP"].copy()
 
             # Normalizar (evitar NaN / '-')
             for col, fallback in [("Categoria_TNP", "Sin categoría"), ("Detalle_TNP", "Sin detalle")]:
@@ -11093,7 +11045,16 @@ with tab_export:
             if figs.get(key) is not None:
                 charts_export[label] = figs[key]
 
-    sig_main = f"{pozo}|{etapa}|{fecha}|{modo_reporte}|{repr(kpis_export)}|{list(charts_export.keys())}"
+    _profiles = list(RENDER_PROFILES)
+    exp_profile = st.selectbox(
+        "Resolución de gráficas",
+        _profiles,
+        index=_profiles.index(EXPORT_RENDER_PROFILE) if EXPORT_RENDER_PROFILE in _profiles else 0,
+        key="exp_main_profile",
+        help="print: 1800×1000 ×2 (impresión) · screen: 1600×900 · draft: 1200×675 sin optimizar (más rápido).",
+    )
+
+    sig_main = f"{pozo}|{etapa}|{fecha}|{modo_reporte}|{repr(kpis_export)}|{list(charts_export.keys())}|{exp_profile}"
     if st.session_state.get("exp_main_sig") != sig_main:
         st.session_state["exp_main_sig"] = sig_main
         st.session_state.pop("exp_main_pdf", None)
@@ -11106,10 +11067,14 @@ with tab_export:
                 prog_main = st.progress(0)
                 prog_main_msg = st.empty()
                 prog_main_msg.caption("Iniciando...")
-                st.session_state["exp_main_pdf"] = build_pdf(meta, kpis_export, charts=charts_export)
-                prog_main.progress(55)
+                # Las gráficas se renderizan una vez (en paralelo) y PDF/PPTX las toman de la caché.
+                render_charts_png(charts_export, exp_profile)
+                prog_main.progress(40)
+                prog_main_msg.caption("Gráficas listas.")
+                st.session_state["exp_main_pdf"] = build_pdf(meta, kpis_export, charts=charts_export, profile=exp_profile)
+                prog_main.progress(70)
                 prog_main_msg.caption("PDF listo.")
-                st.session_state["exp_main_ppt"] = build_pptx(meta, kpis_export, charts_export)
+                st.session_state["exp_main_ppt"] = build_pptx(meta, kpis_export, charts_export, profile=exp_profile)
                 prog_main.progress(100)
                 prog_main_msg.caption("PowerPoint listo.")
 
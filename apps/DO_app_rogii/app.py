@@ -12,13 +12,16 @@ Versión .py con mejoras profesionales:
 from __future__ import annotations
 
 import copy
+import hashlib
 import io
 import json
 import math
 import os
 import re
 import shutil
+import sys
 import tempfile
+import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -104,7 +107,6 @@ def filter_by_rig_activity(df: pd.DataFrame, activity_col: str | None, drilling_
 
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
 from scipy.signal import find_peaks, savgol_filter
 from scipy.stats import binned_statistic_2d
 import streamlit as st
@@ -488,6 +490,31 @@ try:
 except Exception:
     winsound = None
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+from endpoint_memo import get_endpoint_memo, is_not_supported
+from solo_http import get_client as get_solo_client
+from trace_fetch import concat_pages, fetch_trace_pages
+from refresh_scheduler import get_refresh_scheduler
+from live_tail import TailBuffer, incremental_rolling_median, live_buffers, pick_x_col
+from trace_probe import ProbeReport, ProbeStep, probe_trace_extent
+from trace_store import format_bound, get_trace_store, range_bounds
+from trace_merge import merge_trace_frames
+from bha_resonance import StreamingHistogram, band_proximity
+from broomstick import broomstick_curves
+from rop_zone_grid import ZoneGrid
+from downsample import downsample_indices
+
+# Envolvente por profundidad compartida con apps/hookload_filter.
+_HOOKLOAD_FILTER_DIR = Path(__file__).resolve().parent.parent / "hookload_filter"
+if str(_HOOKLOAD_FILTER_DIR) not in sys.path:
+    sys.path.append(str(_HOOKLOAD_FILTER_DIR))
+from depth_envelope import REDUCERS as ENVELOPE_REDUCERS, depth_envelope, envelope_frame
+
 
 # =========================
 # Configuración
@@ -639,6 +666,15 @@ _load_dotenv_files()
 
 API_DEFAULT_BASE_URL = os.getenv("SOLO_BASE_URL", "https://solo.cloud").rstrip("/")
 API_DEFAULT_TOKEN = os.getenv("SOLO_ACCESS_TOKEN")
+# Cachés locales en disco (endpoints descubiertos, etc.). Sobrevive a reinicios.
+APP_CACHE_DIR = Path(os.getenv("DO_APP_CACHE_DIR", str(BASE_DIR / ".cache")))
+SOLO_ENDPOINT_MEMO_TTL_S = int(os.getenv("SOLO_ENDPOINT_MEMO_TTL_S", str(7 * 24 * 3600)))
+TRACE_STORE_MAX_MB = int(os.getenv("DO_APP_TRACE_STORE_MAX_MB", "2048"))
+# Últimos segundos de un rango TIME que no se marcan cubiertos (datos que llegan tarde).
+TRACE_STORE_HEAD_MARGIN_S = float(os.getenv("DO_APP_TRACE_STORE_HEAD_MARGIN_S", "900"))
+BHA_STORE_MAX_PAGES = 50
+# Presupuesto de puntos por traza en gráficas largas (LTTB / min-max, ver downsample.py).
+PLOT_MAX_POINTS = int(os.getenv("DO_APP_PLOT_MAX_POINTS", "4000"))
 
 # SMTP para envío de bitácora de lodo (usando st.secrets)
 def _secret(name, default=""):
@@ -808,7 +844,7 @@ def api_get(
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
     }
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = get_solo_client().get(url, params=params, headers=headers, session_id=streamlit_session_id())
     if r.status_code >= 400:
         raise RuntimeError(f"GET {url} -> {r.status_code}\n{r.text}")
     try:
@@ -844,6 +880,97 @@ def build_api_url(path: str, base_url: str | None = None) -> str:
     return f"{base}{path}"
 
 
+def solo_endpoint_memo():
+    """Memoria compartida de qué ruta candidata funciona en cada tenant."""
+    return get_endpoint_memo(APP_CACHE_DIR / "solo_endpoints.json", SOLO_ENDPOINT_MEMO_TTL_S)
+
+
+def solo_trace_store():
+    """Almacén Parquet local de trazas (compartido por sesiones y reinicios)."""
+    return get_trace_store(APP_CACHE_DIR / "traces", TRACE_STORE_MAX_MB * 1024**2, TRACE_STORE_HEAD_MARGIN_S)
+
+
+def read_trace_range_through_store(
+    well_uuid: str,
+    trace_key: str,
+    domain: str,
+    params: dict,
+    fetch_params,
+    max_pages: int = 50,
+) -> pd.DataFrame | None:
+    """
+    Lee el rango ``from``/``to`` de ``params`` desde el almacén local y pide a la API
+    solo los huecos (todas sus páginas, vía ``fetch_params(params) -> DataFrame``).
+    ``fetch_params`` debe lanzar si la petición falla: una página vacía se toma como
+    fin de datos y el hueco queda cubierto. Los errores se propagan sin marcar nada.
+    Retorna ``None`` si no aplica (sin rango explícito o sin pyarrow).
+    """
+    domain = str(domain).upper()
+    store = solo_trace_store()
+    bounds = range_bounds(params, domain)
+    if not store.available or bounds is None:
+        return None
+
+    def _fetch_range(lo: float, hi: float) -> tuple[pd.DataFrame, bool]:
+        p = dict(params)
+        p["from"] = format_bound(lo, domain)
+        p["to"] = format_bound(hi, domain)
+        size = int(p.get("size") or 0)
+        pages: list[pd.DataFrame] = []
+        for page in range(max_pages):
+            p["page"] = page
+            if "offset" in p and size:
+                p["offset"] = page * size
+            df = fetch_params(dict(p))
+            if df is None or df.empty:
+                break
+            # Sin cortar por página corta: la API puede limitar el tamaño de página.
+            pages.append(df)
+        else:
+            return pd.concat(pages, ignore_index=True), False
+        return (pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()), True
+
+    return store.read_through(well_uuid, trace_key, domain, bounds[0], bounds[1], _fetch_range)
+
+
+def trace_store_key(trace_uuid: str, *variant) -> str:
+    """Clave de la traza en el almacén: UUID + huella de lo que cambia el contenido (fuente, params extra)."""
+    extra = json.dumps(variant, sort_keys=True, default=str)
+    return f"{trace_uuid}~{hashlib.sha1(extra.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _solo_route_not_supported(exc: BaseException) -> bool:
+    """404/405/410/501, o una respuesta no JSON (ruta que sirve HTML): la ruta no existe aquí."""
+    return is_not_supported(exc) or str(exc).startswith("Respuesta no JSON")
+
+
+def api_try_candidates(
+    kind: str,
+    candidates: list[tuple[str, dict | None]],
+    base_url: str,
+    call,
+    ids: dict[str, str] | None = None,
+    error_title: str = "No pude obtener datos",
+):
+    """
+    Prueba rutas candidatas empezando por la que funcionó la última vez en este
+    tenant (ver ``endpoint_memo``). Si todas fallan, lanza RuntimeError con los errores.
+    """
+    errors: list[str] = []
+    try:
+        return solo_endpoint_memo().try_candidates(
+            base_url or API_DEFAULT_BASE_URL,
+            kind,
+            candidates,
+            call,
+            ids=ids,
+            errors_out=errors,
+            not_supported=_solo_route_not_supported,
+        )
+    except RuntimeError:
+        raise RuntimeError(f"{error_title}. Errores:\n" + "\n".join(errors))
+
+
 def api_get_raw(
     path: str,
     params: dict | None = None,
@@ -857,7 +984,18 @@ def api_get_raw(
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
     }
-    return requests.get(url, headers=headers, params=params, timeout=30)
+    return get_solo_client().get(url, params=params, headers=headers, session_id=streamlit_session_id())
+
+
+def st_thread_initializer():
+    """Propaga el contexto de Streamlit a los hilos de un pool (cache_data sin avisos)."""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def _init() -> None:
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+
+    return _init
 
 
 def normalize_list_response(resp) -> list:
@@ -946,14 +1084,14 @@ def api_list_laterals(
             ]
         )
 
-    errors: list[str] = []
-    for path, params in candidates:
-        try:
-            return api_get_raw(path, params, base_url, token)
-        except RuntimeError as e:
-            errors.append(str(e))
-
-    raise RuntimeError("No pude listar laterales. Errores:\n" + "\n".join(errors))
+    return api_try_candidates(
+        "laterals:well" if well_uuid else "laterals:project",
+        candidates,
+        base_url,
+        lambda path, params: api_get(path, params, base_url, token),
+        ids={"well_uuid": well_uuid, "project_uuid": project_uuid},
+        error_title="No pude listar laterales",
+    )
 
 
 @st.cache_data(show_spinner=False)
@@ -967,13 +1105,13 @@ def api_list_trace_definitions(base_url: str, token: str, custom_path: str | Non
             ("/api/v1/traces", {"offset": 0, "limit": 500}),
         ]
     )
-    errors: list[str] = []
-    for path, params in candidates:
-        try:
-            return api_get_raw(path, params, base_url, token)
-        except RuntimeError as e:
-            errors.append(str(e))
-    raise RuntimeError("No pude listar tipos de traza. Errores:\n" + "\n".join(errors))
+    return api_try_candidates(
+        "trace_definitions",
+        candidates,
+        base_url,
+        lambda path, params: api_get(path, params, base_url, token),
+        error_title="No pude listar tipos de traza",
+    )
 
 
 @st.cache_data(show_spinner=False)
@@ -1172,14 +1310,14 @@ def api_get_drilling_trace(
         ]
     )
 
-    errors: list[str] = []
-    for path, p in candidates:
-        try:
-            return api_get(path, p, base_url, token)
-        except RuntimeError as e:
-            errors.append(str(e))
-
-    raise RuntimeError("No pude obtener detalle de drilling-trace. Errores:\n" + "\n".join(errors))
+    return api_try_candidates(
+        "drilling_trace",
+        candidates,
+        base_url,
+        lambda path, p: api_get(path, p, base_url, token),
+        ids={"trace_uuid": trace_uuid},
+        error_title="No pude obtener detalle de drilling-trace",
+    )
 
 
 
@@ -1276,13 +1414,14 @@ def api_get_mapped_trace(
                         (f"/api/v1/laterals/{scope_uuid}/mapped-time-traces", dict(base_params)),
                     ]
                 )
-    errors: list[str] = []
-    for path, params in candidates:
-        try:
-            return get_trace_time_with_fallback(path, params, base_url, token)
-        except RuntimeError as e:
-            errors.append(str(e))
-    raise RuntimeError("No pude obtener datos de traza mapeada. Errores:\n" + "\n".join(errors))
+    return api_try_candidates(
+        f"mapped_trace:{trace_type.upper()}:{scope_kind}:{int(bool(force_data_endpoint))}",
+        candidates,
+        base_url,
+        lambda path, params: get_trace_time_with_fallback(path, params, base_url, token),
+        ids={"well_uuid": data_scope_uuid, "scope_uuid": scope_uuid, "trace_uuid": trace_uuid},
+        error_title="No pude obtener datos de traza mapeada",
+    )
 
 @st.cache_data(show_spinner=False)
 def api_list_traces_catalog(base_url: str, token: str, custom_path: str | None = None, params: dict | None = None):
@@ -1336,6 +1475,48 @@ def api_get_well_trace_data(
     return api_get(path, p, base_url, token)
 
 
+def fetch_well_trace_strict(
+    base_url: str,
+    token: str,
+    well_uuid: str,
+    trace_uuid: str,
+    trace_type: str,
+    params: dict | None = None,
+) -> pd.DataFrame:
+    """
+    data/{time|depth} y, si viene vacío o falla, data/calculated/{time|depth}.
+    A diferencia de ``probe_well_trace_data`` no traga errores: si el endpoint
+    plano falla y el calculado tampoco da datos, relanza el error (un 5xx o un
+    token vencido no debe confundirse con "no hay datos" en el almacén).
+    """
+    err: Exception | None = None
+    for calculated in (False, True):
+        try:
+            df = trace_detail_to_df(
+                api_get_well_trace_data(
+                    base_url=base_url,
+                    token=token,
+                    well_uuid=well_uuid,
+                    trace_uuid=str(trace_uuid),
+                    trace_type=trace_type,
+                    params=params or None,
+                    calculated=calculated,
+                )
+            )
+        except Exception as e:
+            if not calculated:
+                err = e
+            elif err is None:
+                # El plano respondió vacío: el calculado puede no existir para esta traza.
+                return pd.DataFrame()
+            continue
+        if not df.empty:
+            return df
+    if err is not None:
+        raise err
+    return pd.DataFrame()
+
+
 def probe_well_trace_data(
     base_url: str,
     token: str,
@@ -1343,99 +1524,59 @@ def probe_well_trace_data(
     trace_uuid: str,
     prefer_type: str,
     user_params: dict | None = None,
-) -> tuple[pd.DataFrame, str, dict]:
+    return_report: bool = False,
+):
     """
     Estrategia robusta basada en endpoints oficiales:
       1) Intento directo con preferencia (TIME/DEPTH) y params del usuario
-      2) Si TIME vacío: ventanas hacia atrás (6h, 24h, 7d, 30d, 180d, 365d, 3a)
-      3) Si sigue vacío: DEPTH con rangos crecientes
-    """
-    from datetime import datetime, timedelta, timezone
+      2) Si viene vacío: petición size=1 sobre el rango completo y bisección sobre las
+         ventanas TIME (6h … 3a) y luego DEPTH (ver ``trace_probe``)
 
+    Retorna (df, tipo_usado, params_usados) o, con ``return_report=True``,
+    (df, tipo_usado, params_usados, report) con el plan y nº de peticiones.
+    """
     prefer = str(prefer_type).upper()
     user_params = dict(user_params or {})
+    direct = ProbeReport()
 
-    def _get_df(ttype: str, params: dict) -> pd.DataFrame:
-        # Intento 1: data/{time|depth}
-        try:
-            detail = api_get_well_trace_data(
-                base_url=base_url,
-                token=token,
-                well_uuid=well_uuid,
-                trace_uuid=str(trace_uuid),
-                trace_type=ttype,
-                params=params,
-                calculated=False,
-            )
-            df = trace_detail_to_df(detail)
-            if df is not None and not df.empty:
-                return df
-        except Exception:
-            pass
-
-        # Intento 2 (fallback): data/calculated/{time|depth}
-        detail2 = api_get_well_trace_data(
+    def _fetch(ttype: str, params: dict, variant: str) -> pd.DataFrame:
+        detail = api_get_well_trace_data(
             base_url=base_url,
             token=token,
             well_uuid=well_uuid,
             trace_uuid=str(trace_uuid),
             trace_type=ttype,
             params=params,
-            calculated=True,
+            calculated=(variant == "calculated"),
         )
-        return trace_detail_to_df(detail2)
+        return trace_detail_to_df(detail)
 
-    # 1) intento directo
-    try:
-        df0 = _get_df(prefer, user_params)
+    def _done(df, used_type, used_params, report):
+        return (df, used_type, used_params, report) if return_report else (df, used_type, used_params)
+
+    # 1) intento directo: data/{time|depth} y fallback data/calculated/{time|depth}
+    for variant in ("plain", "calculated"):
+        direct.requests += 1
+        try:
+            df0 = _fetch(prefer, user_params, variant)
+        except Exception:
+            df0 = pd.DataFrame()
+        direct.steps.append(ProbeStep(prefer, "direct", variant, dict(user_params), len(df0)))
         if not df0.empty:
-            return df0, prefer, user_params
-    except Exception:
-        pass
+            direct.outcome = "direct"
+            return _done(df0, prefer, user_params, direct)
 
     # FIX: If user explicitly specified a range (from/to), do NOT override it with probing.
     # In that case, return empty so the UI can reflect "no data for that range".
     _has_user_range = ("from" in user_params and "to" in user_params and str(user_params.get("from")).strip() != "" and str(user_params.get("to")).strip() != "")
     if _has_user_range:
-        return pd.DataFrame(), prefer, user_params
-
-    # 2) probing TIME
-    if prefer == "TIME":
-        now = datetime.now(timezone.utc)
-        windows = [
-            timedelta(hours=6),
-            timedelta(hours=24),
-            timedelta(days=7),
-            timedelta(days=30),
-            timedelta(days=180),
-            timedelta(days=365),
-            timedelta(days=365 * 3),
-        ]
-        for w in windows:
-            p = dict(user_params)
-            p["to"] = now.strftime("%Y-%m-%dT%H:%M:%SZ")
-            p["from"] = (now - w).strftime("%Y-%m-%dT%H:%M:%SZ")
-            try:
-                df = _get_df("TIME", p)
-                if not df.empty:
-                    return df, "TIME", p
-            except Exception:
-                continue
-
-    # 3) probing DEPTH
-    depth_ranges = [(0, 2000), (0, 5000), (0, 10000), (0, 20000), (0, 50000)]
-    for a, b in depth_ranges:
-        p = dict(user_params)
-        p["from"] = a
-        p["to"] = b
-        try:
-            df = _get_df("DEPTH", p)
-            if not df.empty:
-                return df, "DEPTH", p
-        except Exception:
-            continue
+        direct.outcome = "empty"
+        return _done(pd.DataFrame(), prefer, user_params, direct)
 
-    return pd.DataFrame(), prefer, user_params
+    df, used_type, used_params, report = probe_trace_extent(_fetch, prefer, user_params)
+    report.steps = direct.steps + report.steps
+    report.requests += direct.requests
+    return _done(df, used_type, used_params, report)
 
 
 
@@ -1486,19 +1627,21 @@ def probe_mapped_trace_data(
     prefer_type: str,
     user_params: dict | None = None,
     max_rows_preview: int = 5,
-) -> tuple[pd.DataFrame, str, dict]:
+    return_report: bool = False,
+):
     """
     Intenta obtener datos para una traza mapeada con una estrategia robusta:
       1) Preferencia (TIME o DEPTH) con params del usuario (si hay)
-      2) Si TIME está vacío, prueba ventanas relativas hacia atrás (6h, 24h, 7d, 30d, 180d, 365d)
-      3) Si sigue vacío, prueba DEPTH con rangos crecientes
+      2) Si viene vacío: size=1 sobre el rango completo y bisección sobre las ventanas
+         TIME y luego DEPTH (ver ``trace_probe``)
 
-    Retorna: (df, tipo_usado, params_usados)
+    Retorna: (df, tipo_usado, params_usados) [+ report si ``return_report=True``]
     """
     prefer = str(prefer_type).upper()
     user_params = dict(user_params or {})
+    direct = ProbeReport()
 
-    def _get_df(ttype: str, params: dict) -> pd.DataFrame:
+    def _fetch(ttype: str, params: dict, variant: str = "mapped") -> pd.DataFrame:
         detail = api_get_mapped_trace(
             base_url,
             token,
@@ -1513,110 +1656,27 @@ def probe_mapped_trace_data(
         )
         return trace_detail_to_df(detail)
 
+    def _done(df, used_type, used_params, report):
+        return (df, used_type, used_params, report) if return_report else (df, used_type, used_params)
+
     # 1) intento directo con lo que pidió el usuario
+    direct.requests += 1
     try:
-        df0 = _get_df(prefer, user_params)
-        if not df0.empty:
-            return df0, prefer, user_params
+        df0 = _fetch(prefer, user_params)
     except Exception:
-        pass
-
-    # 2) probing TIME con ventanas hacia atrás (si la preferencia o el modo actual es TIME)
-    if prefer == "TIME":
-        now = datetime.now(timezone.utc)
-        windows = [
-            timedelta(hours=6),
-            timedelta(hours=24),
-            timedelta(days=7),
-            timedelta(days=30),
-            timedelta(days=180),
-            timedelta(days=365),
-            timedelta(days=365 * 3),
-        ]
-        for w in windows:
-            p = dict(user_params)
-            p["to"] = now.strftime("%Y-%m-%dT%H:%M:%SZ")
-            p["from"] = (now - w).strftime("%Y-%m-%dT%H:%M:%SZ")
-            try:
-                df = _get_df("TIME", p)
-                if not df.empty:
-                    return df, "TIME", p
-            except Exception:
-                continue
-
-    # 3) probing DEPTH con rangos crecientes
-    depth_ranges = [(0, 2000), (0, 5000), (0, 10000), (0, 20000), (0, 50000)]
-    for a, b in depth_ranges:
-        p = dict(user_params)
-        p["from"] = a
-        p["to"] = b
-        try:
-            df = _get_df("DEPTH", p)
-            if not df.empty:
-                return df, "DEPTH", p
-        except Exception:
-            continue
-
-    return pd.DataFrame(), prefer, user_params
+        df0 = pd.DataFrame()
+    direct.steps.append(ProbeStep(prefer, "direct", "mapped", dict(user_params), len(df0)))
+    if not df0.empty:
+        direct.outcome = "direct"
+        return _done(df0, prefer, user_params, direct)
 
+    # 2) y 3) extensión + bisección TIME / DEPTH
+    df, used_type, used_params, report = probe_trace_extent(_fetch, prefer, user_params, variants=("mapped",))
+    report.steps = direct.steps + report.steps
+    report.requests += direct.requests
+    return _done(df, used_type, used_params, report)
 
 
-def merge_trace_frames(frames: list[tuple[str, pd.DataFrame]]) -> pd.DataFrame:
-    merged = pd.DataFrame()
-    x_col_name = None
-    x_candidates = {
-        "depth",
-        "md",
-        "measured_depth",
-        "survey_md",
-        "time",
-        "timestamp",
-        "datetime",
-        "date",
-    }
-
-    for label, df in frames:
-        if df.empty:
-            continue
-        df = df.copy()
-        cols = list(df.columns)
-        if not cols:
-            continue
-
-        x_col = None
-        for c in cols:
-            if str(c).strip().lower() in x_candidates:
-                x_col = c
-                break
-        if x_col is None:
-            x_col = cols[0]
-
-        value_cols = [c for c in cols if c != x_col]
-        if not value_cols:
-            df = df.reset_index().rename(columns={"index": "index"})
-            x_col = "index"
-            value_cols = [c for c in df.columns if c != x_col]
-        if not value_cols:
-            continue
-
-        if len(value_cols) == 1:
-            df = df[[x_col, value_cols[0]]].rename(columns={value_cols[0]: label})
-        else:
-            rename_map = {c: f"{label}_{c}" for c in value_cols}
-            df = df[[x_col] + value_cols].rename(columns=rename_map)
-
-        if merged.empty:
-            merged = df
-            x_col_name = x_col
-        else:
-            if x_col_name and x_col != x_col_name:
-                df = df.rename(columns={x_col: x_col_name})
-            merged = pd.merge(merged, df, on=x_col_name, how="outer")
-
-    if x_col_name and x_col_name in merged.columns:
-        merged = merged.sort_values(by=x_col_name, ignore_index=True)
-    return merged
-
 
 def pick_default_column(columns: Iterable[str], candidates: List[str]) -> str | None:
     lowered = {c.lower(): c for c in columns}
@@ -1733,6 +1793,13 @@ I18N: dict[str, dict[str, str]] = {
         "trip_env_exact": "Profundidad exacta (max Hookload por depth)",
         "trip_env_bin": "Bin (rangos de profundidad)",
         "trip_env_help": "Exacta: una fila por cada Bit depth (max Hookload). Bin: agrupar por rangos para baseline y overpull.",
+        "trip_env_resolution": "Resolución del envelope exacto (m, 0 = valor float exacto)",
+        "trip_env_resolution_help": "Con tracking de profundidad ruidoso cada muestra tiene un Bit depth distinto; cuantizar a esta resolución reduce el envelope en órdenes de magnitud.",
+        "trip_env_reducer": "Reductor del envelope",
+        "trip_env_red_max": "Máximo",
+        "trip_env_red_percentile": "Percentil",
+        "trip_env_red_robust_max": "Máximo robusto (sin picos aislados)",
+        "trip_env_q": "Percentil del envelope",
         "trip_range_hdr": "#### Rango de análisis (opcional)",
         "trip_range_cap": "Restringe el análisis a un intervalo de tiempo y/o de profundidad. Si no defines rango, se usa todo el dato cargado.",
         "trip_use_time": "Aplicar rango de tiempo",
@@ -1882,6 +1949,13 @@ I18N: dict[str, dict[str, str]] = {
         "trip_env_exact": "Exact depth (max Hookload per depth)",
         "trip_env_bin": "Bin (depth ranges)",
         "trip_env_help": "Exact: one row per bit depth (max Hookload). Bin: group depth ranges for baseline and overpull.",
+        "trip_env_resolution": "Exact envelope resolution (m, 0 = exact float value)",
+        "trip_env_resolution_help": "With noisy depth tracking every sample has a different bit depth; quantizing to this resolution shrinks the envelope by orders of magnitude.",
+        "trip_env_reducer": "Envelope reducer",
+        "trip_env_red_max": "Max",
+        "trip_env_red_percentile": "Percentile",
+        "trip_env_red_robust_max": "Robust max (ignores isolated spikes)",
+        "trip_env_q": "Envelope percentile",
         "trip_range_hdr": "#### Analysis range (optional)",
         "trip_range_cap": "Restrict analysis to a time and/or depth interval. If empty, the full loaded dataset is used.",
         "trip_use_time": "Apply time range",
@@ -2031,6 +2105,13 @@ I18N: dict[str, dict[str, str]] = {
         "trip_env_exact": "Точная глубина (max Hookload на глубину)",
         "trip_env_bin": "Бин (диапазоны глубины)",
         "trip_env_help": "Точная: строка на глубину долота (max Hookload). Бин: группировка для базы и overpull.",
+        "trip_env_resolution": "Разрешение точной огибающей (м, 0 = точное значение)",
+        "trip_env_resolution_help": "При шумном трекинге глубины каждая выборка имеет свою глубину; квантование до этого шага уменьшает огибающую на порядки.",
+        "trip_env_reducer": "Редуктор огибающей",
+        "trip_env_red_max": "Максимум",
+        "trip_env_red_percentile": "Перцентиль",
+        "trip_env_red_robust_max": "Робастный максимум (без одиночных пиков)",
+        "trip_env_q": "Перцентиль огибающей",
         "trip_range_hdr": "#### Диапазон анализа (опционально)",
         "trip_range_cap": "Ограничьте анализ интервалом времени и/или глубины. Иначе — весь загруженный набор.",
         "trip_use_time": "Задать интервал времени",
@@ -3380,6 +3461,20 @@ def kpi_depth_optimal_zone_chips(
     return items
 
 
+def plot_zoom_window(key: str, lo: float, hi: float, label: str) -> tuple[float, float] | None:
+    """
+    Slider de ventana para gráficas reducidas: al acotar el rango se vuelve a reducir solo esa
+    ventana (más detalle con el mismo presupuesto de puntos). None = rango completo.
+    """
+    if not (np.isfinite(lo) and np.isfinite(hi)) or hi <= lo:
+        return None
+    lo, hi = float(lo), float(hi)
+    sel = st.slider(label, min_value=lo, max_value=hi, value=(lo, hi), key=key)
+    if sel[0] <= lo and sel[1] >= hi:
+        return None
+    return float(sel[0]), float(sel[1])
+
+
 def build_kpi_depth_curves_figure(
     df: pd.DataFrame,
     depth_col: str | None,
@@ -3388,12 +3483,15 @@ def build_kpi_depth_curves_figure(
     rpm_col: str,
     title: str = "Curvas suavizadas de ROP, WOB y RPM",
     zone_stats: dict | None = None,
+    max_points: int = PLOT_MAX_POINTS,
+    x_range: tuple[float, float] | None = None,
 ) -> tuple[go.Figure | None, list[tuple[str, str]]]:
     """
     Series en **unidades reales** vs profundidad (o índice): ROP (eje Y izq.), WOB y RPM (ejes Y derecha).
 
     Si ``zone_stats`` tiene la celda óptima, se sombrean **franjas verticales** donde WOB y RPM
     caen dentro de esos rangos (tramos contiguos en X).
+    Cada curva se dibuja con máx. ``max_points`` (LTTB); ``x_range`` limita a una ventana con más detalle.
     """
     need = [rop_col, wob_col, rpm_col]
     if not all(c in df.columns for c in need):
@@ -3430,6 +3528,8 @@ def build_kpi_depth_curves_figure(
         chips = kpi_depth_optimal_zone_chips(xv, y_r, in_zone, x_title, zone_stats, len(segments))
 
     fig = go.Figure()
+    if x_range is not None:
+        segments = [(a, b) for a, b in segments if b >= x_range[0] and a <= x_range[1]]
     for x0, x1 in segments:
         span = max(x1 - x0, 1e-9)
         pad = min(span * 0.008, (float(np.nanmax(xv)) - float(np.nanmin(xv))) * 0.002 + 1e-9)
@@ -3440,30 +3540,33 @@ def build_kpi_depth_curves_figure(
             line=dict(color="rgba(251,146,60,0.65)", width=1.2),
             layer="below",
         )
+    i_rop = downsample_indices(xv, y_r, max_points, "lttb", x_range=x_range)
     fig.add_trace(
         go.Scatter(
-            x=xv,
-            y=y_r,
+            x=xv[i_rop],
+            y=y_r[i_rop],
             name="ROP",
             mode="lines",
             line=dict(color="#f97316", width=2.4),
             yaxis="y",
         )
     )
+    i_wob = downsample_indices(xv, y_w, max_points, "lttb", x_range=x_range)
     fig.add_trace(
         go.Scatter(
-            x=xv,
-            y=y_w,
+            x=xv[i_wob],
+            y=y_w[i_wob],
             name="WOB",
             mode="lines",
             line=dict(color="#2dd4bf", width=2),
             yaxis="y2",
         )
     )
+    i_rpm = downsample_indices(xv, y_m, max_points, "lttb", x_range=x_range)
     fig.add_trace(
         go.Scatter(
-            x=xv,
-            y=y_m,
+            x=xv[i_rpm],
+            y=y_m[i_rpm],
             name="RPM",
             mode="lines",
             line=dict(color="#64748b", width=2),
@@ -4366,11 +4469,12 @@ def compute_effective_time_hours(df_run: pd.DataFrame) -> float:
     return float(df_time.loc[effective_mask, "Duration_h"].sum())
 
 
-def build_control_chart(df_run: pd.DataFrame, col: str, run_name: str):
+def build_control_chart(df_run: pd.DataFrame, col: str, run_name: str, max_points: int = PLOT_MAX_POINTS):
     """
     Carta de control vs profundidad: puntos ordenados por MD, relleno degradado frío→cálido bajo la curva,
     tendencia lineal (mínimos cuadrados vs MD), línea principal clara, media ±3σ, outliers en naranja.
     Para ROP/WOB/RPM el eje Y empieza en 0 (magnitudes físicas ≥ 0).
+    Estadísticos sobre todos los puntos; se dibujan como máx. ``max_points`` (LTTB + todos los outliers).
     """
     from plotly.colors import sample_colorscale
 
@@ -4400,24 +4504,21 @@ def build_control_chart(df_run: pd.DataFrame, col: str, run_name: str):
     if cmax <= cmin:
         cmax = cmin + 1e-9
 
-    sizes = [10 if bool(o) else 7 for o in out_mask]
-    symbols = ["diamond" if bool(o) else "circle" for o in out_mask]
-    customdata_rows = ["Fuera de ±3σ" if bool(o) else "Dentro de límites" for o in out_mask]
-    marker_colors: list[str] = []
-    for yi, o in zip(y, out_mask):
-        if o:
-            marker_colors.append("#F97316")
-        else:
-            t = float(np.clip((yi - cmin) / (cmax - cmin), 0.0, 1.0))
-            marker_colors.append(sample_colorscale(COLORSCALE_COLD_WARM, [t])[0])
+    idx = downsample_indices(x, y, max_points, "lttb", keep=out_mask)
+    x_plot, y_plot, out_plot = x[idx], y[idx], out_mask[idx]
+    sizes = np.where(out_plot, 10, 7)
+    symbols = np.where(out_plot, "diamond", "circle")
+    customdata_rows = np.where(out_plot, "Fuera de ±3σ", "Dentro de límites")
+    t_color = np.clip((y_plot - cmin) / (cmax - cmin), 0.0, 1.0)
+    marker_colors = np.where(out_plot, "#F97316", np.asarray(sample_colorscale(COLORSCALE_COLD_WARM, t_color.tolist()), dtype=object))
 
     fig = go.Figure()
     _add_cold_warm_trapezoid_fill(
         fig,
-        x,
-        y,
+        x_plot,
+        y_plot,
         y0=0.0,
-        color_values=y,
+        color_values=y_plot,
         cmin=cmin,
         cmax=cmax,
         fill_alpha=0.34,
@@ -4446,8 +4547,8 @@ def build_control_chart(df_run: pd.DataFrame, col: str, run_name: str):
 
     fig.add_trace(
         go.Scatter(
-            x=x,
-            y=y,
+            x=x_plot,
+            y=y_plot,
             mode="lines+markers",
             name=col,
             line=dict(color="rgba(255, 255, 255, 0.58)", width=2.2),
@@ -4597,10 +4698,11 @@ def build_depth_heatmap(df_run: pd.DataFrame, run_name: str):
     return fig
 
 
-def build_cumulative_meters(df_run: pd.DataFrame, run_name: str):
+def build_cumulative_meters(df_run: pd.DataFrame, run_name: str, max_points: int = PLOT_MAX_POINTS):
     """
     Metros acumulados vs tiempo: relleno degradado frío→cálido según metros acumulados,
     tendencia lineal en el tiempo (ms), línea clara y barra de color.
+    La curva se dibuja con máx. ``max_points`` puntos (LTTB).
     """
     if "End" not in df_run.columns:
         return None
@@ -4661,16 +4763,17 @@ def build_cumulative_meters(df_run: pd.DataFrame, run_name: str):
     except (np.linalg.LinAlgError, ValueError):
         pass
 
+    idx = downsample_indices(x_ms, y, max_points, "lttb")
     fig.add_trace(
         go.Scatter(
-            x=x_ms,
-            y=y,
+            x=x_ms[idx],
+            y=y[idx],
             mode="lines+markers",
             name="Metros acumulados",
             line=dict(width=2.5, color="rgba(255, 255, 255, 0.58)"),
             marker=dict(
                 size=5,
-                color=y,
+                color=y[idx],
                 colorscale=COLORSCALE_COLD_WARM,
                 cmin=cmin,
                 cmax=cmax,
@@ -5061,7 +5164,16 @@ def analyze_bha_resonance(
     torque_col: str | None = None,
     max_modes: int = 8,
     tolerance_hz: float | None = None,
+    freq_hist: StreamingHistogram | None = None,
 ):
+    """
+    Detecta modos naturales (picos del histograma de frecuencia de rotación), bandas
+    resonantes y ventanas seguras de RPM.
+
+    Con ``freq_hist`` (persistente entre reruns, p. ej. en modo en vivo) el histograma
+    se mantiene de forma incremental: solo se suman las muestras posteriores a la
+    última marca de tiempo ya ingerida (columna de tiempo o índice de fechas).
+    """
     df = df.copy()
     cols_to_num = [wob_col, rpm_col]
     if torque_col:
@@ -5076,7 +5188,17 @@ def analyze_bha_resonance(
 
     df["Freq_Hz"] = df[rpm_col] / 60.0
 
-    hist, bin_edges = np.histogram(df["Freq_Hz"], bins=200)
+    if freq_hist is not None:
+        t_col = pick_x_col(df, "TIME")
+        t_src = df[t_col] if t_col else (df.index.to_series() if isinstance(df.index, pd.DatetimeIndex) else None)
+        times = None
+        if t_src is not None:
+            ts = pd.to_datetime(t_src, errors="coerce", utc=True)
+            times = ((ts - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+        freq_hist.sync(df["Freq_Hz"].to_numpy(dtype=float), times)
+        hist, bin_edges = freq_hist.histogram(bins=200)
+    else:
+        hist, bin_edges = np.histogram(df["Freq_Hz"], bins=200)
     bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
     peak_height = max(5, np.percentile(hist, 90))
     peaks, props = find_peaks(hist, height=peak_height)
@@ -5101,17 +5223,7 @@ def analyze_bha_resonance(
 
     resonant_bands = [((f - tolerance) * 60, (f + tolerance) * 60) for f in natural_modes]
 
-    def proximity_to_resonance(rpm: float) -> float:
-        if not resonant_bands:
-            return 1.0
-        distances = []
-        for band_min, band_max in resonant_bands:
-            if band_min <= rpm <= band_max:
-                return 0.0
-            distances.append(min(abs(rpm - band_min), abs(rpm - band_max)))
-        return min(distances)
-
-    df["Proximity"] = df[rpm_col].apply(proximity_to_resonance)
+    df["Proximity"] = band_proximity(df[rpm_col].to_numpy(dtype=float), resonant_bands)
     max_distance = max(df["Proximity"].max(), 1e-6)
     df["Proximity_norm"] = df["Proximity"] / max_distance
 
@@ -5383,6 +5495,45 @@ def build_wob_rpm_binned_heatmap(
     return prettify(fig, h=520)
 
 
+def streamlit_session_id() -> str:
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return getattr(ctx, "session_id", None) or "local"
+
+
+@st.fragment(run_every=2)
+def render_refresh_status(job_key: str, trigger_key: str | None = None) -> None:
+    """
+    Estado del próximo refresco (se re-ejecuta solo este fragmento cada 2 s, sin
+    bloquear el script). Cuando el trabajo en segundo plano termina, lanza un rerun
+    completo de la app una sola vez por resultado.
+    """
+    status = get_refresh_scheduler().status(streamlit_session_id(), job_key)
+    seen_key = f"_refresh_seen_{job_key}"
+    if status["ready"] and st.session_state.get(seen_key) != status["ready_at"]:
+        st.session_state[seen_key] = status["ready_at"]
+        if trigger_key:
+            st.session_state[trigger_key] = True
+        st.rerun(scope="app")
+    stale = status["staleness_s"]
+    st.caption(
+        f"🔄 Próxima actualización en **{status['due_in_s']}** s · en cola: {status['queue_depth']}"
+        + (f" · datos de hace {stale} s" if stale is not None else "")
+        + " (desmarca «Actualizar automáticamente» para detener)"
+    )
+
+
+def schedule_auto_refresh(
+    job_key: str,
+    interval_s: int,
+    config_key: str | None = None,
+    job=None,
+    trigger_key: str | None = None,
+) -> None:
+    """Programa el siguiente refresco en segundo plano (sin time.sleep) y muestra su estado."""
+    get_refresh_scheduler().schedule(streamlit_session_id(), job_key, interval_s, job, config_key)
+    render_refresh_status(job_key, trigger_key)
+
+
 def render_bha_module() -> None:
     st.subheader(tr("bha_subheader"))
     st.caption(tr("bha_caption"))
@@ -5610,6 +5761,38 @@ def render_bha_module() -> None:
                     "Para más datos usa **Página = 0** y sube **Páginas a cargar** a 2 o 3."
                 )
 
+        with st.expander("Alineación de trazas", expanded=False):
+            align_labels = {
+                "exact": "Exacta (misma marca de tiempo/profundidad)",
+                "nearest": "Más cercana dentro de tolerancia",
+                "grid": "Remuestrear a rejilla regular",
+            }
+            bha_align_mode = st.selectbox(
+                "Modo de alineación",
+                options=list(align_labels),
+                format_func=lambda m: align_labels[m],
+                key="bha_align_mode",
+                help="Cómo se unen trazas cuyas muestras no caen exactamente en la misma coordenada. "
+                "«Más cercana» usa el eje de la primera traza.",
+            )
+            align_unit = "s" if trace_type.upper() == "TIME" else "m"
+            bha_align_tolerance = st.number_input(
+                f"Tolerancia ({align_unit})",
+                min_value=0.0,
+                value=float(st.session_state.get("bha_align_tolerance", 5.0)),
+                step=1.0,
+                key="bha_align_tolerance",
+                disabled=bha_align_mode != "nearest",
+            )
+            bha_align_step = st.number_input(
+                f"Paso de rejilla ({align_unit})",
+                min_value=0.01,
+                value=float(st.session_state.get("bha_align_step", 10.0)),
+                step=1.0,
+                key="bha_align_step",
+                disabled=bha_align_mode != "grid",
+            )
+
         with st.expander("Params adicionales (avanzado)", expanded=False):
             extra_params_raw = st.text_input(
                 "Query string extra (opcional)",
@@ -5634,6 +5817,13 @@ def render_bha_module() -> None:
             )
             if use_custom_range:
                 trip_auto_probe_data = False  # FIX: never auto-probe when user specified from/to
+            bha_use_trace_store = st.checkbox(
+                "Caché local de trazas en disco",
+                value=st.session_state.get("bha_use_trace_store", True),
+                key="bha_use_trace_store",
+                help="Con rango Desde/Hasta, guarda las series en disco (Parquet) y solo pide a la API los tramos "
+                "que faltan. Se carga el rango completo (todas sus páginas), no solo «Páginas a cargar».",
+            )
 
         # Construcción única de params: rango + paginación + adicionales (sin duplicar)
         def build_trace_params(page_override: int | None = None) -> dict:
@@ -5916,6 +6106,12 @@ def render_bha_module() -> None:
                 key="bha_auto_refresh_interval",
                 help="Cada cuántos segundos se vuelve a ejecutar (10–300 s).",
             )
+            st.checkbox(
+                "Modo en vivo: pedir solo muestras nuevas",
+                value=st.session_state.get("bha_live_tail", True),
+                key="bha_live_tail",
+                help="Recuerda la última muestra de cada traza y en cada refresco pide solo desde ahí (from=última muestra).",
+            )
 
         with st.expander("Debug API de trazas", expanded=False):
             st.write("Prueba un GET y revisa URL, status y respuesta.")
@@ -5970,10 +6166,152 @@ def render_bha_module() -> None:
                     except Exception as e:
                         st.error(f"No pude probar la traza: {e}")
 
+            http_summary = get_solo_client().metrics_summary(streamlit_session_id())
+            st.caption(
+                f"HTTP SOLO: {http_summary['calls']} llamadas · {http_summary['retries']} reintentos · "
+                f"{http_summary['errors']} errores · {http_summary['bytes'] / 1e6:.1f} MB · "
+                f"media {http_summary['avg_ms']} ms · máx {http_summary['max_ms']} ms"
+            )
+            memo_stats = solo_endpoint_memo().stats()
+            st.caption(
+                f"Endpoints recordados: {memo_stats['entries']} · aciertos {memo_stats['hits']} / "
+                f"fallos {memo_stats['misses']} · round-trips ahorrados {memo_stats['saved_round_trips']}"
+            )
+            store_stats = solo_trace_store().stats()
+            st.caption(
+                f"Caché de trazas en disco: {store_stats['size_mb']} / {store_stats['max_mb']} MB · "
+                f"filas desde disco {store_stats['rows_from_disk']} · desde API {store_stats['rows_from_api']} "
+                f"({store_stats['gap_fetches']} huecos) · particiones expulsadas {store_stats['evicted_files']}"
+                if store_stats["enabled"]
+                else "Caché de trazas en disco deshabilitada (instala pyarrow)."
+            )
+            http_calls = get_solo_client().metrics(streamlit_session_id())
+            if http_calls:
+                st.dataframe(pd.DataFrame(http_calls[-50:]), use_container_width=True, hide_index=True)
+
         frames: list[tuple[str, pd.DataFrame]] = []
         used_params_rows: list[dict] = []
         page_indices = list(range(num_pages_to_load)) if num_pages_to_load > 1 else [int(page_number)]
 
+        # Modo en vivo: buffers por traza; las que ya tienen histórico solo piden la cola.
+        live_tail_on = bool(
+            (bha_auto_refresh or st.session_state.get("roadmap_auto_refresh"))
+            and st.session_state.get("bha_live_tail", True)
+        )
+        bha_live_config = json.dumps(
+            [well_uuid, trace_source, str(trace_type).upper(), sorted(map(str, selected_trace_uuids)), build_trace_params(page_override=0)],
+            default=str,
+        )
+        bha_buffers = live_buffers(st.session_state, "bha_live_buffers", bha_live_config) if live_tail_on else {}
+        tail_uuids = {u for u, buf in bha_buffers.items() if buf.ready}
+
+        bha_store_on = bool(
+            bha_use_trace_store
+            and solo_trace_store().available
+            and range_bounds(build_trace_params(page_override=0), trace_type) is not None
+        )
+
+        def _fetch_bha_page(trace_uuid: str, page_idx: int, tail: bool = False) -> pd.DataFrame:
+            user_params = build_trace_params(page_override=page_idx)
+            if tail:
+                return _fetch_bha_params(trace_uuid, bha_buffers[str(trace_uuid)].tail_params(user_params))
+            if bha_store_on:
+                # El almacén devuelve el rango entero en la página 0; las demás quedan vacías.
+                if page_idx != page_indices[0]:
+                    return pd.DataFrame()
+                return read_trace_range_through_store(
+                    well_uuid,
+                    trace_store_key(str(trace_uuid), trace_source, force_data_endpoint, mapped_trace_path, trace_detail_path, parse_params_input(extra_params_raw)),
+                    trace_type,
+                    user_params,
+                    lambda p: _fetch_bha_params(trace_uuid, p),
+                    max_pages=BHA_STORE_MAX_PAGES,
+                )
+            return _fetch_bha_params(trace_uuid, user_params)
+
+        def _fetch_bha_params(trace_uuid: str, user_params: dict) -> pd.DataFrame:
+            detail = None
+            if trace_source in ("mapped",):
+                detail = api_get_mapped_trace(
+                    base_url,
+                    token,
+                    mapped_scope_uuid,
+                    str(trace_uuid),
+                    trace_type,
+                    mapped_scope_kind,
+                    mapped_trace_path or None,
+                    user_params or None,
+                    force_data_endpoint,
+                    well_uuid,
+                )
+            elif trace_source == "catalog":
+                return fetch_well_trace_strict(base_url, token, well_uuid, str(trace_uuid), trace_type, user_params)
+            else:
+                detail = api_get_drilling_trace(
+                    base_url,
+                    token,
+                    str(trace_uuid),
+                    trace_detail_path or None,
+                    params=user_params or None,
+                )
+            return trace_detail_to_df(detail)
+
+        # (traza, página) en paralelo; cada traza se corta en su primera página vacía.
+        bha_fetch_ids = [str(u) for u in selected_trace_uuids if trace_map_by_uuid.get(str(u))]
+        fetched_pages = fetch_trace_pages(
+            _fetch_bha_page,
+            [u for u in bha_fetch_ids if u not in tail_uuids],
+            page_indices,
+            base_url=base_url,
+            initializer=st_thread_initializer(),
+        )
+        bha_thread_init = st_thread_initializer()
+
+        def _fetch_bha_tail(trace_uuids: list[str]) -> dict:
+            return fetch_trace_pages(
+                lambda u, p: _fetch_bha_page(u, p, tail=True),
+                trace_uuids,
+                list(range(len(page_indices))),
+                base_url=base_url,
+                initializer=bha_thread_init,
+            )
+
+        def bha_tail_snapshot() -> dict[str, list[dict]]:
+            """Params de cola por traza/página, calculados en el hilo del script."""
+            return {
+                u: [buf.tail_params(build_trace_params(page_override=p)) for p in range(len(page_indices))]
+                for u, buf in bha_buffers.items()
+                if buf.ready
+            }
+
+        def make_bha_prefetch_job(snapshot: dict[str, list[dict]]):
+            # Se ejecuta en el programador de refrescos, antes del siguiente rerun; solo lee
+            # la instantánea (session_state y los buffers no son seguros entre hilos).
+            def job() -> dict:
+                return fetch_trace_pages(
+                    lambda u, p: _fetch_bha_params(u, dict(snapshot[u][p])),
+                    list(snapshot),
+                    list(range(len(page_indices))),
+                    base_url=base_url,
+                    initializer=bha_thread_init,
+                )
+
+            return job
+
+        if tail_uuids:
+            # Si el programador ya descargó la cola, se usa; si no, se descarga ahora.
+            prefetched = get_refresh_scheduler().take(streamlit_session_id(), "bha", bha_live_config)
+            if (
+                prefetched is not None
+                and prefetched.error is None
+                and isinstance(prefetched.value, dict)
+                and tail_uuids.issubset(prefetched.value)
+            ):
+                fetched_pages.update({u: prefetched.value[u] for u in tail_uuids})
+            else:
+                fetched_pages.update(_fetch_bha_tail([u for u in bha_fetch_ids if u in tail_uuids]))
+        get_refresh_scheduler().mark_fresh(streamlit_session_id(), "bha")
+
         for trace_uuid in selected_trace_uuids:
             trace_entry = trace_map_by_uuid.get(str(trace_uuid))
             if not trace_entry:
@@ -5982,69 +6320,17 @@ def render_bha_module() -> None:
             try:
                 used_type = str(trace_type).upper()
                 used_probe = False
-                list_df_pages: list[pd.DataFrame] = []
-
-                for page_idx in page_indices:
-                    user_params = build_trace_params(page_override=page_idx)
-                    detail = None
-                    if trace_source in ("mapped",):
-                        detail = api_get_mapped_trace(
-                            base_url,
-                            token,
-                            mapped_scope_uuid,
-                            str(trace_uuid),
-                            trace_type,
-                            mapped_scope_kind,
-                            mapped_trace_path or None,
-                            user_params or None,
-                            force_data_endpoint,
-                            well_uuid,
-                        )
-                    elif trace_source == "catalog":
-                        try:
-                            detail = api_get_well_trace_data(
-                                base_url=base_url,
-                                token=token,
-                                well_uuid=well_uuid,
-                                trace_uuid=str(trace_uuid),
-                                trace_type=trace_type,
-                                params=user_params or None,
-                                calculated=False,
-                            )
-                            df_tmp = trace_detail_to_df(detail)
-                        except Exception:
-                            df_tmp = pd.DataFrame()
-                            detail = None
-                        if df_tmp is None or df_tmp.empty:
-                            detail = api_get_well_trace_data(
-                                base_url=base_url,
-                                token=token,
-                                well_uuid=well_uuid,
-                                trace_uuid=str(trace_uuid),
-                                trace_type=trace_type,
-                                params=user_params or None,
-                                calculated=True,
-                            )
-                    else:
-                        detail = api_get_drilling_trace(
-                            base_url,
-                            token,
-                            str(trace_uuid),
-                            trace_detail_path or None,
-                            params=user_params or None,
-                        )
-
-                    df_page = trace_detail_to_df(detail)
-                    if df_page.empty:
-                        break
-                    list_df_pages.append(df_page)
+                probe_report = None
+                fetched = fetched_pages[str(trace_uuid)]
+                if fetched.error is not None:
+                    raise fetched.error
 
                 used_params = dict(build_trace_params(page_override=page_indices[0]))
                 if num_pages_to_load > 1:
-                    used_params["_pages_loaded"] = str(len(list_df_pages))
-                df_trace = pd.concat(list_df_pages, ignore_index=True) if list_df_pages else pd.DataFrame()
+                    used_params["_pages_loaded"] = str(fetched.pages_loaded)
+                df_trace = concat_pages(fetched)
 
-                if not df_trace.empty and len(list_df_pages) > 1:
+                if not df_trace.empty and fetched.pages_loaded > 1:
                     x_candidates = {"time", "timestamp", "datetime", "date", "depth", "md", "measured_depth", "survey_md", "index"}
                     for c in df_trace.columns:
                         if str(c).strip().lower() in x_candidates:
@@ -6052,14 +6338,16 @@ def render_bha_module() -> None:
                             break
 
                 user_has_explicit_range = bool(used_params.get("from") and used_params.get("to"))
-                if df_trace.empty and trace_source in ("mapped", "catalog") and trip_auto_probe_data and not user_has_explicit_range:
-                    df_probe, used_type, used_params = probe_well_trace_data(
+                is_tail = str(trace_uuid) in tail_uuids
+                if df_trace.empty and trace_source in ("mapped", "catalog") and trip_auto_probe_data and not user_has_explicit_range and not is_tail:
+                    df_probe, used_type, used_params, probe_report = probe_well_trace_data(
                         base_url=base_url,
                         token=token,
                         well_uuid=well_uuid,
                         trace_uuid=str(trace_uuid),
                         prefer_type=trace_type,
                         user_params=used_params,
+                        return_report=True,
                     )
                     if not df_probe.empty:
                         st.info(
@@ -6068,6 +6356,17 @@ def render_bha_module() -> None:
                         df_trace = df_probe
                         used_probe = True
 
+                if live_tail_on and used_probe:
+                    # Rango detectado por probe: no hay cola fiable, se recarga completo.
+                    bha_buffers.pop(str(trace_uuid), None)
+                elif live_tail_on:
+                    buf = bha_buffers.setdefault(str(trace_uuid), TailBuffer(domain=str(trace_type).upper()))
+                    new_rows = buf.ingest(df_trace, full=not is_tail)
+                    if is_tail:
+                        used_params = buf.tail_params(used_params)
+                        used_params["_live_new_rows"] = str(len(new_rows))
+                    df_trace = buf.frame
+
             except Exception as e:
                 msg = str(e)
                 if trace_source == "mapped" and "missing required request parameters" in msg:
@@ -6089,11 +6388,21 @@ def render_bha_module() -> None:
                     "Tipo usado": used_type,
                     "Params usados": json.dumps(used_params, ensure_ascii=False) if used_params else "",
                     "Auto-probe": "Sí" if used_probe else "No",
+                    "Peticiones probe": probe_report.requests if probe_report else 0,
                 }
             )
             frames.append((label, df_trace))
 
-        bha_df = merge_trace_frames(frames)
+        try:
+            bha_df = merge_trace_frames(
+                frames,
+                mode=bha_align_mode,
+                tolerance=float(bha_align_tolerance),
+                step=float(bha_align_step),
+            )
+        except ValueError as e:
+            st.error(str(e))
+            return
         if bha_df.empty:
             st.error("No pude construir un DataFrame con las trazas seleccionadas.")
             return
@@ -6104,6 +6413,15 @@ def render_bha_module() -> None:
             else:
                 st.info("No hay params efectivos para mostrar.")
             st.caption("Nota: el campo 'index' en la tabla proviene del timestamp real de cada muestra.")
+            if live_tail_on and bha_buffers:
+                st.caption("Modo en vivo (buffers por traza):")
+                st.dataframe(
+                    pd.DataFrame(
+                        [{"Traza": trace_map_by_uuid.get(u, {}).get("label", u), **buf.stats()} for u, buf in bha_buffers.items()]
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                )
 
         cols = list(bha_df.columns)
         time_col_default = pick_default_column(
@@ -6406,8 +6724,21 @@ def render_bha_module() -> None:
             )
 
     if (bha_rpm_col is not None and bha_wob_col is not None):
+        freq_hist = None
+        if data_source == "API" and live_tail_on:
+            # Modo en vivo: el histograma de modos se actualiza solo con las muestras nuevas.
+            hist_cache = st.session_state.setdefault("bha_freq_hist", {})
+            if hist_cache.get("rpm_col") != bha_rpm_col:
+                hist_cache.clear()
+                hist_cache.update({"rpm_col": bha_rpm_col, "hist": StreamingHistogram()})
+            freq_hist = hist_cache["hist"]
         analysis = analyze_bha_resonance(
-            bha_df, bha_wob_col, bha_rpm_col, torque_col=bha_torque_col, tolerance_hz=tolerance_hz_param
+            bha_df,
+            bha_wob_col,
+            bha_rpm_col,
+            torque_col=bha_torque_col,
+            tolerance_hz=tolerance_hz_param,
+            freq_hist=freq_hist,
         )
     else:
         st.warning("RPM o WOB no están configuradas. Se mostrará solo previsualización (sin resonancia).")
@@ -6678,15 +7009,21 @@ def render_bha_module() -> None:
     else:
         st.info("⚠️ No se detectaron ventanas seguras fuera de las bandas resonantes.")
 
-    if data_source == "API" and bha_df is not None and st.session_state.get("bha_auto_refresh"):
-        interval = int(st.session_state.get("bha_auto_refresh_interval", 30))
-        interval = max(10, min(300, interval))
-        countdown_placeholder = st.empty()
-        for i in range(interval, 0, -1):
-            countdown_placeholder.info(f"🔄 Próxima actualización en **{i}** s… (desmarca «Actualizar automáticamente» para detener)")
-            time.sleep(1)
-        countdown_placeholder.empty()
-        st.rerun()
+    bha_refresh_on = st.session_state.get("bha_auto_refresh") or st.session_state.get("roadmap_auto_refresh")
+    if data_source == "API" and bha_df is not None and bha_refresh_on:
+        intervals = [
+            int(st.session_state.get(f"{k}_auto_refresh_interval", 30))
+            for k in ("bha", "roadmap")
+            if st.session_state.get(f"{k}_auto_refresh")
+        ]
+        schedule_auto_refresh(
+            "bha",
+            max(10, min(300, min(intervals))),
+            config_key=bha_live_config,
+            job=make_bha_prefetch_job(bha_tail_snapshot()) if live_tail_on else None,
+        )
+    elif data_source == "API":
+        get_refresh_scheduler().cancel(streamlit_session_id(), "bha")
 
 
 def render_roadmap() -> None:
@@ -6898,14 +7235,16 @@ def render_roadmap() -> None:
         )
 
     if st.session_state.get("roadmap_auto_refresh"):
-        interval = int(st.session_state.get("roadmap_auto_refresh_interval", 30))
-        interval = max(10, min(300, interval))
-        countdown_placeholder = st.empty()
-        for i in range(interval, 0, -1):
-            countdown_placeholder.info(f"🔄 Próxima actualización en **{i}** s… (desmarca «Actualizar automáticamente» para detener)")
-            time.sleep(1)
-        countdown_placeholder.empty()
-        st.rerun()
+        # Con BHA por API el refresco lo programa render_bha_module (descarga la cola por
+        # adelantado); aquí solo se muestra su estado. Si no, basta un temporizador.
+        bha_status = get_refresh_scheduler().status(streamlit_session_id(), "bha")
+        if bha_status["queue_depth"] or bha_status["ready"]:
+            render_refresh_status("bha")
+        else:
+            interval = int(st.session_state.get("roadmap_auto_refresh_interval", 30))
+            schedule_auto_refresh("roadmap", max(10, min(300, interval)))
+    else:
+        get_refresh_scheduler().cancel(streamlit_session_id(), "roadmap")
 
 
 def export_engineering_pptx(analysis, cols) -> tuple[str, Path]:
@@ -7224,17 +7563,17 @@ def _trip_prepare_limits_for_continuous_line(
 # ===============================
 # Broomstick: modelo por familia de FF (PU/SO/ROT) + interpolación
 # ===============================
-_TRIP_FF_FAMILY_RE = re.compile(r"^(PU|SO|ROT)[_ ]?([0-9]*\.?[0-9]+)$", re.IGNORECASE)
+_TRIP_FF_FAMILY_RE = re.compile(r"^(PU|SO|ROT|TQ)[_ ]?([0-9]*\.?[0-9]+)$", re.IGNORECASE)
 
 def parse_ff_family_csv(raw: pd.DataFrame) -> tuple[pd.DataFrame | None, dict, str]:
     """Parsea un CSV con familia de curvas por FF.
 
     Formato esperado (mínimo):
-      Depth, PU_0.10, PU_0.20, ..., SO_0.10, SO_0.20, ... (y opcional ROT_xx)
+      Depth, PU_0.10, PU_0.20, ..., SO_0.10, SO_0.20, ... (y opcional ROT_xx, TQ_xx)
 
     Devuelve:
       - df_model con columna 'Depth' y columnas numéricas por curva
-      - fam_map: {'PU': {0.1:'PU_0.10', ...}, 'SO': {...}, 'ROT': {...}}
+      - fam_map: {'PU': {0.1:'PU_0.10', ...}, 'SO': {...}, 'ROT': {...}, 'TQ': {...}}
       - error_msg ("" si ok)
     """
     raw = raw.copy()
@@ -7260,7 +7599,7 @@ def parse_ff_family_csv(raw: pd.DataFrame) -> tuple[pd.DataFrame | None, dict, s
     df["Depth"] = pd.to_numeric(df["Depth"], errors="coerce")
     df = df.dropna(subset=["Depth"]).sort_values("Depth").reset_index(drop=True)
 
-    fam = {"PU": {}, "SO": {}, "ROT": {}}
+    fam = {"PU": {}, "SO": {}, "ROT": {}, "TQ": {}}
     for c in df.columns:
         if c == "Depth":
             continue
@@ -7284,10 +7623,6 @@ def parse_ff_family_csv(raw: pd.DataFrame) -> tuple[pd.DataFrame | None, dict, s
         return None, {}, "No se detectaron columnas tipo PU_0.10 / SO_0.10 / ROT_0.10."
     return df, fam, ""
 
-# Conversión kg → klb para que el modelo simplificado use la misma escala que datos típicos de Hookload (klb)
-KG_TO_KLB = 0.00220462
-
-
 def generate_broomstick_curves_simplified(
     md_min_m: float,
     md_max_m: float,
@@ -7301,103 +7636,33 @@ def generate_broomstick_curves_simplified(
     inclination_surface_deg: float | None = None,
     inclination_td_deg: float | None = None,
     survey_df: pd.DataFrame | None = None,
+    model: str = "simplified",
+    pipe_od_in: float = 0.0,
 ) -> tuple[pd.DataFrame, dict]:
     """
     Genera familia de curvas Hookload vs Depth (PU, SO, ROT) para varios FF.
     Si survey_df tiene columnas 'Depth' e 'Inclination', se usa inclinación del survey (curvas reales).
     Si no, inclination_surface/td distintos dan perfil lineal; si no, inclinación constante.
     block_weight_klb desplaza todas las curvas.
+    model="soft_string" añade la contribución de la pata de perro (y TQ si pipe_od_in > 0).
+    Cálculo vectorizado y cacheado en broomstick.py.
     """
-    import math
-    if step_m <= 0 or md_max_m <= md_min_m or not ff_values:
-        return pd.DataFrame(), {}
-    depths = np.arange(md_min_m, md_max_m + step_m * 0.5, step_m)
-    depths = np.round(depths, 2)
-    w_eff = float(weight_per_m_kg) * float(buoyancy_factor)
-    scale = KG_TO_KLB if output_klb else 1.0
-    block_klb = float(block_weight_klb or 0.0)
-
-    use_survey = (
-        survey_df is not None
-        and not survey_df.empty
-        and "Depth" in survey_df.columns
-        and "Inclination" in survey_df.columns
-    )
-    if use_survey:
-        survey_df = survey_df.dropna(subset=["Depth", "Inclination"]).sort_values("Depth")
-        use_survey = len(survey_df) >= 2
-    if use_survey:
-        survey_depth = survey_df["Depth"].values.astype(float)
-        survey_inc = survey_df["Inclination"].values.astype(float)
-    else:
-        survey_depth = survey_inc = None
-
-    use_linear_inc = (
-        not use_survey
-        and inclination_surface_deg is not None
-        and inclination_td_deg is not None
-        and (abs(inclination_surface_deg - inclination_td_deg) > 0.01)
-    )
-    depth_span = float(md_max_m - md_min_m) if md_max_m != md_min_m else 1.0
-
-    out = pd.DataFrame({"Depth": depths})
-    fam = {"PU": {}, "SO": {}, "ROT": {}}
-
-    for ff in sorted(set(ff_values)):
-        ff = round(ff, 2)
-        if use_survey and survey_depth is not None and survey_inc is not None:
-            inc_deg_at_depths = np.interp(depths, survey_depth, survey_inc)
-            pu = np.zeros_like(depths, dtype=float)
-            so = np.zeros_like(depths, dtype=float)
-            rot = np.zeros_like(depths, dtype=float)
-            pu[0] = block_klb
-            so[0] = block_klb
-            rot[0] = block_klb
-            for i in range(1, len(depths)):
-                inc_rad = math.radians(float(inc_deg_at_depths[i]))
-                cos_i = math.cos(inc_rad)
-                sin_i = math.sin(inc_rad)
-                step = depths[i] - depths[i - 1]
-                pu[i] = pu[i - 1] + step * w_eff * (cos_i + ff * sin_i) * scale
-                so[i] = so[i - 1] + step * w_eff * (cos_i - ff * sin_i) * scale
-                rot[i] = rot[i - 1] + step * w_eff * cos_i * scale
-        elif use_linear_inc:
-            inc_surf_rad = math.radians(float(inclination_surface_deg))
-            inc_td_rad = math.radians(float(inclination_td_deg))
-            pu = np.zeros_like(depths, dtype=float)
-            so = np.zeros_like(depths, dtype=float)
-            rot = np.zeros_like(depths, dtype=float)
-            pu[0] = block_klb
-            so[0] = block_klb
-            rot[0] = block_klb
-            for i in range(1, len(depths)):
-                d = depths[i]
-                t = (d - md_min_m) / depth_span
-                inc_rad = inc_surf_rad + t * (inc_td_rad - inc_surf_rad)
-                cos_i = math.cos(inc_rad)
-                sin_i = math.sin(inc_rad)
-                step = depths[i] - depths[i - 1]
-                pu[i] = pu[i - 1] + step * w_eff * (cos_i + ff * sin_i) * scale
-                so[i] = so[i - 1] + step * w_eff * (cos_i - ff * sin_i) * scale
-                rot[i] = rot[i - 1] + step * w_eff * cos_i * scale
-        else:
-            inc_rad = math.radians(float(inclination_deg))
-            cos_i = math.cos(inc_rad)
-            sin_i = math.sin(inc_rad)
-            pu = block_klb + depths * w_eff * (cos_i + ff * sin_i) * scale
-            so = block_klb + depths * w_eff * (cos_i - ff * sin_i) * scale
-            rot = block_klb + depths * w_eff * cos_i * scale
-
-        col_pu = f"PU_{ff:.2f}"
-        col_so = f"SO_{ff:.2f}"
-        col_rot = f"ROT_{ff:.2f}"
-        out[col_pu] = pu
-        out[col_so] = so
-        out[col_rot] = rot
-        fam["PU"][ff] = col_pu
-        fam["SO"][ff] = col_so
-        fam["ROT"][ff] = col_rot
-    return out, fam
+    return broomstick_curves(
+        md_min_m,
+        md_max_m,
+        step_m,
+        weight_per_m_kg,
+        buoyancy_factor,
+        inclination_deg,
+        ff_values,
+        output_klb=output_klb,
+        block_weight_klb=block_weight_klb,
+        inclination_surface_deg=inclination_surface_deg,
+        inclination_td_deg=inclination_td_deg,
+        survey_df=survey_df,
+        model=model,
+        pipe_od_in=pipe_od_in,
+    )
 
 
 def interp_ff_curve(df_model: pd.DataFrame, fam_map: dict, mode: str, ff: float) -> pd.Series:
@@ -7427,15 +7692,18 @@ def _trip_dir_labels_from_depth(df: pd.DataFrame, eps_m: float = 0.02) -> pd.Ser
     lab[d < -eps_m] = "PU"
     lab[d > eps_m] = "SO"
     return lab
-def _trip_build_exact_depth_envelope(df: pd.DataFrame) -> pd.DataFrame:
+def _trip_build_exact_depth_envelope(
+    df: pd.DataFrame,
+    resolution_m: float | None = None,
+    reducer: str = "max",
+    q: float = 95.0,
+) -> pd.DataFrame:
     """
     Envelope por profundidad exacta: para cada Bit depth conserva la fila donde Hookload es máximo.
     En conexiones (Bit depth fijo, Hookload variable) queda un punto por profundidad con el mayor Hookload.
+    resolution_m > 0 cuantiza Bit depth antes de agrupar; reducer: max / percentile / robust_max.
     """
-    if df.empty or "Bit depth" not in df.columns or "Hookload" not in df.columns:
-        return pd.DataFrame()
-    filtered = df.loc[df.groupby("Bit depth")["Hookload"].idxmax()].sort_values("Bit depth").reset_index(drop=True)
-    return filtered
+    return envelope_frame(df, "Bit depth", "Hookload", bin_m=resolution_m, reducer=reducer, q=q)
 
 
 TRIP_SEVERITY_COLORS = {"low": "#FACC15", "medium": "#F97316", "high": "#EF4444"}
@@ -7446,82 +7714,148 @@ TRIP_SEVERITY_LABELS = {
 }
 
 
+TRIP_SEVERITY_ORDER = ("low", "medium", "high")
+TRIP_EVENT_GAP_FACTOR = 5.0
+
+
+def _trip_segment_overpull_events(d: pd.DataFrame, gap_factor: float = TRIP_EVENT_GAP_FACTOR) -> pd.DataFrame:
+    """
+    Agrupa las muestras con ``Event_t`` en eventos (corridas contiguas) en una sola pasada.
+    Una corrida se corta si entre dos muestras hay un hueco > ``gap_factor`` × paso típico.
+    Devuelve una fila por evento: inicio, fin, duración, muestras, pico y severidad del pico.
+    """
+    cols = [
+        "Event", "Start", "End", "Start_h", "End_h", "Duration_s", "Samples",
+        "Peak_time", "Peak_h", "Peak_overpull", "Peak_hookload", "Peak_depth", "Severity",
+    ]
+    ev_idx = np.flatnonzero(d["Event_t"].to_numpy(dtype=bool))
+    if ev_idx.size == 0:
+        return pd.DataFrame(columns=cols)
+    t_s = (d["Timestamp"] - d["Timestamp"].iloc[0]).dt.total_seconds().to_numpy()
+    steps = np.diff(t_s)
+    typical = float(np.median(steps[steps > 0])) if (steps > 0).any() else 0.0
+    t_ev = t_s[ev_idx]
+    new_run = np.ones(ev_idx.size, dtype=bool)
+    new_run[1:] = (np.diff(ev_idx) > 1) | (np.diff(t_ev) > gap_factor * typical if typical > 0 else False)
+    starts = np.flatnonzero(new_run)
+    ends = np.r_[starts[1:], ev_idx.size] - 1
+    run_id = np.cumsum(new_run) - 1
+
+    op = d["Overpull_t"].to_numpy(dtype=float)[ev_idx]
+    # Pico de cada corrida: primera posición tras ordenar por (corrida, -overpull).
+    order = np.lexsort((-np.nan_to_num(op, nan=-np.inf), run_id))
+    first = np.r_[True, run_id[order][1:] != run_id[order][:-1]]
+    peak = ev_idx[order[first]]
+    hours = d["Hours"].to_numpy(dtype=float)
+    ts = d["Timestamp"]
+    depth = (
+        pd.to_numeric(d["Bit depth"], errors="coerce").to_numpy(dtype=float)[peak]
+        if "Bit depth" in d.columns
+        else np.full(peak.size, np.nan)
+    )
+    return pd.DataFrame(
+        {
+            "Event": np.arange(1, starts.size + 1),
+            "Start": ts.iloc[ev_idx[starts]].to_numpy(),
+            "End": ts.iloc[ev_idx[ends]].to_numpy(),
+            "Start_h": hours[ev_idx[starts]],
+            "End_h": hours[ev_idx[ends]],
+            "Duration_s": t_s[ev_idx[ends]] - t_s[ev_idx[starts]],
+            "Samples": ends - starts + 1,
+            "Peak_time": ts.iloc[peak].to_numpy(),
+            "Peak_h": hours[peak],
+            "Peak_overpull": d["Overpull_t"].to_numpy(dtype=float)[peak],
+            "Peak_hookload": d["Hookload"].to_numpy(dtype=float)[peak],
+            "Peak_depth": depth,
+            "Severity": d["Severity"].to_numpy()[peak],
+        },
+        columns=cols,
+    )
+
+
 def _trip_compute_time_overpull(
     df: pd.DataFrame,
     rolling_window: int = 60,
     overpull_thr: float = 0.0,
-) -> tuple[pd.DataFrame, pd.Timestamp]:
+    rolling_cache: dict | None = None,
+) -> tuple[pd.DataFrame, pd.Timestamp, pd.DataFrame]:
     """
     Calcula overpull en dominio tiempo: baseline = rolling median, overpull = Hookload - baseline.
-    Devuelve (df con columnas extra Overpull_t, Event_t, Severity, Hours), t0 (Timestamp mínimo).
+    Devuelve (df con columnas extra Overpull_t, Event_t, Severity, Hours), t0 (Timestamp mínimo)
+    y la tabla de eventos (corridas contiguas, ver ``_trip_segment_overpull_events``).
+
+    Si se pasa ``rolling_cache`` (dict persistente, p. ej. en session_state), la mediana
+    móvil solo se recalcula en la cola que cambió desde la llamada anterior (modo en vivo).
     """
     d = df.sort_values("Timestamp").reset_index(drop=True).copy()
     d["Hookload"] = pd.to_numeric(d["Hookload"], errors="coerce")
-    d["Baseline_roll"] = d["Hookload"].rolling(window=rolling_window, min_periods=max(1, rolling_window // 2), center=True).median()
+    baseline, state = incremental_rolling_median(
+        d["Timestamp"].to_numpy(),
+        d["Hookload"].to_numpy(dtype=float),
+        rolling_window,
+        max(1, rolling_window // 2),
+        previous=rolling_cache.get("state") if rolling_cache is not None else None,
+    )
+    if rolling_cache is not None:
+        rolling_cache["state"] = state
+    d["Baseline_roll"] = baseline
     d["Overpull_t"] = d["Hookload"] - d["Baseline_roll"]
     d["Overpull_t"] = d["Overpull_t"].clip(lower=0)
     d["Event_t"] = d["Overpull_t"] >= overpull_thr if overpull_thr > 0 else d["Overpull_t"] > 0
-    op_vals = d.loc[d["Event_t"], "Overpull_t"]
-    if len(op_vals) >= 3:
-        p33 = float(op_vals.quantile(0.33))
-        p66 = float(op_vals.quantile(0.66))
+    event = d["Event_t"].to_numpy(dtype=bool)
+    op = d["Overpull_t"].to_numpy(dtype=float)
+    op_vals = op[event]
+    if op_vals.size >= 3:
+        p33, p66 = np.nanquantile(op_vals, [0.33, 0.66])
         if p66 <= p33:
-            p66 = max(p33 + 1e-6, op_vals.max())
-
-        def _sev(x):
-            if pd.isna(x) or x <= 0:
-                return "low"
-            if x <= p33:
-                return "low"
-            if x <= p66:
-                return "medium"
-            return "high"
-        d["Severity"] = d.apply(lambda r: _sev(r["Overpull_t"]) if r["Event_t"] else None, axis=1)
+            p66 = max(p33 + 1e-6, np.nanmax(op_vals))
+        # NaN / <= 0 / <= p33 -> low; <= p66 -> medium; resto -> high
+        sev = np.select([~(op > 0) | (op <= p33), op <= p66], ["low", "medium"], "high")
     else:
-        d["Severity"] = d.apply(
-            lambda r: "high" if r["Event_t"] and r["Overpull_t"] > 0 else (None if not r["Event_t"] else "low"),
-            axis=1,
-        )
+        sev = np.where(op > 0, "high", "low")
+    d["Severity"] = np.where(event, sev.astype(object), None)
     t0 = d["Timestamp"].min()
     d["Hours"] = (d["Timestamp"] - t0).dt.total_seconds() / 3600.0
-    return d, t0
+    return d, t0, _trip_segment_overpull_events(d)
 
 
 
 def _trip_build_events_timeline_figure(
-    df_events: pd.DataFrame,
+    events: pd.DataFrame,
     t0: pd.Timestamp,
     mode_label: str,
     dark: bool = False,
 ) -> go.Figure:
-    """Timeline de overpull: barras por evento coloreadas por severidad (legible y sin 'bloques' gigantes)."""
+    """Timeline de overpull: una barra por evento (ancho = duración, alto = pico), coloreada por severidad."""
     fig = go.Figure()
 
-    # Ancho de barra: basado en la separación típica de muestras (en horas).
-    try:
-        diffs = df_events["Hours"].sort_values().diff().dropna()
-        step = float(diffs.median()) if len(diffs) else 0.01
-        # 80% del paso típico, con límites razonables
-        bar_w = max(0.002, min(0.08, 0.8 * step))
-    except Exception:
-        bar_w = 0.01
-
-    for sev in ("low", "medium", "high"):
-        sub = df_events[(df_events["Event_t"]) & (df_events["Severity"] == sev)]
-        if sub.empty:
-            continue
-        fig.add_trace(
-            go.Bar(
-                x=sub["Hours"],
-                y=sub["Overpull_t"],
-                name=TRIP_SEVERITY_LABELS[sev],
-                marker_color=TRIP_SEVERITY_COLORS[sev],
-                marker_line_width=0,
-                opacity=0.9,
-                width=bar_w,
-                hovertemplate="Tiempo: %{x:.2f} h<br>Overpull: %{y:.2f} klb<extra></extra>",
+    if not events.empty:
+        # Ancho mínimo visible aunque el evento sea de una sola muestra.
+        span_h = float(events["End_h"].max() - events["Start_h"].min())
+        min_w = max(0.002, span_h / 1500.0)
+        width = np.maximum((events["End_h"] - events["Start_h"]).to_numpy(dtype=float), min_w)
+        center = (events["Start_h"] + events["End_h"]).to_numpy(dtype=float) / 2.0
+        for sev in TRIP_SEVERITY_ORDER:
+            mask = (events["Severity"] == sev).to_numpy()
+            if not mask.any():
+                continue
+            sub = events[mask]
+            fig.add_trace(
+                go.Bar(
+                    x=center[mask],
+                    y=sub["Peak_overpull"],
+                    width=width[mask],
+                    name=TRIP_SEVERITY_LABELS[sev],
+                    marker_color=TRIP_SEVERITY_COLORS[sev],
+                    marker_line_width=0,
+                    opacity=0.9,
+                    customdata=np.c_[sub["Start_h"], sub["Duration_s"], sub["Samples"]],
+                    hovertemplate=(
+                        "Inicio: %{customdata[0]:.2f} h · Duración: %{customdata[1]:.0f} s"
+                        "<br>Muestras: %{customdata[2]:.0f}<br>Overpull pico: %{y:.2f} klb<extra></extra>"
+                    ),
+                )
             )
-        )
 
     fig.update_layout(
         title=dict(
@@ -7558,32 +7892,48 @@ def _trip_build_events_timeline_figure(
 
 def _trip_build_hookload_with_events_figure(
     df: pd.DataFrame,
+    events: pd.DataFrame,
     mode_label: str,
     dark: bool = False,
+    max_points: int = PLOT_MAX_POINTS,
+    x_range: tuple[float, float] | None = None,
 ) -> go.Figure:
-    """Gráfico Hookload vs tiempo: línea base + puntos donde hay evento, coloreados por severidad."""
+    """
+    Gráfico Hookload vs tiempo: línea + un punto por evento (en su pico), coloreado por severidad.
+    La línea se reduce a ``max_points`` con mín/máx por bucket (no se pierden picos) conservando
+    los picos de los eventos; ``x_range`` (h) vuelve a pedir detalle para una ventana.
+    """
+    hours = df["Hours"].to_numpy(dtype=float)
+    keep = None
+    if not events.empty and len(hours):
+        keep = np.clip(np.searchsorted(hours, events["Peak_h"].to_numpy(dtype=float)), 0, len(hours) - 1)
+    idx = downsample_indices(hours, df["Hookload"].to_numpy(dtype=float), max_points, "minmax", keep=keep, x_range=x_range)
+    if x_range is not None:
+        events = events[(events["Peak_h"] >= x_range[0]) & (events["Peak_h"] <= x_range[1])]
     fig = go.Figure()
     fig.add_trace(
         go.Scatter(
-            x=df["Hours"],
-            y=df["Hookload"],
+            x=hours[idx],
+            y=df["Hookload"].to_numpy(dtype=float)[idx],
             mode="lines",
             name="Hookload",
             line=dict(color="#94A3B8" if dark else "#64748B", width=1.2),
         )
     )
-    for sev in ("low", "medium", "high"):
-        sub = df[(df["Event_t"]) & (df["Severity"] == sev)]
+    for sev in TRIP_SEVERITY_ORDER:
+        sub = events[events["Severity"] == sev]
         if sub.empty:
             continue
         color = TRIP_SEVERITY_COLORS[sev]
         fig.add_trace(
             go.Scatter(
-                x=sub["Hours"],
-                y=sub["Hookload"],
+                x=sub["Peak_h"],
+                y=sub["Peak_hookload"],
                 mode="markers",
                 name=TRIP_SEVERITY_LABELS[sev],
                 marker=dict(size=8, color=color, line=dict(width=0), symbol="diamond"),
+                customdata=np.c_[sub["Duration_s"], sub["Peak_overpull"]],
+                hovertemplate="Hookload: %{y:.1f} klb<br>Overpull pico: %{customdata[1]:.2f} klb · %{customdata[0]:.0f} s<extra></extra>",
             )
         )
     fig.update_layout(
@@ -7797,6 +8147,29 @@ def render_tripping_analysis() -> None:
         format_func=lambda x: tr("trip_env_exact") if x == TRIP_ENV_EXACT else tr("trip_env_bin"),
         help=tr("trip_env_help"),
     )
+    c_env1, c_env2, c_env3 = st.columns(3)
+    with c_env1:
+        env_resolution_m = st.number_input(
+            tr("trip_env_resolution"),
+            0.0,
+            5.0,
+            0.1,
+            0.01,
+            key="trip_env_resolution_m",
+            help=tr("trip_env_resolution_help"),
+            disabled=envelope_method != TRIP_ENV_EXACT,
+        )
+    with c_env2:
+        env_reducer = st.selectbox(
+            tr("trip_env_reducer"),
+            list(ENVELOPE_REDUCERS),
+            key="trip_env_reducer",
+            format_func=lambda r: tr(f"trip_env_red_{r}"),
+        )
+    with c_env3:
+        env_q = st.number_input(
+            tr("trip_env_q"), 50.0, 100.0, 95.0, 1.0, key="trip_env_q", disabled=env_reducer != "percentile"
+        )
 
     st.markdown(tr("trip_range_hdr"))
     st.caption(tr("trip_range_cap"))
@@ -7951,6 +8324,26 @@ def render_tripping_analysis() -> None:
                 st.caption("Si rellenas ambos valores y son distintos, la inclinación varía linealmente con la profundidad y las curvas dejan de ser rectas.")
                 inc_surf_deg = st.number_input("Incl. en superficie (°)", value=0.0, min_value=0.0, max_value=90.0, step=1.0, key="trip_model_inc_surf")
                 inc_td_deg = st.number_input("Incl. en TD (°)", value=0.0, min_value=0.0, max_value=90.0, step=1.0, key="trip_model_inc_td")
+            cm1, cm2 = st.columns(2)
+            with cm1:
+                trip_model_kind = st.selectbox(
+                    "Modelo",
+                    ["simplified", "soft_string"],
+                    format_func=lambda m: "Simplificado (incl. por tramo)" if m == "simplified" else "Soft-string con patas de perro",
+                    key="trip_model_kind",
+                    help="Soft-string suma la normal por curvatura (cambios de inclinación/azimut del survey) proporcional a la tensión.",
+                )
+            with cm2:
+                pipe_od_in = st.number_input(
+                    "OD tubería (in) para torque",
+                    value=0.0,
+                    min_value=0.0,
+                    max_value=20.0,
+                    step=0.125,
+                    key="trip_model_pipe_od",
+                    help="Solo soft-string: si es > 0 se generan también curvas de torque rotando fuera de fondo (TQ, klbf·ft).",
+                    disabled=trip_model_kind != "soft_string",
+                )
             with st.expander("Cargar survey / wellplan (opcional)", expanded=False):
                 st.caption(
                     "CSV o Excel con profundidad (MD) e inclinación. Si lo cargas, las curvas del modelo usan esta trayectoria "
@@ -7977,11 +8370,24 @@ def render_tripping_analysis() -> None:
                         idx_i = cols_survey.index(incl_candidates[0]) if incl_candidates else 0
                         survey_md_col = st.selectbox("Columna MD / Profundidad", cols_survey, index=idx_d, key="trip_survey_md_col")
                         survey_incl_col = st.selectbox("Columna Inclinación (°)", cols_survey, index=idx_i, key="trip_survey_incl_col")
+                        azi_candidates = [c for c in cols_survey if any(x in c.lower() for x in ["azi", "azimuth", "azimut"])]
+                        azi_options = ["(ninguna)"] + cols_survey
+                        idx_a = azi_options.index(azi_candidates[0]) if azi_candidates else 0
+                        survey_azi_col = st.selectbox(
+                            "Columna Azimut (°, opcional)",
+                            azi_options,
+                            index=idx_a,
+                            key="trip_survey_azi_col",
+                            help="Con azimut, el modelo soft-string incluye también las patas de perro laterales.",
+                        )
                         if survey_md_col and survey_incl_col:
-                            trip_survey_df = raw_survey[[survey_md_col, survey_incl_col]].copy()
-                            trip_survey_df.columns = ["Depth", "Inclination"]
-                            trip_survey_df["Depth"] = pd.to_numeric(trip_survey_df["Depth"], errors="coerce")
-                            trip_survey_df["Inclination"] = pd.to_numeric(trip_survey_df["Inclination"], errors="coerce")
+                            survey_cols = [survey_md_col, survey_incl_col]
+                            if survey_azi_col != "(ninguna)":
+                                survey_cols.append(survey_azi_col)
+                            trip_survey_df = raw_survey[survey_cols].copy()
+                            trip_survey_df.columns = ["Depth", "Inclination", "Azimuth"][: len(survey_cols)]
+                            for c in trip_survey_df.columns:
+                                trip_survey_df[c] = pd.to_numeric(trip_survey_df[c], errors="coerce")
                             trip_survey_df = trip_survey_df.dropna().sort_values("Depth")
                             if len(trip_survey_df) >= 2:
                                 st.session_state["trip_survey_df"] = trip_survey_df
@@ -8016,6 +8422,8 @@ def render_tripping_analysis() -> None:
                     inclination_surface_deg=inc_surf,
                     inclination_td_deg=inc_td,
                     survey_df=survey_for_model,
+                    model=trip_model_kind,
+                    pipe_od_in=pipe_od_in,
                 )
                 if not model_df.empty:
                     st.session_state["trip_ff_family_df"] = model_df
@@ -8308,6 +8716,14 @@ def render_tripping_analysis() -> None:
                 key="trip_load_all_pages",
                 help="La app pedirá página 0, 1, 2… hasta que no venga más dato. No hace falta elegir número de páginas.",
             )
+            trip_use_trace_store = st.checkbox(
+                "Caché local de trazas en disco",
+                value=st.session_state.get("trip_use_trace_store", True),
+                key="trip_use_trace_store",
+                disabled=not trip_load_all_pages,
+                help="Con rango Desde/Hasta y «Cargar todo», guarda las series en disco (Parquet) y solo pide a la API "
+                "los tramos que faltan.",
+            )
             st.caption("Paginación: más «Tamaño de página» = más datos por petición. Si no usas «Cargar todo», indica cuántas páginas.")
             col_size, col_page, col_multi = st.columns(3)
             with col_size:
@@ -8603,6 +9019,12 @@ def render_tripping_analysis() -> None:
                 key="trip_auto_refresh_interval",
                 help="Cada cuántos segundos se vuelve a ejecutar el análisis (10–300 s).",
             )
+            st.checkbox(
+                "Modo en vivo: pedir solo muestras nuevas",
+                value=st.session_state.get("trip_live_tail", True),
+                key="trip_live_tail",
+                help="Recuerda la última muestra de cada traza y en cada refresco pide solo desde ahí (from=última muestra).",
+            )
 
         auto_rerun = st.session_state.pop("trip_auto_rerun_trigger", False)
         run_clicked = st.button("▶️ Ejecutar análisis", key="trip_run")
@@ -8638,80 +9060,109 @@ def render_tripping_analysis() -> None:
             page_size_int = int(trip_page_size)
             max_auto_pages = 50
             if trip_load_all_pages:
-                page_indices_trip = []  # se llenará en el bucle hasta que venga menos de size
+                page_indices_trip = []  # páginas 0..max_auto_pages hasta la primera vacía (por traza)
             else:
                 page_indices_trip = list(range(int(trip_num_pages))) if int(trip_num_pages) > 1 else [int(trip_page_number)]
-            list_hk_pages: list[pd.DataFrame] = []
-            list_dp_pages: list[pd.DataFrame] = []
-            list_gr_pages: list[pd.DataFrame] = []
-            list_dls_pages: list[pd.DataFrame] = []
             used_type_hk = used_type_dp = "TIME"
             used_params_hk = used_params_dp = {}
             used_type_gr = used_type_dls = "TIME"
             used_params_gr = used_params_dls = {}
             try:
-                page_idx = 0
-                while True:
-                    if not trip_load_all_pages and page_idx >= len(page_indices_trip):
-                        break
-                    if trip_load_all_pages and page_idx >= max_auto_pages:
-                        break
-                    current_page = page_indices_trip[page_idx] if not trip_load_all_pages else page_idx
-                    user_params = build_trace_params_trip(page_override=current_page)
-                    d_hk, used_type_hk, used_params_hk = probe_well_trace_data(
-                        base_url=base_url,
-                        token=token,
-                        well_uuid=well_uuid,
-                        trace_uuid=hookload_trace_uuid,
-                        prefer_type="TIME",
-                        user_params=user_params,
+                trip_trace_uuids = list(
+                    dict.fromkeys(
+                        str(u) for u in (hookload_trace_uuid, depth_trace_uuid, gamma_trace_uuid, dls_trace_uuid) if u
                     )
-                    d_dp, used_type_dp, used_params_dp = probe_well_trace_data(
+                )
+                # Modo en vivo: las trazas con histórico en buffer solo piden from=última muestra.
+                trip_live_on = bool(trip_auto_refresh and st.session_state.get("trip_live_tail", True))
+                trip_buffers = (
+                    live_buffers(
+                        st.session_state,
+                        "trip_live_buffers",
+                        json.dumps(
+                            [well_uuid, trip_trace_uuids, build_trace_params_trip(page_override=0), bool(trip_load_all_pages), page_indices_trip],
+                            default=str,
+                        ),
+                    )
+                    if trip_live_on
+                    else {}
+                )
+                trip_tail_uuids = {u for u, buf in trip_buffers.items() if buf.ready}
+
+                trip_store_on = bool(
+                    trip_use_trace_store
+                    and trip_load_all_pages
+                    and solo_trace_store().available
+                    and range_bounds(build_trace_params_trip(page_override=0), "TIME") is not None
+                )
+
+                def _fetch_trip_page(trace_uuid: str, page_idx: int):
+                    user_params = build_trace_params_trip(page_override=page_idx)
+                    if trace_uuid in trip_tail_uuids:
+                        # from/to explícitos: probe_well_trace_data no sondea ventanas.
+                        user_params = trip_buffers[trace_uuid].tail_params(user_params)
+                    elif trip_store_on:
+                        # El almacén devuelve el rango entero en la página 0; las demás quedan vacías.
+                        if page_idx > 0:
+                            return pd.DataFrame(), "TIME", user_params
+                        stored = read_trace_range_through_store(
+                            well_uuid,
+                            trace_store_key(trace_uuid, "well_trace", parse_params_input(trip_extra_params_raw or "")),
+                            "TIME",
+                            user_params,
+                            # Sin probe: sus errores devuelven vacío y el almacén los cubriría como "sin datos".
+                            lambda p: fetch_well_trace_strict(base_url, token, well_uuid, trace_uuid, "TIME", p),
+                            max_pages=max_auto_pages,
+                        )
+                        return stored, "TIME", user_params
+                    return _fetch_trip_params(trace_uuid, user_params)
+
+                def _fetch_trip_params(trace_uuid: str, user_params: dict):
+                    return probe_well_trace_data(
                         base_url=base_url,
                         token=token,
                         well_uuid=well_uuid,
-                        trace_uuid=depth_trace_uuid,
+                        trace_uuid=trace_uuid,
                         prefer_type="TIME",
                         user_params=user_params,
                     )
-                    d_gr = pd.DataFrame()
-                    d_dls = pd.DataFrame()
-                    if gamma_trace_uuid:
-                        d_gr, used_type_gr, used_params_gr = probe_well_trace_data(
-                            base_url=base_url,
-                            token=token,
-                            well_uuid=well_uuid,
-                            trace_uuid=gamma_trace_uuid,
-                            prefer_type="TIME",
-                            user_params=user_params,
-                        )
-                    if dls_trace_uuid:
-                        d_dls, used_type_dls, used_params_dls = probe_well_trace_data(
+
+                # (traza, página) en paralelo; cada traza deja de pedir páginas al llegar una vacía.
+                fetched_trip = fetch_trace_pages(
+                    _fetch_trip_page,
+                    [u for u in trip_trace_uuids if u not in trip_tail_uuids],
+                    None if trip_load_all_pages else page_indices_trip,
+                    max_pages=max_auto_pages,
+                    base_url=base_url,
+                    initializer=st_thread_initializer(),
+                )
+                if trip_tail_uuids:
+                    fetched_trip.update(
+                        fetch_trace_pages(
+                            _fetch_trip_page,
+                            [u for u in trip_trace_uuids if u in trip_tail_uuids],
+                            None,
+                            max_pages=max_auto_pages,
                             base_url=base_url,
-                            token=token,
-                            well_uuid=well_uuid,
-                            trace_uuid=dls_trace_uuid,
-                            prefer_type="TIME",
-                            user_params=user_params,
+                            initializer=st_thread_initializer(),
                         )
-                    if not d_hk.empty:
-                        list_hk_pages.append(d_hk)
-                    if not d_dp.empty:
-                        list_dp_pages.append(d_dp)
-                    if not d_gr.empty:
-                        list_gr_pages.append(d_gr)
-                    if not d_dls.empty:
-                        list_dls_pages.append(d_dls)
-                    if d_hk.empty and d_dp.empty and d_gr.empty and d_dls.empty:
-                        break
-                    if trip_load_all_pages:
-                        n_hk = len(d_hk)
-                        n_dp = len(d_dp)
-                        # FIX: do NOT stop just because len < size (API may cap page size)
-                        if n_hk == 0 and n_dp == 0:
-                            break
+                    )
 
-                    page_idx += 1
+                def _trip_pages(trace_uuid: str | None, default_params: dict):
+                    if not trace_uuid:
+                        return [], "TIME", default_params
+                    res = fetched_trip[str(trace_uuid)]
+                    if res.error is not None and not res.pages:
+                        raise res.error
+                    if not res.pages:
+                        return [], "TIME", default_params
+                    _, last_type, last_params = res.pages[-1]
+                    return [p[0] for p in res.pages], last_type, last_params
+
+                list_hk_pages, used_type_hk, used_params_hk = _trip_pages(hookload_trace_uuid, used_params_hk)
+                list_dp_pages, used_type_dp, used_params_dp = _trip_pages(depth_trace_uuid, used_params_dp)
+                list_gr_pages, used_type_gr, used_params_gr = _trip_pages(gamma_trace_uuid, used_params_gr)
+                list_dls_pages, used_type_dls, used_params_dls = _trip_pages(dls_trace_uuid, used_params_dls)
                 df_hk = pd.concat(list_hk_pages, ignore_index=True) if list_hk_pages else pd.DataFrame()
                 df_dp = pd.concat(list_dp_pages, ignore_index=True) if list_dp_pages else pd.DataFrame()
                 df_gr = pd.concat(list_gr_pages, ignore_index=True) if list_gr_pages else pd.DataFrame()
@@ -8732,9 +9183,22 @@ def render_tripping_analysis() -> None:
                     tcol = _trip_pick_time_col(df_dls)
                     if tcol:
                         df_dls = df_dls.drop_duplicates(subset=[tcol], keep="first").sort_values(tcol).reset_index(drop=True)
+                if trip_live_on:
+                    def _trip_live_ingest(trace_uuid: str | None, frame: pd.DataFrame) -> pd.DataFrame:
+                        if not trace_uuid:
+                            return frame
+                        buf = trip_buffers.setdefault(str(trace_uuid), TailBuffer(domain="TIME"))
+                        buf.ingest(frame, full=str(trace_uuid) not in trip_tail_uuids)
+                        return buf.frame
+
+                    df_hk = _trip_live_ingest(hookload_trace_uuid, df_hk)
+                    df_dp = _trip_live_ingest(depth_trace_uuid, df_dp)
+                    df_gr = _trip_live_ingest(gamma_trace_uuid, df_gr)
+                    df_dls = _trip_live_ingest(dls_trace_uuid, df_dls)
             except Exception as e:
                 st.error(f"No pude leer trazas: {e}")
                 return
+            get_refresh_scheduler().mark_fresh(streamlit_session_id(), "trip")
 
             if df_hk.empty or df_dp.empty:
                 st.error(
@@ -8913,16 +9377,15 @@ def render_tripping_analysis() -> None:
     # --- Envelope por profundidad exacta (max Hookload por Bit depth), si aplica
     envelope_exact = pd.DataFrame()
     if envelope_method == TRIP_ENV_EXACT:
-        envelope_exact = _trip_build_exact_depth_envelope(df)
+        envelope_exact = _trip_build_exact_depth_envelope(df, env_resolution_m, env_reducer, env_q)
 
     # --- Envelope por bin de profundidad
-    df["Depth_bin"] = (df["Bit depth"] / float(bin_m)).round().astype(int) * float(bin_m)
-
-    grp = df.groupby("Depth_bin")["Hookload"]
-    env = grp.max().to_frame("Hookload_max")
-    env["Hookload_baseline"] = grp.quantile(float(baseline_q) / 100.0)
+    env_top = depth_envelope(df["Bit depth"], df["Hookload"], bin_m=float(bin_m), reducer=env_reducer, q=env_q)
+    env_base = depth_envelope(df["Bit depth"], df["Hookload"], bin_m=float(bin_m), reducer="percentile", q=float(baseline_q))
+    env = pd.DataFrame(
+        {"Depth_bin": env_top.depth, "Hookload_max": env_top.value, "Hookload_baseline": env_base.value}
+    )
     env["Overpull"] = env["Hookload_max"] - env["Hookload_baseline"]
-    env = env.reset_index().sort_values("Depth_bin")
 
     if thr > 0:
         env["Event"] = env["Overpull"] >= float(thr)
@@ -9128,10 +9591,11 @@ def render_tripping_analysis() -> None:
             )
 
         # --- Vista Pro: overpull en tiempo + severidad
-        df_with_events, t0 = _trip_compute_time_overpull(
+        df_with_events, t0, overpull_events = _trip_compute_time_overpull(
             df,
             rolling_window=max(5, int(rolling_window)),
             overpull_thr=float(thr),
+            rolling_cache=st.session_state.setdefault("trip_overpull_rolling_cache", {}),
         )
         mode_label = "Trip Out" if mode == "Trip Out" else "Trip In"
         dark_pro = st.checkbox("Tema oscuro (vista pro)", value=is_streamlit_dark_mode(), key="trip_dark_pro")
@@ -9287,12 +9751,25 @@ def render_tripping_analysis() -> None:
 
         st.markdown("#### Vista Pro – Eventos de overpull en el tiempo")
         st.caption("Barras = eventos de overpull; color = severidad (amarillo aislado → naranja frecuencia en aumento → rojo restricción/riesgo de pegadura).")
-        fig_events = _trip_build_events_timeline_figure(df_with_events, t0, mode_label, dark=dark_pro)
+        fig_events = _trip_build_events_timeline_figure(overpull_events, t0, mode_label, dark=dark_pro)
         st.plotly_chart(fig_events, use_container_width=True, config={"displayModeBar": "hover", "displaylogo": False})
+        if not overpull_events.empty:
+            with st.expander(f"Tabla de eventos de overpull ({len(overpull_events):,})", expanded=False):
+                st.dataframe(overpull_events, use_container_width=True, hide_index=True)
 
         st.markdown("#### Hookload con eventos resaltados")
-        st.caption("Línea = Hookload; diamantes = eventos de overpull coloreados por severidad.")
-        fig_hookload_pro = _trip_build_hookload_with_events_figure(df_with_events, mode_label, dark=dark_pro)
+        st.caption("Línea = Hookload; diamantes = pico de cada evento de overpull, coloreado por severidad.")
+        hookload_window = None
+        if len(df_with_events) > PLOT_MAX_POINTS:
+            hookload_window = plot_zoom_window(
+                "trip_hookload_zoom",
+                df_with_events["Hours"].min(),
+                df_with_events["Hours"].max(),
+                "Ventana de tiempo (h) – detalle al acotar",
+            )
+        fig_hookload_pro = _trip_build_hookload_with_events_figure(
+            df_with_events, overpull_events, mode_label, dark=dark_pro, x_range=hookload_window
+        )
         st.plotly_chart(fig_hookload_pro, use_container_width=True, config={"displayModeBar": "hover", "displaylogo": False})
 
         insight = _trip_generate_insight(df_with_events, env[env["Event"]].shape[0])
@@ -9353,14 +9830,9 @@ def render_tripping_analysis() -> None:
         # --- Actualización automática cada N segundos (solo API)
         if data_source == "API" and st.session_state.get("trip_auto_refresh"):
             interval = int(st.session_state.get("trip_auto_refresh_interval", 30))
-            interval = max(10, min(300, interval))
-            countdown_placeholder = st.empty()
-            for i in range(interval, 0, -1):
-                countdown_placeholder.info(f"🔄 Próxima actualización en **{i}** s… (desmarca «Actualizar automáticamente» para detener)")
-                time.sleep(1)
-            countdown_placeholder.empty()
-            st.session_state["trip_auto_rerun_trigger"] = True
-            st.rerun()
+            schedule_auto_refresh("trip", max(10, min(300, interval)), trigger_key="trip_auto_rerun_trigger")
+        else:
+            get_refresh_scheduler().cancel(streamlit_session_id(), "trip")
 
     with tab_broom:
         st.markdown("### Broomstick (Hookload vs Profundidad)")
@@ -9489,6 +9961,7 @@ def render_tripping_analysis() -> None:
             show_limits = st.checkbox("Mostrar límites", value=has_limits, key="trip_broom_show_limits", disabled=not has_limits)
 
         fig = go.Figure()
+        tq_curve = None
 
         # Scatter medido
         if show_measured and not df_rt.empty:
@@ -9532,6 +10005,8 @@ def render_tripping_analysis() -> None:
                 pu_curve = interp_ff_curve(model_df, fam_map, "PU", float(ff_val))
                 so_curve = interp_ff_curve(model_df, fam_map, "SO", float(ff_val))
                 rot_curve = interp_ff_curve(model_df, fam_map, "ROT", float(ff_val))
+                # Torque (klbf·ft): no se le aplica el offset de Hookload.
+                tq_curve = interp_ff_curve(model_df, fam_map, "TQ", float(ff_val))
                 if pu_curve is not None and curve_offset_klb != 0:
                     pu_curve = pu_curve + float(curve_offset_klb)
                 if so_curve is not None and curve_offset_klb != 0:
@@ -9671,6 +10146,32 @@ def render_tripping_analysis() -> None:
             "Si hay datos, Gamma Ray y DLS pueden mostrarse como tracks laterales a la izquierda del Hookload."
         )
 
+        # Torque rotando fuera de fondo (solo si el modelo trae TQ_<ff>: soft-string con OD > 0)
+        if tq_curve is not None and not tq_curve.empty and tq_curve.notna().any():
+            fig_tq = go.Figure()
+            fig_tq.add_trace(go.Scatter(
+                x=tq_curve, y=model_df["Depth"],
+                mode="lines",
+                name=f"Modelo TQ @ FF={ff_val:.2f}",
+                line=dict(width=2.1, shape="spline", smoothing=1.2, color="#FECB52"),
+            ))
+            fig_tq.update_layout(
+                xaxis=dict(title="Torque rotando fuera de fondo (klbf·ft)", showgrid=True, gridcolor="rgba(255,255,255,0.08)", zeroline=False),
+                yaxis=dict(title="Profundidad (m)", showgrid=True, gridcolor="rgba(255,255,255,0.08)", zeroline=False),
+                template="plotly_dark",
+                paper_bgcolor="rgba(0,0,0,0)",
+                plot_bgcolor="rgba(0,0,0,0)",
+                height=420,
+                margin=dict(l=70, r=30, t=50, b=40),
+                legend=dict(orientation="h", yanchor="bottom", y=1.03, xanchor="right", x=1, bgcolor="rgba(0,0,0,0)"),
+                hovermode="closest",
+            )
+            fig_tq.update_yaxes(autorange="reversed")
+            st.plotly_chart(fig_tq, use_container_width=True, config=PLOTLY_CONFIG)
+            st.caption(
+                "TQ = torque rotando fuera de fondo del modelo soft-string para el FF seleccionado (sin offset de Hookload)."
+            )
+
         with st.expander("Datos usados (puntos medidos)", expanded=False):
             st.dataframe(df_rt.head(200), use_container_width=True, hide_index=True)
 
@@ -10849,6 +11350,7 @@ def compute_rop_zone_stats(
     bins: int = 20,
     min_points_per_bin: int = 3,
     density_percentile_trim: tuple[float, float] | None = None,
+    fixed_range: tuple[float, float, float, float] | None = None,
 ) -> dict | None:
     """
     Agrupa WOB×RPM en una grilla y calcula ROP medio por celda.
@@ -10861,6 +11363,10 @@ def compute_rop_zone_stats(
     si casi todo el trabajo fue en una “nube” pequeña, verás **mucho negro** fuera de esa nube.
     Opcionalmente ``density_percentile_trim=(2, 98)`` recorta outliers en el plano WOB×RPM antes
     de binar, para que los bins se concentren donde hay más datos.
+
+    ``fixed_range=(wob_min, wob_max, rpm_min, rpm_max)`` usa bordes fijos (los puntos fuera
+    se descartan) para que las grillas de distintas corridas se puedan fusionar.
+    El dict incluye ``grid`` (``ZoneGrid`` con conteo/suma/suma² por celda) y ``std``.
     """
     needed = [wob_col, rpm_col, rop_col]
     if any(c not in df.columns for c in needed):
@@ -10884,53 +11390,12 @@ def compute_rop_zone_stats(
         if len(d_sub) >= max(30, int(bins) * 2):
             d = d_sub
 
-    stat, x_edges, y_edges, binnumber = binned_statistic_2d(
-        d[wob_col].to_numpy(),
-        d[rpm_col].to_numpy(),
-        d[rop_col].to_numpy(),
-        statistic="mean",
-        bins=bins,
-    )
-    counts, _, _, _ = binned_statistic_2d(
-        d[wob_col].to_numpy(),
-        d[rpm_col].to_numpy(),
-        d[rop_col].to_numpy(),
-        statistic="count",
-        bins=[x_edges, y_edges],
-    )
-    stat = np.where(counts >= max(1, int(min_points_per_bin)), stat, np.nan)
-    if np.isnan(stat).all():
-        return None
-
-    max_idx = np.nanargmax(stat)
-    i, j = np.unravel_index(max_idx, stat.shape)
-    best_wob_low, best_wob_high = x_edges[i], x_edges[i + 1]
-    best_rpm_low, best_rpm_high = y_edges[j], y_edges[j + 1]
-    center_wob = (best_wob_low + best_wob_high) / 2.0
-    center_rpm = (best_rpm_low + best_rpm_high) / 2.0
-    best_rop = float(stat[i, j])
-    best_count = int(counts[i, j])
-
-    x_centers = (x_edges[:-1] + x_edges[1:]) / 2.0
-    y_centers = (y_edges[:-1] + y_edges[1:]) / 2.0
-
-    return {
-        "stat": stat,
-        "counts": counts,
-        "x_edges": x_edges,
-        "y_edges": y_edges,
-        "x_centers": x_centers,
-        "y_centers": y_centers,
-        "best_bin": (i, j),
-        "best_rop": best_rop,
-        "best_wob_low": float(best_wob_low),
-        "best_wob_high": float(best_wob_high),
-        "best_rpm_low": float(best_rpm_low),
-        "best_rpm_high": float(best_rpm_high),
-        "best_wob_center": float(center_wob),
-        "best_rpm_center": float(center_rpm),
-        "best_count": best_count,
-    }
+    if fixed_range is not None:
+        grid = ZoneGrid.from_range(*fixed_range, bins=int(bins))
+        grid.update(d[wob_col].to_numpy(), d[rpm_col].to_numpy(), d[rop_col].to_numpy())
+    else:
+        grid = ZoneGrid.from_data(d[wob_col].to_numpy(), d[rpm_col].to_numpy(), d[rop_col].to_numpy(), bins=int(bins))
+    return grid.zone_stats(min_points_per_bin)
 
 
 def build_optimal_rop_heatmap(zone_stats: dict, title: str = "Heatmap ROP vs WOB-RPM") -> go.Figure:
@@ -11051,6 +11516,83 @@ def build_optimal_rop_heatmap(zone_stats: dict, title: str = "Heatmap ROP vs WOB
     return prettify_heatmap_auto(fig, h=640)
 
 
+def render_rop_grid_accumulator(zone_stats: dict | None, min_points: int, run_name: str) -> None:
+    """Suma grillas WOB×RPM de corridas (esta o JSON exportados) en una grilla acumulada de pozo/campo."""
+    grid = zone_stats.get("grid") if zone_stats else None
+    acc: ZoneGrid | None = st.session_state.get("kpi_rop_grid_acc")
+    with st.expander("Grilla acumulada (pozo / campo)", expanded=acc is not None):
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            if st.button("➕ Sumar esta corrida", key="kpi_rop_grid_add", disabled=grid is None):
+                try:
+                    acc = grid if acc is None else acc.merge(grid)
+                    st.session_state["kpi_rop_grid_acc"] = acc
+                except ValueError as e:
+                    st.error(str(e))
+        with c2:
+            if grid is not None:
+                st.download_button(
+                    "⬇️ Grilla de esta corrida (JSON)",
+                    data=grid.to_json(),
+                    file_name=f"{Path(run_name).stem}_grilla_rop.json",
+                    mime="application/json",
+                    key="kpi_rop_grid_dl_run",
+                )
+        with c3:
+            if st.button("🗑️ Vaciar acumulada", key="kpi_rop_grid_clear", disabled=acc is None):
+                st.session_state.pop("kpi_rop_grid_acc", None)
+                acc = None
+
+        grid_files = st.file_uploader(
+            "Grillas exportadas de otras corridas (JSON)",
+            type=["json"],
+            accept_multiple_files=True,
+            key="kpi_rop_grid_files",
+        )
+        if grid_files and st.button("Fusionar grillas cargadas", key="kpi_rop_grid_merge"):
+            for f in grid_files:
+                try:
+                    other = ZoneGrid.from_json(f.getvalue())
+                    acc = other if acc is None else acc.merge(other)
+                except (ValueError, KeyError) as e:
+                    st.error(f"{f.name}: {e}")
+            st.session_state["kpi_rop_grid_acc"] = acc
+
+        if acc is None:
+            st.caption("Suma corridas con la misma **grilla fija** para ver la mejor zona a nivel pozo o campo.")
+            return
+        acc_stats = acc.zone_stats(min_points)
+        st.caption(
+            f"Acumulado: **{int(acc.count.sum()):,}** muestras en {acc.shape[0]}×{acc.shape[1]} celdas"
+            + (f" ({acc.dropped:,} fuera de la grilla)." if acc.dropped else ".")
+        )
+        if acc_stats is None:
+            st.info("La grilla acumulada aún no tiene celdas con el mínimo de puntos por bin.")
+        else:
+            i, j = acc_stats["best_bin"]
+            _std = acc_stats["std"][i, j]
+            st.success(
+                "Mejor zona acumulada: "
+                f"WOB {acc_stats['best_wob_low']:.2f}–{acc_stats['best_wob_high']:.2f}, "
+                f"RPM {acc_stats['best_rpm_low']:.2f}–{acc_stats['best_rpm_high']:.2f}, "
+                f"ROP medio {acc_stats['best_rop']:.2f}"
+                + (f" ± {_std:.2f}" if np.isfinite(_std) else "")
+                + f" ({acc_stats['best_count']} puntos)."
+            )
+            st.plotly_chart(
+                build_optimal_rop_heatmap(acc_stats, title="Heatmap acumulado de mejor zona de ROP"),
+                use_container_width=True,
+                config=PLOTLY_CONFIG,
+            )
+        st.download_button(
+            "⬇️ Grilla acumulada (JSON)",
+            data=acc.to_json(),
+            file_name="grilla_rop_acumulada.json",
+            mime="application/json",
+            key="kpi_rop_grid_dl_acc",
+        )
+
+
 def render_kpi_csv_optimizer() -> None:
     st.markdown("### Optimizador de ROP desde CSV")
     st.caption(
@@ -11116,6 +11658,27 @@ def render_kpi_csv_optimizer() -> None:
         key="kpi_csv_focus_dense_hm",
         help="Quita outliers en el plano WOB×RPM antes de armar la grilla: el mapa usa el rango donde está la mayoría de puntos y se reduce el área negra vacía.",
     )
+    fixed_range = None
+    with st.expander("Grilla fija (para acumular corridas en pozo / campo)", expanded=False):
+        st.caption(
+            "Con bordes fijos las grillas de distintas corridas son compatibles: se suman conteo, suma y suma² por celda "
+            "sin volver a cargar los datos crudos. Los puntos fuera del rango se descartan."
+        )
+        use_fixed_grid = st.checkbox("Usar grilla fija", value=False, key="kpi_csv_fixed_grid")
+        fg = st.columns(4)
+        with fg[0]:
+            fixed_wob_min = st.number_input("WOB mín.", value=0.0, step=1.0, key="kpi_csv_fixed_wob_min")
+        with fg[1]:
+            fixed_wob_max = st.number_input("WOB máx.", value=50.0, step=1.0, key="kpi_csv_fixed_wob_max")
+        with fg[2]:
+            fixed_rpm_min = st.number_input("RPM mín.", value=0.0, step=5.0, key="kpi_csv_fixed_rpm_min")
+        with fg[3]:
+            fixed_rpm_max = st.number_input("RPM máx.", value=250.0, step=5.0, key="kpi_csv_fixed_rpm_max")
+        if use_fixed_grid:
+            if fixed_wob_max > fixed_wob_min and fixed_rpm_max > fixed_rpm_min:
+                fixed_range = (fixed_wob_min, fixed_wob_max, fixed_rpm_min, fixed_rpm_max)
+            else:
+                st.warning("Los máximos deben ser mayores que los mínimos; se usa la grilla del archivo.")
 
     selected_numeric = [c for c in [rop_col, wob_col, rpm_col] if c and c != "<ninguna>"]
     if depth_col != "<ninguna>":
@@ -11143,6 +11706,7 @@ def render_kpi_csv_optimizer() -> None:
         bins=int(bins),
         min_points_per_bin=int(min_points),
         density_percentile_trim=(2.0, 98.0) if focus_dense_cloud else None,
+        fixed_range=fixed_range,
     )
 
     na_counts = df_raw[[c for c in [rop_col, wob_col, rpm_col] if c in df_raw.columns]].isna().sum()
@@ -11200,8 +11764,16 @@ def render_kpi_csv_optimizer() -> None:
                 "**Zonas vacías:** igual que en el dashboard — pocos puntos por celda o combinación WOB×RPM no usada; opción **P2–P98** para enfocar el núcleo."
             )
 
+    render_rop_grid_accumulator(zone_stats, int(min_points), uploaded_csv.name)
+
     _depth_sel = depth_col if depth_col != "<ninguna>" else None
     _fig_top_zones = build_rop_top_zones_bar_figure(zone_stats, top_n=8) if zone_stats is not None else None
+    _depth_window = None
+    if _depth_sel and len(df_processed) > PLOT_MAX_POINTS:
+        _dvals = pd.to_numeric(df_processed[_depth_sel], errors="coerce")
+        _depth_window = plot_zoom_window(
+            "kpi_csv_depth_zoom", _dvals.min(), _dvals.max(), "Ventana de profundidad – detalle al acotar"
+        )
     _fig_depth_curves, _depth_franja_chips = build_kpi_depth_curves_figure(
         df_processed,
         _depth_sel,
@@ -11209,6 +11781,7 @@ def render_kpi_csv_optimizer() -> None:
         wob_work_col,
         rpm_work_col,
         zone_stats=zone_stats,
+        x_range=_depth_window,
     )
     if _fig_top_zones is not None or _fig_depth_curves is not None:
         st.markdown("#### Contexto operativo")
@@ -0,0 +1,227 @@
+"""Motor vectorizado de curvas broomstick (Hookload vs profundidad por FF).
+
+Calcula PU (Trip Out), SO (Trip In) y ROT para todos los factores de fricción a
+la vez sobre una matriz (profundidad × FF):
+
+- ``simplified``: incremento por tramo ``Δs · w · (cos I ± FF · sin I)``
+  acumulado con ``cumsum`` (mismo resultado que el bucle original).
+- ``soft_string``: modelo soft-string (Johancsik) con contribución de la
+  severidad de pata de perro: la normal por tramo es
+  ``N = sqrt((T·Δα·sin Ī)² + (T·ΔI + w·Δs·sin Ī)²)`` y depende de la tensión,
+  así que se integra desde la barrena hacia arriba. Se resuelve para todas las
+  posiciones de barrena y FF en la misma pasada (una iteración por estación) y
+  se interpola a la malla de salida. Si se da el OD de la tubería también se
+  obtiene el torque rotando fuera de fondo (``TQ``).
+
+Como el modelo original, la sarta se integra desde MD mínimo. Los resultados se
+cachean por huella del survey + parámetros.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+KG_TO_KLB = 0.00220462
+MODELS = ("simplified", "soft_string")
+SOFT_STRING_STATION_M = 10.0
+CACHE_SIZE = 16
+IN_TO_M = 0.0254
+# Torque en klbf·ft a partir de fuerza en klb y radio en m.
+M_TO_FT = 3.28084
+
+_CACHE: "OrderedDict[tuple, tuple[pd.DataFrame, dict]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def survey_hash(survey_df: pd.DataFrame | None) -> str:
+    """Huella del contenido del survey (MD, inclinación y azimut si existe)."""
+    if survey_df is None or survey_df.empty:
+        return ""
+    cols = [c for c in ("Depth", "Inclination", "Azimuth") if c in survey_df.columns]
+    data = survey_df[cols].to_numpy(dtype=float)
+    return hashlib.sha1(repr(cols).encode() + np.ascontiguousarray(data).tobytes()).hexdigest()
+
+
+def _inclination_profile(
+    md: np.ndarray,
+    md_min: float,
+    md_max: float,
+    inclination_deg: float,
+    inc_surface_deg: float | None,
+    inc_td_deg: float | None,
+    survey: pd.DataFrame | None,
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """Inclinación (y azimut, si el survey lo trae) en grados en cada ``md``."""
+    if survey is not None:
+        inc = np.interp(md, survey["Depth"].to_numpy(dtype=float), survey["Inclination"].to_numpy(dtype=float))
+        azi = None
+        if "Azimuth" in survey.columns and survey["Azimuth"].notna().all():
+            # Azimut desenrollado para que 359° → 1° no interpole por 180°.
+            azi_unwrapped = np.degrees(np.unwrap(np.radians(survey["Azimuth"].to_numpy(dtype=float))))
+            azi = np.interp(md, survey["Depth"].to_numpy(dtype=float), azi_unwrapped)
+        return inc, azi
+    if inc_surface_deg is not None and inc_td_deg is not None and abs(inc_surface_deg - inc_td_deg) > 0.01:
+        span = float(md_max - md_min) if md_max != md_min else 1.0
+        t = (md - md_min) / span
+        return inc_surface_deg + t * (inc_td_deg - inc_surface_deg), None
+    return np.full(md.shape, float(inclination_deg)), None
+
+
+def _simplified(depths, inc_deg, ff, w, scale, block):
+    inc = np.radians(inc_deg[1:])
+    step = np.diff(depths)[:, None] * w * scale
+    cos_i = np.cos(inc)[:, None]
+    sin_i = np.sin(inc)[:, None]
+    first = np.full((1, ff.size), block)
+    pu = np.vstack([first, block + np.cumsum(step * (cos_i + ff * sin_i), axis=0)])
+    so = np.vstack([first, block + np.cumsum(step * (cos_i - ff * sin_i), axis=0)])
+    rot = np.vstack([first, block + np.cumsum(np.broadcast_to(step * cos_i, pu[1:].shape), axis=0)])
+    return {"PU": pu, "SO": so, "ROT": rot}
+
+
+def _soft_string(stations, inc_deg, azi_deg, ff, w, scale, block, radius_m):
+    """
+    Tensión en superficie para una barrena en cada estación (filas) y cada FF
+    (columnas). Se recorre de la estación más profunda a la superficie; en el
+    tramo j solo están activas las barrenas por debajo de j.
+    """
+    m = stations.size
+    inc = np.radians(inc_deg)
+    d_s = np.diff(stations)
+    inc_avg = 0.5 * (inc[1:] + inc[:-1])
+    d_inc = np.diff(inc)
+    d_azi = np.diff(np.radians(azi_deg)) if azi_deg is not None else np.zeros(m - 1)
+    w_seg = w * d_s * scale
+    sin_avg = np.sin(inc_avg)
+    cos_avg = np.cos(inc_avg)
+
+    t_pu = np.zeros((m, ff.size))
+    t_so = np.zeros((m, ff.size))
+    t_rot = np.zeros((m, 1))
+    torque = np.zeros((m, ff.size))
+    for j in range(m - 2, -1, -1):
+        act = slice(j + 1, m)  # barrenas por debajo de la estación j
+        axial = w_seg[j] * cos_avg[j]
+        lateral = w_seg[j] * sin_avg[j]
+        n_pu = np.hypot(t_pu[act] * d_azi[j] * sin_avg[j], t_pu[act] * d_inc[j] + lateral)
+        n_so = np.hypot(t_so[act] * d_azi[j] * sin_avg[j], t_so[act] * d_inc[j] + lateral)
+        n_rot = np.hypot(t_rot[act] * d_azi[j] * sin_avg[j], t_rot[act] * d_inc[j] + lateral)
+        t_pu[act] += axial + ff * n_pu
+        t_so[act] += axial - ff * n_so
+        t_rot[act] += axial
+        if radius_m:
+            torque[act] += ff * n_rot * radius_m * M_TO_FT
+    out = {"PU": block + t_pu, "SO": block + t_so, "ROT": block + np.broadcast_to(t_rot, t_pu.shape)}
+    if radius_m:
+        out["TQ"] = torque
+    return out
+
+
+def broomstick_curves(
+    md_min_m: float,
+    md_max_m: float,
+    step_m: float,
+    weight_per_m_kg: float,
+    buoyancy_factor: float,
+    inclination_deg: float,
+    ff_values: list[float],
+    output_klb: bool = True,
+    block_weight_klb: float = 0.0,
+    inclination_surface_deg: float | None = None,
+    inclination_td_deg: float | None = None,
+    survey_df: pd.DataFrame | None = None,
+    model: str = "simplified",
+    pipe_od_in: float = 0.0,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Familia de curvas ``Depth, PU_<ff>, SO_<ff>, ROT_<ff>`` (+ ``TQ_<ff>`` en
+    soft-string con OD) y el mapa ``{"PU": {ff: col}, …}``.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Modelo no soportado: {model}")
+    if step_m <= 0 or md_max_m <= md_min_m or not ff_values:
+        return pd.DataFrame(), {}
+
+    survey = None
+    if survey_df is not None and not survey_df.empty and {"Depth", "Inclination"} <= set(survey_df.columns):
+        survey = survey_df.dropna(subset=["Depth", "Inclination"]).sort_values("Depth")
+        if len(survey) < 2:
+            survey = None
+
+    ffs = sorted({round(float(f), 2) for f in ff_values})
+    key = (
+        survey_hash(survey),
+        float(md_min_m), float(md_max_m), float(step_m), float(weight_per_m_kg), float(buoyancy_factor),
+        float(inclination_deg), tuple(ffs), bool(output_klb), float(block_weight_klb or 0.0),
+        inclination_surface_deg, inclination_td_deg, model, float(pipe_od_in or 0.0),
+    )
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            cache_stats["hits"] += 1
+            return hit[0].copy(), {k: dict(v) for k, v in hit[1].items()}
+        cache_stats["misses"] += 1
+
+    depths = np.round(np.arange(md_min_m, md_max_m + step_m * 0.5, step_m), 2)
+    w = float(weight_per_m_kg) * float(buoyancy_factor)
+    scale = KG_TO_KLB if output_klb else 1.0
+    block = float(block_weight_klb or 0.0)
+    ff = np.asarray(ffs, dtype=float)[None, :]
+
+    linear = (
+        inclination_surface_deg is not None
+        and inclination_td_deg is not None
+        and abs(inclination_surface_deg - inclination_td_deg) > 0.01
+    )
+    if model == "simplified" and survey is None and not linear:
+        # Inclinación constante: forma cerrada (recta desde MD 0), como el modelo original.
+        inc = np.radians(float(inclination_deg))
+        base = depths[:, None] * w * scale
+        curves = {
+            "PU": block + base * (np.cos(inc) + ff * np.sin(inc)),
+            "SO": block + base * (np.cos(inc) - ff * np.sin(inc)),
+            "ROT": np.broadcast_to(block + base * np.cos(inc), (depths.size, ff.shape[1])),
+        }
+    elif model == "simplified":
+        inc, _ = _inclination_profile(
+            depths, md_min_m, md_max_m, inclination_deg, inclination_surface_deg, inclination_td_deg, survey
+        )
+        curves = _simplified(depths, inc, ff, w, scale, block)
+    else:
+        # Estaciones: malla regular + estaciones del survey (donde cambia la trayectoria).
+        stations = np.arange(md_min_m, md_max_m + SOFT_STRING_STATION_M * 0.5, SOFT_STRING_STATION_M)
+        if survey is not None:
+            sd = survey["Depth"].to_numpy(dtype=float)
+            stations = np.concatenate([stations, sd[(sd > md_min_m) & (sd < md_max_m)]])
+        stations = np.unique(np.clip(np.append(stations, [md_min_m, md_max_m]), md_min_m, md_max_m))
+        inc, azi = _inclination_profile(
+            stations, md_min_m, md_max_m, inclination_deg, inclination_surface_deg, inclination_td_deg, survey
+        )
+        radius_m = 0.5 * float(pipe_od_in or 0.0) * IN_TO_M
+        at_stations = _soft_string(stations, inc, azi, ff, w, scale, block, radius_m)
+        curves = {
+            mode: np.column_stack([np.interp(depths, stations, vals[:, k]) for k in range(ff.shape[1])])
+            for mode, vals in at_stations.items()
+        }
+
+    out = {"Depth": depths}
+    fam: dict = {mode: {} for mode in ("PU", "SO", "ROT")}
+    for k, f in enumerate(ffs):
+        for mode, mat in curves.items():
+            col = f"{mode}_{f:.2f}"
+            out[col] = mat[:, k]
+            fam.setdefault(mode, {})[f] = col
+    cols = ["Depth"] + [f"{mode}_{f:.2f}" for f in ffs for mode in curves]
+    df = pd.DataFrame(out)[cols]
+    with _CACHE_LOCK:
+        _CACHE[key] = (df, fam)
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return df.copy(), {k: dict(v) for k, v in fam.items()}
@@ -0,0 +1,120 @@
+"""Reducción de puntos para gráficas largas (profundidad o tiempo).
+
+Mandar 500k muestras por traza a Plotly genera decenas de MB en el navegador.
+Aquí cada traza se limita a un presupuesto de puntos conservando su forma:
+
+- ``lttb``: Largest-Triangle-Three-Buckets; elige en cada bucket el punto que
+  forma el triángulo más grande con el anterior elegido y la media del
+  siguiente bucket. Buena forma visual para curvas suaves.
+- ``minmax``: mínimo y máximo de cada bucket (un bucket por "píxel" de ancho):
+  no pierde picos, ideal para señales ruidosas como Hookload.
+
+Siempre se conservan el primer y el último punto y los índices marcados en
+``keep`` (outliers, eventos). ``x_range`` recorta antes de reducir, para volver
+a pedir detalle al hacer zoom en una ventana.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+DEFAULT_MAX_POINTS = 4000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices elegidos por LTTB (``x`` ordenado, sin NaN)."""
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Buckets interiores de igual número de muestras; el primero y el último punto van fijos.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    csum_x = np.r_[0.0, np.cumsum(x)]
+    csum_y = np.r_[0.0, np.cumsum(y)]
+    # Media del bucket siguiente (el del último bucket interior es el último punto).
+    nxt_s = np.r_[starts[1:], n - 1]
+    nxt_e = np.r_[ends[1:], n]
+    cnt = np.maximum(nxt_e - nxt_s, 1)
+    avg_x = (csum_x[nxt_e] - csum_x[nxt_s]) / cnt
+    avg_y = (csum_y[nxt_e] - csum_y[nxt_s]) / cnt
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    a = 0
+    for b, (s, e) in enumerate(zip(starts, ends)):
+        xs, ys = x[s:e], y[s:e]
+        area = np.abs((x[a] - avg_x[b]) * (ys - y[a]) - (x[a] - xs) * (avg_y[b] - y[a]))
+        a = s + int(np.argmax(area))
+        out[b + 1] = a
+    out[-1] = n - 1
+    return out
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Índices del mínimo y máximo de ``y`` por bucket de igual ancho en ``x`` (ordenado)."""
+    n = x.size
+    if n_buckets * 2 >= n or n_buckets < 1:
+        return np.arange(n)
+    span = x[-1] - x[0]
+    if not span > 0:
+        edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+        bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    else:
+        bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    pos = np.arange(n)
+    hi = np.maximum.reduceat(y, starts)
+    lo = np.minimum.reduceat(y, starts)
+    i_hi = np.minimum.reduceat(np.where(y == np.repeat(hi, counts), pos, n), starts)
+    i_lo = np.minimum.reduceat(np.where(y == np.repeat(lo, counts), pos, n), starts)
+    return np.unique(np.r_[0, i_lo, i_hi, n - 1])
+
+
+def downsample_indices(
+    x,
+    y,
+    max_points: int = DEFAULT_MAX_POINTS,
+    method: str = "lttb",
+    keep=None,
+    x_range: tuple[float, float] | None = None,
+) -> np.ndarray:
+    """
+    Posiciones (ordenadas) a graficar de la serie ``(x, y)`` ya ordenada por ``x``.
+    ``keep`` es una máscara booleana o lista de posiciones que siempre se conservan;
+    los valores no finitos se descartan.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método de reducción no soportado: {method}")
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    window = np.isfinite(x) & np.isfinite(y)
+    if x_range is not None:
+        window &= (x >= x_range[0]) & (x <= x_range[1])
+    base = np.flatnonzero(window)
+
+    forced = np.array([], dtype=np.int64)
+    if keep is not None:
+        keep = np.asarray(keep)
+        forced = np.flatnonzero(keep) if keep.dtype == bool else keep.astype(np.int64)
+        forced = forced[(forced >= 0) & (forced < n)]
+        forced = forced[window[forced]]
+
+    budget = int(max_points) - forced.size
+    if base.size <= max_points or budget < 3:
+        chosen = base if base.size <= max_points else base[lttb_indices(x[base], y[base], 3)]
+    elif method == "lttb":
+        chosen = base[lttb_indices(x[base], y[base], budget)]
+    else:
+        chosen = base[minmax_indices(x[base], y[base], max(1, budget // 2 - 1))]
+    return np.union1d(chosen, forced)
+
+
+def downsample_frame(df, x_col: str, y_col: str, max_points: int = DEFAULT_MAX_POINTS, method: str = "lttb", keep=None, x_range=None):
+    """``df`` reducido a las filas elegidas para ``y_col`` vs ``x_col`` (``df`` ordenado por ``x_col``)."""
+    if len(df) <= max_points and x_range is None:
+        return df
+    idx = downsample_indices(df[x_col].to_numpy(dtype=float), df[y_col].to_numpy(dtype=float), max_points, method, keep, x_range)
+    return df.iloc[idx]
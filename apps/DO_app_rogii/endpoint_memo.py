@@ -0,0 +1,215 @@
+"""Memoria de endpoints descubiertos para la API de SOLO.
+
+Varias llamadas prueban una lista de rutas candidatas hasta que una responde
+(cada tenant expone una variante distinta). Este módulo recuerda, por
+``base_url`` y tipo de llamada, qué plantilla de ruta funcionó para probarla
+primero la próxima vez. Se persiste en un JSON local con TTL, así que sobrevive
+a reinicios y se comparte entre sesiones de Streamlit.
+
+Solo se recuerda una ruta de respaldo si las anteriores fallaron por "no
+soportada" (404/405/410/501): tras un fallo transitorio (timeout, 5xx, token
+vencido) la que respondió puede devolver otra forma de payload y no debe quedar
+fijada para todo el proceso.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, TypeVar
+
+DEFAULT_TTL_S = 7 * 24 * 3600
+NOT_SUPPORTED_STATUS = frozenset({404, 405, 410, 501})
+# Los errores HTTP de la app llevan el estado como ``GET <url> -> 404``.
+_STATUS_RE = re.compile(r"->\s*(\d{3})\b")
+
+T = TypeVar("T")
+
+
+def candidate_key(path: str, params: dict | None, ids: dict[str, str] | None = None) -> str:
+    """
+    Plantilla estable de un candidato: la ruta con los UUID sustituidos por
+    ``{nombre}`` más los nombres de los params (sin valores).
+    """
+    template = str(path)
+    for name, value in (ids or {}).items():
+        if value:
+            template = template.replace(str(value), "{" + name + "}")
+    keys = ",".join(sorted(str(k) for k in (params or {})))
+    return f"{template}?{keys}"
+
+
+def error_status(exc: BaseException) -> int | None:
+    """Código HTTP de un error (atributo ``status_code``/``response`` o texto ``-> NNN``)."""
+    for obj in (exc, getattr(exc, "response", None)):
+        code = getattr(obj, "status_code", None)
+        if isinstance(code, int):
+            return code
+    m = _STATUS_RE.search(str(exc))
+    return int(m.group(1)) if m else None
+
+
+def is_not_supported(exc: BaseException) -> bool:
+    """True si el error indica que la ruta no existe en este tenant (no un fallo transitorio)."""
+    return error_status(exc) in NOT_SUPPORTED_STATUS
+
+
+class EndpointMemo:
+    """Caché ``(base_url, kind) -> plantilla ganadora`` persistida en disco."""
+
+    def __init__(self, path: str | Path, ttl_s: float = DEFAULT_TTL_S):
+        self.path = Path(path)
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved_round_trips = 0
+        self.wasted_round_trips = 0
+        self._load()
+
+    @staticmethod
+    def _entry_id(base_url: str, kind: str) -> str:
+        return f"{(base_url or '').rstrip('/').lower()}|{kind}"
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            now = time.time()
+            self._entries = {
+                k: v
+                for k, v in data.items()
+                if isinstance(v, dict) and now - float(v.get("ts", 0)) < self.ttl_s
+            }
+
+    def _save(self) -> None:
+        # Escritura atómica: otro proceso nunca ve un JSON a medias.
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def lookup(self, base_url: str, kind: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(self._entry_id(base_url, kind))
+            if not entry:
+                return None
+            if time.time() - float(entry.get("ts", 0)) >= self.ttl_s:
+                self._entries.pop(self._entry_id(base_url, kind), None)
+                return None
+            return entry.get("key")
+
+    def remember(self, base_url: str, kind: str, key: str) -> None:
+        with self._lock:
+            eid = self._entry_id(base_url, kind)
+            prev = self._entries.get(eid)
+            if prev and prev.get("key") == key and time.time() - float(prev.get("ts", 0)) < self.ttl_s / 2:
+                return
+            self._entries[eid] = {"key": key, "ts": time.time()}
+            self._save()
+
+    def forget(self, base_url: str, kind: str) -> None:
+        with self._lock:
+            if self._entries.pop(self._entry_id(base_url, kind), None) is not None:
+                self._save()
+
+    def try_candidates(
+        self,
+        base_url: str,
+        kind: str,
+        candidates: list[tuple[str, dict | None]],
+        call: Callable[[str, dict | None], T],
+        ids: dict[str, str] | None = None,
+        errors_out: list[str] | None = None,
+        retry_on: tuple[type[BaseException], ...] = (RuntimeError,),
+        not_supported: Callable[[BaseException], bool] = is_not_supported,
+    ) -> T:
+        """
+        Prueba ``candidates`` (ruta, params) con ``call`` empezando por la plantilla
+        recordada. Guarda la que funcione solo si las anteriores fallaron por
+        ``not_supported``; tras un fallo transitorio no se toca la memoria. Si
+        ninguna funciona relanza el último error (los mensajes quedan en
+        ``errors_out``).
+        """
+        keys = [candidate_key(p, prm, ids) for p, prm in candidates]
+        remembered = self.lookup(base_url, kind)
+        order = list(range(len(candidates)))
+        first = keys.index(remembered) if remembered in keys else None
+        if first is not None:
+            order.remove(first)
+            order.insert(0, first)
+
+        errors = errors_out if errors_out is not None else []
+        last_exc: BaseException | None = None
+        transient = False
+        remembered_failed = False
+        for n, i in enumerate(order):
+            path, params = candidates[i]
+            try:
+                result = call(path, params)
+            except retry_on as e:
+                errors.append(str(e))
+                last_exc = e
+                if not not_supported(e):
+                    transient = True
+                elif first is not None and n == 0:
+                    remembered_failed = True
+                continue
+            with self._lock:
+                if first is not None and n == 0:
+                    self.hits += 1
+                    self.saved_round_trips += i
+                else:
+                    self.misses += 1
+                    self.wasted_round_trips += n
+            if not transient:
+                self.remember(base_url, kind, keys[i])
+            return result
+
+        with self._lock:
+            self.misses += 1
+            self.wasted_round_trips += len(order)
+        if remembered_failed:
+            self.forget(base_url, kind)
+        if last_exc is None:
+            raise RuntimeError("Sin candidatos")
+        raise last_exc
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "saved_round_trips": self.saved_round_trips,
+                "wasted_round_trips": self.wasted_round_trips,
+                "entries": len(self._entries),
+            }
+
+
+_MEMOS: dict[str, EndpointMemo] = {}
+_MEMOS_LOCK = threading.Lock()
+
+
+def get_endpoint_memo(path: str | Path, ttl_s: float = DEFAULT_TTL_S) -> EndpointMemo:
+    """Instancia compartida por archivo (una por proceso)."""
+    key = str(Path(path).resolve())
+    with _MEMOS_LOCK:
+        memo = _MEMOS.get(key)
+        if memo is None:
+            memo = EndpointMemo(path, ttl_s)
+            _MEMOS[key] = memo
+        return memo
@@ -0,0 +1,182 @@
+"""Modo en vivo: descarga solo la cola nueva de cada traza.
+
+Cada traza tiene un ``TailBuffer`` que acumula las muestras ya ingeridas y
+recuerda la última coordenada (tiempo o profundidad). En cada refresco se pide
+solo ``from=last_seen`` y se anexan las filas nuevas, de modo que el tráfico es
+O(muestras nuevas) en vez de O(histórico). Incluye además un helper para
+recalcular una mediana móvil centrada solo en la parte afectada por la cola.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, MutableMapping
+
+import numpy as np
+import pandas as pd
+
+TIME_X_CANDIDATES = ("time", "timestamp", "datetime", "date", "index")
+DEPTH_X_CANDIDATES = ("depth", "md", "measured_depth", "survey_md", "bit depth", "index")
+DEPTH_TAIL_SPAN_M = 50000.0
+DEFAULT_MAX_ROWS = 2_000_000
+
+
+def pick_x_col(df: pd.DataFrame, domain: str = "TIME") -> str | None:
+    """Columna de coordenada (tiempo o profundidad) de una traza."""
+    candidates = TIME_X_CANDIDATES if str(domain).upper() == "TIME" else DEPTH_X_CANDIDATES
+    lowered = {str(c).strip().lower(): c for c in df.columns}
+    for cand in candidates:
+        if cand in lowered:
+            return lowered[cand]
+    return None
+
+
+def _coords(s: pd.Series, domain: str) -> pd.Series:
+    if str(domain).upper() == "TIME":
+        return pd.to_datetime(s, errors="coerce", utc=True)
+    return pd.to_numeric(s, errors="coerce")
+
+
+@dataclass
+class TailBuffer:
+    """Muestras acumuladas de una traza + última coordenada ingerida."""
+
+    domain: str = "TIME"
+    x_col: str | None = None
+    frame: pd.DataFrame = field(default_factory=pd.DataFrame)
+    last_seen: Any = None
+    max_rows: int | None = DEFAULT_MAX_ROWS
+    full_loads: int = 0
+    tail_fetches: int = 0
+    rows_received: int = 0
+    rows_appended: int = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.last_seen is not None and not self.frame.empty
+
+    def reset(self) -> None:
+        self.frame = pd.DataFrame()
+        self.last_seen = None
+        self.x_col = None
+
+    def ingest(self, df: pd.DataFrame | None, full: bool = False) -> pd.DataFrame:
+        """
+        Anexa ``df`` al buffer y devuelve solo las filas nuevas.
+
+        ``full=True`` reemplaza el contenido (carga inicial). En modo cola se descartan
+        las filas con coordenada <= ``last_seen`` (el solapamiento del ``from``).
+        """
+        if full:
+            self.reset()
+            self.full_loads += 1
+        else:
+            self.tail_fetches += 1
+        if df is None or df.empty:
+            return pd.DataFrame()
+        self.rows_received += len(df)
+        if self.x_col is None or self.x_col not in df.columns:
+            self.x_col = pick_x_col(df, self.domain)
+        if self.x_col is None:
+            # Sin coordenada no hay forma de hacer cola: se queda como carga completa.
+            self.frame = df.reset_index(drop=True)
+            return self.frame
+
+        x = _coords(df[self.x_col], self.domain)
+        mask = x.notna()
+        if self.last_seen is not None:
+            mask &= x > self.last_seen
+        new = df.loc[mask]
+        if new.empty:
+            return new
+        order = np.argsort(x[mask].to_numpy(), kind="stable")
+        new = new.iloc[order].drop_duplicates(subset=[self.x_col], keep="first")
+        self.frame = new.reset_index(drop=True) if self.frame.empty else pd.concat([self.frame, new], ignore_index=True)
+        if self.max_rows and len(self.frame) > self.max_rows:
+            self.frame = self.frame.iloc[-self.max_rows:].reset_index(drop=True)
+        self.last_seen = x[mask].max()
+        self.rows_appended += len(new)
+        return new
+
+    def tail_params(self, params: dict | None) -> dict:
+        """
+        Params para pedir solo lo nuevo: ``from=last_seen`` y, si el usuario no
+        fijó ``to``, límite superior abierto hacia delante (ahora / +DEPTH_TAIL_SPAN_M).
+        """
+        p = dict(params or {})
+        if self.last_seen is None:
+            return p
+        user_to = p.get("to") not in (None, "")
+        if str(self.domain).upper() == "TIME":
+            p["from"] = pd.Timestamp(self.last_seen).strftime("%Y-%m-%dT%H:%M:%SZ")
+            if not user_to:
+                p["to"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        else:
+            p["from"] = float(self.last_seen)
+            if not user_to:
+                p["to"] = float(self.last_seen) + DEPTH_TAIL_SPAN_M
+        return p
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self.frame),
+            "last_seen": str(self.last_seen) if self.last_seen is not None else "",
+            "full_loads": self.full_loads,
+            "tail_fetches": self.tail_fetches,
+            "rows_received": self.rows_received,
+            "rows_appended": self.rows_appended,
+        }
+
+
+def live_buffers(store: MutableMapping, store_key: str, config_key: str) -> dict[str, TailBuffer]:
+    """
+    Buffers por traza guardados en ``store[store_key]`` (p. ej. ``st.session_state``).
+    Si cambia la configuración (pozo, trazas, rango…) se descartan y se vuelve a
+    empezar con una carga completa.
+    """
+    entry = store.get(store_key)
+    if not isinstance(entry, dict) or entry.get("config") != config_key:
+        entry = {"config": config_key, "buffers": {}}
+        store[store_key] = entry
+    return entry["buffers"]
+
+
+def incremental_rolling_median(
+    keys: np.ndarray,
+    values: np.ndarray,
+    window: int,
+    min_periods: int,
+    previous: dict | None = None,
+) -> tuple[np.ndarray, dict]:
+    """
+    Mediana móvil centrada (igual a ``Series.rolling(window, min_periods, center=True).median()``)
+    reutilizando el resultado anterior cuando ``keys``/``values`` solo crecieron por el final.
+
+    Solo se recalcula desde el primer índice que cambió menos una ventana (con otra
+    ventana de contexto), así que un refresco con k muestras nuevas cuesta O(k + window).
+    Retorna ``(baseline, state)``; ``state`` se pasa como ``previous`` en la siguiente llamada.
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    start = 0
+    if previous and previous.get("window") == window and previous.get("min_periods") == min_periods:
+        old_keys = previous["keys"]
+        old_vals = previous["values"]
+        m = min(len(old_keys), n)
+        same = (old_keys[:m] == keys[:m]) & ((old_vals[:m] == values[:m]) | (np.isnan(old_vals[:m]) & np.isnan(values[:m])))
+        first_diff = int(np.argmin(same)) if m and not same.all() else m
+        start = max(0, first_diff - window)
+
+    if start == 0:
+        baseline = (
+            pd.Series(values).rolling(window=window, min_periods=min_periods, center=True).median().to_numpy()
+        )
+    else:
+        ctx = max(0, start - window)
+        seg = pd.Series(values[ctx:]).rolling(window=window, min_periods=min_periods, center=True).median().to_numpy()
+        baseline = np.concatenate([previous["baseline"][:start], seg[start - ctx:]])
+
+    state = {"window": window, "min_periods": min_periods, "keys": keys, "values": values, "baseline": baseline}
+    return baseline, state
@@ -0,0 +1,187 @@
+"""Programador de refrescos en segundo plano (auto-refresh sin bloquear Streamlit).
+
+En lugar de dormir el hilo del script con ``time.sleep`` durante el intervalo,
+cada sesión programa su siguiente refresco aquí: un hilo despachador lanza el
+trabajo (p. ej. la descarga de la cola de trazas) en un pool cuando llega su
+hora y deja el resultado aparcado. La UI solo consulta ``status`` de vez en
+cuando y hace ``st.rerun`` cuando hay datos frescos listos.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+DEFAULT_WORKERS = 4
+READY_TTL_S = 3600
+
+
+@dataclass
+class _Job:
+    session_id: str
+    key: str
+    config_key: str | None
+    due_at: float
+    fn: Callable[[], Any] | None
+    scheduled_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    future: Future | None = None
+    result: Any = None
+    error: Exception | None = None
+    cancelled: bool = False
+
+    @property
+    def state(self) -> str:
+        if self.cancelled:
+            return "cancelled"
+        if self.finished_at is not None:
+            return "ready"
+        if self.started_at is not None:
+            return "running"
+        return "pending"
+
+
+@dataclass
+class RefreshResult:
+    config_key: str | None
+    value: Any
+    error: Exception | None
+    finished_at: float
+
+
+class RefreshScheduler:
+    """Un despachador + pool compartidos por todas las sesiones del proceso."""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh")
+        self._jobs: dict[tuple[str, str], _Job] = {}
+        self._last_data: dict[tuple[str, str], float] = {}
+        self._heap: list[tuple[float, int, _Job]] = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="refresh-dispatcher", daemon=True)
+        self._thread.start()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap or self._heap[0][0] > time.time():
+                    timeout = None if not self._heap else max(0.0, self._heap[0][0] - time.time())
+                    self._cv.wait(timeout)
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled or self._jobs.get((job.session_id, job.key)) is not job:
+                    continue
+                job.started_at = time.time()
+                job.future = self._pool.submit(self._run, job)
+
+    def _run(self, job: _Job) -> None:
+        try:
+            job.result = job.fn() if job.fn is not None else None
+        except Exception as e:
+            job.error = e
+        with self._cv:
+            job.finished_at = time.time()
+
+    def schedule(
+        self,
+        session_id: str,
+        key: str,
+        delay_s: float,
+        fn: Callable[[], Any] | None = None,
+        config_key: str | None = None,
+    ) -> None:
+        """
+        Programa ``fn`` para dentro de ``delay_s`` segundos. Si ya hay un trabajo
+        pendiente/en curso para ``(session_id, key)`` con la misma configuración se
+        conserva (los reruns por widgets no reinician la cuenta atrás); uno ya
+        terminado se reemplaza por el siguiente ciclo (los temporizadores y los
+        trabajos sin ``take`` no se recogen nunca).
+        ``fn=None`` es un simple temporizador.
+        """
+        with self._cv:
+            self._prune()
+            current = self._jobs.get((session_id, key))
+            if current is not None and current.state in ("pending", "running") and current.config_key == config_key:
+                return
+            if current is not None:
+                current.cancelled = True
+            job = _Job(session_id, key, config_key, time.time() + max(0.0, float(delay_s)), fn)
+            self._jobs[(session_id, key)] = job
+            heapq.heappush(self._heap, (job.due_at, next(self._seq), job))
+            self._cv.notify()
+
+    def _prune(self) -> None:
+        # Resultados que nadie recogió (sesión cerrada) y antigüedades viejas.
+        limit = time.time() - READY_TTL_S
+        for k, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < limit:
+                self._jobs.pop(k, None)
+        for k, t in list(self._last_data.items()):
+            if t < limit and k not in self._jobs:
+                self._last_data.pop(k, None)
+
+    def cancel(self, session_id: str, key: str) -> None:
+        with self._cv:
+            job = self._jobs.pop((session_id, key), None)
+            if job is not None:
+                job.cancelled = True
+
+    def is_ready(self, session_id: str, key: str) -> bool:
+        with self._cv:
+            job = self._jobs.get((session_id, key))
+            return job is not None and job.state == "ready"
+
+    def take(self, session_id: str, key: str, config_key: str | None = None) -> RefreshResult | None:
+        """
+        Recoge (y retira) el resultado listo de ``(session_id, key)``. Si se indica
+        ``config_key`` y no coincide, el resultado se descarta (la configuración cambió).
+        """
+        with self._cv:
+            job = self._jobs.get((session_id, key))
+            if job is None or job.state != "ready":
+                return None
+            self._jobs.pop((session_id, key), None)
+            self._last_data[(session_id, key)] = job.finished_at or time.time()
+        if config_key is not None and job.config_key != config_key:
+            return None
+        return RefreshResult(job.config_key, job.result, job.error, job.finished_at or time.time())
+
+    def mark_fresh(self, session_id: str, key: str) -> None:
+        """Registra que la sesión acaba de cargar datos (para medir la antigüedad)."""
+        with self._cv:
+            self._last_data[(session_id, key)] = time.time()
+
+    def status(self, session_id: str, key: str | None = None) -> dict:
+        """Profundidad de cola y antigüedad de los datos de una sesión."""
+        now = time.time()
+        with self._cv:
+            jobs = [j for (sid, k), j in self._jobs.items() if sid == session_id and (key is None or k == key)]
+            last = [t for (sid, k), t in self._last_data.items() if sid == session_id and (key is None or k == key)]
+            queue_depth = sum(1 for j in jobs if j.state in ("pending", "running"))
+            due = [j.due_at for j in jobs if j.state == "pending"]
+            return {
+                "queue_depth": queue_depth,
+                "running": sum(1 for j in jobs if j.state == "running"),
+                "ready": any(j.state == "ready" for j in jobs),
+                "ready_at": max((j.finished_at for j in jobs if j.state == "ready"), default=None),
+                "due_in_s": max(0, int(round(min(due) - now))) if due else 0,
+                "staleness_s": int(now - max(last)) if last else None,
+            }
+
+
+_SCHEDULER: RefreshScheduler | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = RefreshScheduler()
+        return _SCHEDULER
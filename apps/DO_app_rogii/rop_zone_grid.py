@@ -0,0 +1,193 @@
+"""Grilla WOB×RPM acumulativa para la mejor zona de ROP.
+
+Cada celda guarda conteo, suma y suma de cuadrados de la variable (ROP, MSE…),
+así que:
+
+- sumar muestras nuevas cuesta O(nuevas) (un ``bincount`` sobre el índice de
+  celda), sin volver a pasar por todo el frame;
+- media, desviación estándar, conteo y mejor celda salen en cualquier momento;
+- dos grillas con los mismos bordes se fusionan sumando sus arreglos, y se
+  serializan a JSON: las grillas de cada corrida se combinan en una de pozo o
+  de campo sin tocar los datos crudos.
+
+La asignación de bins es la de ``binned_statistic_2d`` (bins semiabiertos, el
+borde superior entra en el último bin; fuera de rango se descarta).
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+GRID_FORMAT_VERSION = 1
+
+
+def _edges(lo: float, hi: float, bins: int) -> np.ndarray:
+    lo, hi = float(lo), float(hi)
+    if hi <= lo:
+        # Mismo criterio que numpy/scipy cuando todos los valores son iguales.
+        lo, hi = lo - 0.5, hi + 0.5
+    return np.linspace(lo, hi, int(bins) + 1)
+
+
+def _bin_index(edges: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Índice de bin de cada ``x`` o -1 si cae fuera de ``[edges[0], edges[-1]]``."""
+    idx = np.searchsorted(edges, x, side="right") - 1
+    idx = np.where(x == edges[-1], edges.size - 2, idx)
+    return np.where((idx >= 0) & (idx < edges.size - 1), idx, -1)
+
+
+@dataclass
+class ZoneGrid:
+    x_edges: np.ndarray
+    y_edges: np.ndarray
+    count: np.ndarray | None = None
+    total: np.ndarray | None = None
+    total_sq: np.ndarray | None = None
+    dropped: int = 0  # muestras fuera de la grilla
+
+    def __post_init__(self) -> None:
+        self.x_edges = np.asarray(self.x_edges, dtype=float)
+        self.y_edges = np.asarray(self.y_edges, dtype=float)
+        shape = self.shape
+        self.count = np.zeros(shape, dtype=np.int64) if self.count is None else np.asarray(self.count, dtype=np.int64)
+        self.total = np.zeros(shape) if self.total is None else np.asarray(self.total, dtype=float)
+        self.total_sq = np.zeros(shape) if self.total_sq is None else np.asarray(self.total_sq, dtype=float)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.x_edges.size - 1, self.y_edges.size - 1
+
+    @classmethod
+    def from_range(cls, x_min: float, x_max: float, y_min: float, y_max: float, bins: int | tuple[int, int]) -> "ZoneGrid":
+        bx, by = (bins, bins) if np.isscalar(bins) else bins
+        return cls(_edges(x_min, x_max, bx), _edges(y_min, y_max, by))
+
+    @classmethod
+    def from_data(cls, x, y, v, bins: int | tuple[int, int]) -> "ZoneGrid":
+        """Grilla con bordes del mínimo al máximo de los datos (como ``bins=N`` en scipy)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        grid = cls.from_range(x.min(), x.max(), y.min(), y.max(), bins)
+        grid.update(x, y, v)
+        return grid
+
+    def update(self, x, y, v) -> int:
+        """Suma muestras nuevas; retorna cuántas cayeron dentro de la grilla."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        v = np.asarray(v, dtype=float)
+        ok = np.isfinite(x) & np.isfinite(y) & np.isfinite(v)
+        x, y, v = x[ok], y[ok], v[ok]
+        ix = _bin_index(self.x_edges, x)
+        iy = _bin_index(self.y_edges, y)
+        inside = (ix >= 0) & (iy >= 0)
+        self.dropped += int((~inside).sum())
+        flat = ix[inside] * self.shape[1] + iy[inside]
+        size = self.shape[0] * self.shape[1]
+        v = v[inside]
+        self.count += np.bincount(flat, minlength=size).reshape(self.shape)
+        self.total += np.bincount(flat, weights=v, minlength=size).reshape(self.shape)
+        self.total_sq += np.bincount(flat, weights=v * v, minlength=size).reshape(self.shape)
+        return int(inside.sum())
+
+    def compatible(self, other: "ZoneGrid") -> bool:
+        return (
+            self.x_edges.shape == other.x_edges.shape
+            and self.y_edges.shape == other.y_edges.shape
+            and np.allclose(self.x_edges, other.x_edges)
+            and np.allclose(self.y_edges, other.y_edges)
+        )
+
+    def merge(self, other: "ZoneGrid") -> "ZoneGrid":
+        """Nueva grilla con la suma de ambas (mismos bordes)."""
+        if not self.compatible(other):
+            raise ValueError("Las grillas tienen bordes WOB/RPM distintos; usa una grilla fija común para acumular.")
+        return ZoneGrid(
+            self.x_edges.copy(),
+            self.y_edges.copy(),
+            self.count + other.count,
+            self.total + other.total,
+            self.total_sq + other.total_sq,
+            self.dropped + other.dropped,
+        )
+
+    def mean(self, min_count: int = 1) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m = self.total / self.count
+        return np.where(self.count >= max(1, int(min_count)), m, np.nan)
+
+    def std(self, min_count: int = 2) -> np.ndarray:
+        """Desviación estándar muestral (ddof=1) por celda."""
+        n = self.count.astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return np.where(self.count >= max(2, int(min_count)), np.sqrt(np.clip(var, 0.0, None)), np.nan)
+
+    def best_cell(self, min_count: int = 1) -> tuple[int, int] | None:
+        m = self.mean(min_count)
+        if np.isnan(m).all():
+            return None
+        i, j = np.unravel_index(np.nanargmax(m), m.shape)
+        return int(i), int(j)
+
+    def zone_stats(self, min_points_per_bin: int = 1) -> dict | None:
+        """Mismo dict que ``compute_rop_zone_stats`` (más ``std`` y la propia grilla)."""
+        stat = self.mean(min_points_per_bin)
+        best = self.best_cell(min_points_per_bin)
+        if best is None:
+            return None
+        i, j = best
+        x_edges, y_edges = self.x_edges, self.y_edges
+        return {
+            "stat": stat,
+            "std": self.std(),
+            "counts": self.count.astype(float),
+            "x_edges": x_edges,
+            "y_edges": y_edges,
+            "x_centers": (x_edges[:-1] + x_edges[1:]) / 2.0,
+            "y_centers": (y_edges[:-1] + y_edges[1:]) / 2.0,
+            "best_bin": (i, j),
+            "best_rop": float(stat[i, j]),
+            "best_wob_low": float(x_edges[i]),
+            "best_wob_high": float(x_edges[i + 1]),
+            "best_rpm_low": float(y_edges[j]),
+            "best_rpm_high": float(y_edges[j + 1]),
+            "best_wob_center": float((x_edges[i] + x_edges[i + 1]) / 2.0),
+            "best_rpm_center": float((y_edges[j] + y_edges[j + 1]) / 2.0),
+            "best_count": int(self.count[i, j]),
+            "grid": self,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "version": GRID_FORMAT_VERSION,
+            "x_edges": self.x_edges.tolist(),
+            "y_edges": self.y_edges.tolist(),
+            "count": self.count.tolist(),
+            "total": self.total.tolist(),
+            "total_sq": self.total_sq.tolist(),
+            "dropped": int(self.dropped),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ZoneGrid":
+        if int(data.get("version", 0)) != GRID_FORMAT_VERSION:
+            raise ValueError(f"Versión de grilla no soportada: {data.get('version')}")
+        return cls(
+            data["x_edges"],
+            data["y_edges"],
+            data["count"],
+            data["total"],
+            data["total_sq"],
+            int(data.get("dropped", 0)),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text: str | bytes) -> "ZoneGrid":
+        return cls.from_dict(json.loads(text))
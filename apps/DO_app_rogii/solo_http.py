@@ -0,0 +1,183 @@
+"""Cliente HTTP compartido para la API de SOLO.
+
+Una sola ``requests.Session`` por proceso (keep-alive + pool de conexiones), con
+negociación gzip, reintentos con backoff exponencial y jitter ante 429/502/503/504
+o errores de conexión (respetando ``Retry-After``) y métricas por llamada
+(latencia, bytes, intentos) para diagnóstico. Cada métrica lleva el id de la
+sesión que hizo la llamada: el cliente es de todo el proceso, pero cada sesión
+solo ve sus propias URLs (los UUID de pozo/traza son de su tenant).
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = frozenset({429, 502, 503, 504})
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 20.0
+DEFAULT_POOL_SIZE = 16
+METRICS_HISTORY = 500
+
+
+@dataclass
+class CallMetric:
+    """Una llamada HTTP (incluye todos sus reintentos)."""
+
+    method: str
+    url: str
+    status: int | None
+    elapsed_s: float
+    bytes_received: int
+    attempts: int
+    error: str = ""
+    session_id: str = ""
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    """Interpreta ``Retry-After`` como segundos o como fecha HTTP."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class SoloHttpClient:
+    """Sesión HTTP con pool de conexiones, reintentos y métricas."""
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        sleep=time.sleep,
+    ):
+        self.timeout = timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        self._metrics: deque[CallMetric] = deque(maxlen=METRICS_HISTORY)
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: uniforme en [0, base * 2^attempt], acotado.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, metric: CallMetric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | None = None,
+        session_id: str = "",
+    ) -> requests.Response:
+        """
+        GET con reintentos. Devuelve la última respuesta (aunque sea >= 400);
+        si todos los intentos fallan por conexión, relanza la última excepción.
+        """
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                r = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt > self.max_retries:
+                    self._record(
+                        CallMetric("GET", url, None, time.perf_counter() - start, 0, attempt, str(e), session_id)
+                    )
+                    raise
+                self._sleep(self._backoff(attempt - 1, None))
+                continue
+            if r.status_code in RETRY_STATUS and attempt <= self.max_retries:
+                wait_s = self._backoff(attempt - 1, _retry_after_seconds(r.headers.get("Retry-After")))
+                r.close()
+                self._sleep(wait_s)
+                continue
+            self._record(
+                CallMetric(
+                    "GET",
+                    r.url or url,
+                    r.status_code,
+                    time.perf_counter() - start,
+                    len(r.content or b""),
+                    attempt,
+                    session_id=session_id,
+                )
+            )
+            return r
+
+    def _items(self, session_id: str | None) -> list[CallMetric]:
+        with self._lock:
+            return [m for m in self._metrics if session_id is None or m.session_id == session_id]
+
+    def metrics(self, session_id: str | None = None) -> list[dict]:
+        """Últimas llamadas (más reciente al final); con ``session_id``, solo las de esa sesión."""
+        return [asdict(m) for m in self._items(session_id)]
+
+    def metrics_summary(self, session_id: str | None = None) -> dict:
+        """Totales agregados de las llamadas registradas (de ``session_id`` si se indica)."""
+        items = self._items(session_id)
+        if not items:
+            return {"calls": 0, "retries": 0, "errors": 0, "bytes": 0, "total_s": 0.0, "avg_ms": 0.0, "max_ms": 0.0}
+        total_s = sum(m.elapsed_s for m in items)
+        return {
+            "calls": len(items),
+            "retries": sum(m.attempts - 1 for m in items),
+            "errors": sum(1 for m in items if m.status is None or m.status >= 400),
+            "bytes": sum(m.bytes_received for m in items),
+            "total_s": round(total_s, 3),
+            "avg_ms": round(1000 * total_s / len(items), 1),
+            "max_ms": round(1000 * max(m.elapsed_s for m in items), 1),
+        }
+
+    def reset_metrics(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+_CLIENT: SoloHttpClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> SoloHttpClient:
+    """Cliente compartido por todo el proceso (todas las sesiones de Streamlit)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = SoloHttpClient()
+        return _CLIENT
@@ -0,0 +1,177 @@
+"""Descarga concurrente de páginas de trazas (SOLO API).
+
+El módulo no depende de Streamlit: recibe una función ``fetch_page(trace_id, page)``
+que hace la petición HTTP y devuelve el resultado de esa página. Las peticiones
+(traza, página) se reparten en un pool de hilos acotado, con un límite de
+concurrencia por host compartido entre sesiones, y para cada traza se deja de
+pedir páginas en cuanto una llega vacía (igual que el bucle secuencial original).
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+from urllib.parse import urlparse
+
+import pandas as pd
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 4
+
+_HOST_SEMAPHORES: dict[str, threading.BoundedSemaphore] = {}
+_HOST_LOCK = threading.Lock()
+
+
+@dataclass
+class TraceFetchResult:
+    """Páginas descargadas de una traza, en orden de página."""
+
+    trace_id: str
+    pages: list[Any] = field(default_factory=list)
+    page_numbers: list[int] = field(default_factory=list)
+    requests_made: int = 0
+    error: Exception | None = None
+
+    @property
+    def pages_loaded(self) -> int:
+        return len(self.pages)
+
+
+def _frame_is_empty(result) -> bool:
+    if result is None:
+        return True
+    if isinstance(result, pd.DataFrame):
+        return result.empty
+    if isinstance(result, tuple) and result and isinstance(result[0], pd.DataFrame):
+        return result[0].empty
+    try:
+        return len(result) == 0
+    except TypeError:
+        return False
+
+
+def host_semaphore(base_url: str | None, limit: int = DEFAULT_PER_HOST_LIMIT) -> threading.BoundedSemaphore:
+    """Semáforo compartido por proceso para limitar peticiones simultáneas a un host."""
+    host = (urlparse(base_url or "").netloc or str(base_url or "")).lower()
+    with _HOST_LOCK:
+        sem = _HOST_SEMAPHORES.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(max(1, int(limit)))
+            _HOST_SEMAPHORES[host] = sem
+        return sem
+
+
+def fetch_trace_pages(
+    fetch_page: Callable[[str, int], Any],
+    trace_ids: Iterable[str],
+    page_indices: Iterable[int] | None = None,
+    *,
+    max_pages: int | None = None,
+    base_url: str | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+    is_empty: Callable[[Any], bool] = _frame_is_empty,
+    initializer: Callable[[], None] | None = None,
+) -> dict[str, TraceFetchResult]:
+    """
+    Descarga en paralelo las páginas de varias trazas.
+
+    - ``page_indices``: páginas a pedir por traza (p. ej. ``[0, 1, 2]``). Si es None,
+      se piden 0, 1, 2… hasta ``max_pages`` o hasta la primera página vacía.
+    - Como mucho ``max_workers`` peticiones en vuelo (y ``per_host_limit`` contra el mismo
+      host); al llegar una página vacía no se emiten más páginas de esa traza y se
+      descartan las posteriores.
+    - Un error en una página corta esa traza (se guarda en ``error``) sin afectar a las demás.
+
+    Retorna ``{trace_id: TraceFetchResult}`` con las páginas en orden.
+    """
+    trace_ids = [str(t) for t in trace_ids]
+    if page_indices is not None:
+        plan = [int(p) for p in page_indices]
+    else:
+        plan = list(range(int(max_pages or 1)))
+    results = {tid: TraceFetchResult(trace_id=tid) for tid in trace_ids}
+    if not trace_ids or not plan:
+        return results
+
+    sem = host_semaphore(base_url, per_host_limit)
+    max_workers = max(1, int(max_workers))
+
+    def _call(tid: str, page: int):
+        with sem:
+            return fetch_page(tid, page)
+
+    # Estado por traza: siguiente posición del plan a emitir y primera posición vacía/errónea.
+    next_pos = {tid: 0 for tid in trace_ids}
+    stop_pos = {tid: len(plan) for tid in trace_ids}
+    done: dict[str, dict[int, Any]] = {tid: {} for tid in trace_ids}
+    errors: dict[str, tuple[int, Exception]] = {}
+    in_flight: dict = {}
+
+    def _can_issue(tid: str) -> bool:
+        return next_pos[tid] < stop_pos[tid]
+
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=initializer) as pool:
+
+        def _fill() -> None:
+            # Round-robin entre trazas para que todas avancen a la vez.
+            progressed = True
+            while progressed and len(in_flight) < max_workers:
+                progressed = False
+                for tid in trace_ids:
+                    if len(in_flight) >= max_workers:
+                        break
+                    if not _can_issue(tid):
+                        continue
+                    pos = next_pos[tid]
+                    next_pos[tid] = pos + 1
+                    fut = pool.submit(_call, tid, plan[pos])
+                    in_flight[fut] = (tid, pos)
+                    results[tid].requests_made += 1
+                    progressed = True
+
+        _fill()
+        while in_flight:
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                tid, pos = in_flight.pop(fut)
+                if pos >= stop_pos[tid]:
+                    continue
+                try:
+                    value = fut.result()
+                except Exception as e:
+                    stop_pos[tid] = pos
+                    errors[tid] = (pos, e)
+                    continue
+                if is_empty(value):
+                    stop_pos[tid] = pos
+                    continue
+                done[tid][pos] = value
+            # Cancela lo que aún no arrancó de trazas ya cortadas.
+            for fut, (tid, pos) in list(in_flight.items()):
+                if pos >= stop_pos[tid] and fut.cancel():
+                    in_flight.pop(fut)
+                    results[tid].requests_made -= 1
+            _fill()
+
+    for tid in trace_ids:
+        res = results[tid]
+        err = errors.get(tid)
+        if err is not None and err[0] == stop_pos[tid]:
+            res.error = err[1]
+        for pos in range(stop_pos[tid]):
+            if pos not in done[tid]:
+                break
+            res.pages.append(done[tid][pos])
+            res.page_numbers.append(plan[pos])
+    return results
+
+
+def concat_pages(result: TraceFetchResult) -> pd.DataFrame:
+    """Une las páginas (DataFrames) de una traza en un solo DataFrame."""
+    frames = [p for p in result.pages if isinstance(p, pd.DataFrame) and not p.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
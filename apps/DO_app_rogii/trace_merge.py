@@ -0,0 +1,286 @@
+"""Unión de trazas sobre un eje común (tiempo o profundidad).
+
+Antes se encadenaba un ``pd.merge(how="outer")`` por traza y se ordenaba al
+final: con 10 trazas de 200k muestras en timestamps ligeramente distintos eso
+copia el frame acumulado una y otra vez. Aquí cada traza se ordena una sola vez
+por su coordenada y se coloca sobre un índice común por ``searchsorted``:
+
+- ``exact``: unión de coordenadas; cada traza ocupa solo sus posiciones exactas.
+- ``nearest``: eje de la traza de referencia (la primera); las demás toman la
+  muestra más cercana dentro de ``tolerance`` (como ``merge_asof(direction="nearest")``).
+- ``grid``: rejilla regular de paso ``step``; cada celda es la media de las
+  muestras de la traza que caen en ella.
+
+``tolerance`` y ``step`` van en segundos (tiempo) o metros (profundidad). Las
+columnas numéricas se guardan en float32 solo si el redondeo queda dentro de
+``FLOAT32_RTOL`` del rango de la columna; las de tiempo/profundidad nunca.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+X_CANDIDATES = (
+    "depth",
+    "md",
+    "measured_depth",
+    "survey_md",
+    "time",
+    "timestamp",
+    "datetime",
+    "date",
+)
+ALIGN_MODES = ("exact", "nearest", "grid")
+FLOAT32_SAFE_INT = 2**24
+# Error máximo tolerado al pasar a float32, relativo al rango de la columna.
+FLOAT32_RTOL = 1e-6
+INDEX_COL_TOKENS = ("time", "date", "depth", "epoch")
+SNIFF_ROWS = 1000
+MAX_GRID_POINTS = 5_000_000
+
+
+@dataclass
+class _Trace:
+    columns: list[str]
+    values: list[np.ndarray]
+    keys: np.ndarray
+    raw_x: np.ndarray
+
+
+def _pick_x_col(cols: list) -> object:
+    for c in cols:
+        if str(c).strip().lower() in X_CANDIDATES:
+            return c
+    return cols[0]
+
+
+def _coord_kind(s: pd.Series) -> str:
+    """``num``, ``time`` o ``cat`` (texto sin orden temporal/numérico)."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return "time"
+    if pd.api.types.is_numeric_dtype(s):
+        return "num"
+    sample = s.dropna().head(SNIFF_ROWS)
+    if sample.empty:
+        return "cat"
+    if pd.to_numeric(sample, errors="coerce").notna().mean() >= 0.9:
+        return "num"
+    if _parse_time(sample).notna().mean() >= 0.9:
+        return "time"
+    return "cat"
+
+
+def _parse_time(s: pd.Series) -> pd.Series:
+    # ISO 8601 (lo que devuelve SOLO) va por la ruta rápida; el resto, formato mixto.
+    try:
+        return pd.to_datetime(s, utc=True, format="ISO8601")
+    except (ValueError, TypeError):
+        return pd.to_datetime(s, errors="coerce", utc=True, format="mixed")
+
+
+def _keys(s: pd.Series, kind: str) -> np.ndarray:
+    if kind == "time":
+        ts = _parse_time(s)
+        return ((ts - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _is_index_col(name) -> bool:
+    """Columnas de tiempo/profundidad (índices): nunca van a float32."""
+    n = str(name).strip().lower()
+    return n in X_CANDIDATES or any(tok in n for tok in INDEX_COL_TOKENS)
+
+
+def _float32_ok(arr: np.ndarray) -> bool:
+    """float32 conserva ``arr`` a la escala de la columna (error ≤ FLOAT32_RTOL × rango)."""
+    finite = arr[np.isfinite(arr)]
+    if finite.size == 0:
+        return True
+    scale = float(np.ptp(finite)) or float(np.abs(finite).max())
+    back = finite.astype(np.float32).astype(np.float64)
+    return bool(np.allclose(back, finite, rtol=0.0, atol=FLOAT32_RTOL * scale))
+
+
+def _downcast(arr: np.ndarray) -> np.ndarray:
+    if arr.dtype.kind == "f":
+        return arr.astype(np.float32) if _float32_ok(arr) else arr.astype(np.float64, copy=False)
+    if arr.dtype.kind in "iu":
+        if arr.size == 0 or np.abs(arr).max() < FLOAT32_SAFE_INT:
+            return arr.astype(np.float32)
+        return arr.astype(np.float64)
+    if arr.dtype.kind == "b":
+        return arr.astype(np.float32)
+    return arr
+
+
+def _empty_like(values: np.ndarray, n: int) -> np.ndarray:
+    if values.dtype.kind == "f":
+        return np.full(n, np.nan, dtype=values.dtype)
+    return np.full(n, None, dtype=object)
+
+
+def _split(label: str, df: pd.DataFrame):
+    """``(nombres, x_col, serie_x, columnas_valor, df)`` o ``None`` si no hay valores."""
+    cols = list(df.columns)
+    x_col = _pick_x_col(cols)
+    value_cols = [c for c in cols if c != x_col]
+    if not value_cols:
+        df = df.reset_index().rename(columns={"index": "index"})
+        x_col = "index"
+        value_cols = [c for c in df.columns if c != x_col]
+    if not value_cols:
+        return None
+    names = [label] if len(value_cols) == 1 else [f"{label}_{c}" for c in value_cols]
+    return names, x_col, value_cols, df
+
+
+def _shared_keys(xs: list[pd.Series]) -> tuple[list[np.ndarray], str]:
+    """
+    Coordenada numérica de cada traza. Se factoriza la concatenación de todos los
+    ejes y solo se interpretan los valores distintos (las trazas comparten casi
+    todos sus timestamps), en lugar de parsear cada muestra.
+    """
+    raw = pd.concat(xs, ignore_index=True)
+    kind = _coord_kind(raw)
+    codes, uniques = pd.factorize(raw)
+    uniques = pd.Series(uniques)
+    if kind == "cat":
+        # Texto sin orden temporal/numérico: orden lexicográfico (igual que sort_values).
+        ukeys = np.argsort(np.argsort(uniques.astype(str).to_numpy(), kind="stable")).astype(float)
+    else:
+        ukeys = _keys(uniques, kind)
+    keys = np.where(codes >= 0, ukeys[codes.clip(0)] if ukeys.size else np.nan, np.nan)
+    bounds = np.cumsum([0] + [len(x) for x in xs])
+    return [keys[a:b] for a, b in zip(bounds[:-1], bounds[1:])], kind
+
+
+def _prepare(names: list[str], value_cols: list, df: pd.DataFrame, x_col, keys: np.ndarray, downcast: bool) -> _Trace:
+    ok = np.flatnonzero(~np.isnan(keys))
+    order = ok[np.argsort(keys[ok], kind="stable")]
+    values = []
+    for c in value_cols:
+        arr = df[c].to_numpy()[order]
+        if arr.dtype.kind in "fiub":
+            arr = _downcast(arr) if downcast and not _is_index_col(c) else arr.astype(np.float64)
+        values.append(arr)
+    return _Trace(names, values, keys[order], df[x_col].to_numpy()[order])
+
+
+def _dedup_last(tr: _Trace) -> _Trace:
+    """Una muestra por coordenada (la última), sobre la traza ya ordenada."""
+    k = tr.keys
+    if len(k) < 2:
+        return tr
+    keep = np.ones(len(k), dtype=bool)
+    keep[:-1] = k[1:] != k[:-1]
+    if keep.all():
+        return tr
+    return _Trace(tr.columns, [v[keep] for v in tr.values], tr.keys[keep], tr.raw_x[keep])
+
+
+def _nearest_index(src: np.ndarray, targets: np.ndarray, tolerance: float | None) -> np.ndarray:
+    """Para cada ``target`` el índice de la muestra más cercana en ``src`` (ordenado) o -1."""
+    if src.size == 0:
+        return np.full(targets.size, -1)
+    right = np.searchsorted(src, targets, side="left").clip(0, src.size - 1)
+    left = (right - 1).clip(0, src.size - 1)
+    use_left = np.abs(targets - src[left]) <= np.abs(src[right] - targets)
+    idx = np.where(use_left, left, right)
+    if tolerance is not None:
+        idx = np.where(np.abs(src[idx] - targets) <= tolerance, idx, -1)
+    return idx
+
+
+def _time_axis(keys: np.ndarray) -> pd.Series:
+    return pd.Series(pd.to_datetime(keys, unit="s", utc=True))
+
+
+def merge_trace_frames(
+    frames: list[tuple[str, pd.DataFrame]],
+    mode: str = "exact",
+    tolerance: float | None = None,
+    step: float | None = None,
+    downcast: bool = True,
+) -> pd.DataFrame:
+    """
+    Une ``frames`` (``[(label, df), …]``) en un solo DataFrame ordenado por la
+    coordenada de la primera traza. Cada traza aporta una columna ``label`` (si
+    tiene un solo valor) o ``label_<col>`` por columna.
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"Modo de alineación no soportado: {mode}")
+    parts = []
+    for label, df in frames:
+        if df is None or df.empty or not list(df.columns):
+            continue
+        part = _split(label, df)
+        if part is not None:
+            parts.append(part)
+    if not parts:
+        return pd.DataFrame()
+    x_col_name = parts[0][1]
+    all_keys, kind = _shared_keys([df[x_col] for _, x_col, _, df in parts])
+    traces = [
+        _prepare(names, value_cols, df, x_col, keys, downcast)
+        for (names, x_col, value_cols, df), keys in zip(parts, all_keys)
+    ]
+
+    if kind == "cat" and mode != "exact":
+        mode = "exact"
+    if mode == "grid" and not (step and step > 0):
+        mode = "exact"
+
+    out: dict = {}
+    if mode == "exact":
+        traces = [_dedup_last(t) for t in traces]
+        axis = np.unique(np.concatenate([t.keys for t in traces]))
+        positions = [np.searchsorted(axis, t.keys) for t in traces]
+        x_values = np.empty(axis.size, dtype=object)
+        for t, pos in zip(reversed(traces), reversed(positions)):
+            x_values[pos] = t.raw_x  # la primera traza manda en la representación
+        out[x_col_name] = x_values
+        for t, pos in zip(traces, positions):
+            for name, vals in zip(t.columns, t.values):
+                col = _empty_like(vals, axis.size)
+                col[pos] = vals
+                out[name] = col
+    elif mode == "nearest":
+        ref = traces[0]
+        out[x_col_name] = ref.raw_x
+        for t in traces:
+            idx = np.arange(ref.keys.size) if t is ref else _nearest_index(t.keys, ref.keys, tolerance)
+            hit = idx >= 0
+            for name, vals in zip(t.columns, t.values):
+                col = _empty_like(vals, ref.keys.size)
+                col[hit] = vals[idx[hit]]
+                out[name] = col
+    else:
+        lo = min(float(t.keys[0]) for t in traces if t.keys.size)
+        hi = max(float(t.keys[-1]) for t in traces if t.keys.size)
+        start = np.floor(lo / step) * step
+        n = int(np.floor((hi - start) / step)) + 1
+        if n > MAX_GRID_POINTS:
+            raise ValueError(f"Paso de rejilla demasiado pequeño: {n} puntos (máx. {MAX_GRID_POINTS}).")
+        grid = start + step * np.arange(n)
+        out[x_col_name] = _time_axis(grid) if kind == "time" else grid
+        for t in traces:
+            bins = np.floor((t.keys - start) / step).astype(np.int64)
+            for name, vals in zip(t.columns, t.values):
+                if vals.dtype.kind == "f":
+                    ok = ~np.isnan(vals)
+                    sums = np.bincount(bins[ok], weights=vals[ok].astype(np.float64), minlength=n)
+                    counts = np.bincount(bins[ok], minlength=n)
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        col = (sums / counts).astype(vals.dtype)
+                else:
+                    col = np.full(n, None, dtype=object)
+                    col[bins] = vals  # la última muestra de cada celda
+                out[name] = col
+
+    merged = pd.DataFrame(out)
+    if mode == "exact":
+        merged[x_col_name] = merged[x_col_name].infer_objects()
+    return merged
@@ -0,0 +1,202 @@
+"""Búsqueda del rango con datos de una traza (SOLO API).
+
+Sustituye la escalera lineal de ventanas (7 TIME + 5 DEPTH, cada una con doble
+fetch plain/calculated) por:
+
+1. Una petición ``size=1`` sobre el rango completo para saber si hay datos y con
+   qué variante de endpoint (plain o calculated); si no hay, se salta el dominio.
+2. Si la fila devuelta trae la coordenada (tiempo/profundidad), acota la búsqueda.
+3. Bisección acotada sobre los peldaños de la escalera (la existencia de datos es
+   monótona: si hay datos en una ventana, los hay en todas las mayores) para
+   encontrar la ventana más pequeña con datos, que es la misma que elegía la
+   escalera lineal.
+4. Una sola descarga completa con esa ventana.
+
+Todo queda registrado en un ``ProbeReport`` (plan + número de peticiones).
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import pandas as pd
+
+TIME_WINDOWS = (
+    timedelta(hours=6),
+    timedelta(hours=24),
+    timedelta(days=7),
+    timedelta(days=30),
+    timedelta(days=180),
+    timedelta(days=365),
+    timedelta(days=365 * 3),
+)
+DEPTH_RANGES = ((0, 2000), (0, 5000), (0, 10000), (0, 20000), (0, 50000))
+DEFAULT_MAX_REQUESTS = 12
+
+_TIME_KEYS = ("time", "timestamp", "datetime", "date", "index")
+_DEPTH_KEYS = ("depth", "md", "measured_depth", "survey_md", "index")
+
+
+@dataclass
+class ProbeStep:
+    domain: str
+    purpose: str
+    variant: str
+    params: dict
+    rows: int
+
+
+@dataclass
+class ProbeReport:
+    steps: list[ProbeStep] = field(default_factory=list)
+    requests: int = 0
+    outcome: str = ""
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "outcome": self.outcome, "steps": [asdict(s) for s in self.steps]}
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _fmt_time(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _row_coordinate(df: pd.DataFrame, domain: str):
+    """Coordenada (tiempo o profundidad) de la primera fila, si se puede inferir."""
+    if df is None or df.empty:
+        return None
+    keys = _TIME_KEYS if domain == "TIME" else _DEPTH_KEYS
+    lowered = {str(c).strip().lower(): c for c in df.columns}
+    for k in keys:
+        if k in lowered:
+            val = df[lowered[k]].iloc[0]
+            if domain == "TIME":
+                ts = pd.to_datetime(val, errors="coerce", utc=True)
+                return None if pd.isna(ts) else ts.to_pydatetime()
+            num = pd.to_numeric(pd.Series([val]), errors="coerce").iloc[0]
+            return None if pd.isna(num) else float(num)
+    return None
+
+
+def probe_trace_extent(
+    fetch: Callable[[str, dict, str], pd.DataFrame],
+    prefer_type: str,
+    user_params: dict | None = None,
+    variants: tuple[str, ...] = ("plain", "calculated"),
+    now: datetime | None = None,
+    time_windows: tuple[timedelta, ...] = TIME_WINDOWS,
+    depth_ranges: tuple[tuple[float, float], ...] = DEPTH_RANGES,
+    max_requests: int = DEFAULT_MAX_REQUESTS,
+) -> tuple[pd.DataFrame, str, dict, ProbeReport]:
+    """
+    Busca datos para una traza que vino vacía con los params del usuario.
+
+    ``fetch(domain, params, variant)`` hace una petición y devuelve un DataFrame
+    (vacío si no hay datos o si falla). Retorna ``(df, dominio, params, report)``.
+    """
+    prefer = str(prefer_type).upper()
+    user_params = dict(user_params or {})
+    now = now or datetime.now(timezone.utc)
+    report = ProbeReport()
+
+    def _call(domain: str, params: dict, variant: str, purpose: str) -> pd.DataFrame:
+        if report.requests >= max_requests:
+            raise _BudgetExceeded()
+        report.requests += 1
+        try:
+            df = fetch(domain, params, variant)
+        except Exception:
+            df = pd.DataFrame()
+        if df is None:
+            df = pd.DataFrame()
+        report.steps.append(
+            ProbeStep(domain=domain, purpose=purpose, variant=variant, params=dict(params), rows=len(df))
+        )
+        return df
+
+    def _one_row(domain: str, params: dict, variant: str, purpose: str) -> pd.DataFrame:
+        p = {k: v for k, v in params.items() if k != "_bounds"}
+        p["size"] = 1
+        p["page"] = 0
+        return _call(domain, p, variant, purpose)
+
+    def _search(domain: str, rungs: list[dict]) -> tuple[pd.DataFrame, dict] | None:
+        # 1) existencia de datos en el peldaño más grande (y variante que responde)
+        variant = None
+        hit = pd.DataFrame()
+        for v in variants:
+            hit = _one_row(domain, rungs[-1], v, "extent")
+            if not hit.empty:
+                variant = v
+                break
+        if variant is None:
+            return None
+
+        # 2) la coordenada de la fila acota el peldaño más pequeño que seguro tiene datos
+        hi = len(rungs) - 1
+        coord = _row_coordinate(hit, domain)
+        if coord is not None:
+            for i, r in enumerate(rungs):
+                lo_b, hi_b = r["_bounds"]
+                if lo_b <= coord <= hi_b:
+                    hi = i
+                    break
+
+        # 3) bisección: menor peldaño con datos en [0, hi]
+        lo = 0
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _one_row(domain, rungs[mid], variant, "bisect").empty:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # 4) descarga completa con la ventana elegida
+        params = {k: v for k, v in rungs[hi].items() if k != "_bounds"}
+        df = _call(domain, params, variant, "fetch")
+        if df.empty:
+            return None
+        return df, params
+
+    def _time_rungs() -> list[dict]:
+        rungs = []
+        for w in time_windows:
+            p = dict(user_params)
+            p["to"] = _fmt_time(now)
+            p["from"] = _fmt_time(now - w)
+            p["_bounds"] = (now - w, now)
+            rungs.append(p)
+        return rungs
+
+    def _depth_rungs() -> list[dict]:
+        rungs = []
+        for a, b in depth_ranges:
+            p = dict(user_params)
+            p["from"] = a
+            p["to"] = b
+            p["_bounds"] = (float(a), float(b))
+            rungs.append(p)
+        return rungs
+
+    domains = [("TIME", _time_rungs)] if prefer == "TIME" else []
+    domains.append(("DEPTH", _depth_rungs))
+    try:
+        for domain, make_rungs in domains:
+            rungs = make_rungs()
+            if not rungs:
+                continue
+            found = _search(domain, rungs)
+            if found is not None:
+                report.outcome = f"found:{domain}"
+                return found[0], domain, found[1], report
+    except _BudgetExceeded:
+        report.outcome = "budget"
+        return pd.DataFrame(), prefer, user_params, report
+
+    report.outcome = "empty"
+    return pd.DataFrame(), prefer, user_params, report
@@ -0,0 +1,388 @@
+"""Almacén local de trazas en disco (Parquet), por pozo, traza y rango.
+
+Las series descargadas de SOLO solo vivían en ``st.cache_data`` (memoria del
+proceso) y se perdían al reiniciar; cada ingeniero que abría el mismo pozo
+volvía a bajar las mismas cientos de miles de filas. Aquí se guardan en
+particiones Parquet::
+
+    <root>/well=<uuid>/trace=<uuid>/domain=TIME/day=2024-01-31.parquet
+    <root>/well=<uuid>/trace=<uuid>/domain=DEPTH/bucket=000500.parquet
+
+junto con un ``coverage.json`` por traza/dominio con los intervalos ya pedidos
+a la API (tengan o no datos). ``read_through`` solo descarga los huecos del
+rango pedido que no están cubiertos. El tamaño total se acota con expulsión
+LRU (la fecha de modificación de cada partición se renueva al leerla).
+
+``pyarrow`` es opcional: si no está instalado el almacén queda deshabilitado y
+``read_through`` simplemente llama a la API.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+from live_tail import pick_x_col
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+DEPTH_BUCKET_M = 500.0
+DAY_S = 86400.0
+EVICT_TARGET = 0.9
+# Las muestras cercanas al "ahora" pueden llegar con retraso: esa cola no se marca cubierta.
+HEAD_MARGIN_S = 900.0
+
+
+def _to_num(s: pd.Series, domain: str) -> pd.Series:
+    """Coordenada numérica: segundos epoch (TIME) o metros (DEPTH)."""
+    if domain == "TIME":
+        ts = pd.to_datetime(s, errors="coerce", utc=True)
+        return (ts - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+    return pd.to_numeric(s, errors="coerce").astype(float)
+
+
+def range_bounds(params: dict | None, domain: str) -> tuple[float, float] | None:
+    """``(lo, hi)`` numérico de los params ``from``/``to`` o ``None`` si no hay rango explícito."""
+    p = params or {}
+    if str(p.get("from", "")).strip() == "" or str(p.get("to", "")).strip() == "":
+        return None
+    bounds = _to_num(pd.Series([p["from"], p["to"]]), domain)
+    if bounds.isna().any() or bounds.iloc[0] > bounds.iloc[1]:
+        return None
+    return float(bounds.iloc[0]), float(bounds.iloc[1])
+
+
+def _merge_intervals(intervals: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    out: list[list[float]] = []
+    for lo, hi in sorted(intervals):
+        if out and lo <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], hi)
+        else:
+            out.append([lo, hi])
+    return [(a, b) for a, b in out]
+
+
+def _subtract(intervals: list[tuple[float, float]], lo: float, hi: float) -> list[tuple[float, float]]:
+    out = []
+    for a, b in intervals:
+        if b <= lo or a >= hi:
+            out.append((a, b))
+            continue
+        if a < lo:
+            out.append((a, lo))
+        if b > hi:
+            out.append((hi, b))
+    return out
+
+
+def missing_ranges(covered: list[tuple[float, float]], lo: float, hi: float) -> list[tuple[float, float]]:
+    """Partes de ``[lo, hi]`` no cubiertas por ``covered`` (ordenadas)."""
+    gaps = []
+    cur = lo
+    for a, b in _merge_intervals(covered):
+        if b <= cur:
+            continue
+        if a >= hi:
+            break
+        if a > cur:
+            gaps.append((cur, min(a, hi)))
+        cur = max(cur, b)
+        if cur >= hi:
+            break
+    if cur < hi:
+        gaps.append((cur, hi))
+    return gaps
+
+
+def format_bound(value: float, domain: str):
+    """Valor para el param ``from``/``to`` de la API."""
+    if domain == "TIME":
+        return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return float(value)
+
+
+class TraceStore:
+    """Particiones Parquet + cobertura por traza, con tope de tamaño LRU."""
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        depth_bucket_m: float = DEPTH_BUCKET_M,
+        head_margin_s: float = HEAD_MARGIN_S,
+    ):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.depth_bucket_m = float(depth_bucket_m)
+        self.head_margin_s = max(0.0, float(head_margin_s))
+        self._lock = threading.RLock()
+        self.rows_from_disk = 0
+        self.rows_from_api = 0
+        self.gap_fetches = 0
+        self.evicted_files = 0
+
+    @property
+    def available(self) -> bool:
+        return pq is not None
+
+    # ---------------------------------------------------------------- rutas
+    def _trace_dir(self, well_uuid: str, trace_uuid: str, domain: str) -> Path:
+        return self.root / f"well={well_uuid}" / f"trace={trace_uuid}" / f"domain={domain}"
+
+    def _bucket_of(self, x: np.ndarray, domain: str) -> np.ndarray:
+        size = DAY_S if domain == "TIME" else self.depth_bucket_m
+        return np.floor(x / size).astype("int64")
+
+    def _bucket_name(self, b: int, domain: str) -> str:
+        if domain == "TIME":
+            return "day=" + datetime.fromtimestamp(b * DAY_S, tz=timezone.utc).strftime("%Y-%m-%d") + ".parquet"
+        return f"bucket={int(b * self.depth_bucket_m):06d}.parquet"
+
+    def _bucket_span(self, path: Path, domain: str) -> tuple[float, float] | None:
+        name = path.stem.split("=", 1)[-1]
+        try:
+            if domain == "TIME":
+                lo = datetime.strptime(name, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+                return lo, lo + DAY_S
+            lo = float(name)
+            return lo, lo + self.depth_bucket_m
+        except ValueError:
+            return None
+
+    # ------------------------------------------------------------ cobertura
+    def _coverage_path(self, tdir: Path) -> Path:
+        return tdir / "coverage.json"
+
+    def _read_coverage(self, tdir: Path) -> tuple[list[tuple[float, float]], str | None]:
+        try:
+            data = json.loads(self._coverage_path(tdir).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return [], None
+        return [(float(a), float(b)) for a, b in data.get("intervals", [])], data.get("x_col")
+
+    def _write_json(self, path: Path, payload: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def coverage(self, well_uuid: str, trace_uuid: str, domain: str) -> list[tuple[float, float]]:
+        with self._lock:
+            return self._read_coverage(self._trace_dir(well_uuid, trace_uuid, domain))[0]
+
+    # ------------------------------------------------------------- lectura
+    def read(self, well_uuid: str, trace_uuid: str, domain: str, lo: float, hi: float) -> pd.DataFrame:
+        """Filas guardadas con coordenada en ``[lo, hi]`` (ordenadas)."""
+        if not self.available:
+            return pd.DataFrame()
+        with self._lock:
+            tdir = self._trace_dir(well_uuid, trace_uuid, domain)
+            _, x_col = self._read_coverage(tdir)
+            if x_col is None:
+                return pd.DataFrame()
+            parts = []
+            for b in range(int(self._bucket_of(np.array([lo]), domain)[0]), int(self._bucket_of(np.array([hi]), domain)[0]) + 1):
+                path = tdir / self._bucket_name(b, domain)
+                if not path.exists():
+                    continue
+                try:
+                    part = pq.read_table(path).to_pandas()
+                except (OSError, pa.ArrowException):
+                    continue
+                os.utime(path)  # LRU: último acceso
+                x = _to_num(part[x_col], domain)
+                parts.append(part.loc[(x >= lo) & (x <= hi)])
+            if not parts:
+                return pd.DataFrame()
+            df = pd.concat(parts, ignore_index=True)
+            self.rows_from_disk += len(df)
+            return df
+
+    # ------------------------------------------------------------ escritura
+    def write(
+        self,
+        well_uuid: str,
+        trace_uuid: str,
+        domain: str,
+        df: pd.DataFrame,
+        lo: float,
+        hi: float,
+        x_col: str | None = None,
+    ) -> bool:
+        """
+        Guarda ``df`` (filas de ``[lo, hi]``) y marca ese intervalo como cubierto.
+        Retorna ``False`` si no se pudo guardar (sin pyarrow, sin columna de
+        coordenada o tipos que Parquet no admite); en ese caso no se marca cobertura.
+        """
+        if not self.available:
+            return False
+        with self._lock:
+            tdir = self._trace_dir(well_uuid, trace_uuid, domain)
+            covered, stored_x = self._read_coverage(tdir)
+            if df is not None and not df.empty:
+                x_col = stored_x if stored_x in df.columns else (x_col or pick_x_col(df, domain))
+                if x_col is None:
+                    return False
+                x = _to_num(df[x_col], domain)
+                ok = x.notna().to_numpy()
+                df = df.loc[ok]
+                buckets = self._bucket_of(x[ok].to_numpy(), domain)
+                try:
+                    for b in np.unique(buckets):
+                        path = tdir / self._bucket_name(int(b), domain)
+                        new = df.loc[buckets == b]
+                        if path.exists():
+                            old = pq.read_table(path).to_pandas()
+                            new = pd.concat([old, new], ignore_index=True)
+                        xs = _to_num(new[x_col], domain)
+                        new = new.assign(_x=xs.to_numpy()).drop_duplicates("_x", keep="last").sort_values("_x").drop(columns="_x")
+                        self._write_parquet(path, new.reset_index(drop=True))
+                except (pa.ArrowException, ValueError, TypeError):
+                    return False
+            else:
+                x_col = stored_x or x_col
+            if domain == "TIME":
+                # Ni el futuro ni los últimos minutos (muestras tardías) se marcan cubiertos.
+                hi = min(hi, time.time() - self.head_margin_s)
+            if hi > lo:
+                covered = _merge_intervals(covered + [(lo, hi)])
+            self._write_json(self._coverage_path(tdir), {"x_col": x_col, "intervals": covered})
+        self.evict()
+        return True
+
+    def _write_parquet(self, path: Path, df: pd.DataFrame) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    # ------------------------------------------------------------ expulsión
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.rglob("*.parquet")) if self.root.exists() else 0
+
+    def evict(self) -> int:
+        """Borra las particiones menos usadas hasta bajar del 90 % de ``max_bytes``."""
+        if not self.root.exists():
+            return 0
+        with self._lock:
+            files = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.root.rglob("*.parquet")]
+            total = sum(f[1] for f in files)
+            if total <= self.max_bytes:
+                return 0
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes * EVICT_TARGET:
+                    break
+                tdir = path.parent
+                domain = tdir.name.split("=", 1)[-1]
+                span = self._bucket_span(path, domain)
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                if span is not None:
+                    covered, x_col = self._read_coverage(tdir)
+                    self._write_json(self._coverage_path(tdir), {"x_col": x_col, "intervals": _subtract(covered, *span)})
+            self.evicted_files += removed
+            return removed
+
+    # --------------------------------------------------------- read-through
+    def read_through(
+        self,
+        well_uuid: str,
+        trace_uuid: str,
+        domain: str,
+        lo: float,
+        hi: float,
+        fetch_range: Callable[[float, float], tuple[pd.DataFrame, bool]],
+    ) -> pd.DataFrame:
+        """
+        Devuelve las filas de ``[lo, hi]`` pidiendo a la API solo los huecos.
+
+        ``fetch_range(lo, hi)`` descarga un hueco y retorna ``(df, completo)``;
+        si ``completo`` es ``False`` (p. ej. se alcanzó el tope de páginas) solo se
+        marca cubierto hasta la última coordenada recibida. Si ``fetch_range``
+        lanza (5xx, timeout, token vencido) el error se propaga y ese hueco no se
+        marca: se vuelve a pedir en la siguiente lectura.
+        """
+        domain = str(domain).upper()
+        if not self.available:
+            df, _ = fetch_range(lo, hi)
+            return df
+        unsaved: list[pd.DataFrame] = []
+        for g_lo, g_hi in missing_ranges(self.coverage(well_uuid, trace_uuid, domain), lo, hi):
+            df, complete = fetch_range(g_lo, g_hi)
+            self.gap_fetches += 1
+            self.rows_from_api += 0 if df is None else len(df)
+            if not complete:
+                x_col = pick_x_col(df, domain) if df is not None and not df.empty else None
+                if x_col is None:
+                    if df is not None and not df.empty:
+                        unsaved.append(df)
+                    continue
+                g_hi = float(_to_num(df[x_col], domain).max())
+            if not self.write(well_uuid, trace_uuid, domain, df, g_lo, g_hi) and df is not None and not df.empty:
+                # No se pudo guardar (sin columna de coordenada, tipos no admitidos): se sirve lo descargado.
+                unsaved.append(df)
+        out = self.read(well_uuid, trace_uuid, domain, lo, hi)
+        if not unsaved:
+            return out
+        parts = [d for d in [out, *unsaved] if d is not None and not d.empty]
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat(parts, ignore_index=True)
+        x_col = pick_x_col(df, domain)
+        if x_col is not None:
+            df = df.assign(_x=_to_num(df[x_col], domain).to_numpy()).sort_values("_x", kind="stable").drop(columns="_x").reset_index(drop=True)
+        return df
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.available,
+            "size_mb": round(self.size_bytes() / 1e6, 1),
+            "max_mb": round(self.max_bytes / 1e6, 1),
+            "rows_from_disk": self.rows_from_disk,
+            "rows_from_api": self.rows_from_api,
+            "gap_fetches": self.gap_fetches,
+            "evicted_files": self.evicted_files,
+        }
+
+
+_STORES: dict[str, TraceStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_trace_store(
+    root: str | Path, max_bytes: int = DEFAULT_MAX_BYTES, head_margin_s: float = HEAD_MARGIN_S
+) -> TraceStore:
+    """Instancia compartida por directorio (una por proceso)."""
+    key = str(Path(root).resolve())
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = TraceStore(root, max_bytes, head_margin_s=head_margin_s)
+            _STORES[key] = store
+        return store
@@ -1,12 +1,12 @@
-import io
 import smtplib
 from email.message import EmailMessage
 from pathlib import Path
 
 import altair as alt
-import pandas as pd
 import streamlit as st
 
+from hookload_engine import DEPTH_BIN_COL, dataframe_to_excel_bytes, filter_max_hookload
+
 st.set_page_config(
     page_title="Filtrado de Hookload máximo por Bit depth",
     page_icon="📈",
@@ -48,29 +48,6 @@ st.markdown(
 )
 
 
-def detect_timestamp_column(columns):
-    preferred = ["Timestamp", "timestamp", "YYYY-MM-DDTHH:MM:SS"]
-    for col in preferred:
-        if col in columns:
-            return col
-    return None
-
-
-def preserve_units_row(original_df: pd.DataFrame, filtered_df: pd.DataFrame) -> pd.DataFrame:
-    if original_df.empty:
-        return filtered_df.copy()
-
-    units_row = original_df.iloc[[0]].copy()
-    units_row.columns = [c.strip() for c in units_row.columns]
-
-    for col in filtered_df.columns:
-        if col not in units_row.columns:
-            units_row[col] = ""
-
-    units_row = units_row[filtered_df.columns]
-    return pd.concat([units_row, filtered_df], ignore_index=True)
-
-
 def send_email_with_attachment(
     smtp_server: str,
     smtp_port: int,
@@ -121,28 +98,6 @@ def find_logo_path():
     return None
 
 
-def dataframe_to_excel_bytes(df: pd.DataFrame) -> bytes:
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Hookload_filtrado")
-        ws = writer.sheets["Hookload_filtrado"]
-
-        for col_cells in ws.columns:
-            max_length = 0
-            column_letter = col_cells[0].column_letter
-            for cell in col_cells:
-                try:
-                    cell_len = len(str(cell.value)) if cell.value is not None else 0
-                    if cell_len > max_length:
-                        max_length = cell_len
-                except Exception:
-                    pass
-            ws.column_dimensions[column_letter].width = min(max(max_length + 2, 12), 40)
-
-    output.seek(0)
-    return output.getvalue()
-
-
 with st.sidebar:
     st.header("Configuración de limpieza")
     timestamp_col_enabled = st.checkbox(
@@ -153,6 +108,13 @@ with st.sidebar:
         "Eliminar filas con Timestamp inválido",
         value=True,
     )
+    depth_bin_m = st.number_input(
+        "Bin de profundidad (m, 0 = por Bit depth exacto)",
+        min_value=0.0,
+        value=0.0,
+        step=0.1,
+        help="Con un bin > 0 se conserva la fila de mayor Hookload por cada intervalo de profundidad.",
+    )
 
     st.divider()
 
@@ -190,50 +152,36 @@ uploaded_file = st.file_uploader("Sube tu archivo CSV", type=["csv"])
 
 if uploaded_file is not None:
     try:
-        raw_bytes = uploaded_file.getvalue()
-        original_df = pd.read_csv(io.BytesIO(raw_bytes))
-        original_df.columns = [c.strip() for c in original_df.columns]
-
-        st.subheader("Vista previa original")
-        st.dataframe(original_df.head(), use_container_width=True)
-
-        st.info(f"Columnas detectadas: {', '.join(original_df.columns.tolist())}")
-
-        required_columns = ["Bit depth", "Hookload"]
-        missing = [c for c in required_columns if c not in original_df.columns]
-        if missing:
-            st.error("Faltan columnas obligatorias: " + ", ".join(missing))
+        # Lectura por bloques: el archivo nunca se carga entero como DataFrame.
+        uploaded_file.seek(0)
+        try:
+            reducer = filter_max_hookload(
+                uploaded_file,
+                bin_m=depth_bin_m,
+                parse_timestamp=timestamp_col_enabled,
+                drop_invalid_timestamp=drop_nan_timestamp,
+            )
+        except ValueError as e:
+            st.error(str(e))
             st.stop()
 
-        df = original_df.copy()
-
-        df["Bit depth"] = pd.to_numeric(df["Bit depth"], errors="coerce")
-        df["Hookload"] = pd.to_numeric(df["Hookload"], errors="coerce")
+        st.subheader("Vista previa original")
+        st.dataframe(reducer.head_raw, use_container_width=True)
 
-        original_rows = len(df)
-        df = df.dropna(subset=["Bit depth", "Hookload"]).copy()
-        cleaned_rows = len(df)
+        st.info(f"Columnas detectadas: {', '.join(reducer.head_raw.columns.tolist())}")
 
-        ts_col = detect_timestamp_column(df.columns)
-        if timestamp_col_enabled and ts_col is not None:
-            df[ts_col] = pd.to_datetime(df[ts_col], errors="coerce")
-            if drop_nan_timestamp:
-                df = df.dropna(subset=[ts_col]).copy()
+        original_rows = reducer.rows_read
+        cleaned_rows = reducer.rows_valid
 
         st.subheader("Datos después de limpiar NaNs")
-        st.dataframe(df.head(), use_container_width=True)
+        st.dataframe(reducer.head_clean, use_container_width=True)
 
-        if df.empty:
+        filtered_df = reducer.result()
+        if filtered_df.empty:
             st.warning("No quedaron filas válidas después de la limpieza.")
             st.stop()
 
-        filtered_df = (
-            df.loc[df.groupby("Bit depth")["Hookload"].idxmax()]
-            .sort_values("Bit depth")
-            .reset_index(drop=True)
-        )
-
-        final_df = preserve_units_row(original_df=original_df, filtered_df=filtered_df)
+        final_df = reducer.final_frame()
 
         st.subheader("Datos filtrados")
         st.dataframe(final_df.head(100), use_container_width=True)
@@ -242,7 +190,7 @@ if uploaded_file is not None:
         m1.metric("Filas originales", original_rows)
         m2.metric("Filas válidas", cleaned_rows)
         m3.metric("Filas filtradas", len(filtered_df))
-        m4.metric("Fila de unidades", "Sí" if len(original_df) >= 1 else "No")
+        m4.metric("Fila de unidades", "Sí" if original_rows >= 1 else "No")
 
         st.subheader("Gráfico Hookload vs Depth en vivo")
 
@@ -255,7 +203,7 @@ if uploaded_file is not None:
                 .encode(
                     x=alt.X("Bit depth:Q", title="Bit depth"),
                     y=alt.Y("Hookload:Q", title="Hookload"),
-                    tooltip=["Bit depth", "Hookload"],
+                    tooltip=["Bit depth", "Hookload"] + ([DEPTH_BIN_COL] if DEPTH_BIN_COL in chart_df.columns else []),
                 )
                 .properties(height=420)
                 .interactive()
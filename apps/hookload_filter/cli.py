@@ -0,0 +1,109 @@
+"""CLI por lotes: filtra el Hookload máximo por Bit depth en una carpeta de CSV.
+
+Cada archivo se procesa en su propio proceso con el mismo motor por bloques que
+la app de Streamlit. Ejemplo::
+
+    python apps/hookload_filter/cli.py exports/ -o filtrados/ --bin 0.5 --workers 4 --excel
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from hookload_engine import DEFAULT_CHUNKSIZE, dataframe_to_excel_bytes, filter_max_hookload
+
+
+def process_file(
+    path: Path,
+    out_dir: Path,
+    bin_m: float | None,
+    parse_timestamp: bool,
+    drop_invalid_timestamp: bool,
+    chunksize: int,
+    excel: bool,
+) -> dict:
+    t0 = time.perf_counter()
+    reducer = filter_max_hookload(
+        path,
+        bin_m=bin_m,
+        parse_timestamp=parse_timestamp,
+        drop_invalid_timestamp=drop_invalid_timestamp,
+        chunksize=chunksize,
+    )
+    final_df = reducer.final_frame()
+    out_csv = out_dir / f"{path.stem}_filtrado.csv"
+    final_df.to_csv(out_csv, index=False)
+    outputs = [out_csv]
+    if excel:
+        out_xlsx = out_dir / f"{path.stem}_filtrado.xlsx"
+        out_xlsx.write_bytes(dataframe_to_excel_bytes(final_df))
+        outputs.append(out_xlsx)
+    return {
+        "file": path.name,
+        "rows_read": reducer.rows_read,
+        "rows_valid": reducer.rows_valid,
+        "rows_out": len(final_df) - (0 if reducer.units_row.empty else 1),
+        "outputs": [str(p) for p in outputs],
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Filtrado de Hookload máximo por Bit depth (por lotes).")
+    parser.add_argument("input", type=Path, help="Carpeta con CSV (o un CSV).")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Carpeta de salida (por defecto, la de entrada).")
+    parser.add_argument("--pattern", default="*.csv", help="Patrón de archivos dentro de la carpeta (por defecto *.csv).")
+    parser.add_argument("--bin", dest="bin_m", type=float, default=None, help="Ancho de bin de profundidad en m (sin bin: por profundidad exacta).")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, núcleos disponibles).")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Filas por bloque de lectura.")
+    parser.add_argument("--excel", action="store_true", help="Escribir también el Excel filtrado.")
+    parser.add_argument("--no-timestamp", action="store_true", help="No procesar la columna Timestamp.")
+    parser.add_argument("--keep-invalid-timestamp", action="store_true", help="Conservar filas con Timestamp inválido.")
+    args = parser.parse_args(argv)
+
+    if args.input.is_dir():
+        files = sorted(p for p in args.input.glob(args.pattern) if not p.stem.endswith("_filtrado"))
+    else:
+        files = [args.input]
+    if not files:
+        print(f"No se encontraron archivos {args.pattern} en {args.input}", file=sys.stderr)
+        return 1
+    out_dir = args.output or (args.input if args.input.is_dir() else args.input.parent)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(
+                process_file,
+                path,
+                out_dir,
+                args.bin_m,
+                not args.no_timestamp,
+                not args.keep_invalid_timestamp,
+                args.chunksize,
+                args.excel,
+            ): path
+            for path in files
+        }
+        for done, fut in enumerate(as_completed(futures), start=1):
+            path = futures[fut]
+            try:
+                r = fut.result()
+            except Exception as e:
+                failures += 1
+                print(f"[{done}/{len(files)}] {path.name}: ERROR {e}", file=sys.stderr)
+                continue
+            print(
+                f"[{done}/{len(files)}] {r['file']}: {r['rows_read']:,} filas → {r['rows_out']:,} "
+                f"({r['seconds']:.1f} s) → {', '.join(r['outputs'])}"
+            )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
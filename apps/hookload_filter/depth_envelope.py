@@ -0,0 +1,164 @@
+"""Envolvente de una señal por profundidad (exacta o por bins).
+
+Agrupar por el valor float exacto de ``Bit depth`` deja casi un grupo por
+muestra cuando el tracking de profundidad es ruidoso, y la envolvente sale
+casi tan grande como la entrada. Aquí la profundidad se cuantiza a un ancho de
+bin configurable y cada grupo se reduce con:
+
+- ``max``: máximo (ruta rápida: ``np.maximum.reduceat`` sobre la profundidad
+  ordenada; si ya viene ordenada no se reordena).
+- ``percentile``: percentil ``q`` (interpolación lineal, como ``quantile``).
+- ``robust_max``: máximo de las muestras dentro de ``mediana + k·1.4826·MAD``
+  del grupo, para que un pico aislado no marque la envolvente.
+
+Cada grupo guarda además la posición de la muestra representativa (la mayor
+que no supera el valor reducido; con ``max``, ante empates, la primera), así
+que con ``max`` y sin bin el resultado es el de
+``df.groupby(depth)[value].idxmax()``.
+Lo usan ``hookload_engine.py`` y el análisis de viajes de ``DO_app_rogii``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+REDUCERS = ("max", "percentile", "robust_max")
+MAD_TO_SIGMA = 1.4826
+DEFAULT_ROBUST_K = 3.5
+
+
+@dataclass
+class DepthEnvelope:
+    depth: np.ndarray  # profundidad del grupo (bin o valor exacto)
+    value: np.ndarray
+    count: np.ndarray
+    row: np.ndarray  # posición (0..n-1) de la muestra representativa en la entrada
+
+    def __len__(self) -> int:
+        return int(self.depth.size)
+
+
+def bin_depth(depth, bin_m: float | None) -> np.ndarray:
+    """Centro del bin de ``bin_m`` metros más cercano (sin bin, la profundidad tal cual)."""
+    d = np.asarray(depth, dtype=float)
+    if not bin_m or bin_m <= 0:
+        return d
+    return np.round(d / float(bin_m)) * float(bin_m)
+
+
+def _group_starts(sorted_keys: np.ndarray) -> np.ndarray:
+    new = np.ones(sorted_keys.size, dtype=bool)
+    new[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    return np.flatnonzero(new)
+
+
+def _percentile_sorted(v: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Percentil por grupo sobre valores ordenados dentro de cada grupo."""
+    pos = starts + (q / 100.0) * (counts - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts + counts - 1)
+    frac = pos - lo
+    return v[lo] + (v[hi] - v[lo]) * frac
+
+
+def _sort_within_groups(values: np.ndarray, gid: np.ndarray) -> np.ndarray:
+    by_value = np.argsort(values)
+    return by_value[np.argsort(gid[by_value], kind="stable")]
+
+
+def depth_envelope(
+    depth,
+    values,
+    bin_m: float | None = None,
+    reducer: str = "max",
+    q: float = 95.0,
+    robust_k: float = DEFAULT_ROBUST_K,
+) -> DepthEnvelope:
+    """Envolvente de ``values`` por profundidad; ignora muestras con NaN en cualquiera de los dos."""
+    if reducer not in REDUCERS:
+        raise ValueError(f"Reductor no soportado: {reducer}")
+    keys_all = bin_depth(depth, bin_m)
+    v_all = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~(np.isnan(keys_all) | np.isnan(v_all)))
+    if valid.size == 0:
+        empty = np.array([], dtype=float)
+        return DepthEnvelope(empty, empty, np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    keys = keys_all[valid]
+    v = v_all[valid]
+    n = keys.size
+    pos = np.arange(n)
+
+    if reducer == "max":
+        # Orden estable por profundidad: dentro de cada grupo se conserva el orden original.
+        presorted = bool(np.all(keys[1:] >= keys[:-1]))
+        order = pos if presorted else np.argsort(keys, kind="stable")
+        k = keys[order]
+        vs = v[order]
+        starts = _group_starts(k)
+        counts = np.diff(np.r_[starts, n])
+        value = np.maximum.reduceat(vs, starts)
+        first_max = np.where(vs == np.repeat(value, counts), pos, n)
+        row = order[np.minimum.reduceat(first_max, starts)]
+        return DepthEnvelope(k[starts], value, counts, valid[row])
+
+    # Orden por (grupo, valor): argsort por valor y luego uno estable por grupo
+    # (radix sort si el id de grupo cabe en 16 bits). Más rápido que lexsort.
+    korder = np.argsort(keys, kind="stable")
+    starts = _group_starts(keys[korder])
+    counts = np.diff(np.r_[starts, n])
+    gid = np.empty(n, dtype=np.uint16 if starts.size <= np.iinfo(np.uint16).max else np.int64)
+    gid[korder] = np.repeat(np.arange(starts.size), counts)
+    order = _sort_within_groups(v, gid)
+    k = keys[order]
+    vs = v[order]
+    if reducer == "percentile":
+        value = _percentile_sorted(vs, starts, counts, float(q))
+    else:
+        med = _percentile_sorted(vs, starts, counts, 50.0)
+        dev = np.abs(vs - np.repeat(med, counts))
+        # MAD por grupo: mediana de las desviaciones ordenadas dentro de cada grupo.
+        dev_sorted = dev[_sort_within_groups(dev, gid[order])]
+        mad = _percentile_sorted(dev_sorted, starts, counts, 50.0)
+        limit = np.repeat(med + robust_k * MAD_TO_SIGMA * mad, counts)
+        value = np.maximum.reduceat(np.where(vs <= limit, vs, -np.inf), starts)
+    # Representativa: la última muestra del grupo (ordenado) que no supera el valor.
+    below = np.where(vs <= np.repeat(value, counts) + 1e-12 * np.abs(np.repeat(value, counts)), pos, -1)
+    last = np.maximum.reduceat(below, starts)
+    last = np.where(last >= starts, last, starts)
+    return DepthEnvelope(k[starts], value, counts, valid[order[last]])
+
+
+def envelope_frame(
+    df: pd.DataFrame,
+    depth_col: str,
+    value_col: str,
+    bin_m: float | None = None,
+    reducer: str = "max",
+    q: float = 95.0,
+    robust_k: float = DEFAULT_ROBUST_K,
+    bin_col: str | None = None,
+) -> pd.DataFrame:
+    """
+    Una fila de ``df`` por grupo (la muestra representativa) ordenada por
+    profundidad, con ``value_col`` igual al valor reducido. ``bin_col`` añade la
+    profundidad del bin.
+    """
+    if df.empty or depth_col not in df.columns or value_col not in df.columns:
+        return pd.DataFrame()
+    env = depth_envelope(
+        pd.to_numeric(df[depth_col], errors="coerce"),
+        pd.to_numeric(df[value_col], errors="coerce"),
+        bin_m=bin_m,
+        reducer=reducer,
+        q=q,
+        robust_k=robust_k,
+    )
+    out = df.iloc[env.row].reset_index(drop=True)
+    if reducer != "max":
+        out[value_col] = env.value
+    if bin_col:
+        out[bin_col] = env.depth
+    return out
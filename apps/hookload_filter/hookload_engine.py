@@ -0,0 +1,215 @@
+"""Filtrado de Hookload máximo por Bit depth en streaming.
+
+El CSV se lee por bloques (``chunksize``) y se mantiene, por cada profundidad
+(o por cada bin de profundidad), la fila con el mayor Hookload visto hasta el
+momento. Por clave solo se guardan el máximo y la posición de su fila en
+arrays de numpy, que se actualizan en el sitio con cada bloque; de cada bloque
+se conservan únicamente las filas que mejoran un máximo, y las filas ganadoras
+se arman una sola vez en ``finalize``. El costo por bloque no crece con el
+número de bloques ya leídos.
+
+El resultado es el mismo que ``df.loc[df.groupby("Bit depth")["Hookload"].idxmax()]``
+sobre el archivo completo: ante empates gana la primera fila del archivo.
+Lo usan la página de Streamlit (``app.py``) y el CLI por lotes (``cli.py``).
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from depth_envelope import bin_depth, depth_envelope
+
+DEPTH_COL = "Bit depth"
+HOOKLOAD_COL = "Hookload"
+DEPTH_BIN_COL = "Depth bin"
+REQUIRED_COLUMNS = [DEPTH_COL, HOOKLOAD_COL]
+DEFAULT_CHUNKSIZE = 250_000
+PREVIEW_ROWS = 5
+_KEY = "__depth_key"
+
+
+def detect_timestamp_column(columns):
+    preferred = ["Timestamp", "timestamp", "YYYY-MM-DDTHH:MM:SS"]
+    for col in preferred:
+        if col in columns:
+            return col
+    return None
+
+
+def preserve_units_row(original_df: pd.DataFrame, filtered_df: pd.DataFrame) -> pd.DataFrame:
+    if original_df.empty:
+        return filtered_df.copy()
+
+    units_row = original_df.iloc[[0]].copy()
+    units_row.columns = [c.strip() for c in units_row.columns]
+
+    for col in filtered_df.columns:
+        if col not in units_row.columns:
+            units_row[col] = ""
+
+    units_row = units_row[filtered_df.columns]
+    return pd.concat([units_row, filtered_df], ignore_index=True)
+
+
+def dataframe_to_excel_bytes(df: pd.DataFrame) -> bytes:
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Hookload_filtrado")
+        ws = writer.sheets["Hookload_filtrado"]
+
+        for col_cells in ws.columns:
+            max_length = 0
+            column_letter = col_cells[0].column_letter
+            for cell in col_cells:
+                try:
+                    cell_len = len(str(cell.value)) if cell.value is not None else 0
+                    if cell_len > max_length:
+                        max_length = cell_len
+                except Exception:
+                    pass
+            ws.column_dimensions[column_letter].width = min(max(max_length + 2, 12), 40)
+
+    output.seek(0)
+    return output.getvalue()
+
+
+@dataclass
+class HookloadMaxReducer:
+    """
+    Acumula bloques de filas y conserva la de mayor Hookload por clave de
+    profundidad. ``bin_m`` agrupa profundidades en bins de ese ancho (m),
+    centrados como en ``depth_envelope.bin_depth``.
+    """
+
+    bin_m: float | None = None
+    parse_timestamp: bool = True
+    drop_invalid_timestamp: bool = True
+    rows_read: int = 0
+    rows_valid: int = 0
+    units_row: pd.DataFrame = field(default_factory=pd.DataFrame)
+    head_raw: pd.DataFrame = field(default_factory=pd.DataFrame)
+    head_clean: pd.DataFrame = field(default_factory=pd.DataFrame)
+    # Por clave (ordenadas): máximo y posición de su fila en la concatenación de ``_kept``.
+    _keys: np.ndarray = field(default_factory=lambda: np.array([], dtype=float))
+    _vals: np.ndarray = field(default_factory=lambda: np.array([], dtype=float))
+    _pos: np.ndarray = field(default_factory=lambda: np.array([], dtype=np.int64))
+    _kept: list = field(default_factory=list)
+    _kept_rows: int = 0
+    _result: pd.DataFrame | None = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        chunk = chunk.copy()
+        chunk.columns = [str(c).strip() for c in chunk.columns]
+        if self.rows_read == 0:
+            missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError("Faltan columnas obligatorias: " + ", ".join(missing))
+            self.units_row = chunk.head(1)
+            self.head_raw = chunk.head(PREVIEW_ROWS)
+        self.rows_read += len(chunk)
+
+        chunk[DEPTH_COL] = pd.to_numeric(chunk[DEPTH_COL], errors="coerce")
+        chunk[HOOKLOAD_COL] = pd.to_numeric(chunk[HOOKLOAD_COL], errors="coerce")
+        chunk = chunk.dropna(subset=[DEPTH_COL, HOOKLOAD_COL])
+        self.rows_valid += len(chunk)
+
+        ts_col = detect_timestamp_column(chunk.columns)
+        if self.parse_timestamp and ts_col is not None:
+            chunk[ts_col] = pd.to_datetime(chunk[ts_col], errors="coerce")
+            if self.drop_invalid_timestamp:
+                chunk = chunk.dropna(subset=[ts_col])
+        if self.head_clean.empty and not chunk.empty:
+            self.head_clean = chunk.head(PREVIEW_ROWS)
+        if chunk.empty:
+            return
+
+        chunk[_KEY] = bin_depth(chunk[DEPTH_COL].to_numpy(dtype=float), self.bin_m)
+        # Una fila por clave del bloque (la primera con el máximo), ordenadas por clave.
+        env = depth_envelope(chunk[_KEY].to_numpy(), chunk[HOOKLOAD_COL].to_numpy(dtype=float))
+        idx = np.searchsorted(self._keys, env.depth)
+        found = idx < self._keys.size
+        found[found] = self._keys[idx[found]] == env.depth[found]
+        # Estrictamente mayor: ante empates se conserva la fila más temprana.
+        better = np.zeros(env.depth.size, dtype=bool)
+        better[found] = env.value[found] > self._vals[idx[found]]
+        take = better | ~found
+        if not take.any():
+            return
+        self._result = None
+        new_pos = self._kept_rows + np.arange(int(take.sum()), dtype=np.int64)
+        self._kept.append(chunk.iloc[env.row[take]])
+        self._kept_rows += int(take.sum())
+
+        upd = better[take]
+        self._vals[idx[better]] = env.value[better]
+        self._pos[idx[better]] = new_pos[upd]
+        ins = ~found
+        self._keys = np.insert(self._keys, idx[ins], env.depth[ins])
+        self._vals = np.insert(self._vals, idx[ins], env.value[ins])
+        self._pos = np.insert(self._pos, idx[ins], new_pos[~upd])
+        # Las filas superadas ocupan memoria: compactar cuando sean más que las vigentes.
+        if self._kept_rows > 2 * self._keys.size:
+            self._compact()
+
+    def _compact(self) -> None:
+        if len(self._kept) > 1 or self._kept_rows != self._keys.size:
+            self._kept = [pd.concat(self._kept).iloc[self._pos]]
+            self._kept_rows = self._keys.size
+            self._pos = np.arange(self._keys.size, dtype=np.int64)
+
+    def finalize(self) -> pd.DataFrame:
+        """Arma (una vez) las filas ganadoras ordenadas por profundidad."""
+        if self._result is None:
+            if not self._keys.size:
+                self._result = pd.DataFrame(columns=self.units_row.columns)
+            else:
+                self._compact()
+                self._result = self._kept[0].reset_index(drop=True)
+        return self._result
+
+    def result(self) -> pd.DataFrame:
+        """Filas ganadoras ordenadas por profundidad (sin la fila de unidades)."""
+        out = self.finalize()
+        if out.empty and _KEY not in out.columns:
+            return out.copy()
+        if self.bin_m:
+            return out.rename(columns={_KEY: DEPTH_BIN_COL})
+        return out.drop(columns=[_KEY])
+
+    def final_frame(self) -> pd.DataFrame:
+        """Resultado con la fila de unidades original delante."""
+        return preserve_units_row(original_df=self.units_row, filtered_df=self.result())
+
+
+def iter_csv_chunks(source, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterable[pd.DataFrame]:
+    """
+    Bloques del CSV como texto (``dtype=str``): las columnas que no se filtran
+    salen exactamente como venían, igual que cuando la fila de unidades forzaba
+    todo a texto.
+    """
+    with pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=True) as reader:
+        yield from reader
+
+
+def filter_max_hookload(
+    source,
+    bin_m: float | None = None,
+    parse_timestamp: bool = True,
+    drop_invalid_timestamp: bool = True,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> HookloadMaxReducer:
+    """Procesa ``source`` (ruta o buffer) por bloques y devuelve el acumulador ya completo."""
+    reducer = HookloadMaxReducer(
+        bin_m=bin_m if bin_m and bin_m > 0 else None,
+        parse_timestamp=parse_timestamp,
+        drop_invalid_timestamp=drop_invalid_timestamp,
+    )
+    for chunk in iter_csv_chunks(source, chunksize=chunksize):
+        reducer.update(chunk)
+    reducer.finalize()
+    return reducer
@@ -0,0 +1,297 @@
+"""Servicio de render de gráficas Plotly a PNG para exportables (PDF / PPTX / Excel).
+
+``build_pdf`` y ``build_pptx`` llamaban ``plotly_to_png_bytes`` gráfica por
+gráfica: cada llamada copiaba la figura con ``style_for_export``, la pasaba por
+kaleido a 1800×1000×2 y la re-codificaba con PIL (``optimize=True``). Preparar
+ambos formatos rendereaba todo dos veces. Aquí:
+
+- caché de PNG por huella de contenido (JSON de la figura ya estilizada +
+  perfil de resolución), LRU acotada en bytes y compartida por todos los
+  exportables: la segunda exportación de la misma gráfica no renderiza;
+- ``render_many`` renderiza en paralelo las gráficas que faltan en un pool de
+  procesos; cada proceso arranca kaleido una vez (``_warm_worker``) y lo
+  reutiliza, porque kaleido 0.2 atiende una transformación a la vez por proceso;
+- perfiles de resolución con nombre (``print``, ``screen``, ``draft``).
+
+Sin kaleido o PIL ``render`` retorna None, como antes. Si el pool de procesos
+no está disponible o falla, se renderiza en serie en el proceso actual. Los
+workers se crean con ``forkserver`` (``TNPI_POOL_START_METHOD``): hacer fork del
+servidor de Streamlit, que tiene hilos, puede dejar locks tomados en el hijo.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    width: int
+    height: int
+    scale: float
+    optimize: bool = True
+
+
+RENDER_PROFILES = {
+    # Resolución histórica de los exportables.
+    "print": RenderProfile(1800, 1000, 2),
+    "screen": RenderProfile(1600, 900, 1),
+    "draft": RenderProfile(1200, 675, 1, optimize=False),
+}
+DEFAULT_PROFILE = "print"
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+POOL_START_METHOD = os.environ.get("TNPI_POOL_START_METHOD", "forkserver")
+
+
+def pool_context():
+    """Contexto de multiprocessing para los pools de export (sin fork del proceso con hilos)."""
+    for method in (POOL_START_METHOD, "spawn"):
+        try:
+            return multiprocessing.get_context(method)
+        except ValueError:
+            continue
+    return multiprocessing.get_context()
+
+
+def export_style(fig, colorway=None):
+    """Copia de ``fig`` con estilo de impresión (fondo blanco, fuentes grandes, ``colorway``)."""
+    import plotly.graph_objects as go
+
+    f = go.Figure(fig.to_dict())
+    f.update_layout(
+        template="plotly_white",
+        paper_bgcolor="white",
+        plot_bgcolor="white",
+        font=dict(color="black", size=18),
+        margin=dict(l=40, r=40, t=70, b=40),
+        legend=dict(bgcolor="rgba(255,255,255,0.85)", borderwidth=0, font=dict(size=24)),
+        title=dict(x=0.02),
+        colorway=colorway,
+        uniformtext=dict(minsize=16, mode="show"),
+    )
+    f.update_xaxes(tickfont=dict(size=24), title_font=dict(size=24), automargin=True)
+    f.update_yaxes(tickfont=dict(size=24), title_font=dict(size=24), automargin=True)
+    f.update_traces(
+        textfont=dict(size=24),
+        insidetextfont=dict(size=26),
+        outsidetextfont=dict(size=24),
+        selector=dict(type="pie"),
+    )
+    legend_items = {t.name for t in f.data if getattr(t, "name", None)}
+    if len(legend_items) >= 6:
+        f.update_layout(
+            legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5, font=dict(size=24)),
+            margin=dict(l=40, r=40, t=70, b=130),
+        )
+    return f
+
+
+def _render_png(fig_json: str, profile: RenderProfile) -> bytes:
+    """Figura (JSON Plotly) → PNG RGB sobre fondo blanco."""
+    import plotly.io as pio
+    from PIL import Image
+
+    png = pio.to_image(pio.from_json(fig_json), format="png", width=profile.width, height=profile.height, scale=profile.scale)
+    im = Image.open(BytesIO(png)).convert("RGBA")
+    bg = Image.new("RGBA", im.size, (255, 255, 255, 255))
+    bg.paste(im, (0, 0), im)
+    out = BytesIO()
+    bg.convert("RGB").save(out, format="PNG", optimize=profile.optimize)
+    return out.getvalue()
+
+
+def _warm_worker() -> None:
+    # Arranca el subproceso de kaleido del worker antes del primer trabajo real.
+    try:
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        pio.to_image(go.Figure(), format="png", width=16, height=16)
+    except Exception:
+        pass
+
+
+def _render_worker(fig_json: str, profile: RenderProfile) -> bytes | None:
+    try:
+        return _render_png(fig_json, profile)
+    except Exception:
+        return None
+
+
+class ChartRenderer:
+    """
+    PNG por figura con caché por contenido. ``style`` se aplica antes de
+    calcular la huella (p. ej. ``style_for_export``); ``workers`` > 1 activa el
+    pool de procesos.
+    """
+
+    def __init__(
+        self,
+        style: Callable[[Any], Any] | None = None,
+        workers: int = 1,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        profiles: dict[str, RenderProfile] | None = None,
+        default_profile: str = DEFAULT_PROFILE,
+        render_fn: Callable[[str, RenderProfile], bytes | None] = _render_worker,
+    ):
+        self.style = style
+        self.workers = max(1, int(workers))
+        self.max_bytes = int(max_bytes)
+        self.profiles = dict(profiles or RENDER_PROFILES)
+        self.default_profile = default_profile
+        self.render_fn = render_fn
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._warm = False
+        self.hits = 0
+        self.renders = 0
+        self.failures = 0
+
+    # -------- perfiles / llaves --------
+    def profile(self, name: str | RenderProfile | None) -> RenderProfile:
+        if isinstance(name, RenderProfile):
+            return name
+        name = name or self.default_profile
+        if name not in self.profiles:
+            raise ValueError(f"Perfil de render desconocido: {name} (disponibles: {', '.join(self.profiles)})")
+        return self.profiles[name]
+
+    def _prepare(self, fig, profile: RenderProfile) -> tuple[str, str]:
+        styled = self.style(fig) if self.style is not None else fig
+        fig_json = styled.to_json()
+        h = hashlib.blake2b(fig_json.encode("utf-8"), digest_size=16)
+        h.update(repr(profile).encode())
+        return h.hexdigest(), fig_json
+
+    # -------- caché --------
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def _put(self, key: str, png: bytes) -> None:
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = png
+            self._bytes += len(png)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _k, old = self._items.popitem(last=False)
+                self._bytes -= len(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    # -------- pool --------
+    def _get_pool(self) -> ProcessPoolExecutor | None:
+        if self.workers <= 1:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context(), initializer=_warm_worker)
+                    atexit.register(self.shutdown)
+                except Exception:
+                    self.workers = 1
+                    return None
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def warm(self) -> None:
+        """Arranca kaleido (en el proceso actual o en los workers del pool)."""
+        pool = self._get_pool()
+        if pool is None:
+            if not self._warm:
+                _warm_worker()
+                self._warm = True
+        else:
+            # Un trabajo trivial por worker fuerza su creación (y su initializer).
+            list(pool.map(int, range(self.workers)))
+
+    # -------- render --------
+    def render(self, fig, profile: str | RenderProfile | None = None) -> bytes | None:
+        return self.render_many({"_": fig}, profile).get("_")
+
+    def render_many(self, figs: dict, profile: str | RenderProfile | None = None) -> dict:
+        """``{nombre: figura}`` → ``{nombre: PNG o None}``; las figuras repetidas se renderizan una vez."""
+        prof = self.profile(profile)
+        out: dict = {}
+        pending: dict[str, tuple[str, list]] = {}
+        for name, fig in figs.items():
+            if fig is None:
+                out[name] = None
+                continue
+            try:
+                key, fig_json = self._prepare(fig, prof)
+            except Exception:
+                out[name] = None
+                continue
+            png = self._get(key)
+            if png is not None:
+                out[name] = png
+            else:
+                pending.setdefault(key, (fig_json, []))[1].append(name)
+        if not pending:
+            return {name: out[name] for name in figs}
+
+        results: dict[str, bytes | None] = {}
+        pool = self._get_pool() if len(pending) > 1 else None
+        if pool is not None:
+            try:
+                futures = {key: pool.submit(self.render_fn, fig_json, prof) for key, (fig_json, _names) in pending.items()}
+                results = {key: fut.result() for key, fut in futures.items()}
+            except Exception:
+                # Pool roto (worker muerto, sin fork/spawn): se cae a render en serie.
+                self.shutdown()
+                self.workers = 1
+                results = {}
+        for key, (fig_json, _names) in pending.items():
+            if key not in results:
+                results[key] = self.render_fn(fig_json, prof)
+
+        for key, (_fig_json, names) in pending.items():
+            png = results.get(key)
+            with self._lock:
+                if png is None:
+                    self.failures += 1
+                else:
+                    self.renders += 1
+            if png is not None:
+                self._put(key, png)
+            for name in names:
+                out[name] = png
+        return {name: out[name] for name in figs}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "renders": self.renders,
+                "failures": self.failures,
+                "workers": self.workers,
+            }
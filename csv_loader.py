@@ -0,0 +1,205 @@
+"""Lectura de CSV con encoding/separador desconocido en una sola pasada.
+
+``robust_read_csv`` probaba hasta 3 encodings × (Sniffer + 4 separadores), y
+cada intento era un ``pd.read_csv(engine="python")`` completo: un mal intento
+costaba un parseo entero con el motor más lento de pandas. Aquí:
+
+- encoding y separador se detectan una vez sobre una muestra acotada de bytes
+  (``SNIFF_BYTES``): BOM, decodificación incremental de la muestra y
+  ``csv.Sniffer`` validado con el conteo de separadores por línea;
+- el archivo se parsea una sola vez con el motor C (o pyarrow con
+  ``TNPI_CSV_ENGINE=pyarrow``; si pyarrow falla se usa C);
+- si ese parseo falla se reintenta con los otros encodings y, al final, con el
+  recorrido anterior (Sniffer/separadores con ``engine="python"``), así que lo
+  que antes se leía se sigue leyendo.
+
+``read_csv_auto`` retorna ``(df, CsvDialect)``; ``robust_read_csv`` retorna solo
+el DataFrame y deja lo detectado en ``df.attrs["csv_dialect"]``.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass
+from io import BytesIO
+
+import pandas as pd
+
+DEFAULT_ENCODINGS = ("utf-8-sig", "utf-8", "latin-1")
+DEFAULT_SEPS = (",", ";", "\t", "|")
+SNIFF_BYTES = 64 * 1024
+SNIFF_LINES = 50
+DEFAULT_ENGINE = os.environ.get("TNPI_CSV_ENGINE", "c")
+
+
+@dataclass
+class CsvDialect:
+    encoding: str
+    sep: str
+    engine: str
+    sniffed_by: str  # "sniffer" | "conteo" | "default" | "fallback"
+    sample_bytes: int
+    attempts: int = 1
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# ------------------------------------------------------------------
+# Detección sobre la muestra
+# ------------------------------------------------------------------
+def sniff_encoding(sample: bytes, encodings=DEFAULT_ENCODINGS) -> tuple[str, str]:
+    """Primer encoding que decodifica la muestra → (encoding, texto)."""
+    if sample.startswith(codecs.BOM_UTF8) and "utf-8-sig" in encodings:
+        return "utf-8-sig", sample.decode("utf-8-sig", errors="replace")
+    for enc in encodings:
+        try:
+            # Incremental: la muestra puede cortar un carácter multibyte al final.
+            text = codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+        except (UnicodeDecodeError, LookupError):
+            continue
+        return enc, text
+    enc = encodings[-1] if encodings else "latin-1"
+    return enc, sample.decode(enc, errors="replace")
+
+
+def _line_counts(lines: list[str], sep: str) -> list[int]:
+    return [len(next(csv.reader([ln], delimiter=sep))) - 1 for ln in lines]
+
+
+def sniff_sep(text: str, seps=DEFAULT_SEPS) -> tuple[str, str]:
+    """Separador de la muestra → (sep, método)."""
+    # Solo líneas completas (la muestra puede terminar a media línea).
+    if "\n" in text:
+        text = text[: text.rfind("\n")]
+    lines = [ln for ln in text.splitlines()[:SNIFF_LINES] if ln.strip()]
+    if not lines:
+        return seps[0], "default"
+    if len(lines) > 1:
+        try:
+            sep = csv.Sniffer().sniff("\n".join(lines), delimiters="".join(seps)).delimiter
+            counts = _line_counts(lines, sep)
+            if sep in seps and counts[0] > 0 and Counter(counts).most_common(1)[0][0] == counts[0]:
+                return sep, "sniffer"
+        except (csv.Error, StopIteration):
+            pass
+    # Conteo: el separador con más campos en el encabezado que se repite en la mayoría de las líneas.
+    best, best_score = None, (0.0, 0)
+    for sep in seps:
+        counts = _line_counts(lines, sep)
+        if counts[0] <= 0:
+            continue
+        score = (sum(1 for c in counts if c == counts[0]) / len(counts), counts[0])
+        if score > best_score:
+            best, best_score = sep, score
+    if best is not None:
+        return best, "conteo"
+    return seps[0], "default"
+
+
+# ------------------------------------------------------------------
+# Lectura
+# ------------------------------------------------------------------
+def _source_bytes(src) -> bytes | None:
+    """Bytes de un stream (``st.file_uploader``) o ``bytes``; None si es ruta."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return bytes(src)
+    if isinstance(src, (str, os.PathLike)):
+        return None
+    if hasattr(src, "getvalue"):
+        try:
+            return src.getvalue()
+        except Exception:
+            pass
+    if hasattr(src, "read"):
+        try:
+            # Ojo: read() consume el stream; por eso guardamos bytes
+            return src.read()
+        except Exception:
+            pass
+    raise ValueError("No se pudo leer el archivo (stream vacío).")
+
+
+def _parse(open_buf, sep: str, enc: str, engine: str, **kwargs) -> tuple[pd.DataFrame, str]:
+    if engine == "pyarrow":
+        try:
+            return pd.read_csv(open_buf(), sep=sep, encoding=enc, engine="pyarrow", **kwargs), "pyarrow"
+        except Exception:
+            # pyarrow no acepta algunas opciones/archivos irregulares: se usa el motor C.
+            pass
+    return pd.read_csv(open_buf(), sep=sep, encoding=enc, engine="c", low_memory=False, **kwargs), "c"
+
+
+def read_csv_auto(
+    src,
+    encodings=DEFAULT_ENCODINGS,
+    seps=DEFAULT_SEPS,
+    engine: str | None = None,
+    sample_bytes: int = SNIFF_BYTES,
+    **kwargs,
+) -> tuple[pd.DataFrame, CsvDialect]:
+    """
+    Lee ``src`` (ruta, ``bytes`` o stream) detectando encoding y separador una
+    vez; ``kwargs`` se pasan a ``pd.read_csv``. Retorna ``(df, dialecto)``.
+    """
+    engine = engine or DEFAULT_ENGINE
+    data = _source_bytes(src)
+    if data is None:
+        with open(src, "rb") as f:
+            sample = f.read(sample_bytes)
+
+        def _buf():
+            return src
+    else:
+        if not data:
+            raise ValueError("No se pudo leer el archivo (stream vacío).")
+        sample = data[:sample_bytes]
+
+        def _buf():
+            return BytesIO(data)
+
+    enc, text = sniff_encoding(sample, encodings)
+    sep, how = sniff_sep(text, seps)
+    attempts = 0
+    last_err = None
+    # 1) Un parseo con lo detectado; si el encoding falla más allá de la muestra, los siguientes.
+    for e in [enc] + [x for x in encodings if x != enc and not (enc == "utf-8-sig" and x == "utf-8")]:
+        attempts += 1
+        try:
+            df, used = _parse(_buf, sep, e, engine, **kwargs)
+            return df, CsvDialect(e, sep, used, how, len(sample), attempts)
+        except Exception as err:
+            last_err = err
+    # 2) Recorrido anterior (Sniffer / separadores comunes con engine="python").
+    for e in encodings:
+        for s in (None, *seps):
+            attempts += 1
+            try:
+                df = pd.read_csv(_buf(), sep=s, engine="python", encoding=e, **kwargs)
+                return df, CsvDialect(e, s or "sniffer", "python", "fallback", len(sample), attempts)
+            except Exception as err:
+                last_err = err
+    raise last_err if last_err else ValueError("No se pudo leer el CSV")
+
+
+def robust_read_csv(src, encodings=DEFAULT_ENCODINGS, seps=DEFAULT_SEPS, **kwargs) -> pd.DataFrame:
+    """
+    Lee CSV desde ruta o stream (UploadedFile) con encoding/separador
+    detectados (ver ``read_csv_auto``); lo detectado queda en
+    ``df.attrs["csv_dialect"]``.
+    """
+    df, dialect = read_csv_auto(src, encodings=encodings, seps=seps, **kwargs)
+    df.attrs["csv_dialect"] = dialect.as_dict()
+    return df
+
+
+def dialect_label(df: pd.DataFrame) -> str:
+    """Texto corto de lo detectado (para captions), p. ej. ``utf-8 · ';' · motor c``."""
+    d = (getattr(df, "attrs", None) or {}).get("csv_dialect") or {}
+    if not d:
+        return ""
+    sep = {"\t": "tab"}.get(d.get("sep"), repr(d.get("sep")))
+    return f"{d.get('encoding')} · {sep} · motor {d.get('engine')}"
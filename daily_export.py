@@ -0,0 +1,431 @@
+"""Exportables diarios (PDF / PPTX / CSV / Excel) por día y por lotes.
+
+El export por calendario generaba un día a la vez desde el script de
+Streamlit. Aquí cada día es un ``DayExportJob`` autocontenido (filas del día,
+entradas de ``drill_day`` de esa fecha, meta, KPIs y opciones) y
+``export_day`` produce sus archivos sin depender de la sesión, así que:
+
+- el export de un día y el de un rango usan exactamente las mismas gráficas
+  (``daily_charts``) y documentos (``export_docs``);
+- ``run_batch`` reparte los días en un pool de procesos (cada worker arranca
+  kaleido una vez), reporta el avance día por día y arma un solo ZIP;
+- cada día lleva una huella de sus datos y opciones (``job.fingerprint``): los
+  días cuya huella no cambió desde el último lote se toman de ``cache`` sin
+  volver a generarse.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable
+
+import pandas as pd
+
+from chart_render import ChartRenderer, _warm_worker, export_style, pool_context
+from export_docs import build_pdf_doc, build_pptx_doc
+from figure_cache import frame_fingerprint
+
+FORMATS = ("pdf", "pptx", "csv", "xlsx")
+DEFAULT_FORMATS = ("pdf", "pptx", "csv")
+SCOPE_POZO = "pozo"
+SCOPE_ETAPA = "etapa"
+
+
+def _safe_float(v, default=0.0) -> float:
+    try:
+        if v is None:
+            return float(default)
+        return float(v)
+    except Exception:
+        return float(default)
+
+
+def _safe_name(s) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(s)).strip("_")
+
+
+@dataclass
+class DayExportJob:
+    day: date
+    df_day: pd.DataFrame
+    df_conn_day: pd.DataFrame
+    df_bha_day: pd.DataFrame
+    # ``drill_day["por_etapa"]`` con solo las entradas ``*_by_date`` de este día.
+    por_etapa: dict
+    meta: dict
+    kpis: dict
+    etapa: str = ""  # alcance por etapa ("" = todo el pozo)
+    modo_reporte: str = ""
+    formats: tuple = DEFAULT_FORMATS
+    profile: str = "print"
+    colorway: list = field(default_factory=list)
+    conn_order: list = field(default_factory=list)
+    conn_color_map: dict = field(default_factory=dict)
+    viajes_store: dict | None = None
+
+    @property
+    def fingerprint(self) -> str:
+        opts = json.dumps(
+            [self.day.isoformat(), self.por_etapa, self.meta, self.kpis, self.etapa, self.modo_reporte,
+             list(self.formats), self.profile, self.colorway, self.conn_order, self.conn_color_map],
+            sort_keys=True,
+            default=str,
+        )
+        parts = [frame_fingerprint(self.df_day), frame_fingerprint(self.df_conn_day), frame_fingerprint(self.df_bha_day), opts]
+        return frame_fingerprint(pd.DataFrame({"p": parts}))
+
+    def base_name(self) -> str:
+        return f"{_safe_name(self.meta.get('pozo', ''))}_{self.day.isoformat()}"
+
+
+# ------------------------------------------------------------------
+# KPIs / gráficas del día
+# ------------------------------------------------------------------
+def day_kpis(df_day: pd.DataFrame) -> dict:
+    """KPIs de texto del reporte diario (TP/TNPI/TNP/total/eficiencia)."""
+    total = float(pd.to_numeric(df_day.get("Horas_Reales", pd.Series(dtype=float)), errors="coerce").fillna(0).sum())
+    if "Tipo" in df_day.columns:
+        hrs = pd.to_numeric(df_day["Horas_Reales"], errors="coerce").fillna(0.0)
+        tp = float(hrs[df_day["Tipo"] == "TP"].sum())
+        tnpi = float(hrs[df_day["Tipo"] == "TNPI"].sum())
+        tnp = float(hrs[df_day["Tipo"] == "TNP"].sum())
+    else:
+        tp, tnpi, tnp = total, 0.0, 0.0
+    eff = max(0.0, min(100.0, tp / total * 100.0)) if total > 0 else 0.0
+    return {
+        "TP (h)": f"{tp:.2f}",
+        "TNPI (h)": f"{tnpi:.2f}",
+        "TNP (h)": f"{tnp:.2f}",
+        "Horas total (h)": f"{total:.2f}",
+        "Eficiencia del día": f"{eff:.0f}%",
+    }
+
+
+def _drill_sums(por_etapa: dict, etapa: str, day_str: str, prog_key: str, prog_field: str, dia_key: str, noche_key: str):
+    """(programado, real día, real noche) de la etapa o sumado por pozo."""
+    items = [(etapa, por_etapa.get(etapa, {}))] if etapa else list((por_etapa or {}).items())
+    prog = dia = noche = 0.0
+    for _k, data in items:
+        data = data or {}
+        entry = (data.get(prog_key, {}) or {}).get(day_str, {})
+        prog += _safe_float(entry.get(prog_field) if isinstance(entry, dict) else (entry or 0.0))
+        dia += _safe_float((data.get(dia_key, {}) or {}).get(day_str, 0.0) or 0.0)
+        noche += _safe_float((data.get(noche_key, {}) or {}).get(day_str, 0.0) or 0.0)
+    return prog, dia, noche
+
+
+def daily_charts(job: DayExportJob) -> dict:
+    """Gráficas del reporte diario ``{título: figura}`` (mismo orden que el export por día)."""
+    import plotly.express as px
+
+    df_day = job.df_day
+    day_iso = job.day.isoformat()
+    charts = {}
+
+    # Pie tiempos
+    if "Tipo" in df_day.columns and "Horas_Reales" in df_day.columns:
+        df_t = df_day.groupby("Tipo", as_index=False)["Horas_Reales"].sum()
+        if not df_t.empty:
+            charts["TP vs TNPI vs TNP (Diario)"] = px.pie(
+                df_t, names="Tipo", values="Horas_Reales", hole=0.55, title=f"TP vs TNPI vs TNP - {day_iso}"
+            )
+    # Pie actividades
+    if "Actividad" in df_day.columns and "Horas_Reales" in df_day.columns:
+        df_a = df_day.groupby("Actividad", as_index=False)["Horas_Reales"].sum().sort_values("Horas_Reales", ascending=False).head(10)
+        if not df_a.empty:
+            charts["Top actividades (Diario)"] = px.pie(
+                df_a, names="Actividad", values="Horas_Reales", hole=0.35, title=f"Top actividades - {day_iso}"
+            )
+    # BHA (Arma/Desarma)
+    df_bha_d = job.df_bha_day
+    if df_bha_d is not None and not df_bha_d.empty:
+        if job.etapa and "Etapa" in df_bha_d.columns:
+            df_bha_d = df_bha_d[df_bha_d["Etapa"] == str(job.etapa)]
+        if not df_bha_d.empty:
+            df_long_bha = df_bha_d.melt(
+                id_vars=[c for c in ["BHA_Tipo", "Accion"] if c in df_bha_d.columns],
+                value_vars=[c for c in ["Estandar_h", "Real_h"] if c in df_bha_d.columns],
+                var_name="Serie",
+                value_name="Horas",
+            )
+            if not df_long_bha.empty:
+                charts["BHA (Estándar vs Real)"] = px.bar(
+                    df_long_bha,
+                    x="BHA_Tipo" if "BHA_Tipo" in df_long_bha.columns else "Accion",
+                    y="Horas",
+                    color="Serie",
+                    barmode="group",
+                    title=f"BHA - {day_iso}",
+                    color_discrete_sequence=job.colorway or None,
+                )
+
+    if job.modo_reporte == "Perforación":
+        # ROP diario (Día vs Noche): por etapa o consolidado por pozo
+        rop_prog_d, rop_rd, rop_rn = _drill_sums(
+            job.por_etapa, job.etapa, day_iso, "rop_prog_by_date", "rop_prog", "rop_real_dia_by_date", "rop_real_noche_by_date"
+        )
+        if (rop_prog_d + rop_rd + rop_rn) > 0:
+            df_rop_d = pd.DataFrame(
+                [
+                    {"Turno": "Día ☀️", "Programado (m/h)": rop_prog_d, "Real (m/h)": rop_rd},
+                    {"Turno": "Noche 🌙", "Programado (m/h)": rop_prog_d, "Real (m/h)": rop_rn},
+                ]
+            )
+            charts["ROP (Diario)"] = px.bar(
+                df_rop_d,
+                x="Turno",
+                y=["Programado (m/h)", "Real (m/h)"],
+                barmode="group",
+                text_auto=True,
+                title=f"ROP - {day_iso}",
+                color_discrete_sequence=job.colorway or None,
+            )
+        # Metros perforados (Real vs Programado)
+        mp_d, mr_d, mr_n = _drill_sums(
+            job.por_etapa, job.etapa, day_iso, "metros_prog_by_date", "metros_prog", "metros_real_dia_by_date", "metros_real_noche_by_date"
+        )
+        if (mp_d + mr_d + mr_n) > 0:
+            df_m_d = pd.DataFrame(
+                [
+                    {"Tipo": "Programado (total)", "Metros (m)": mp_d},
+                    {"Tipo": "Real Día ☀️", "Metros (m)": mr_d},
+                    {"Tipo": "Real Noche 🌙", "Metros (m)": mr_n},
+                    {"Tipo": "Real Total", "Metros (m)": mr_d + mr_n},
+                ]
+            )
+            charts["Metros perforados (Diario)"] = px.bar(
+                df_m_d,
+                x="Tipo",
+                y="Metros (m)",
+                text_auto=True,
+                title=f"Metros - {day_iso}",
+                color="Tipo",
+                color_discrete_map={
+                    "Programado (total)": "#6B7280",
+                    "Real Día ☀️": "#F59E0B",
+                    "Real Noche 🌙": "#1D4ED8",
+                    "Real Total": "#22C55E",
+                },
+            )
+
+    # Conexiones perforando
+    df_conn_d = job.df_conn_day
+    if df_conn_d is not None and not df_conn_d.empty:
+        if job.etapa and "Etapa" in df_conn_d.columns:
+            df_conn_d = df_conn_d[df_conn_d["Etapa"] == str(job.etapa)]
+        if not df_conn_d.empty and {"Componente", "Minutos_Reales"}.issubset(df_conn_d.columns):
+            df_conn_sum = df_conn_d.groupby("Componente", as_index=False)["Minutos_Reales"].sum()
+            df_conn_sum["Componente"] = pd.Categorical(df_conn_sum["Componente"], categories=job.conn_order, ordered=True)
+            df_conn_sum = df_conn_sum.sort_values("Componente")
+            charts["Conexiones (Distribución)"] = px.pie(
+                df_conn_sum,
+                names="Componente",
+                values="Minutos_Reales",
+                hole=0.35,
+                title=f"Conexiones - {day_iso}",
+                color="Componente",
+                color_discrete_map=job.conn_color_map,
+            )
+
+            df_stack = df_conn_d.copy()
+            df_stack["Conn_Label"] = df_stack["Profundidad_m"].fillna(df_stack["Conn_No"]).astype(float).astype(int).astype(str)
+            df_stack["Componente"] = pd.Categorical(df_stack["Componente"], categories=job.conn_order, ordered=True)
+            df_stack_g = df_stack.groupby(["Conn_Label", "Componente"], as_index=False)["Minutos_Reales"].sum().sort_values(["Conn_Label", "Componente"])
+            charts["Conexiones perforando (Stack)"] = px.bar(
+                df_stack_g,
+                x="Conn_Label",
+                y="Minutos_Reales",
+                color="Componente",
+                category_orders={"Componente": job.conn_order},
+                color_discrete_map=job.conn_color_map,
+                barmode="stack",
+                title=f"Conexiones perforando - {day_iso}",
+                labels={"Conn_Label": "Profundidad (m)", "Minutos_Reales": "Tiempo (min)"},
+            )
+
+    # Viajes (datos por hora del viaje en curso; no están fechados, solo aplican al export de un día)
+    for v_name, v_obj in (job.viajes_store or {}).items():
+        hourly_df = v_obj.get("hourly") if isinstance(v_obj, dict) else None
+        if isinstance(hourly_df, pd.DataFrame) and not hourly_df.empty:
+            df_plot = hourly_df.copy().sort_values("hour").reset_index(drop=True)
+            df_plot["hour_str"] = df_plot["hour"].astype(int)
+            fig_v = px.bar(
+                df_plot,
+                x="hour_str",
+                y="speed_mh",
+                labels={"hour_str": "Hora", "speed_mh": "m/h"},
+                title=f"Viaje – {v_name}",
+            )
+            if job.colorway:
+                fig_v.update_traces(marker_color=job.colorway[0])
+            charts[f"Viaje – Velocidad ({v_name})"] = fig_v
+            fig_c = px.bar(
+                df_plot,
+                x="hour_str",
+                y="conn_min",
+                labels={"hour_str": "Hora", "conn_min": "min"},
+                title=f"Viaje – Conexiones ({v_name})",
+            )
+            if job.colorway:
+                fig_c.update_traces(marker_color=job.colorway[1] if len(job.colorway) > 1 else job.colorway[0])
+            charts[f"Viaje – Conexiones ({v_name})"] = fig_c
+    return charts
+
+
+# ------------------------------------------------------------------
+# Archivos de un día
+# ------------------------------------------------------------------
+_WORKER_RENDERER: ChartRenderer | None = None
+
+
+def _worker_renderer(colorway) -> ChartRenderer:
+    global _WORKER_RENDERER
+    if _WORKER_RENDERER is None:
+        _WORKER_RENDERER = ChartRenderer(workers=1)
+    _WORKER_RENDERER.style = lambda fig: export_style(fig, colorway or None)
+    return _WORKER_RENDERER
+
+
+def export_day(job: DayExportJob, renderer: ChartRenderer | None = None) -> dict:
+    """``{nombre_archivo: bytes}`` del día. Sin ``renderer`` usa uno propio del proceso (workers del pool)."""
+    files = {}
+    base = job.base_name()
+    if "pdf" in job.formats or "pptx" in job.formats:
+        charts = daily_charts(job)
+        pngs = (renderer or _worker_renderer(job.colorway)).render_many(charts, job.profile) if charts else {}
+        titles = list(charts)
+        if "pdf" in job.formats:
+            files[f"Reporte_Diario_{base}.pdf"] = build_pdf_doc(job.meta, job.kpis, titles, pngs)
+        if "pptx" in job.formats:
+            files[f"Reporte_Diario_{base}.pptx"] = build_pptx_doc(job.meta, job.kpis, titles, pngs)
+    if "csv" in job.formats:
+        files[f"Datos_Diarios_{base}.csv"] = job.df_day.to_csv(index=False).encode("utf-8")
+    if "xlsx" in job.formats:
+        from reporte_diario import DailyReportMeta, make_daily_excel
+
+        meta = DailyReportMeta(equipo=job.meta.get("equipo", ""), pozo=job.meta.get("pozo", ""), etapa=job.meta.get("etapa", ""))
+        files[f"Resumen_Diario_{base}.xlsx"] = make_daily_excel(job.df_day, meta=meta)
+    return files
+
+
+def _export_day_worker(job: DayExportJob) -> tuple[str, dict]:
+    return job.fingerprint, export_day(job)
+
+
+# ------------------------------------------------------------------
+# Lotes
+# ------------------------------------------------------------------
+@dataclass
+class BatchResult:
+    zip_bytes: bytes
+    days: list
+    generated: list
+    reused: list
+    failed: dict
+
+
+def run_batch(
+    jobs: list,
+    workers: int = 1,
+    cache: dict | None = None,
+    progress: Callable[[int, int, str, str], None] | None = None,
+) -> BatchResult:
+    """
+    Genera los archivos de cada día y los empaqueta en un ZIP (una carpeta por
+    día + ``resumen.csv``). ``cache`` (``{día: (huella, archivos)}``) se lee y queda
+    solo con los días de este lote; ``progress(hechos, total, día, estado)`` se llama al terminar
+    cada día con estado ``reutilizado``, ``generado`` o ``error``.
+    """
+    cache = {} if cache is None else cache
+    total = len(jobs)
+    done = 0
+    results: dict[str, dict] = {}
+    generated, reused, failed = [], [], {}
+
+    def _tick(day: str, state: str) -> None:
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, total, day, state)
+
+    todo = []
+    for job in jobs:
+        day = job.day.isoformat()
+        hit = cache.get(day)
+        if hit is not None and hit[0] == job.fingerprint:
+            results[day] = hit[1]
+            reused.append(day)
+            _tick(day, "reutilizado")
+        else:
+            todo.append(job)
+
+    def _store(day: str, fp: str, files: dict) -> None:
+        cache[day] = (fp, files)
+        results[day] = files
+        generated.append(day)
+        _tick(day, "generado")
+
+    pool = None
+    if workers > 1 and len(todo) > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=pool_context(), initializer=_warm_worker)
+        except Exception:
+            pool = None
+    if pool is not None:
+        try:
+            with pool:
+                futures = {pool.submit(_export_day_worker, job): job for job in todo}
+                for fut in as_completed(futures):
+                    job = futures[fut]
+                    day = job.day.isoformat()
+                    try:
+                        fp, files = fut.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        failed[day] = str(e)
+                        _tick(day, "error")
+                        continue
+                    _store(day, fp, files)
+        except BrokenProcessPool:
+            # Un worker murió (p. ej. kaleido): los días que faltan se generan en este proceso.
+            pass
+        todo = [j for j in todo if j.day.isoformat() not in results and j.day.isoformat() not in failed]
+    for job in todo:
+        day = job.day.isoformat()
+        try:
+            _store(day, job.fingerprint, export_day(job))
+        except Exception as e:
+            failed[day] = str(e)
+            _tick(day, "error")
+
+    # La caché solo guarda el último lote (cada día retiene sus PDF/PPTX completos).
+    batch_days = {j.day.isoformat() for j in jobs}
+    for day in [d for d in cache if d not in batch_days]:
+        del cache[day]
+
+    days = sorted(results)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        summary = io.StringIO()
+        kpi_cols = list(jobs[0].kpis) if jobs else []
+        w = csv.writer(summary)
+        w.writerow(["Fecha", "Estado", *kpi_cols])
+        by_day = {j.day.isoformat(): j for j in jobs}
+        for day in sorted(by_day):
+            state = "error: " + failed[day] if day in failed else ("reutilizado" if day in reused else "generado")
+            w.writerow([day, state, *[by_day[day].kpis.get(k, "") for k in kpi_cols]])
+        zf.writestr("resumen.csv", summary.getvalue().encode("utf-8"))
+        for day in days:
+            for name, data in results[day].items():
+                # PDF/PPTX/XLSX ya vienen comprimidos: se guardan sin volver a comprimir.
+                ctype = zipfile.ZIP_DEFLATED if name.endswith(".csv") else zipfile.ZIP_STORED
+                zf.writestr(f"{day}/{name}", data, compress_type=ctype)
+    return BatchResult(buf.getvalue(), days, sorted(generated), sorted(reused), failed)
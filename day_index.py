@@ -0,0 +1,213 @@
+"""Índice por día y turno de la bitácora (Fecha → filas, horas por día/turno).
+
+La validación de captura pregunta muchas veces por rerun cuántas horas lleva
+el día o el turno. Antes cada pregunta copiaba el frame completo, convertía
+``Fecha`` a texto y corría varias búsquedas ``str.contains`` sobre ``Turno``.
+Aquí se mantiene un índice:
+
+- por fila: fecha como texto, turno normalizado (bits diurno/nocturno, se
+  clasifica cada valor distinto una sola vez) y horas reales;
+- por día: posiciones de sus filas y total de horas; por (día, turno): horas.
+
+``sync`` compara un hash por fila de ``Fecha``/``Turno``/``Horas_Reales``:
+filas agregadas al final se indexan de forma incremental, filas editadas se
+actualizan una a una y solo un borrado o un cambio masivo reconstruye todo.
+Las consultas de horas son búsquedas en diccionario.
+"""
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+DIURNO = 1
+NOCTURNO = 2
+INDEX_COLS = ("Fecha", "Turno", "Horas_Reales")
+# Más filas editadas que esto (o que esta fracción) y se reconstruye.
+MAX_INCREMENTAL_EDITS = 2000
+MAX_INCREMENTAL_FRACTION = 0.25
+
+
+def turno_bits(value) -> int:
+    """Bits diurno/nocturno de un texto de turno (mismos criterios que la validación previa)."""
+    t = str(value if value is not None else "").lower()
+    bits = 0
+    if any(k in t for k in ("diurno", "dia", "día", "day", "☀")):
+        bits |= DIURNO
+    if any(k in t for k in ("nocturno", "noche", "night", "🌙")):
+        bits |= NOCTURNO
+    return bits
+
+
+def turno_query_bit(turno_nombre) -> int:
+    """Bit a consultar para un nombre de turno ('Diurno'/'Nocturno'); 0 si no aplica."""
+    tn = str(turno_nombre or "").strip().lower()
+    if "diurno" in tn or "dia" in tn or "día" in tn:
+        return DIURNO
+    if "nocturno" in tn or "noche" in tn:
+        return NOCTURNO
+    return 0
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    cols = [c for c in INDEX_COLS if c in df.columns]
+    if not cols or df.empty:
+        return np.zeros(len(df), dtype=np.uint64)
+    sub = df[cols]
+    try:
+        return pd.util.hash_pandas_object(sub, index=False).to_numpy()
+    except TypeError:
+        return pd.util.hash_pandas_object(sub.astype(str), index=False).to_numpy()
+
+
+def _row_values(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = len(df)
+    if "Fecha" in df.columns:
+        fecha = df["Fecha"].astype(str).to_numpy(dtype=object, copy=True)
+    else:
+        fecha = np.full(n, None, dtype=object)
+    if "Turno" in df.columns:
+        turno_raw = df["Turno"].fillna("").astype(str)
+        uniq = pd.unique(turno_raw)
+        bits = dict(zip(uniq, (turno_bits(u) for u in uniq)))
+        turno = turno_raw.map(bits).to_numpy(dtype=np.int8, copy=True)
+    else:
+        turno = np.zeros(n, dtype=np.int8)
+    if "Horas_Reales" in df.columns:
+        hours = pd.to_numeric(df["Horas_Reales"], errors="coerce").fillna(0.0).to_numpy(dtype=float, copy=True)
+    else:
+        hours = np.zeros(n, dtype=float)
+    return fecha, turno, hours
+
+
+@dataclass
+class DayIndex:
+    frame: pd.DataFrame | None = None
+    fecha: np.ndarray = field(default_factory=lambda: np.array([], dtype=object))
+    turno: np.ndarray = field(default_factory=lambda: np.array([], dtype=np.int8))
+    hours: np.ndarray = field(default_factory=lambda: np.array([], dtype=float))
+    row_hash: np.ndarray = field(default_factory=lambda: np.array([], dtype=np.uint64))
+    has_fecha: bool = False
+    has_turno: bool = False
+    positions: dict = field(default_factory=dict)
+    day_hours: dict = field(default_factory=dict)
+    turno_hours: dict = field(default_factory=dict)
+    rebuilds: int = 0
+    appends: int = 0
+    edits: int = 0
+
+    # -------- mantenimiento --------
+    @classmethod
+    def build(cls, df: pd.DataFrame) -> "DayIndex":
+        idx = cls()
+        idx._rebuild(df, _row_hashes(df))
+        return idx
+
+    def _rebuild(self, df: pd.DataFrame, hashes: np.ndarray) -> None:
+        self.frame = df
+        self.has_fecha = "Fecha" in df.columns
+        self.has_turno = "Turno" in df.columns
+        self.fecha, self.turno, self.hours = _row_values(df)
+        self.row_hash = hashes
+        self.positions, self.day_hours, self.turno_hours = {}, {}, {}
+        self._add_rows(np.arange(len(df)))
+        self.rebuilds += 1
+
+    def _add_rows(self, rows: np.ndarray) -> None:
+        if rows.size == 0:
+            return
+        f = pd.Series(self.fecha[rows])
+        for day, grp in f.groupby(f, sort=False).indices.items():
+            pos = rows[grp]
+            lst = self.positions.setdefault(day, [])
+            if lst and pos[0] < lst[-1]:
+                for p in pos:
+                    bisect.insort(lst, int(p))
+            else:
+                lst.extend(int(p) for p in pos)
+            self._refresh_day(day)
+
+    def _refresh_day(self, day) -> None:
+        pos = self.positions.get(day)
+        if not pos:
+            self.positions.pop(day, None)
+            self.day_hours.pop(day, None)
+            for bits in range(4):
+                self.turno_hours.pop((day, bits), None)
+            return
+        pos = np.asarray(pos)
+        h = self.hours[pos]
+        self.day_hours[day] = float(h.sum())
+        t = self.turno[pos]
+        for bits in range(4):
+            self.turno_hours[(day, bits)] = float(h[t == bits].sum())
+
+    def sync(self, df: pd.DataFrame) -> "DayIndex":
+        """Pone el índice al día con ``df`` (incremental si solo hubo altas/ediciones)."""
+        if df is self.frame:
+            return self
+        hashes = _row_hashes(df)
+        n_old, n_new = self.row_hash.size, len(df)
+        same_cols = ("Fecha" in df.columns) == self.has_fecha and ("Turno" in df.columns) == self.has_turno
+        if self.frame is None or n_new < n_old or not same_cols:
+            self._rebuild(df, hashes)
+            return self
+        changed = np.flatnonzero(hashes[:n_old] != self.row_hash)
+        if changed.size > min(MAX_INCREMENTAL_EDITS, MAX_INCREMENTAL_FRACTION * max(n_old, 1)):
+            self._rebuild(df, hashes)
+            return self
+        # Solo se leen las filas editadas y las nuevas (los arreglos son copias escribibles).
+        added = np.arange(n_old, n_new)
+        fecha_u, turno_u, hours_u = _row_values(df.iloc[np.r_[changed, added]])
+        k = changed.size
+        self.frame = df
+        self.row_hash = hashes
+        if k:
+            old_days = self.fecha[changed]
+            self.fecha[changed] = fecha_u[:k]
+            self.turno[changed] = turno_u[:k]
+            self.hours[changed] = hours_u[:k]
+            for p, old_day, new_day in zip(changed.tolist(), old_days.tolist(), fecha_u[:k].tolist()):
+                if new_day != old_day:
+                    lst = self.positions.get(old_day, [])
+                    i = bisect.bisect_left(lst, p)
+                    if i < len(lst) and lst[i] == p:
+                        lst.pop(i)
+                    bisect.insort(self.positions.setdefault(new_day, []), p)
+            for day in set(old_days.tolist()) | set(fecha_u[:k].tolist()):
+                self._refresh_day(day)
+            self.edits += int(k)
+        if added.size:
+            self.fecha = np.concatenate([self.fecha, fecha_u[k:]])
+            self.turno = np.concatenate([self.turno, turno_u[k:]])
+            self.hours = np.concatenate([self.hours, hours_u[k:]])
+            self._add_rows(added)
+            self.appends += int(added.size)
+        return self
+
+    # -------- consultas --------
+    def rows(self, fecha_sel) -> np.ndarray:
+        """Posiciones (iloc) de las filas del día ``fecha_sel``."""
+        return np.asarray(self.positions.get(str(fecha_sel), []), dtype=np.int64)
+
+    def day_total(self, fecha_sel) -> float:
+        return self.day_hours.get(str(fecha_sel), 0.0)
+
+    def turno_total(self, fecha_sel, turno_nombre) -> float:
+        bit = turno_query_bit(turno_nombre)
+        if not bit or not self.has_turno:
+            return 0.0
+        day = str(fecha_sel)
+        return float(sum(self.turno_hours.get((day, b), 0.0) for b in range(4) if b & bit))
+
+    def stats(self) -> dict:
+        return {
+            "rows": int(self.row_hash.size),
+            "days": len(self.positions),
+            "rebuilds": self.rebuilds,
+            "appends": self.appends,
+            "edits": self.edits,
+        }
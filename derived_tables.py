@@ -0,0 +1,186 @@
+"""Tablas derivadas por versión de datos (bitácora, conexiones, BHA).
+
+Las pestañas del tablero recalculaban en cada rerun los mismos agregados
+(horas TP/TNPI/TNP, horas por actividad, por etapa, estándar por conexión…)
+empezando cada una con ``df.copy()``. Aquí:
+
+- cada tabla base (``df``, ``df_conn``, ``df_bha``) lleva un número de versión.
+  ``sync`` lo incrementa solo cuando el objeto cambió *y* su huella de
+  contenido es distinta, así que reasignar la misma tabla no invalida nada;
+  ``bump`` fuerza la invalidación tras una edición in situ;
+- cada agregado tiene nombre y dependencias (tablas base u otros agregados) y
+  se calcula una vez por combinación de versiones; todas las pestañas reciben
+  el mismo objeto.
+
+Los agregados devueltos se comparten: no deben modificarse in situ (usar
+``.copy()`` si hace falta).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import pandas as pd
+
+from figure_cache import frame_fingerprint
+from kpi_kernel import attach_standard
+
+TIPOS = ("TP", "TNPI", "TNP")
+
+
+@dataclass
+class _Source:
+    frame: pd.DataFrame
+    fingerprint: str
+    version: int = 0
+
+
+@dataclass
+class _Derived:
+    deps: tuple[str, ...]
+    fn: Callable[..., Any]
+    key: tuple | None = None
+    value: Any = None
+    hits: int = 0
+    builds: int = 0
+
+
+@dataclass
+class DerivedTables:
+    _sources: dict[str, _Source] = field(default_factory=dict)
+    _derived: dict[str, _Derived] = field(default_factory=dict)
+
+    # -------- tablas base --------
+    def sync(self, name: str, frame: pd.DataFrame) -> int:
+        """Registra el estado actual de la tabla base ``name``; retorna su versión."""
+        src = self._sources.get(name)
+        if src is None:
+            self._sources[name] = _Source(frame, frame_fingerprint(frame))
+            return 0
+        if frame is not src.frame:
+            fp = frame_fingerprint(frame)
+            if fp != src.fingerprint:
+                src.fingerprint = fp
+                src.version += 1
+            src.frame = frame
+        return src.version
+
+    def bump(self, name: str) -> int:
+        """Invalida ``name`` tras modificarla in situ (recalcula su huella)."""
+        src = self._sources.get(name)
+        if src is None:
+            raise KeyError(f"Tabla base no registrada: {name}")
+        src.fingerprint = frame_fingerprint(src.frame)
+        src.version += 1
+        return src.version
+
+    def version(self, name: str) -> int:
+        return self._sources[name].version
+
+    def fingerprint(self, name: str) -> str:
+        """Huella de contenido de la tabla base (calculada solo cuando cambia)."""
+        return self._sources[name].fingerprint
+
+    # -------- agregados --------
+    def define(self, name: str, deps: tuple[str, ...] | list[str], fn: Callable[..., Any]) -> None:
+        """``fn`` recibe los valores de ``deps`` (tablas base o agregados) en ese orden."""
+        if name in self._sources:
+            raise ValueError(f"'{name}' ya es una tabla base")
+        self._derived[name] = _Derived(tuple(deps), fn)
+
+    def _key(self, name: str) -> tuple:
+        if name in self._sources:
+            return (name, self._sources[name].version)
+        spec = self._derived[name]
+        return (name,) + tuple(self._key(d) for d in spec.deps)
+
+    def get(self, name: str) -> Any:
+        if name in self._sources:
+            return self._sources[name].frame
+        spec = self._derived.get(name)
+        if spec is None:
+            raise KeyError(f"Agregado no definido: {name}")
+        key = self._key(name)
+        if spec.key == key:
+            spec.hits += 1
+            return spec.value
+        spec.value = spec.fn(*(self.get(d) for d in spec.deps))
+        spec.key = key
+        spec.builds += 1
+        return spec.value
+
+    def stats(self) -> dict:
+        return {
+            "versions": {n: s.version for n, s in self._sources.items()},
+            "derived": {n: {"builds": d.builds, "hits": d.hits} for n, d in self._derived.items()},
+        }
+
+
+# ------------------------------------------------------------------
+# Agregados estándar de la bitácora
+# ------------------------------------------------------------------
+def _num(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+
+
+def tipo_totals(df: pd.DataFrame) -> dict:
+    """Horas programadas, reales y reales por Tipo (TP/TNPI/TNP)."""
+    out = {"Prog": 0.0, "Real": 0.0, **{t: 0.0 for t in TIPOS}}
+    if df is None or df.empty:
+        return out
+    real = _num(df, "Horas_Reales")
+    out["Prog"] = float(_num(df, "Horas_Prog").sum())
+    out["Real"] = float(real.sum())
+    if "Tipo" in df.columns:
+        by_tipo = real.groupby(df["Tipo"]).sum()
+        for t in TIPOS:
+            out[t] = float(by_tipo.get(t, 0.0))
+    return out
+
+
+def hours_by(df: pd.DataFrame, keys: str | list[str]) -> pd.DataFrame:
+    """
+    Horas por ``keys`` con columnas ``TP``, ``TNPI``, ``TNP`` (horas reales por
+    Tipo), ``Real`` y ``Prog``. Filas con llave vacía (NaN) se descartan, como
+    en ``groupby``.
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    cols = keys + list(TIPOS) + ["Real", "Prog"]
+    if df is None or df.empty or any(k not in df.columns for k in keys):
+        return pd.DataFrame(columns=cols)
+    base = df[keys].copy()
+    real = _num(df, "Horas_Reales")
+    tipo = df["Tipo"].astype(str) if "Tipo" in df.columns else pd.Series("", index=df.index)
+    for t in TIPOS:
+        base[t] = real.where(tipo == t, 0.0)
+    base["Real"] = real
+    base["Prog"] = _num(df, "Horas_Prog")
+    return base.groupby(keys, as_index=False)[list(TIPOS) + ["Real", "Prog"]].sum()
+
+
+def conn_std_by(df_conn: pd.DataFrame, keys: list[str], std_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Una fila por conexión (``keys`` + ``Conn_No``): minutos reales sumados y
+    estándar ``TOTAL`` de ``std_table`` (``kpi_kernel.standards_table``) según
+    el tipo/ángulo de su primera fila.
+    """
+    group = list(keys) + ["Conn_No"]
+    cols = group + ["Conn_Tipo", "Angulo_Bucket", "Minutos_Reales", "Std_Total"]
+    if df_conn is None or df_conn.empty or any(k not in df_conn.columns for k in group):
+        return pd.DataFrame(columns=cols)
+    g = df_conn.groupby(group, as_index=False)
+    per = g.first()[group + ["Conn_Tipo", "Angulo_Bucket"]]
+    per["Minutos_Reales"] = g["Minutos_Reales"].sum()["Minutos_Reales"].to_numpy()
+    return attach_standard(per, std_table)
+
+
+def conn_totals(per_conn: pd.DataFrame) -> dict:
+    """KPI de conexiones a partir de ``conn_std_by``: real, estándar, TP, TNPI (min)."""
+    real = float(pd.to_numeric(per_conn.get("Minutos_Reales"), errors="coerce").fillna(0.0).sum()) if not per_conn.empty else 0.0
+    std = float(per_conn["Std_Total"].sum()) if not per_conn.empty else 0.0
+    tp = min(real, std) if std > 0 else real
+    tnpi = max(0.0, real - std) if std > 0 else 0.0
+    return {"Real": real, "Std": std, "TP": tp, "TNPI": tnpi}
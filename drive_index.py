@@ -0,0 +1,344 @@
+"""Índice local de las jornadas guardadas en Google Drive.
+
+En cada rerun el sidebar llamaba ``_ensure_drive_folder``, ``_drive_list_json``
+y ``_drive_download_json`` (del archivo seleccionado, solo para pintar el
+resumen KPI): tres viajes a la API de Drive por clic de cualquier widget y por
+usuario. Aquí:
+
+- el id de la carpeta se resuelve una vez;
+- el listado (``id``, ``name``, ``modifiedTime``, ``md5Checksum``, ``size``) se
+  guarda y solo se vuelve a pedir al vencer ``ttl_s``, con ``refresh(force=True)``
+  (botón) o desde el hilo de ``start_auto_refresh``;
+- el contenido de cada archivo se descarga solo si su versión (md5, o
+  ``modifiedTime`` si Drive no da md5) cambió; junto a él se guarda el resumen
+  KPI ya calculado;
+- ``note_upload`` registra lo que la propia app subió sin volver a listar;
+- una carga explícita (``payload(..., revalidate=True)``) pide antes la versión
+  actual de ese archivo (``files().get``): el listado con TTL solo sirve para
+  navegar y puede no ver lo que otra sesión acaba de guardar.
+
+Con ``cache_dir`` el índice y los contenidos también se guardan en disco, así
+que una sesión nueva del mismo usuario no vuelve a descargar lo que no cambió.
+El índice está pensado para compartirse entre las sesiones de un mismo usuario
+y carpeta: un solo hilo de refresco, que usa las credenciales más recientes y
+se detiene solo si nadie consulta el índice en ``idle_s``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+JSON_MIME = "application/json"
+META_FIELDS = "id,name,modifiedTime,md5Checksum,size"
+LIST_FIELDS = f"files({META_FIELDS})"
+DEFAULT_TTL_S = 300.0
+DEFAULT_LIMIT = 100
+DEFAULT_IDLE_S = 900.0
+INDEX_FILE = "index.json"
+
+
+def _version(meta: dict) -> str:
+    return str(meta.get("md5Checksum") or meta.get("modifiedTime") or "")
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    # Temporal con nombre único: varios procesos pueden guardar el mismo archivo a la vez.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class DriveJornadaIndex:
+    """Listado + contenidos + resúmenes KPI de una carpeta de jornadas en Drive."""
+
+    def __init__(
+        self,
+        folder_name: str,
+        summarize: Callable[[dict], dict] | None = None,
+        cache_dir: str | None = None,
+        ttl_s: float = DEFAULT_TTL_S,
+        limit: int = DEFAULT_LIMIT,
+    ):
+        self.folder_name = folder_name
+        self.summarize = summarize
+        self.cache_dir = cache_dir
+        self.ttl_s = float(ttl_s)
+        self.limit = int(limit)
+        self.folder_id: str | None = None
+        self.listed_at = 0.0
+        self._files: list[dict] = []
+        # file_id → {"version", "kpi", "payload" (en memoria), "path" (en disco)}
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self._stop: threading.Event | None = None
+        self._make_drive: Callable[[], Any] | None = None
+        self.last_used = time.time()
+        self.api_calls = 0
+        self.downloads = 0
+        self.content_hits = 0
+        self._load_disk()
+
+    # -------- persistencia --------
+    def _load_disk(self) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if data.get("folder_name") != self.folder_name:
+            return
+        self.folder_id = data.get("folder_id")
+        self._files = data.get("files") or []
+        for fid, e in (data.get("entries") or {}).items():
+            self._entries[fid] = {"version": e.get("version", ""), "kpi": e.get("kpi"), "path": e.get("path")}
+        # El listado de disco sirve para pintar de inmediato, pero se revalida en el próximo refresh.
+        self.listed_at = 0.0
+
+    def _save_disk(self) -> None:
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = {
+            "folder_name": self.folder_name,
+            "folder_id": self.folder_id,
+            "files": self._files,
+            "entries": {fid: {k: e.get(k) for k in ("version", "kpi", "path")} for fid, e in self._entries.items()},
+        }
+        _write_json_atomic(os.path.join(self.cache_dir, INDEX_FILE), data)
+
+    def _content_path(self, file_id: str, version: str) -> str | None:
+        if not self.cache_dir:
+            return None
+        tag = hashlib.blake2b(f"{file_id}:{version}".encode(), digest_size=8).hexdigest()
+        return os.path.join(self.cache_dir, f"{file_id}_{tag}.json")
+
+    # -------- Drive --------
+    def ensure_folder(self, drive) -> str:
+        with self._lock:
+            if self.folder_id:
+                return self.folder_id
+            q = f"mimeType='{FOLDER_MIME}' and name='{self.folder_name}' and trashed=false"
+            res = drive.files().list(q=q, fields="files(id,name)").execute()
+            self.api_calls += 1
+            files = res.get("files", [])
+            if files:
+                self.folder_id = files[0]["id"]
+            else:
+                folder = drive.files().create(body={"name": self.folder_name, "mimeType": FOLDER_MIME}, fields="id").execute()
+                self.api_calls += 1
+                self.folder_id = folder["id"]
+            self._save_disk()
+            return self.folder_id
+
+    def is_stale(self) -> bool:
+        return (time.time() - self.listed_at) > self.ttl_s
+
+    def refresh(self, drive, force: bool = False, prefetch: int = 0) -> bool:
+        """
+        Vuelve a listar la carpeta si venció el TTL (o ``force``). Las entradas
+        cuya versión cambió se invalidan; ``prefetch`` descarga y resume los
+        primeros N archivos que no tengan resumen vigente. Retorna True si listó.
+        """
+        if not force and not self.is_stale():
+            return False
+        folder_id = self.ensure_folder(drive)
+        res = drive.files().list(
+            q=f"'{folder_id}' in parents and mimeType='{JSON_MIME}' and trashed=false",
+            fields=LIST_FIELDS,
+            orderBy="modifiedTime desc",
+            pageSize=self.limit,
+        ).execute()
+        with self._lock:
+            self.api_calls += 1
+            self._files = res.get("files", [])
+            self.listed_at = time.time()
+            alive = {f["id"]: _version(f) for f in self._files}
+            for fid in list(self._entries):
+                if fid not in alive or self._entries[fid].get("version") != alive[fid]:
+                    self._drop_entry(fid)
+            self._save_disk()
+        if prefetch:
+            for f in self._files[:prefetch]:
+                if self.kpi(f["id"]) is None:
+                    self.payload(drive, f["id"])
+        return True
+
+    def _drop_entry(self, file_id: str) -> None:
+        e = self._entries.pop(file_id, None)
+        path = (e or {}).get("path")
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _meta(self, file_id: str) -> dict:
+        return next((f for f in self._files if f.get("id") == file_id), {})
+
+    def _store(self, file_id: str, version: str, payload: dict) -> dict:
+        kpi = None
+        if self.summarize is not None:
+            try:
+                kpi = self.summarize(payload)
+            except Exception:
+                kpi = {}
+        path = self._content_path(file_id, version)
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            _write_json_atomic(path, payload)
+        # Con caché en disco el contenido no se retiene en memoria (las jornadas pesan MB).
+        entry = {"version": version, "kpi": kpi, "payload": None if path else payload, "path": path}
+        old = self._entries.get(file_id)
+        if old and old.get("path") and old.get("path") != path and os.path.exists(old["path"]):
+            os.remove(old["path"])
+        self._entries[file_id] = entry
+        self._save_disk()
+        return entry
+
+    # -------- consultas --------
+    def files(self) -> list[dict]:
+        with self._lock:
+            self.last_used = time.time()
+            return list(self._files)
+
+    def revalidate(self, drive, file_id: str) -> dict:
+        """Versión actual de un archivo (``files().get``); actualiza su entrada del listado."""
+        meta = drive.files().get(fileId=file_id, fields=META_FIELDS).execute()
+        with self._lock:
+            self.api_calls += 1
+            meta = {k: meta[k] for k in ("id", "name", "modifiedTime", "md5Checksum", "size") if k in meta}
+            meta.setdefault("id", file_id)
+            if any(f.get("id") == file_id for f in self._files):
+                self._files = [meta if f.get("id") == file_id else f for f in self._files]
+            else:
+                self._files = [meta] + self._files
+            e = self._entries.get(file_id)
+            if e and e.get("version") != _version(meta):
+                self._drop_entry(file_id)
+            self._save_disk()
+        return meta
+
+    def payload(self, drive, file_id: str, revalidate: bool = False) -> dict:
+        """
+        Contenido del archivo; se descarga solo si no hay copia de su versión
+        actual. Con ``revalidate`` (cargas explícitas del usuario) la versión se
+        confirma contra Drive en vez de confiar en el listado con TTL.
+        """
+        if revalidate:
+            self.revalidate(drive, file_id)
+        with self._lock:
+            meta = self._meta(file_id)
+            version = _version(meta)
+            e = self._entries.get(file_id)
+            if e and (not version or e.get("version") == version):
+                if e.get("payload") is not None:
+                    self.content_hits += 1
+                    return e["payload"]
+                if e.get("path") and os.path.exists(e["path"]):
+                    self.content_hits += 1
+                    with open(e["path"], "r", encoding="utf-8") as f:
+                        return json.load(f)
+        data = drive.files().get_media(fileId=file_id).execute()
+        payload = json.loads(data.decode("utf-8"))
+        with self._lock:
+            self.api_calls += 1
+            self.downloads += 1
+            self._store(file_id, version, payload)
+        return payload
+
+    def kpi(self, file_id: str) -> dict | None:
+        """Resumen KPI guardado de la versión actual (None si aún no se descargó)."""
+        with self._lock:
+            e = self._entries.get(file_id)
+            if not e:
+                return None
+            version = _version(self._meta(file_id))
+            if version and e.get("version") != version:
+                return None
+            return e.get("kpi")
+
+    def note_upload(self, meta: dict, payload: dict) -> None:
+        """
+        Registra un archivo recién subido por la app (``meta`` es el recurso que
+        devuelve Drive: ``id``, ``name``, ``modifiedTime``, ``md5Checksum``) sin
+        volver a listar ni descargar.
+        """
+        with self._lock:
+            meta = {k: meta[k] for k in ("id", "name", "modifiedTime", "md5Checksum", "size") if k in meta}
+            self._files = [meta] + [f for f in self._files if f.get("id") != meta["id"]]
+            self._store(meta["id"], _version(meta), payload)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.listed_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "cached": sum(1 for e in self._entries.values() if e.get("payload") is not None or e.get("path")),
+                "api_calls": self.api_calls,
+                "downloads": self.downloads,
+                "content_hits": self.content_hits,
+                "age_s": (time.time() - self.listed_at) if self.listed_at else None,
+            }
+
+    # -------- refresco en segundo plano --------
+    def start_auto_refresh(
+        self,
+        make_drive: Callable[[], Any],
+        interval_s: float,
+        prefetch: int = 10,
+        idle_s: float = DEFAULT_IDLE_S,
+    ) -> None:
+        """
+        Hilo que vuelve a listar cada ``interval_s`` y pre-descarga resúmenes.
+        ``make_drive`` debe construir su propio cliente de Drive (no se comparte
+        el de la sesión entre hilos). Llamarlo con el hilo ya activo solo
+        actualiza ``make_drive`` (credenciales de la sesión más reciente). El
+        hilo termina si nadie consulta ``files()`` en ``idle_s``; la próxima
+        llamada lo vuelve a arrancar.
+        """
+        with self._lock:
+            self._make_drive = make_drive
+            self.last_used = time.time()
+            if self._stop is not None and not self._stop.is_set():
+                return
+            stop = threading.Event()
+            self._stop = stop
+
+        def _loop():
+            while not stop.wait(interval_s):
+                with self._lock:
+                    if time.time() - self.last_used > idle_s:
+                        stop.set()
+                        return
+                    make = self._make_drive
+                try:
+                    self.refresh(make(), force=True, prefetch=prefetch)
+                except Exception:
+                    # Token vencido o red caída: se reintenta en el siguiente ciclo.
+                    pass
+
+        threading.Thread(target=_loop, name="drive-jornada-index", daemon=True).start()
+
+    def stop_auto_refresh(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
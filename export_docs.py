@@ -0,0 +1,128 @@
+"""Documentos exportables (PDF carta / PPTX) a partir de KPIs y PNG ya renderizados.
+
+Viven fuera de ``app.py`` para poder armarse en procesos del pool de
+exportación por lotes (``daily_export``), que no pueden importar el script de
+Streamlit. ``app.build_pdf`` / ``app.build_pptx`` renderizan las gráficas con
+la caché compartida (``chart_render``) y delegan aquí.
+"""
+
+from __future__ import annotations
+
+from io import BytesIO
+
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+
+def build_pdf_doc(meta: dict, kpis: dict, titles: list, pngs: dict) -> bytes:
+    """PDF carta: encabezado, KPIs y una gráfica por título (``pngs[título]`` o aviso si falta)."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    def write_text(txt, y, size=12, bold=False):
+        c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
+        c.drawString(0.75 * inch, y, txt)
+        return y - 0.26 * inch
+
+    def write_chart(title, y):
+        img_bytes = pngs.get(title)
+        if img_bytes is None:
+            y = write_text(f"{title} (gráfica no disponible: instala kaleido)", y, size=10, bold=False)
+            return y
+        y = write_text(title, y, size=12, bold=True)
+        img_h = 3.1 * inch
+        img_w = width - 1.5 * inch
+        y_img = y - img_h
+
+        if y_img < 0.75 * inch:
+            c.showPage()
+            y = height - 0.75 * inch
+            y = write_text(title, y, bold=True)
+            y_img = y - img_h
+
+        img_reader = ImageReader(BytesIO(img_bytes))
+        c.drawImage(
+            img_reader,
+            0.75 * inch,
+            y_img,
+            width=img_w,
+            height=img_h,
+            preserveAspectRatio=True,
+            mask=None,
+        )
+        return y_img - 0.25 * inch
+
+    y = height - 0.75 * inch
+    y = write_text("Reporte DrillSpot / ROGII", y, size=18, bold=True)
+    y = write_text(f"Equipo: {meta.get('equipo','')}", y)
+    y = write_text(f"Pozo: {meta.get('pozo','')}", y)
+    y = write_text(f"Etapa: {meta.get('etapa','')}", y)
+    y = write_text(f"Fecha: {meta.get('fecha','')}", y)
+    y -= 0.1 * inch
+
+    y = write_text("KPIs", y, size=14, bold=True)
+    for k, v in kpis.items():
+        y = write_text(f"- {k}: {v}", y, size=11)
+        if y < 1.0 * inch:
+            c.showPage()
+            y = height - 0.75 * inch
+
+    if titles:
+        c.showPage()
+        y = height - 0.75 * inch
+        y = write_text("Gráficas", y, size=14, bold=True)
+        for name in titles:
+            y = write_chart(name, y)
+            if y < 1.0 * inch:
+                c.showPage()
+                y = height - 0.75 * inch
+
+    c.save()
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def build_pptx_doc(meta: dict, kpis: dict, titles: list, pngs: dict) -> bytes:
+    """PPTX 16:9: portada, KPIs y una diapositiva por gráfica."""
+    prs = Presentation()
+    prs.slide_width = Inches(13.33)
+    prs.slide_height = Inches(7.5)
+
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = "Reporte DrillSpot / ROGII"
+    slide.placeholders[1].text = (
+        f"Equipo: {meta.get('equipo','')} | Pozo: {meta.get('pozo','')} | "
+        f"Etapa: {meta.get('etapa','')} | Fecha: {meta.get('fecha','')}"
+    )
+
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = "KPIs"
+    box = slide.shapes.add_textbox(Inches(0.8), Inches(1.4), Inches(11.7), Inches(5.2))
+    tf = box.text_frame
+    tf.clear()
+    tf.word_wrap = True
+    for i, (k, v) in enumerate(kpis.items()):
+        p = tf.add_paragraph() if i > 0 else tf.paragraphs[0]
+        p.text = f"{k}: {v}"
+        p.font.size = Pt(18)
+
+    for title in titles or []:
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = title
+        img_bytes = pngs.get(title)
+        if img_bytes is None:
+            slide.shapes.add_textbox(Inches(0.8), Inches(1.6), Inches(11.5), Inches(1.0)).text_frame.text = (
+                "No se pudo embebir imagen (instala kaleido)."
+            )
+        else:
+            slide.shapes.add_picture(BytesIO(img_bytes), Inches(0.8), Inches(1.4), width=Inches(11.6))
+
+    buf = BytesIO()
+    prs.save(buf)
+    buf.seek(0)
+    return buf.getvalue()
@@ -0,0 +1,92 @@
+"""Caché de figuras Plotly por huella de datos.
+
+Antes ``_make_figs`` usaba ``st.cache_data`` con ``df.to_json()`` como
+argumento: en cada rerun se serializaba toda la bitácora a JSON solo para
+calcular la llave, y luego se volvía a parsear. Aquí la llave es una huella
+barata del contenido (``pd.util.hash_pandas_object`` sobre las filas, más
+columnas y dtypes) y las figuras se guardan como objetos, así que:
+
+- la misma figura (mismos datos, mismo título) se reutiliza entre pestañas y
+  en la exportación PDF/PPTX sin volver a construirse;
+- el número de figuras guardadas está acotado (LRU, ``max_entries``);
+- ``stats()`` reporta aciertos, fallos y desalojos.
+
+Las figuras guardadas no deben modificarse in situ; quien necesite cambiar el
+estilo (p. ej. ``style_for_export``) trabaja sobre una copia.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import pandas as pd
+
+DEFAULT_MAX_ENTRIES = 64
+
+
+def frame_fingerprint(df: pd.DataFrame | None) -> str:
+    """Huella hexadecimal del contenido de ``df`` (columnas, dtypes y valores, sin índice)."""
+    if df is None:
+        return "none"
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((tuple(map(str, df.columns)), tuple(map(str, df.dtypes)), df.shape)).encode())
+    if len(df) and len(df.columns):
+        try:
+            rows = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Celdas no hasheables (listas, dicts): se hashea su texto.
+            rows = pd.util.hash_pandas_object(df.astype(str), index=False)
+        h.update(rows.to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class FigureCache:
+    """LRU de figuras por llave ``(nombre, huellas..., parámetros...)``; segura entre hilos."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        # Se construye fuera del lock: dos sesiones con la misma llave a lo sumo
+        # construyen la figura dos veces.
+        value = builder()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
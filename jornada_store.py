@@ -0,0 +1,470 @@
+"""Almacén de jornadas por segmentos diarios (columnar) con manifiesto.
+
+``save_jornada_json`` escribía en cada guardado toda la bitácora (``df``,
+``df_conn``, ``df_bha`` y ``drill_day``) como JSON con ``indent=2``, y
+``load_jornada_json`` volvía a parsear todo: en un pozo con meses de registros
+el archivo llega a decenas de MB. Aquí una jornada es una carpeta:
+
+- ``manifest.json``: meta, actividades personalizadas, columnas de cada tabla
+  y, por día, archivos, filas, huella de contenido y resumen KPI;
+- ``drill_day.<codec>``: la parte de ``drill_day`` que no depende de la fecha
+  (meta, PT programada, profundidad actual…);
+- ``segments/<fecha>/``: las filas de ese día de cada tabla (Parquet) y las
+  entradas ``*_by_date`` de ``drill_day`` para esa fecha (msgpack).
+
+Guardar un día escribe solo su segmento (y el manifiesto); ``save_all`` omite
+los días cuya huella no cambió. ``load`` lee únicamente los segmentos del rango
+de fechas pedido. ``convert_json`` (o ``python jornada_store.py archivo.json``)
+migra un JSON de jornada existente.
+
+Parquet requiere ``pyarrow`` y msgpack el paquete ``msgpack``; si no están
+instalados el segmento se escribe como JSON compacto (el códec queda anotado en
+el manifiesto, así que un almacén se puede leer con cualquiera de los dos).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Any
+
+import pandas as pd
+
+from derived_tables import tipo_totals
+from figure_cache import frame_fingerprint
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+TABLES = ("df", "df_conn", "df_bha")
+MANIFEST = "manifest.json"
+STORE_FORMAT = "jornada-store"
+STORE_VERSION = 1
+NO_DATE = "sin_fecha"
+BY_DATE_SUFFIX = "_by_date"
+
+FRAME_CODEC = "parquet" if importlib.util.find_spec("pyarrow") is not None else "json"
+DICT_CODEC = "msgpack" if msgpack is not None else "json"
+
+
+# ------------------------------------------------------------------
+# Utilidades
+# ------------------------------------------------------------------
+def day_key(value) -> str:
+    """Fecha normalizada ``YYYY-MM-DD`` (como el merge por día de la app); vacío → ``sin_fecha``."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return NO_DATE
+    s = str(value).strip().replace("/", "-")
+    if not s or s.lower() in ("nan", "nat", "none"):
+        return NO_DATE
+    return s[:10] if re.match(r"^\d{4}-\d{2}-\d{2}", s) else s
+
+
+def _segment_dirname(day: str) -> str:
+    return re.sub(r"[^0-9A-Za-z_-]+", "_", day) or NO_DATE
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _json_default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        return obj.item()
+    try:
+        if pd.isna(obj):
+            return None
+    except Exception:
+        pass
+    return str(obj)
+
+
+def _dumps_dict(obj: Any, codec: str) -> bytes:
+    if codec == "msgpack":
+        return msgpack.packb(obj, default=_json_default, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _loads_dict(data: bytes, codec: str) -> Any:
+    if codec == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("El almacén usa msgpack y el paquete no está instalado (pip install msgpack).")
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return json.loads(data.decode("utf-8"))
+
+
+def _write_frame(df: pd.DataFrame, base: str, codec: str) -> str:
+    """
+    Escribe ``df`` en ``base.<códec>`` y retorna el nombre del archivo. Si Parquet
+    no admite la tabla (columnas object con tipos mezclados, p. ej. texto y
+    número) se escribe como JSON: los valores no se convierten a texto.
+    """
+    df = df.reset_index(drop=True)
+    if codec == "parquet":
+        path = f"{base}.parquet"
+        tmp = f"{path}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            return os.path.basename(path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    path = f"{base}.json"
+    _atomic_write(path, df.to_json(orient="records", force_ascii=False, date_format="iso").encode("utf-8"))
+    return os.path.basename(path)
+
+
+def _read_frame(path: str, codec: str) -> pd.DataFrame:
+    if codec == "parquet" and path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    with open(path, "rb") as f:
+        return pd.DataFrame(json.loads(f.read().decode("utf-8")))
+
+
+# ------------------------------------------------------------------
+# drill_day: parte fija + entradas por fecha
+# ------------------------------------------------------------------
+def split_drill_day(drill_day: dict) -> tuple[dict, dict[str, dict]]:
+    """
+    Separa ``drill_day`` en la parte sin fecha y ``{fecha: parte}`` con las
+    entradas de los mapas ``*_by_date`` (a cualquier profundidad).
+    """
+    per_day: dict[str, dict] = {}
+
+    def _walk(node: dict, path: tuple) -> dict:
+        base = {}
+        for k, v in node.items():
+            if isinstance(v, dict) and str(k).endswith(BY_DATE_SUFFIX):
+                base[k] = {}
+                for fecha, val in v.items():
+                    target = per_day.setdefault(day_key(fecha), {})
+                    for p in path + (k,):
+                        target = target.setdefault(p, {})
+                    target[fecha] = val
+            elif isinstance(v, dict):
+                base[k] = _walk(v, path + (k,))
+            else:
+                base[k] = v
+        return base
+
+    return _walk(drill_day if isinstance(drill_day, dict) else {}, ()), per_day
+
+
+def merge_drill_day(base: dict, *parts: dict) -> dict:
+    """Une (en profundidad) la parte fija de ``drill_day`` con partes por día."""
+    out = json.loads(json.dumps(base or {}, default=_json_default))
+    for part in parts:
+        stack = [(out, part or {})]
+        while stack:
+            dst, src = stack.pop()
+            for k, v in src.items():
+                if isinstance(v, dict) and isinstance(dst.get(k), dict):
+                    stack.append((dst[k], v))
+                else:
+                    dst[k] = v
+    return out
+
+
+def _split_by_day(df: pd.DataFrame | None) -> dict[str, pd.DataFrame]:
+    if df is None or df.empty:
+        return {}
+    if "Fecha" not in df.columns:
+        return {NO_DATE: df}
+    keys = df["Fecha"].map(day_key)
+    return {str(k): g for k, g in df.groupby(keys, sort=True)}
+
+
+def session_days(df=None, df_conn=None, df_bha=None, drill_day: dict | None = None) -> set[str]:
+    """Días con datos en las tablas (y entradas ``*_by_date``) de una sesión."""
+    days = set(split_drill_day(drill_day)[1]) if drill_day is not None else set()
+    for src in (df, df_conn, df_bha):
+        days.update(_split_by_day(src))
+    return days
+
+
+def _kpi_summary(df_day: pd.DataFrame | None) -> dict:
+    t = tipo_totals(df_day)
+    return {"total_h": t["Real"], "tp_h": t["TP"], "tnpi_h": t["TNPI"], "tnp_h": t["TNP"]}
+
+
+# ------------------------------------------------------------------
+# Almacén
+# ------------------------------------------------------------------
+class JornadaStore:
+    """Carpeta de jornada: manifiesto + un segmento por día."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest = self._read_manifest()
+
+    # -------- manifiesto --------
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, MANIFEST))
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self.root, MANIFEST)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                man = json.load(f)
+            if man.get("format") != STORE_FORMAT:
+                raise ValueError(f"{path} no es un manifiesto de jornada")
+            return man
+        return {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "meta": {},
+            "custom_actividades": [],
+            "columns": {t: [] for t in TABLES},
+            "drill_day": None,
+            "days": {},
+        }
+
+    def _write_manifest(self) -> None:
+        self.manifest["updated_at"] = datetime.now().isoformat(timespec="seconds")
+        os.makedirs(self.root, exist_ok=True)
+        data = json.dumps(self.manifest, ensure_ascii=False, indent=1, default=_json_default)
+        _atomic_write(os.path.join(self.root, MANIFEST), data.encode("utf-8"))
+
+    def days(self) -> list[str]:
+        return sorted(self.manifest.get("days", {}))
+
+    def day_info(self, day: str) -> dict:
+        return self.manifest.get("days", {}).get(day_key(day), {})
+
+    @property
+    def meta(self) -> dict:
+        return self.manifest.get("meta") or {}
+
+    def size_bytes(self) -> int:
+        total = 0
+        for dirpath, _dirs, files in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in files)
+        return total
+
+    # -------- escritura --------
+    def _write_common(self, meta: dict | None, custom_actividades, drill_day_base: dict | None, frames: dict) -> None:
+        if meta is not None:
+            self.manifest["meta"] = meta
+        if custom_actividades is not None:
+            self.manifest["custom_actividades"] = list(custom_actividades)
+        for t in TABLES:
+            df = frames.get(t)
+            if df is not None and len(df.columns):
+                self.manifest.setdefault("columns", {})[t] = [str(c) for c in df.columns]
+        if drill_day_base is not None:
+            os.makedirs(self.root, exist_ok=True)
+            fname = f"drill_day.{DICT_CODEC}"
+            _atomic_write(os.path.join(self.root, fname), _dumps_dict(drill_day_base, DICT_CODEC))
+            self.manifest["drill_day"] = {"file": fname, "codec": DICT_CODEC}
+
+    def _write_segment(self, day: str, frames: dict, drill_part: dict | None, force: bool) -> bool:
+        """Escribe el segmento de ``day``; retorna False si su huella no cambió."""
+        fps = {t: frame_fingerprint(frames.get(t)) for t in TABLES}
+        fps["drill_day"] = frame_fingerprint(pd.DataFrame([{"v": json.dumps(drill_part or {}, sort_keys=True, default=_json_default)}]))
+        prev = self.manifest.setdefault("days", {}).get(day)
+        if not force and prev and prev.get("fingerprints") == fps:
+            return False
+        seg_rel = os.path.join("segments", _segment_dirname(day))
+        seg_dir = os.path.join(self.root, seg_rel)
+        os.makedirs(seg_dir, exist_ok=True)
+        files, rows = {}, {}
+        for t in TABLES:
+            df = frames.get(t)
+            if df is None or df.empty:
+                rows[t] = 0
+                continue
+            files[t] = _write_frame(df, os.path.join(seg_dir, t), FRAME_CODEC)
+            rows[t] = int(len(df))
+        if drill_part:
+            fname = f"drill_day.{DICT_CODEC}"
+            _atomic_write(os.path.join(seg_dir, fname), _dumps_dict(drill_part, DICT_CODEC))
+            files["drill_day"] = fname
+        # Archivos de un guardado previo que ya no aplican (tabla vacía o códec distinto).
+        for f in os.listdir(seg_dir):
+            if f not in files.values():
+                os.remove(os.path.join(seg_dir, f))
+        self.manifest["days"][day] = {
+            "dir": seg_rel.replace(os.sep, "/"),
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "frame_codec": FRAME_CODEC,
+            "dict_codec": DICT_CODEC,
+            "files": files,
+            "rows": rows,
+            "fingerprints": fps,
+            "kpi": _kpi_summary(frames.get("df")),
+        }
+        return True
+
+    def save_day(
+        self,
+        day,
+        df: pd.DataFrame | None = None,
+        df_conn: pd.DataFrame | None = None,
+        df_bha: pd.DataFrame | None = None,
+        drill_day: dict | None = None,
+        meta: dict | None = None,
+        custom_actividades=None,
+    ) -> bool:
+        """
+        Guarda solo el segmento de ``day`` a partir de las tablas completas de la
+        sesión (se filtran las filas de ese día). Retorna False si no cambió.
+        """
+        day = day_key(day)
+        frames = {}
+        for t, src in zip(TABLES, (df, df_conn, df_bha)):
+            frames[t] = _split_by_day(src).get(day) if src is not None else None
+        base, per_day = split_drill_day(drill_day) if drill_day is not None else (None, {})
+        self._write_common(meta, custom_actividades, base, {t: s for t, s in zip(TABLES, (df, df_conn, df_bha))})
+        written = self._write_segment(day, frames, per_day.get(day), force=False)
+        self._write_manifest()
+        return written
+
+    def save_all(
+        self,
+        df: pd.DataFrame | None,
+        df_conn: pd.DataFrame | None,
+        df_bha: pd.DataFrame | None,
+        drill_day: dict | None = None,
+        meta: dict | None = None,
+        custom_actividades=None,
+        prune_days=None,
+    ) -> list[str]:
+        """
+        Guarda todos los días; solo se reescriben los segmentos cuya huella
+        cambió. Retorna los días escritos.
+
+        ``prune_days`` son los días que la sesión tenía cargados del almacén: de
+        esos, los que ya no tienen datos se borran. Los demás días del disco no
+        se tocan (la sesión puede haber cargado solo un rango).
+        """
+        sources = dict(zip(TABLES, (df, df_conn, df_bha)))
+        split = {t: _split_by_day(src) for t, src in sources.items()}
+        base, per_day = split_drill_day(drill_day) if drill_day is not None else (None, {})
+        self._write_common(meta, custom_actividades, base, sources)
+        all_days = set(per_day)
+        for parts in split.values():
+            all_days.update(parts)
+        written = []
+        for day in sorted(all_days):
+            frames = {t: split[t].get(day) for t in TABLES}
+            if self._write_segment(day, frames, per_day.get(day), force=False):
+                written.append(day)
+        if prune_days:
+            stale = {day_key(d) for d in prune_days} - all_days
+            for day in stale & set(self.manifest.get("days", {})):
+                self.drop_day(day, write_manifest=False)
+        self._write_manifest()
+        return written
+
+    def drop_day(self, day, write_manifest: bool = True) -> None:
+        info = self.manifest.get("days", {}).pop(day_key(day), None)
+        if info:
+            shutil.rmtree(os.path.join(self.root, info.get("dir", "")), ignore_errors=True)
+        if write_manifest:
+            self._write_manifest()
+
+    # -------- lectura --------
+    def drill_day_base(self) -> dict:
+        info = self.manifest.get("drill_day")
+        if not info:
+            return {}
+        with open(os.path.join(self.root, info["file"]), "rb") as f:
+            return _loads_dict(f.read(), info.get("codec", "json"))
+
+    def select_days(self, start=None, end=None) -> list[str]:
+        """Días del manifiesto en ``[start, end]`` (inclusive; ``None`` = sin límite)."""
+        days = self.days()
+        if start is None and end is None:
+            return days
+        lo = day_key(start) if start is not None else ""
+        hi = day_key(end) if end is not None else "9999-99-99"
+        return [d for d in days if d != NO_DATE and lo <= d <= hi]
+
+    def load(self, start=None, end=None) -> dict:
+        """
+        Lee solo los segmentos del rango. Retorna ``meta``, ``custom_actividades``,
+        ``drill_day`` (parte fija + días leídos), ``df``/``df_conn``/``df_bha``
+        y ``days`` (días leídos).
+        """
+        days = self.select_days(start, end)
+        columns = self.manifest.get("columns", {})
+        parts = {t: [] for t in TABLES}
+        drill_parts = []
+        for day in days:
+            info = self.manifest["days"][day]
+            seg_dir = os.path.join(self.root, info["dir"])
+            files = info.get("files", {})
+            for t in TABLES:
+                if t in files:
+                    parts[t].append(_read_frame(os.path.join(seg_dir, files[t]), info.get("frame_codec", "parquet")))
+            if "drill_day" in files:
+                with open(os.path.join(seg_dir, files["drill_day"]), "rb") as f:
+                    drill_parts.append(_loads_dict(f.read(), info.get("dict_codec", "json")))
+        out = {
+            "meta": dict(self.meta),
+            "custom_actividades": list(self.manifest.get("custom_actividades") or []),
+            "drill_day": merge_drill_day(self.drill_day_base(), *drill_parts),
+            "days": days,
+        }
+        for t in TABLES:
+            cols = columns.get(t) or []
+            if parts[t]:
+                frame = pd.concat(parts[t], ignore_index=True)
+                out[t] = frame.reindex(columns=cols + [c for c in frame.columns if c not in cols]) if cols else frame
+            else:
+                out[t] = pd.DataFrame(columns=cols)
+        return out
+
+
+# ------------------------------------------------------------------
+# Migración desde JSON
+# ------------------------------------------------------------------
+def convert_payload(payload: dict, store_dir: str) -> JornadaStore:
+    """Escribe un payload de jornada (formato ``save_jornada_json``) como almacén."""
+    store = JornadaStore(store_dir)
+    store.save_all(
+        pd.DataFrame(payload.get("df") or []),
+        pd.DataFrame(payload.get("df_conn") or []),
+        pd.DataFrame(payload.get("df_bha") or []),
+        drill_day=payload.get("drill_day") or {},
+        meta=payload.get("meta") or (payload.get("drill_day") or {}).get("meta") or {},
+        custom_actividades=payload.get("custom_actividades") or [],
+    )
+    return store
+
+
+def convert_json(path_json: str, store_dir: str | None = None) -> JornadaStore:
+    """Convierte ``jornada_*.json`` a un almacén (por defecto, carpeta hermana sin ``.json``)."""
+    with open(path_json, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if store_dir is None:
+        store_dir = os.path.splitext(path_json)[0]
+    return convert_payload(payload, store_dir)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Uso: python jornada_store.py jornada.json [carpeta_destino]")
+        sys.exit(1)
+    _src = sys.argv[1]
+    _store = convert_json(_src, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(
+        f"{_src}: {os.path.getsize(_src) / 1e6:.2f} MB JSON → {_store.root}: "
+        f"{_store.size_bytes() / 1e6:.2f} MB en {len(_store.days())} segmentos "
+        f"({FRAME_CODEC}/{DICT_CODEC})"
+    )
@@ -0,0 +1,144 @@
+"""Kernel vectorizado de KPIs: eficiencia, recorte a 0-100, semáforo y estándares.
+
+Las tablas resumen del tablero (comparativa de etapas, estadísticas, BHA,
+conexiones, top TNPI…) calculaban ``Eficiencia_pct`` y ``Semáforo`` fila por
+fila con ``df.apply(lambda r: ..., axis=1)`` y ``.apply(semaforo_dot)``, y el
+estándar de cada conexión con una búsqueda en ``CONN_STDS`` por fila. Aquí las
+mismas reglas se aplican sobre columnas completas:
+
+- ``efficiency_pct``: ``num / den * 100`` donde ``den > 0`` (0 en otro caso),
+  opcionalmente recortada a 0-100 (como ``clamp_0_100(safe_pct(...))``);
+- ``semaforo``: 🟢 ≥ 85, 🟡 ≥ 75, 🔴 resto (``np.select``); ⚪ para valores no
+  numéricos, igual que ``_semaforo_from_eff``;
+- ``standards_table`` / ``attach_standard``: el diccionario de estándares se
+  aplana una vez a una tabla y se cruza con ``merge``.
+
+``python kpi_kernel.py`` corre un benchmark contra la versión fila por fila
+sobre una bitácora sintética de 100k filas.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+SEMAFORO_OK = 85.0
+SEMAFORO_WARN = 75.0
+SEMAFORO_LABELS = ("🟢", "🟡", "🔴")
+SEMAFORO_NA = "⚪"
+STD_KEYS = ("Conn_Tipo", "Angulo_Bucket")
+
+
+def _as_float(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values) if np.ndim(values) else pd.Series([values]), errors="coerce").to_numpy(dtype=float)
+
+
+def clamp_pct(values) -> np.ndarray:
+    """Recorta a [0, 100]; no numéricos → 0 (como ``clamp_0_100``)."""
+    v = _as_float(values)
+    return np.where(np.isnan(v), 0.0, np.clip(v, 0.0, 100.0))
+
+
+def efficiency_pct(num, den, clamp: bool = True) -> np.ndarray:
+    """``num / den * 100`` donde ``den > 0`` y 0 en otro caso; ``clamp`` recorta a 0-100."""
+    n = _as_float(num)
+    d = _as_float(den)
+    ok = d > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(ok, n / np.where(ok, d, 1.0) * 100.0, 0.0)
+    return clamp_pct(out) if clamp else out
+
+
+def semaforo(values) -> np.ndarray:
+    """Semáforo por valor de eficiencia (%)."""
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+    out = np.select([v >= SEMAFORO_OK, v >= SEMAFORO_WARN], SEMAFORO_LABELS[:2], SEMAFORO_LABELS[2]).astype(object)
+    if not pd.api.types.is_numeric_dtype(s.dtype):
+        # None, "" o texto no numérico → ⚪; un float NaN conserva 🔴 como antes.
+        bad = np.isnan(v) & ~s.map(lambda x: isinstance(x, float)).to_numpy(dtype=bool)
+        out[bad] = SEMAFORO_NA
+    return out
+
+
+def standards_table(stds: dict, keys: tuple[str, ...] = STD_KEYS) -> pd.DataFrame:
+    """
+    Aplana ``{(tipo, bucket): {"COMPONENTE": min, ..., "TOTAL": min}}`` a una
+    fila por llave con una columna por componente.
+    """
+    rows = [dict(zip(keys, k), **(v or {})) for k, v in stds.items()]
+    if not rows:
+        return pd.DataFrame(columns=list(keys))
+    return pd.DataFrame(rows)
+
+
+def attach_standard(
+    df: pd.DataFrame,
+    table: pd.DataFrame,
+    component: str = "TOTAL",
+    out_col: str = "Std_Total",
+    keys: tuple[str, ...] = STD_KEYS,
+) -> pd.DataFrame:
+    """``df`` con ``out_col`` = estándar ``component`` de su llave (0 si no hay estándar)."""
+    out = df.copy()
+    if df.empty or any(k not in df.columns for k in keys) or component not in table.columns:
+        out[out_col] = 0.0
+        return out
+    right = table[list(keys) + [component]].drop_duplicates(list(keys)).rename(columns={component: "__std"})
+    merged = df[list(keys)].merge(right, on=list(keys), how="left")
+    out[out_col] = pd.to_numeric(merged["__std"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    return out
+
+
+def _benchmark(n: int = 100_000, repeat: int = 3) -> None:
+    import time
+
+    rng = np.random.default_rng(7)
+    stds = {
+        (t, b): {"TOTAL": float(rng.uniform(5, 20))}
+        for t in ("Normal", "Direccional", "Horizontal")
+        for b in ("0-30", "30-60", "60-90")
+    }
+    log = pd.DataFrame(
+        {
+            "TP": rng.uniform(0, 12, n),
+            "Total_h": rng.uniform(0, 14, n) * (rng.random(n) > 0.05),
+            "Conn_Tipo": rng.choice(["Normal", "Direccional", "Horizontal", "Otro"], n),
+            "Angulo_Bucket": rng.choice(["0-30", "30-60", "60-90"], n),
+        }
+    )
+
+    def _clamp(x):
+        return max(0.0, min(float(x), 100.0))
+
+    def _sem(x):
+        return "🟢" if x >= 85 else ("🟡" if x >= 75 else "🔴")
+
+    def rowwise():
+        eff = log.apply(lambda r: _clamp(r["TP"] / r["Total_h"] * 100.0) if r["Total_h"] > 0 else 0.0, axis=1)
+        sem = eff.apply(_sem)
+        std = log.apply(lambda r: float(stds.get((r["Conn_Tipo"], r["Angulo_Bucket"]), {}).get("TOTAL", 0.0)), axis=1)
+        return eff.to_numpy(), sem.to_numpy(), std.to_numpy()
+
+    table = standards_table(stds)
+
+    def vectorized():
+        eff = efficiency_pct(log["TP"], log["Total_h"])
+        return eff, semaforo(eff), attach_standard(log, table)["Std_Total"].to_numpy()
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            res = fn()
+            times.append(time.perf_counter() - t0)
+        return min(times), res
+
+    t_row, (e1, s1, d1) = best(rowwise)
+    t_vec, (e2, s2, d2) = best(vectorized)
+    assert np.allclose(e1, e2) and (s1 == s2).all() and np.allclose(d1, d2)
+    print(f"{n:,} filas — fila por fila: {t_row:.3f} s | vectorizado: {t_vec:.4f} s | {t_row / t_vec:.0f}x")
+
+
+if __name__ == "__main__":
+    _benchmark()
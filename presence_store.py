@@ -0,0 +1,196 @@
+"""Presencia de usuarios activos en SQLite (WAL) con latidos acotados.
+
+``_touch_active_user`` leía, limpiaba y reescribía todo ``active_users.json``
+en cada rerun de cada sesión: lectura-modificación-escritura sin lock (dos
+sesiones a la vez se pisan) y E/S de disco en el camino caliente. Aquí:
+
+- cada usuario es una fila (``user_key`` clave primaria) y el latido es un
+  UPSERT de esa fila; WAL permite leer mientras otra sesión escribe;
+- el latido se limita en memoria a una escritura por usuario cada
+  ``heartbeat_s`` (o cuando cambian nombre/rol/foto), así que los reruns
+  normales no tocan el disco;
+- la expiración por TTL es un solo ``DELETE ... WHERE last_seen < ?`` sobre el
+  índice de ``last_seen`` (a lo sumo una vez por ``heartbeat_s``), y el listado
+  de activos es un ``SELECT`` sobre el mismo índice.
+
+Hay una sola conexión por base en todo el proceso (``check_same_thread=False``)
+protegida por un lock: los PRAGMA de WAL se ejecutan una vez al abrirla y no en
+cada rerun (Streamlit atiende cada rerun en un hilo nuevo, así que una conexión
+por hilo se reabría casi siempre).
+
+Si la base no se puede abrir (disco de solo lectura) se usa una base en
+memoria compartida por el proceso.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_HEARTBEAT_S = 60.0
+DEFAULT_TTL_S = 45 * 60.0
+MEMORY_URI = "file:presence?mode=memory&cache=shared"
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS presence (
+        user_key  TEXT PRIMARY KEY,
+        name      TEXT NOT NULL DEFAULT '',
+        email     TEXT NOT NULL DEFAULT '',
+        photo_url TEXT NOT NULL DEFAULT '',
+        role      TEXT NOT NULL DEFAULT 'user',
+        last_seen REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_presence_last_seen ON presence (last_seen)",
+)
+
+_UPSERT = """
+    INSERT INTO presence (user_key, name, email, photo_url, role, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_key) DO UPDATE SET
+        name = excluded.name,
+        email = excluded.email,
+        photo_url = excluded.photo_url,
+        role = excluded.role,
+        last_seen = excluded.last_seen
+"""
+
+
+_CONNECTIONS: dict[str, sqlite3.Connection] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def _shared_connection(db_path: str, uri: bool) -> sqlite3.Connection:
+    """Conexión única del proceso para ``db_path``; se abre (y configura) una sola vez."""
+    with _CONNECTIONS_LOCK:
+        conn = _CONNECTIONS.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, timeout=5.0, uri=uri, isolation_level=None, check_same_thread=False)
+            try:
+                conn.execute("PRAGMA busy_timeout = 5000")
+                if not uri:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    conn.execute("PRAGMA synchronous = NORMAL")
+            except sqlite3.Error:
+                conn.close()
+                raise
+            _CONNECTIONS[db_path] = conn
+        return conn
+
+
+def user_key(user_meta: dict) -> str:
+    return str(user_meta.get("email") or user_meta.get("username") or "").strip().lower()
+
+
+class PresenceStore:
+    """Usuarios activos sobre una conexión SQLite compartida por el proceso (serializada con un lock)."""
+
+    def __init__(self, db_path: str, heartbeat_s: float = DEFAULT_HEARTBEAT_S, ttl_s: float = DEFAULT_TTL_S):
+        self.heartbeat_s = float(heartbeat_s)
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        # Serializa el uso de la conexión compartida (no admite cursores concurrentes).
+        self._db_lock = threading.Lock()
+        self._last_write: dict[str, tuple[float, tuple]] = {}
+        self._last_expire = 0.0
+        self.writes = 0
+        self.skipped = 0
+        self.db_path, self._uri = db_path, False
+        try:
+            self._init_schema(self._connect())
+        except sqlite3.Error:
+            # La base en memoria compartida vive mientras su conexión (del módulo) siga abierta.
+            self.db_path, self._uri = MEMORY_URI, True
+            self._init_schema(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        return _shared_connection(self.db_path, self._uri)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._db_lock:
+            return self._connect().execute(sql, params)
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._db_lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        with self._db_lock:
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+
+    # -------- escritura --------
+    def heartbeat(self, user_meta: dict, now: float | None = None) -> bool:
+        """Registra actividad del usuario; retorna False si el latido se omitió (throttle)."""
+        if not isinstance(user_meta, dict):
+            return False
+        key = user_key(user_meta)
+        if not key:
+            return False
+        now = time.time() if now is None else float(now)
+        row = (
+            str(user_meta.get("name") or user_meta.get("username") or key),
+            str(user_meta.get("email") or key),
+            str(user_meta.get("photo_url") or ""),
+            str(user_meta.get("role") or "user"),
+        )
+        with self._lock:
+            last = self._last_write.get(key)
+            if last is not None and last[1] == row and (now - last[0]) < self.heartbeat_s:
+                self.skipped += 1
+                return False
+            expire = (now - self._last_expire) >= self.heartbeat_s
+        # Si el UPSERT falla (base bloqueada, disco) no se registra el latido: el siguiente rerun reintenta.
+        self._execute(_UPSERT, (key, *row, now))
+        with self._lock:
+            self._last_write[key] = (now, row)
+            self.writes += 1
+        if expire:
+            try:
+                self.expire(now=now)
+            except sqlite3.Error:
+                pass
+            else:
+                with self._lock:
+                    self._last_expire = now
+        return True
+
+    def expire(self, ttl_s: float | None = None, now: float | None = None) -> int:
+        """Borra los usuarios sin latido en ``ttl_s``; retorna cuántos."""
+        now = time.time() if now is None else float(now)
+        ttl = self.ttl_s if ttl_s is None else float(ttl_s)
+        cur = self._execute("DELETE FROM presence WHERE last_seen < ?", (now - ttl,))
+        with self._lock:
+            cutoff = now - ttl
+            for k in [k for k, (ts, _row) in self._last_write.items() if ts < cutoff]:
+                del self._last_write[k]
+        return cur.rowcount
+
+    # -------- lectura --------
+    def active(self, ttl_s: float | None = None, limit: int | None = None, now: float | None = None) -> list[dict]:
+        """Usuarios con latido en los últimos ``ttl_s``, del más reciente al más antiguo."""
+        now = time.time() if now is None else float(now)
+        ttl = self.ttl_s if ttl_s is None else float(ttl_s)
+        sql = "SELECT user_key, name, email, photo_url, role, last_seen FROM presence WHERE last_seen >= ? ORDER BY last_seen DESC"
+        params: tuple = (now - ttl,)
+        if limit:
+            sql += " LIMIT ?"
+            params += (int(limit),)
+        return [
+            {
+                "key": k,
+                "name": name,
+                "email": email,
+                "photo_url": photo,
+                "role": role,
+                "last_seen": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+            }
+            for k, name, email, photo, role, ts in self._query(sql, params)
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"writes": self.writes, "skipped": self.skipped, "tracked": len(self._last_write), "db": self.db_path}